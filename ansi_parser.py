@@ -0,0 +1,194 @@
+import codecs
+import re
+from typing import List, Tuple
+
+
+# 一次扫描识别一个完整记号：可打印文本段、CSI、OSC、DCS/SOS/PM/APC、ESC、C0/C1控制字符，
+# 最后是无法识别的单个ESC。状态机的各个状态被编译进正则，扫描完全在C代码中完成；
+# 不使用分组，findall 直接返回记号字符串而不是每个记号一个元组。
+_TOKEN_RE = re.compile(
+    r'[^\x00-\x1f\x7f-\x9f]+'
+    r'|\x1b\[[<=>?]?[0-9:;]*[\x20-\x2f]*[\x40-\x7e]'
+    r'|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)'
+    r'|\x1b[PX^_][^\x1b]*\x1b\\'
+    r'|\x1b(?![\[\]PX^_])[\x20-\x2f]*[\x30-\x7e]'
+    r'|[\x00-\x1a\x1c-\x1f\x7f-\x9f]+'
+    r'|\x1b'
+)
+
+# 不可打印的首字符：以这些字符开头的记号是控制字符或转义序列
+_NON_PRINTABLE = frozenset(map(chr, (*range(0x20), *range(0x7f, 0xa0))))
+
+_CSI_RE = re.compile(r'\x1b\[([<=>?]?)([0-9:;]*)([\x20-\x2f]*)([\x40-\x7e])')
+
+# 未结束的转义序列前缀，遇到时保留到下一次feed
+_PARTIAL_RE = re.compile(
+    r'\x1b(?:\[[<=>?]?[0-9:;]*[\x20-\x2f]*'
+    r'|\][^\x07\x1b]*\x1b?'
+    r'|[PX^_][^\x1b]*\x1b?'
+    r'|[\x20-\x2f]*)'
+)
+
+# CSI终止字符 -> 动作类型（无私有前缀时）
+CSI_ACTIONS = {
+    'm': 'sgr',
+    'A': 'cursor', 'B': 'cursor', 'C': 'cursor', 'D': 'cursor',
+    'E': 'cursor', 'F': 'cursor', 'G': 'cursor', 'H': 'cursor',
+    'f': 'cursor', 'd': 'cursor', 'e': 'cursor', 'a': 'cursor', '`': 'cursor',
+    's': 'cursor', 'u': 'cursor',
+    'J': 'erase', 'K': 'erase', 'X': 'erase',
+    'P': 'edit', '@': 'edit', 'L': 'edit', 'M': 'edit', 'S': 'edit', 'T': 'edit',
+    'r': 'margins',
+}
+
+# 单个转义序列的最大长度，超过后丢弃，防止异常数据无限占用内存
+MAX_SEQUENCE_LENGTH = 64 * 1024
+
+# CSI数字参数的上限，与 xterm 一样超出的值按上限处理
+MAX_PARAM = 65535
+
+# 记号 -> 动作元组的缓存上限（SGR等序列高度重复，动作元组不可变可直接复用）
+SEQUENCE_CACHE_SIZE = 4096
+
+# 不超过该长度的文本段也缓存动作元组（如 ls 输出中反复出现的分隔空白和短文件名）
+CACHED_TEXT_LENGTH = 8
+
+Action = Tuple
+
+
+def _param(p: str) -> int:
+    """单个数字参数，超出范围的截断为 MAX_PARAM（过长的数字串不转换，避免int转换的位数限制）"""
+    if len(p) > 5:
+        p = p.lstrip('0')
+        if len(p) > 5:
+            return MAX_PARAM
+    return min(int(p), MAX_PARAM) if p else 0
+
+
+def parse_params(params: str) -> tuple:
+    """解析CSI参数，空参数记为0；含冒号的子参数解析为元组"""
+    if not params:
+        return ()
+    if ':' not in params:
+        return tuple(_param(p) for p in params.split(';'))
+    result = []
+    for p in params.split(';'):
+        if ':' in p:
+            result.append(tuple(_param(s) for s in p.split(':')))
+        else:
+            result.append(_param(p))
+    return tuple(result)
+
+
+def _csi_action(seq: str) -> Action:
+    """把完整的CSI序列转换为动作元组"""
+    private, params, inter, final = _CSI_RE.match(seq).groups()
+    params = parse_params(params)
+    action = None if (private or inter) else CSI_ACTIONS.get(final)
+    if action == 'sgr':
+        return ('sgr', params)
+    if ':' in seq:
+        # 只有SGR使用冒号子参数，其他序列取第一个子参数，保证参数都是整数
+        params = tuple(p[0] if isinstance(p, tuple) else p for p in params)
+    if action is not None:
+        return (action, final, params)
+    if final in 'hl' and not inter:
+        return ('mode', final, params, private)
+    return ('csi', final, params, private, inter)
+
+
+def _esc_action(seq: str) -> Action:
+    """把完整的ESC序列转换为动作元组"""
+    return ('esc', seq[-1], seq[1:-1])
+
+
+def _token_action(token: str) -> Action:
+    """把以控制字符或ESC开头的记号转换为动作元组"""
+    if token[0] != '\x1b' or len(token) == 1:
+        # 无法识别的ESC作为控制字符交给屏幕，不静默丢弃
+        return ('control', token)
+    kind = token[1]
+    if kind == '[':
+        return _csi_action(token)
+    if kind == ']':
+        return ('osc', token[2:-1] if token[-1] == '\x07' else token[2:-2])
+    if kind in 'PX^_':
+        return ('string', kind, token[2:-2])
+    return _esc_action(token)
+
+
+class AnsiParser:
+    """流式ANSI/VT解析器
+
+    直接接收原始字节，使用增量UTF-8解码器，跨数据块的多字节字符和转义序列
+    都会被保留到下一次feed。每次feed返回一批动作元组：
+        ('print', text)
+        ('control', chars)        连续的控制字符合并为一个动作
+        ('sgr', params)
+        ('cursor' | 'erase' | 'edit' | 'margins', final, params)
+        ('mode', final, params, private)
+        ('csi', final, params, private, intermediates)
+        ('esc', final, intermediates)
+        ('osc', text)
+        ('string', kind, text)    DCS(P)/SOS(X)/PM(^)/APC(_) 控制串，屏幕不处理
+    无法识别的ESC（如后面紧跟控制字符）作为 ('control', '\x1b') 交出。
+    """
+
+    def __init__(self, encoding: str = 'utf-8'):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._carry = ''
+        self._cache = {}
+
+    def reset(self):
+        """丢弃未完成的序列和解码状态"""
+        self._decoder.reset()
+        self._carry = ''
+
+    @property
+    def pending(self) -> bool:
+        """是否有未完成的转义序列等待后续输入"""
+        return bool(self._carry)
+
+    def feed(self, data: bytes) -> List[Action]:
+        """输入原始字节"""
+        return self.feed_text(self._decoder.decode(data))
+
+    def feed_text(self, text: str) -> List[Action]:
+        """输入已解码文本"""
+        if self._carry:
+            text = self._carry + text
+            self._carry = ''
+        if not text:
+            return []
+
+        # 末尾未完成的转义序列留到下一次；OSC/DCS的终止符ESC\\可能被截断，所以再向前看一个ESC
+        cut = text.rfind('\x1b')
+        if cut >= 0 and _PARTIAL_RE.fullmatch(text, cut):
+            prev = text.rfind('\x1b', 0, cut)
+            if prev >= 0 and _PARTIAL_RE.fullmatch(text, prev):
+                cut = prev
+            if len(text) - cut <= MAX_SEQUENCE_LENGTH:
+                self._carry = text[cut:]
+            text = text[:cut]
+
+        # 热路径每个记号只有一次缓存查找和一次追加；未命中时才判断记号类型
+        actions = []
+        append = actions.append
+        cache = self._cache
+        get = cache.get
+        for token in _TOKEN_RE.findall(text):
+            action = get(token)
+            if action is None:
+                if token[0] in _NON_PRINTABLE:
+                    action = _token_action(token)
+                else:
+                    action = ('print', token)
+                    if len(token) > CACHED_TEXT_LENGTH:
+                        append(action)
+                        continue
+                if len(cache) >= SEQUENCE_CACHE_SIZE:
+                    cache.clear()
+                cache[token] = action
+            append(action)
+
+        return actions
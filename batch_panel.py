@@ -0,0 +1,183 @@
+import threading
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+                             QSpinBox, QSplitter, QTableWidget, QTableWidgetItem, QPlainTextEdit,
+                             QHeaderView, QAbstractItemView)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QFont
+from batch_runner import BatchRunner, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, LineBuffer
+
+
+# 输出区保留的行数
+MAX_OUTPUT_LINES = 20000
+
+# 输出区刷新间隔（毫秒）：工作线程收到的行先累积，按此间隔批量追加
+OUTPUT_FLUSH_INTERVAL = 50
+
+
+class BatchRunPanel(QWidget):
+    """批量执行面板：在一组主机上执行同一条命令，实时显示输出和每个主机的结果"""
+
+    # 由工作线程发出，跨线程自动排队到界面线程
+    host_finished = pyqtSignal(object)
+    batch_finished = pyqtSignal(object)
+
+    def __init__(self, hosts: list, get_password=None, title: str = ""):
+        super().__init__()
+        self.hosts = hosts
+        self.get_password = get_password
+        self.title = title or f"{len(hosts)} 个主机"
+        self.runner = None
+        self.rows = {}
+        self.lines = LineBuffer()
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.setup_ui()
+        self.host_finished.connect(self.on_host_finished)
+        self.batch_finished.connect(self.on_batch_finished)
+
+    def setup_ui(self):
+        """设置UI"""
+        layout = QVBoxLayout()
+
+        command_layout = QHBoxLayout()
+        command_layout.addWidget(QLabel(f"在 {self.title} 上执行:"))
+        self.command_input = QLineEdit()
+        self.command_input.setPlaceholderText("命令，例如 uptime")
+        self.command_input.returnPressed.connect(self.run)
+        command_layout.addWidget(self.command_input)
+
+        command_layout.addWidget(QLabel("并发:"))
+        self.concurrency_input = QSpinBox()
+        self.concurrency_input.setRange(1, 256)
+        self.concurrency_input.setValue(DEFAULT_CONCURRENCY)
+        command_layout.addWidget(self.concurrency_input)
+
+        command_layout.addWidget(QLabel("超时:"))
+        self.timeout_input = QSpinBox()
+        self.timeout_input.setRange(1, 3600)
+        self.timeout_input.setSuffix(" 秒")
+        self.timeout_input.setValue(int(DEFAULT_TIMEOUT))
+        command_layout.addWidget(self.timeout_input)
+
+        self.run_button = QPushButton("执行")
+        self.run_button.clicked.connect(self.run)
+        command_layout.addWidget(self.run_button)
+
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        command_layout.addWidget(self.cancel_button)
+        layout.addLayout(command_layout)
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+
+        self.result_table = QTableWidget(len(self.hosts), 3)
+        self.result_table.setHorizontalHeaderLabels(["主机", "状态", "耗时"])
+        self.result_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.result_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.result_table.verticalHeader().setVisible(False)
+        self.result_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.result_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        for row, host in enumerate(self.hosts):
+            self.rows[host['id']] = row
+            self.result_table.setItem(row, 0, QTableWidgetItem(f"{host['name']} ({host['host']})"))
+            self.result_table.setItem(row, 1, QTableWidgetItem(""))
+            self.result_table.setItem(row, 2, QTableWidgetItem(""))
+        splitter.addWidget(self.result_table)
+
+        self.output = QPlainTextEdit()
+        self.output.setReadOnly(True)
+        self.output.setMaximumBlockCount(MAX_OUTPUT_LINES)
+        self.output.setFont(QFont("Consolas", 10))
+        splitter.addWidget(self.output)
+        splitter.setStretchFactor(0, 1)
+        splitter.setStretchFactor(1, 2)
+        layout.addWidget(splitter)
+
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+
+        self.setLayout(layout)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(OUTPUT_FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush_output)
+
+    @property
+    def running(self) -> bool:
+        return self.runner is not None
+
+    def run(self):
+        """开始执行：密码在界面线程中取出，执行在后台线程中进行"""
+        command = self.command_input.text().strip()
+        if not command or self.running:
+            return
+
+        self.runner = BatchRunner(self.concurrency_input.value(), self.timeout_input.value(), self.get_password)
+        jobs = self.runner.fetch_passwords(self.hosts)
+
+        for row in range(self.result_table.rowCount()):
+            self._set_status(row, "等待", "")
+        self.output.clear()
+        self.summary_label.setText(f"正在执行: {command}")
+        self.run_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.flush_timer.start()
+        threading.Thread(target=self._run, args=(self.runner, jobs, command), daemon=True).start()
+
+    def _run(self, runner: BatchRunner, jobs: list, command: str):
+        """后台线程：执行并通过信号交回结果"""
+        summary = runner.run(jobs, command, self._on_output, self._on_result)
+        self.batch_finished.emit(summary)
+
+    def _on_output(self, host, stream: str, data: bytes):
+        """工作线程：输出按行累积，由 flush_timer 批量显示"""
+        lines = self.lines.feed(host, stream, data)
+        if lines:
+            with self.pending_lock:
+                self.pending.extend(lines)
+
+    def _on_result(self, result):
+        """工作线程：主机结束时补齐未换行的输出"""
+        lines = self.lines.flush(result.host)
+        if lines:
+            with self.pending_lock:
+                self.pending.extend(lines)
+        self.host_finished.emit(result)
+
+    def flush_output(self):
+        """把累积的输出行一次追加到输出区"""
+        with self.pending_lock:
+            lines, self.pending = self.pending, []
+        if lines:
+            self.output.appendPlainText('\n'.join(
+                f"[{host['name']}] {'! ' if stream == 'stderr' else ''}{line}" for host, stream, line in lines))
+
+    def cancel(self):
+        """取消执行"""
+        if self.runner is not None:
+            self.runner.cancel()
+            self.summary_label.setText("正在取消...")
+
+    def on_host_finished(self, result):
+        """单个主机结束"""
+        row = self.rows.get(result.host['id'])
+        if row is None:
+            return
+        self._set_status(row, result.status_text, f"{result.duration:.2f}s",
+                         None if result.ok else QColor("#c62828"))
+
+    def on_batch_finished(self, summary):
+        """全部主机结束"""
+        self.flush_timer.stop()
+        self.flush_output()
+        self.runner = None
+        self.run_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.summary_label.setText('；'.join(line.strip() for line in summary.format().splitlines()))
+
+    def _set_status(self, row: int, status: str, duration: str, color: QColor = None):
+        status_item = self.result_table.item(row, 1)
+        status_item.setText(status)
+        status_item.setForeground(color if color is not None else self.palette().text().color())
+        self.result_table.item(row, 2).setText(duration)
@@ -0,0 +1,265 @@
+import select
+import socket
+import threading
+import time
+from typing import Callable, Iterable, List
+from ssh_connect import ConnectCancelled, lease_connection
+from transport_pool import get_transport_pool
+
+
+# 同时执行的主机数上限
+DEFAULT_CONCURRENCY = 32
+
+# 单个主机的超时（秒），包含建立连接和命令执行
+DEFAULT_TIMEOUT = 60.0
+
+# 结果中为每个主机保留的输出字节数，完整输出通过 on_output 流式交付
+MAX_CAPTURE = 64 * 1024
+
+# 等待输出时的最长阻塞时间（秒），用于及时响应取消和超时
+_POLL_INTERVAL = 0.25
+
+_READ_SIZE = 32 * 1024
+
+
+class HostResult:
+    """单个主机的执行结果；exit_status 为None表示没有正常结束（见 error）"""
+
+    __slots__ = ('host', 'exit_status', 'stdout', 'stderr', 'duration', 'error', 'truncated')
+
+    def __init__(self, host):
+        self.host = host
+        self.exit_status = None
+        self.stdout = bytearray()
+        self.stderr = bytearray()
+        self.duration = 0.0
+        self.error = ''
+        self.truncated = False
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_status == 0
+
+    @property
+    def status_text(self) -> str:
+        if self.error:
+            return self.error
+        return f"退出码 {self.exit_status}"
+
+    def _capture(self, buffer: bytearray, data: bytes):
+        room = MAX_CAPTURE - len(buffer)
+        if room < len(data):
+            self.truncated = True
+        buffer += data[:max(room, 0)]
+
+
+class BatchSummary:
+    """一次批量执行的汇总"""
+
+    def __init__(self, command: str, results: List[HostResult], duration: float):
+        self.command = command
+        self.results = results
+        self.duration = duration
+
+    @property
+    def succeeded(self) -> List[HostResult]:
+        return [result for result in self.results if result.ok]
+
+    @property
+    def failed(self) -> List[HostResult]:
+        return [result for result in self.results if not result.ok]
+
+    def exit_codes(self) -> dict:
+        """各退出码（或错误）对应的主机数"""
+        counts = {}
+        for result in self.results:
+            key = result.exit_status if result.exit_status is not None else result.error
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def format(self) -> str:
+        """文本形式的汇总"""
+        durations = sorted(result.duration for result in self.results)
+        lines = [f"共 {len(self.results)} 个主机，成功 {len(self.succeeded)}，失败 {len(self.failed)}，"
+                 f"总耗时 {self.duration:.1f}s"]
+        if durations:
+            lines.append(f"单个主机耗时：最短 {durations[0]:.2f}s，中位 {durations[len(durations) // 2]:.2f}s，"
+                         f"最长 {durations[-1]:.2f}s")
+        for key, count in sorted(self.exit_codes().items(), key=lambda item: -item[1]):
+            label = f"退出码 {key}" if isinstance(key, int) else key
+            lines.append(f"  {label}: {count}")
+        return '\n'.join(lines)
+
+
+class BatchRunner:
+    """在多台主机上以有界并发非交互地执行同一条命令
+
+    每个主机通过 exec_command 在连接池中的连接上打开一个会话通道（已有终端连接的主机
+    不会重新认证），stdout/stderr 一到达就通过 on_output 交付，主机结束时调用 on_result。
+    回调在工作线程中调用。密码由 fetch_passwords 在调用者的线程（持有数据库连接的线程）中
+    预先取出，run 可以在任意线程中调用，执行期间不再访问数据库。
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 get_password: Callable[[int], str] = None):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.get_password = get_password
+        self._cancel = threading.Event()
+        self._sockets = set()
+        self._sockets_lock = threading.Lock()
+
+    def cancel(self):
+        """取消：未开始的主机不再执行，正在建立的连接被打断，执行中的命令被关闭"""
+        self._cancel.set()
+        with self._sockets_lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def fetch_passwords(self, hosts: Iterable) -> List[tuple]:
+        """取出各主机的密码，返回作为 run 参数的 [(主机, 密码)]；在持有数据库连接的线程中调用"""
+        return [(host, self.password_for(host)) for host in hosts]
+
+    def run(self, jobs: Iterable[tuple], command: str,
+            on_output: Callable[[object, str, bytes], None] = None,
+            on_result: Callable[[HostResult], None] = None) -> BatchSummary:
+        """在 jobs（fetch_passwords 的结果）的各主机上执行并等待全部结束，返回汇总
+
+        on_output(host, 'stdout'|'stderr', data)；不访问数据库，可以在工作线程中调用。
+        """
+        # concurrent.futures 会连带导入 logging，只在执行时导入，不拖慢界面启动
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._cancel = threading.Event()
+        cancel = self._cancel
+        jobs = list(jobs)
+        started = time.monotonic()
+        with ThreadPoolExecutor(min(self.concurrency, max(len(jobs), 1)),
+                                thread_name_prefix="sshive-batch") as pool:
+            futures = [pool.submit(self._run_host, cancel, host, password, command, on_output, on_result)
+                       for host, password in jobs]
+            results = [future.result() for future in futures]
+        return BatchSummary(command, results, time.monotonic() - started)
+
+    def password_for(self, host) -> str:
+        """主机的密码：记录中已有时直接使用，否则通过 get_password 取出"""
+        password = host.get('password') or ''
+        if not password and host.get('auth_type', 'password') == 'password' and self.get_password:
+            password = self.get_password(host['id'])
+        return password
+
+    def _run_host(self, cancel: threading.Event, host, password: str, command: str,
+                  on_output, on_result) -> HostResult:
+        result = HostResult(host)
+        started = time.monotonic()
+        deadline = started + self.timeout
+        current = []
+
+        def on_socket(sock):
+            # 登记正在连接的socket，cancel() 时关闭
+            with self._sockets_lock:
+                if current:
+                    self._sockets.discard(current.pop())
+                if sock is not None:
+                    current.append(sock)
+                    self._sockets.add(sock)
+
+        try:
+            if cancel.is_set():
+                raise ConnectCancelled()
+            lease = lease_connection(host['host'], host['port'], host['username'], password,
+                                     host.get('auth_type', 'password'), host.get('private_key_path', ''),
+                                     cancel=cancel, on_socket=on_socket, timeout=self.timeout)
+            try:
+                self._execute(cancel, lease, command, deadline, result, on_output)
+            finally:
+                get_transport_pool().release(lease)
+        except ConnectCancelled:
+            result.error = "已取消"
+        except Exception as e:
+            result.error = "已取消" if cancel.is_set() else (f"失败: {e}" if str(e) else f"失败: {type(e).__name__}")
+        finally:
+            on_socket(None)
+        result.duration = time.monotonic() - started
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    def _execute(self, cancel: threading.Event, lease, command: str, deadline: float,
+                 result: HostResult, on_output):
+        """在连接上执行命令，边读边交付输出，直到命令结束、超时或被取消"""
+        channel = lease.transport.open_session(timeout=max(1.0, deadline - time.monotonic()))
+        try:
+            channel.exec_command(command)
+            streams = (('stdout', channel.recv_ready, channel.recv, result.stdout),
+                       ('stderr', channel.recv_stderr_ready, channel.recv_stderr, result.stderr))
+            while True:
+                received = False
+                for name, ready, recv, buffer in streams:
+                    while ready():
+                        data = recv(_READ_SIZE)
+                        if not data:
+                            break
+                        received = True
+                        result._capture(buffer, data)
+                        if on_output is not None:
+                            on_output(result.host, name, data)
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    result.exit_status = channel.recv_exit_status()
+                    return
+                if cancel.is_set():
+                    result.error = "已取消"
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    result.error = "超时"
+                    return
+                if not received:
+                    select.select([channel], [], [], min(remaining, _POLL_INTERVAL))
+        finally:
+            channel.close()
+
+
+class LineBuffer:
+    """把各主机交错到达的输出块拆成完整的行，避免不同主机的半行混在一起；线程安全"""
+
+    def __init__(self, encoding: str = 'utf-8'):
+        self.encoding = encoding
+        self._partial = {}
+        self._lock = threading.Lock()
+
+    def feed(self, host, stream: str, data: bytes) -> List[tuple]:
+        """加入一块输出，返回其中完整的行 [(host, stream, line)]"""
+        key = (host['id'], stream)
+        with self._lock:
+            data = self._partial.pop(key, (host, b''))[1] + data
+            *lines, rest = data.split(b'\n')
+            if rest:
+                self._partial[key] = (host, rest)
+        return [(host, stream, self._decode(line)) for line in lines]
+
+    def flush(self, host=None) -> List[tuple]:
+        """取出未以换行结尾的剩余输出；host 为None时取出全部主机的"""
+        with self._lock:
+            keys = [key for key in self._partial if host is None or key[0] == host['id']]
+            items = [(key[1], *self._partial.pop(key)) for key in keys]
+        return [(owner, stream, self._decode(rest)) for stream, owner, rest in items]
+
+    def _decode(self, line: bytes) -> str:
+        return line.rstrip(b'\r').decode(self.encoding, errors='replace')
+
+
+def run_batch(hosts: Iterable, command: str, concurrency: int = DEFAULT_CONCURRENCY,
+              timeout: float = DEFAULT_TIMEOUT, get_password: Callable[[int], str] = None,
+              on_output=None, on_result=None) -> BatchSummary:
+    """便捷函数：用新的 BatchRunner 执行一次"""
+    runner = BatchRunner(concurrency, timeout, get_password)
+    return runner.run(runner.fetch_passwords(hosts), command, on_output, on_result)
@@ -0,0 +1,160 @@
+"""主机列表加载和搜索基准
+
+    uv run python benchmarks/bench_hosts.py [--hosts 10000] [--max-ms 500]
+
+在临时目录中生成指定数量的主机（分布在嵌套分组中，都带加密密码），测量批量导入、
+读取全部主机、按页读取分组和各类搜索的耗时，并与逐行解密密码的旧读取方式对比。
+每个搜索的结果都与按生成规则算出的主机集合比较，不一致时以状态码1退出；
+指定 --max-ms 时，读取和搜索中任一项超过该值也以状态码1退出（导入和旧读取方式不计）。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+ENVS = ('prod', 'staging', 'dev')
+ROLES = ('web', 'db', 'cache', 'proxy', 'worker')
+DCS = ('北京', '上海', 'frankfurt', 'virginia')
+USERS = ('root', 'deploy', 'admin')
+
+
+def host_fields(i: int) -> tuple:
+    """第 i 个主机的 (环境, 角色, 机房)"""
+    return ENVS[i % len(ENVS)], ROLES[i // len(ENVS) % len(ROLES)], DCS[i // 7 % len(DCS)]
+
+
+def generate_hosts(count: int):
+    for i in range(count):
+        env, role, dc = host_fields(i)
+        yield {
+            'name': f"{env}-{role}-{i:05d}",
+            'host': f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+            'username': USERS[i % len(USERS)],
+            'password': f"secret{i}",
+            'description': f"{dc}机房 {role} server",
+        }
+
+
+# 搜索词 -> 按主机的 (环境, 角色, 机房) 判断是否应当命中
+SEARCHES = {
+    'web': lambda env, role, dc: role == 'web',
+    'prod db': lambda env, role, dc: env == 'prod' and role == 'db',
+    'roxy': lambda env, role, dc: role == 'proxy',  # 词中间的子串，走三元组索引
+    '北京': lambda env, role, dc: dc == '北京',
+    'frank cache': lambda env, role, dc: dc == 'frankfurt' and role == 'cache',
+    'nomatch': lambda env, role, dc: False,
+}
+
+
+def best_ms(function, repeat: int = 3):
+    """返回 (最好一次的毫秒数, 最后一次的结果)"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best, result
+
+
+def legacy_load(db: DatabaseManager) -> list:
+    """旧的读取方式：SELECT * 并逐行解密密码"""
+    hosts = []
+    for row in db.conn.execute("SELECT * FROM hosts ORDER BY name"):
+        host = dict(row)
+        host['password'] = db._decrypt_password(host['password'])
+        hosts.append(host)
+    return hosts
+
+
+def read_group(db: DatabaseManager, group_id) -> list:
+    """按页读取一个分组中的全部主机"""
+    records, after = [], ('', 0)
+    while True:
+        page = db.get_group_hosts(group_id, after)
+        records.extend(page)
+        if not page:
+            return records
+        after = (page[-1].name, page[-1].id)
+
+
+def run(count: int, max_ms: float) -> int:
+    failed = False
+
+    def report(name: str, ms: float, budgeted: bool = True, note: str = ''):
+        nonlocal failed
+        slow = budgeted and max_ms > 0 and ms > max_ms
+        failed |= slow
+        print(f"{name:16} {ms:9.1f} ms  {note}{'  (超出上限)' if slow else ''}")
+
+    db = DatabaseManager("sshive.db")
+    try:
+        start = time.perf_counter()
+        db.add_hosts(generate_hosts(count))
+        report("批量导入", (time.perf_counter() - start) * 1000, budgeted=False, note=f"{count} 个主机")
+
+        # 主机ID -> 生成时的序号（名称末尾的数字）
+        index_of = {record.id: int(record.name.rsplit('-', 1)[1]) for record in db.get_all_hosts()}
+        ids = list(index_of)
+        # 每个环境一个分组，角色为其子分组
+        groups = {}
+        for env in ENVS:
+            parent = db.add_group(env)
+            for role in ROLES:
+                groups[(env, role)] = db.add_group(role, parent)
+        members = {}
+        for host_id in ids:
+            env, role, _ = host_fields(index_of[host_id])
+            members.setdefault(groups[(env, role)], []).append(host_id)
+        for group_id, host_ids in members.items():
+            db.move_hosts(host_ids, group_id)
+
+        ms, records = best_ms(db.get_all_hosts)
+        report("读取全部主机", ms, note=f"{len(records)} 条")
+        ms, _ = best_ms(lambda: legacy_load(db), repeat=1)
+        report("旧方式(逐行解密)", ms, budgeted=False)
+        ms, _ = best_ms(lambda: (db.get_groups(), db.count_ungrouped()))
+        report("读取分组", ms)
+        group_id = groups[(ENVS[0], ROLES[0])]
+        ms, records = best_ms(lambda: read_group(db, group_id))
+        report("按页读取分组", ms, note=f"{len(records)} 条")
+
+        # 上级分组的主机数由触发器随主机移动维护，应等于整个子树的主机数
+        counts = {name: host_count for _, name, parent_id, host_count in db.get_groups() if parent_id is None}
+        for env in ENVS:
+            if counts[env] != sum(1 for i in range(count) if host_fields(i)[0] == env):
+                print(f"分组 {env} 的主机数 {counts[env]} 不正确")
+                failed = True
+
+        for keyword, predicate in SEARCHES.items():
+            ms, found = best_ms(lambda: db.search_host_ids(keyword))
+            expected = {host_id for host_id in ids if predicate(*host_fields(index_of[host_id]))}
+            wrong = set(found) != expected or len(found) != len(expected)
+            failed |= wrong
+            report(f"搜索 {keyword!r}", ms, note=f"{len(found)} 个结果" + ("  (结果不正确)" if wrong else ''))
+    finally:
+        db.close()
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="主机列表加载和搜索基准")
+    parser.add_argument('--hosts', type=int, default=10000, help="生成的主机数量")
+    parser.add_argument('--max-ms', type=float, default=0, help="读取或搜索超过该耗时（毫秒）时返回1")
+    args = parser.parse_args()
+    # DatabaseManager 在当前目录读写数据库和密钥文件
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            return run(args.hosts, args.max_ms)
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
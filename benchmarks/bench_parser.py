@@ -0,0 +1,53 @@
+"""ANSI解析器吞吐量基准
+
+    uv run python benchmarks/bench_parser.py [--min-mbps 20]
+
+分别测量纯文本和带颜色的 ls 风格输出，按 64KB 分块送入解析器（与网络读取的块大小相同）。
+指定 --min-mbps 时任一场景低于该值则以状态码1退出，可用于检查性能回退。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ansi_parser import AnsiParser  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+SCENARIOS = {
+    'plain': (b'lorem ipsum dolor sit amet ' * 40 + b'\r\n') * 20000,
+    'color': (b'\x1b[01;34mdir\x1b[0m  \x1b[01;32mexec.sh\x1b[0m  file.txt  '
+              b'\x1b[38;5;208morange\x1b[0m\r\n') * 100000,
+    'utf8': ('中文输出 ÄÖÜ 日本語 ' * 60 + '\r\n').encode() * 5000,
+}
+
+
+def measure(data: bytes, repeat: int = 3) -> float:
+    """返回最好一次的吞吐量（MB/s）"""
+    best = 0.0
+    for _ in range(repeat):
+        parser = AnsiParser()
+        start = time.perf_counter()
+        for i in range(0, len(data), CHUNK_SIZE):
+            parser.feed(data[i:i + CHUNK_SIZE])
+        best = max(best, len(data) / (time.perf_counter() - start) / 1e6)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANSI解析器吞吐量基准")
+    parser.add_argument('--min-mbps', type=float, default=0, help="低于该吞吐量时返回1")
+    args = parser.parse_args()
+    failed = False
+    for name, data in SCENARIOS.items():
+        rate = measure(data)
+        slow = rate < args.min_mbps
+        failed |= slow
+        print(f"{name:6} {len(data) / 1e6:6.1f} MB  {rate:7.1f} MB/s{'  (低于下限)' if slow else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
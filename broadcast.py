@@ -0,0 +1,77 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+from ssh_client import SSHClient, paste_payload
+
+
+class InputBroadcaster(QObject):
+    """广播输入：把一个终端的键盘输入和粘贴同时发给一组会话
+
+    输入只放入各会话的发送队列，再按I/O线程分组一次性请求发送，实际发送由I/O线程
+    按各自的远端窗口完成，GUI线程不做任何网络写入。某个会话积压的未发送输入超过
+    MAX_BACKLOG 时（远端无响应或网络拥塞）将其移出广播并发出 target_dropped，
+    其他会话不受影响；移出而不是跳过部分按键，避免该会话收到残缺的命令。
+    """
+
+    target_dropped = pyqtSignal(object)
+    targets_changed = pyqtSignal(int)
+
+    # 每个会话允许积压的未发送交互输入（字节）
+    MAX_BACKLOG = 64 * 1024
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.targets = []
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def __contains__(self, client: SSHClient) -> bool:
+        return client in self.targets
+
+    def add(self, client: SSHClient):
+        if client not in self.targets:
+            self.targets.append(client)
+            self.targets_changed.emit(len(self.targets))
+
+    def remove(self, client: SSHClient):
+        if client in self.targets:
+            self.targets.remove(client)
+            self.targets_changed.emit(len(self.targets))
+
+    def clear(self):
+        if self.targets:
+            self.targets.clear()
+            self.targets_changed.emit(0)
+
+    def send(self, data: bytes):
+        """广播键盘输入"""
+        self._fan_out(lambda client: client.queue_input(data), check_backlog=True)
+
+    def paste(self, data: bytes, bracketed: bool = False):
+        """广播粘贴内容：按每个会话自己的终端是否启用括号粘贴决定是否加标记，
+        bracketed 用于没有提供该状态的会话。每种形式的数据只生成一份，由各会话的发送队列共享"""
+        if not data:
+            return
+        payloads = {}
+
+        def enqueue(client):
+            mode = client.bracketed_paste() if client.bracketed_paste is not None else bracketed
+            if mode not in payloads:
+                payloads[mode] = paste_payload(data, mode)
+            return client.queue_paste(*payloads[mode])
+
+        self._fan_out(enqueue, check_backlog=False)
+
+    def _fan_out(self, enqueue, check_backlog: bool):
+        requests = {}
+        lagging = []
+        for client in self.targets:
+            if check_backlog and client.send_queue.input_pending > self.MAX_BACKLOG:
+                lagging.append(client)
+                continue
+            if enqueue(client):
+                requests.setdefault(client.reactor, []).append(client.write_request())
+        for reactor, writes in requests.items():
+            reactor.want_write_many(writes)
+        for client in lagging:
+            self.remove(client)
+            self.target_dropped.emit(client)
@@ -0,0 +1,135 @@
+import os
+import shutil
+import sys
+import threading
+
+
+# 每次从通道或标准输入读取的字节数
+_READ_SIZE = 32 * 1024
+
+# 标准输入最多缓冲的字节数，超过后等通道发送窗口打开再继续读取
+_MAX_PENDING = 256 * 1024
+
+# 有输入等待发送窗口时检查窗口的间隔（秒）
+_SEND_POLL_INTERVAL = 0.01
+
+
+def terminal_size() -> tuple:
+    """当前终端的 (列数, 行数)"""
+    size = shutil.get_terminal_size()
+    return size.columns, size.lines
+
+
+def run_shell(channel):
+    """把当前终端接到交互式SSH通道上，直到远端关闭会话
+
+    POSIX 下终端切换为原始模式，按键原样发给远端，窗口大小变化同步到远端；
+    Windows 下按键通过 msvcrt 读取，方向键等转换为VT序列。
+    """
+    if os.name == 'nt':
+        _run_windows(channel)
+    else:
+        _run_posix(channel)
+
+
+def _run_posix(channel):
+    import select
+    import signal
+    import termios
+    import tty
+
+    stdin = sys.stdin.fileno()
+    stdout = sys.stdout.fileno()
+    is_tty = os.isatty(stdin)
+    saved = termios.tcgetattr(stdin) if is_tty else None
+    previous_handler = None
+    if is_tty and hasattr(signal, 'SIGWINCH'):
+        previous_handler = signal.signal(
+            signal.SIGWINCH, lambda *_: channel.resize_pty(*terminal_size()))
+    try:
+        if is_tty:
+            tty.setraw(stdin)
+        channel.settimeout(0.0)
+        # 待发送的输入：通道发送窗口已满时 send 会立即超时，输入先缓冲，窗口打开后再发送；
+        # 缓冲达到上限时暂停读取标准输入，让管道或粘贴的来源自然等待
+        pending = bytearray()
+        stdin_open = True
+        while True:
+            watch = [channel]
+            if stdin_open and len(pending) < _MAX_PENDING:
+                watch.append(stdin)
+            try:
+                # 通道的发送窗口打开没有对应的fd事件，有待发送数据时定时检查
+                readable, _, _ = select.select(watch, [], [], _SEND_POLL_INTERVAL if pending else None)
+            except InterruptedError:
+                continue
+            if channel in readable:
+                try:
+                    data = channel.recv(_READ_SIZE)
+                except TimeoutError:
+                    data = None
+                if data == b'':
+                    break
+                if data:
+                    os.write(stdout, data)
+            if stdin in readable:
+                data = os.read(stdin, _READ_SIZE)
+                if data:
+                    pending += data
+                else:
+                    stdin_open = False
+            while pending and channel.send_ready():
+                try:
+                    sent = channel.send(bytes(pending[:_READ_SIZE]))
+                except OSError:
+                    # 远端已关闭通道
+                    return
+                del pending[:sent]
+            if not stdin_open and not pending and not channel.eof_sent:
+                # 标准输入结束（如管道输入）且已全部发出，通知远端后继续接收输出
+                channel.shutdown_write()
+    finally:
+        if saved is not None:
+            termios.tcsetattr(stdin, termios.TCSADRAIN, saved)
+        if previous_handler is not None:
+            signal.signal(signal.SIGWINCH, previous_handler)
+
+
+# msvcrt 功能键扫描码到VT序列
+_WINDOWS_KEYS = {
+    'H': '\x1b[A', 'P': '\x1b[B', 'M': '\x1b[C', 'K': '\x1b[D',
+    'G': '\x1b[H', 'O': '\x1b[F', 'S': '\x1b[3~', 'R': '\x1b[2~',
+    'I': '\x1b[5~', 'Q': '\x1b[6~',
+}
+
+
+def _run_windows(channel):
+    import msvcrt
+
+    closed = threading.Event()
+
+    def pump_output():
+        out = sys.stdout.buffer
+        while True:
+            data = channel.recv(_READ_SIZE)
+            if not data:
+                break
+            out.write(data)
+            out.flush()
+        closed.set()
+
+    threading.Thread(target=pump_output, daemon=True).start()
+    size = terminal_size()
+    while not closed.is_set():
+        if not msvcrt.kbhit():
+            closed.wait(0.01)
+            current = terminal_size()
+            if current != size:
+                size = current
+                channel.resize_pty(*size)
+            continue
+        key = msvcrt.getwch()
+        if key in ('\x00', '\xe0'):
+            key = _WINDOWS_KEYS.get(msvcrt.getwch(), '')
+        if key:
+            channel.sendall(key.encode('utf-8'))
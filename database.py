@@ -1,33 +1,218 @@
+import base64
+import json
+import os
 import sqlite3
-from pathlib import Path
-from typing import List, Optional
-from cryptography.fernet import Fernet
+import time
+from itertools import batched, chain
+from typing import Iterable, List, Optional
+
+
+# 解密后的密码在内存中缓存的秒数，0 表示不缓存
+CREDENTIAL_TTL = 60
+
+# 全文索引各列在bm25排序中的权重：名称 > 地址 > 用户名 > 描述
+SEARCH_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+# 命中数超过该值时不再逐条计算bm25，改为名称命中在前，避免单个字母等宽泛查询变慢
+MAX_RANKED_RESULTS = 1000
+
+_INDEXED_COLUMNS = "name, host, username, description"
+
+# 分组和标签。groups.ancestors 为从根到自身的分组ID（JSON数组），
+# host_count 为整个子树的主机数，由触发器随主机增删和移动增量维护，无需扫描hosts表
+_GROUP_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS groups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        parent_id INTEGER REFERENCES groups(id),
+        ancestors TEXT NOT NULL DEFAULT '[]',
+        host_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_groups_parent_name ON groups(COALESCE(parent_id, 0), name);
+
+    CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        host_count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS host_tags (
+        host_id INTEGER NOT NULL REFERENCES hosts(id),
+        tag_id INTEGER NOT NULL REFERENCES tags(id),
+        PRIMARY KEY (host_id, tag_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_host_tags_tag ON host_tags(tag_id, host_id);
+
+    CREATE INDEX IF NOT EXISTS idx_hosts_name ON hosts(name);
+    CREATE INDEX IF NOT EXISTS idx_hosts_group_name ON hosts(group_id, name);
+
+    CREATE TRIGGER IF NOT EXISTS hosts_group_ai AFTER INSERT ON hosts WHEN new.group_id IS NOT NULL BEGIN
+        UPDATE groups SET host_count = host_count + 1 WHERE id IN
+            (SELECT value FROM json_each((SELECT ancestors FROM groups WHERE id = new.group_id)));
+    END;
+    CREATE TRIGGER IF NOT EXISTS hosts_group_ad AFTER DELETE ON hosts BEGIN
+        UPDATE groups SET host_count = host_count - 1 WHERE id IN
+            (SELECT value FROM json_each((SELECT ancestors FROM groups WHERE id = old.group_id)));
+        DELETE FROM host_tags WHERE host_id = old.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS hosts_group_au AFTER UPDATE OF group_id ON hosts
+    WHEN old.group_id IS NOT new.group_id BEGIN
+        UPDATE groups SET host_count = host_count - 1 WHERE id IN
+            (SELECT value FROM json_each((SELECT ancestors FROM groups WHERE id = old.group_id)));
+        UPDATE groups SET host_count = host_count + 1 WHERE id IN
+            (SELECT value FROM json_each((SELECT ancestors FROM groups WHERE id = new.group_id)));
+    END;
+    CREATE TRIGGER IF NOT EXISTS host_tags_ai AFTER INSERT ON host_tags BEGIN
+        UPDATE tags SET host_count = host_count + 1 WHERE id = new.tag_id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS host_tags_ad AFTER DELETE ON host_tags BEGIN
+        UPDATE tags SET host_count = host_count - 1 WHERE id = old.tag_id;
+        DELETE FROM tags WHERE id = old.tag_id AND host_count <= 0;
+    END;
+"""
+
+# 每个主机的端口转发（-L / -R / -D），随会话启动；主机删除时由触发器一并删除
+_FORWARD_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS forwards (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        host_id INTEGER NOT NULL REFERENCES hosts(id),
+        kind TEXT NOT NULL,
+        bind_address TEXT NOT NULL DEFAULT '',
+        bind_port INTEGER NOT NULL,
+        dest_host TEXT NOT NULL DEFAULT '',
+        dest_port INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_forwards_host ON forwards(host_id);
+
+    CREATE TRIGGER IF NOT EXISTS hosts_forwards_ad AFTER DELETE ON hosts BEGIN
+        DELETE FROM forwards WHERE host_id = old.id;
+    END;
+"""
+
+_FORWARD_COLUMNS = ('kind', 'bind_address', 'bind_port', 'dest_host', 'dest_port')
+
+# 分组/标签下的主机每次读取的行数
+HOST_PAGE_SIZE = 500
+
+# 批量写入时每次 executemany 的行数，整个批量操作仍在同一个事务中
+WRITE_BATCH = 1000
+
+# 批量更新允许修改的列
+BULK_UPDATE_COLUMNS = ('name', 'host', 'port', 'username', 'password',
+                       'auth_type', 'private_key_path', 'description', 'group_id', 'recording')
+
+
+def _fts_insert_trigger(table: str) -> str:
+    return f"""
+        CREATE TRIGGER {table}_ai AFTER INSERT ON hosts BEGIN
+            INSERT INTO {table}(rowid, {_INDEXED_COLUMNS})
+            VALUES (new.id, new.name, new.host, new.username, new.description);
+        END;
+    """
+
+
+def _fts_schema(table: str, tokenize: str) -> str:
+    """外部内容全文索引及同步触发器，索引不重复存储主机数据"""
+    return f"""
+        CREATE VIRTUAL TABLE {table} USING fts5(
+            {_INDEXED_COLUMNS}, content='hosts', content_rowid='id', tokenize="{tokenize}"
+        );
+        {_fts_insert_trigger(table)}
+        CREATE TRIGGER {table}_ad AFTER DELETE ON hosts BEGIN
+            INSERT INTO {table}({table}, rowid, {_INDEXED_COLUMNS})
+            VALUES ('delete', old.id, old.name, old.host, old.username, old.description);
+        END;
+        CREATE TRIGGER {table}_au AFTER UPDATE OF {_INDEXED_COLUMNS} ON hosts BEGIN
+            INSERT INTO {table}({table}, rowid, {_INDEXED_COLUMNS})
+            VALUES ('delete', old.id, old.name, old.host, old.username, old.description);
+            INSERT INTO {table}(rowid, {_INDEXED_COLUMNS})
+            VALUES (new.id, new.name, new.host, new.username, new.description);
+        END;
+        INSERT INTO {table}({table}) VALUES ('rebuild');
+    """
+
+
+class HostRecord:
+    """主机列表项：不含密码的轻量记录，支持 record['name'] / record.get() 形式访问"""
+
+    __slots__ = ('id', 'name', 'host', 'port', 'username', 'auth_type', 'private_key_path', 'description',
+                 'group_id', 'recording')
+
+    # 列表查询读取的列，顺序与 __slots__ 一致
+    COLUMNS = ', '.join(__slots__)
+
+    def __init__(self, id: int, name: str, host: str, port: int, username: str,
+                 auth_type: str = 'password', private_key_path: str = '', description: str = '',
+                 group_id: Optional[int] = None, recording: int = 0):
+        self.id = id
+        self.name = name
+        self.host = host
+        self.port = port
+        self.username = username
+        self.auth_type = auth_type or 'password'
+        self.private_key_path = private_key_path or ''
+        self.description = description or ''
+        self.group_id = group_id
+        self.recording = recording or 0
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"HostRecord({self.id}, {self.name!r}, {self.username}@{self.host}:{self.port})"
 
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "sshive.db"):
+    def __init__(self, db_path: str = "sshive.db", credential_ttl: float = CREDENTIAL_TTL):
         self.db_path = db_path
         self.conn = None
-        self.cipher = None
+        self._key = None
+        self._cipher = None
+        self.credential_ttl = credential_ttl
+        self._credentials = {}
+        self.fts_enabled = False
+        self.trigram_enabled = False
+        self._listeners = []
         self._init_encryption()
         self._init_database()
 
     def _init_encryption(self):
-        """初始化加密密钥"""
-        key_file = Path("sshive.key")
-        if key_file.exists():
+        """读取加密密钥，不存在时生成；cryptography 在第一次加解密时才导入"""
+        key_file = "sshive.key"
+        if os.path.exists(key_file):
             with open(key_file, "rb") as f:
                 key = f.read()
         else:
-            key = Fernet.generate_key()
+            # 与 Fernet.generate_key() 相同：32字节随机数的URL安全base64编码
+            key = base64.urlsafe_b64encode(os.urandom(32))
             with open(key_file, "wb") as f:
                 f.write(key)
-        self.cipher = Fernet(key)
+        self._key = key
+
+    @property
+    def cipher(self):
+        """Fernet 加密器，首次使用时创建"""
+        if self._cipher is None:
+            from cryptography.fernet import Fernet
+            self._cipher = Fernet(self._key)
+        return self._cipher
 
     def _init_database(self):
         """初始化数据库表"""
-        self.conn = sqlite3.connect(self.db_path)
+        # 主窗口在后台线程中打开数据库，之后交给GUI线程使用
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
+        # WAL模式下提交只追加日志，读写互不阻塞；NORMAL同步在WAL下不会损坏数据库
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
         cursor = self.conn.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS hosts (
@@ -45,6 +230,53 @@ class DatabaseManager:
             )
         """)
         self.conn.commit()
+        self._init_groups()
+        self._init_recording()
+        self._init_forwards()
+        self._init_search_index()
+
+    def _init_groups(self):
+        """创建分组和标签表，旧数据库的hosts表补充 group_id 列"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(hosts)")]
+        if 'group_id' not in columns:
+            self.conn.execute("ALTER TABLE hosts ADD COLUMN group_id INTEGER REFERENCES groups(id)")
+        self.conn.executescript(_GROUP_SCHEMA)
+        self.conn.commit()
+
+    def _init_recording(self):
+        """旧数据库的hosts表补充 recording 列：0 不录制，1 录制输出，2 录制输出和输入"""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(hosts)")]
+        if 'recording' not in columns:
+            self.conn.execute("ALTER TABLE hosts ADD COLUMN recording INTEGER DEFAULT 0")
+            self.conn.commit()
+
+    def _init_forwards(self):
+        """创建端口转发表"""
+        self.conn.executescript(_FORWARD_SCHEMA)
+        self.conn.commit()
+
+    def _init_search_index(self):
+        """创建搜索索引：词前缀索引用于排序搜索，三元组索引用于子串搜索。
+        SQLite不支持FTS5或trigram分词器时对应功能退回LIKE扫描。"""
+        self.fts_enabled = self._ensure_fts_table('hosts_fts', 'unicode61 remove_diacritics 2')
+        self.trigram_enabled = self._ensure_fts_table('hosts_trgm', 'trigram')
+
+    def _ensure_fts_table(self, table: str, tokenize: str) -> bool:
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+        if exists:
+            return True
+        try:
+            self.conn.executescript("BEGIN;" + _fts_schema(table, tokenize) + "COMMIT;")
+        except sqlite3.OperationalError:
+            self.conn.rollback()
+            return False
+        return True
+
+    def _search_tables(self) -> List[str]:
+        """已启用的全文索引表"""
+        return [table for table, enabled in (('hosts_fts', self.fts_enabled),
+                                             ('hosts_trgm', self.trigram_enabled)) if enabled]
 
     def _encrypt_password(self, password: str) -> str:
         """加密密码"""
@@ -60,80 +292,485 @@ class DatabaseManager:
 
     def add_host(self, name: str, host: str, port: int, username: str,
                  password: str = "", auth_type: str = "password",
-                 private_key_path: str = "", description: str = "") -> int:
+                 private_key_path: str = "", description: str = "",
+                 group_id: Optional[int] = None, tags: Optional[Iterable[str]] = None,
+                 recording: int = 0, forwards: Optional[Iterable[dict]] = None) -> int:
         """添加主机"""
         cursor = self.conn.cursor()
         encrypted_password = self._encrypt_password(password)
         cursor.execute("""
-            INSERT INTO hosts (name, host, port, username, password, auth_type, private_key_path, description)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (name, host, port, username, encrypted_password, auth_type, private_key_path, description))
+            INSERT INTO hosts (name, host, port, username, password, auth_type, private_key_path, description,
+                               group_id, recording)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (name, host, port, username, encrypted_password, auth_type, private_key_path, description,
+              group_id, recording))
+        if tags is not None:
+            self._set_host_tags(cursor.lastrowid, tags)
+        if forwards is not None:
+            self._set_host_forwards(cursor.lastrowid, forwards)
         self.conn.commit()
+        self._notify('added', cursor.lastrowid)
         return cursor.lastrowid
 
     def update_host(self, host_id: int, name: str, host: str, port: int,
                     username: str, password: str = "", auth_type: str = "password",
-                    private_key_path: str = "", description: str = "") -> bool:
-        """更新主机信息"""
+                    private_key_path: str = "", description: str = "",
+                    group_id: Optional[int] = None, tags: Optional[Iterable[str]] = None,
+                    recording: int = 0, forwards: Optional[Iterable[dict]] = None) -> bool:
+        """更新主机信息，tags / forwards 为None时不修改标签 / 端口转发"""
+        self._credentials.pop(host_id, None)
         cursor = self.conn.cursor()
         encrypted_password = self._encrypt_password(password)
         cursor.execute("""
             UPDATE hosts
             SET name=?, host=?, port=?, username=?, password=?, auth_type=?,
-                private_key_path=?, description=?, updated_at=CURRENT_TIMESTAMP
+                private_key_path=?, description=?, group_id=?, recording=?, updated_at=CURRENT_TIMESTAMP
             WHERE id=?
         """, (name, host, port, username, encrypted_password, auth_type,
-              private_key_path, description, host_id))
+              private_key_path, description, group_id, recording, host_id))
+        if cursor.rowcount > 0 and tags is not None:
+            self._set_host_tags(host_id, tags)
+        if cursor.rowcount > 0 and forwards is not None:
+            self._set_host_forwards(host_id, forwards)
         self.conn.commit()
+        if cursor.rowcount > 0:
+            self._notify('updated', host_id)
         return cursor.rowcount > 0
 
     def delete_host(self, host_id: int) -> bool:
         """删除主机"""
+        self._credentials.pop(host_id, None)
         cursor = self.conn.cursor()
         cursor.execute("DELETE FROM hosts WHERE id=?", (host_id,))
         self.conn.commit()
+        if cursor.rowcount > 0:
+            self._notify('deleted', host_id)
+        return cursor.rowcount > 0
+
+    def add_hosts(self, hosts: Iterable[dict], skip_existing: bool = False) -> int:
+        """批量添加主机，在一个事务内分批写入，返回添加的数量
+
+        hosts 为 add_host 参数组成的字典（含 group_id / tags / recording，不含 forwards），
+        可以是生成器（如 host_import.read_inventory），逐批消费而不必全部读入内存。
+        skip_existing 为真时跳过主机、端口和用户名都已存在的记录。
+        """
+        existing = set()
+        if skip_existing:
+            existing = {tuple(row) for row in self.conn.execute("SELECT host, port, username FROM hosts")}
+        group_ids = {row[0] for row in self.conn.execute("SELECT id FROM groups")}
+        # 带标签的记录：(插入顺序, 标签)，写完后按新行ID的顺序对应
+        tagged = []
+
+        def rows():
+            position = 0
+            for data in hosts:
+                if skip_existing:
+                    key = (data['host'], data.get('port', 22), data['username'])
+                    if key in existing:
+                        continue
+                    existing.add(key)
+                if data.get('group_id') is not None and data['group_id'] not in group_ids:
+                    raise ValueError(f"分组不存在: {data['group_id']}")
+                tags = [tag.strip() for tag in data.get('tags') or () if tag.strip()]
+                if tags:
+                    tagged.append((position, tags))
+                position += 1
+                yield (data['name'], data['host'], data.get('port', 22), data['username'],
+                       self._encrypt_password(data.get('password', '')),
+                       data.get('auth_type', 'password'), data.get('private_key_path', ''),
+                       data.get('description', ''), data.get('group_id'), data.get('recording', 0))
+
+        count = 0
+        try:
+            # 逐行触发的索引更新比插入本身慢得多：事务内先去掉插入触发器，写完后一次性索引新行
+            self.conn.execute("BEGIN")
+            last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM hosts").fetchone()[0]
+            indexes = self._search_tables()
+            for table in indexes:
+                self.conn.execute(f"DROP TRIGGER {table}_ai")
+            for batch in batched(rows(), WRITE_BATCH):
+                self.conn.executemany("""
+                    INSERT INTO hosts (name, host, port, username, password, auth_type, private_key_path, description,
+                                       group_id, recording)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, batch)
+                count += len(batch)
+            if tagged:
+                # 自增ID按插入顺序递增
+                new_ids = [row[0] for row in self.conn.execute(
+                    "SELECT id FROM hosts WHERE id > ? ORDER BY id", (last_id,))]
+                tag_ids = {}
+                for name in {tag for _, tags in tagged for tag in tags}:
+                    tag_ids[name] = self._tag_id(name)
+                self.conn.executemany("INSERT OR IGNORE INTO host_tags (host_id, tag_id) VALUES (?, ?)",
+                                      [(new_ids[position], tag_ids[tag])
+                                       for position, tags in tagged for tag in tags])
+            for table in indexes:
+                self.conn.execute(f"""
+                    INSERT INTO {table}(rowid, {_INDEXED_COLUMNS})
+                    SELECT id, {_INDEXED_COLUMNS} FROM hosts WHERE id > ?
+                """, (last_id,))
+                self.conn.execute(_fts_insert_trigger(table))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        if count:
+            self._notify('reset', None)
+        return count
+
+    def update_hosts(self, host_ids: Iterable[int], **fields) -> int:
+        """把多个主机的指定字段改为同一个值（如统一用户名或端口），返回更新的数量"""
+        unknown = set(fields) - set(BULK_UPDATE_COLUMNS)
+        if unknown:
+            raise ValueError(f"不能批量修改的字段: {', '.join(sorted(unknown))}")
+        ids = list(host_ids)
+        if not fields or not ids:
+            return 0
+        if 'password' in fields:
+            fields['password'] = self._encrypt_password(fields['password'])
+            for host_id in ids:
+                self._credentials.pop(host_id, None)
+        assignments = ', '.join(f"{column}=?" for column in fields)
+        cursor = self.conn.execute(f"""
+            UPDATE hosts SET {assignments}, updated_at=CURRENT_TIMESTAMP
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (*fields.values(), json.dumps(ids)))
+        self.conn.commit()
+        if cursor.rowcount > 0:
+            self._notify('reset', None)
+        return cursor.rowcount
+
+    def delete_hosts(self, host_ids: Iterable[int]) -> int:
+        """在一个事务中删除多个主机，返回删除的数量"""
+        ids = list(host_ids)
+        if not ids:
+            return 0
+        for host_id in ids:
+            self._credentials.pop(host_id, None)
+        cursor = self.conn.execute(
+            "DELETE FROM hosts WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids),))
+        self.conn.commit()
+        if cursor.rowcount > 0:
+            self._notify('reset', None)
+        return cursor.rowcount
+
+    # ---- 分组 ----
+
+    def get_groups(self) -> List[tuple]:
+        """所有分组 (id, name, parent_id, host_count)，按名称排序；分组数量通常很少，一次读取"""
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute("SELECT id, name, parent_id, host_count FROM groups ORDER BY name").fetchall()
+
+    def add_group(self, name: str, parent_id: Optional[int] = None) -> int:
+        """添加分组，同一父分组下不能重名"""
+        ancestors = []
+        if parent_id is not None:
+            row = self.conn.execute("SELECT ancestors FROM groups WHERE id=?", (parent_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"分组不存在: {parent_id}")
+            ancestors = json.loads(row[0])
+        try:
+            cursor = self.conn.execute(
+                "INSERT INTO groups (name, parent_id) VALUES (?, ?)", (name, parent_id))
+            group_id = cursor.lastrowid
+            self.conn.execute("UPDATE groups SET ancestors=? WHERE id=?",
+                              (json.dumps(ancestors + [group_id]), group_id))
+            self.conn.commit()
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            raise ValueError(f"分组已存在: {name}") from None
+        self._notify('groups', None)
+        return group_id
+
+    def rename_group(self, group_id: int, name: str) -> bool:
+        """重命名分组"""
+        try:
+            cursor = self.conn.execute("UPDATE groups SET name=? WHERE id=?", (name, group_id))
+            self.conn.commit()
+        except sqlite3.IntegrityError:
+            self.conn.rollback()
+            raise ValueError(f"分组已存在: {name}") from None
+        if cursor.rowcount > 0:
+            self._notify('groups', None)
         return cursor.rowcount > 0
 
+    def delete_group(self, group_id: int) -> bool:
+        """删除分组及其子分组，其中的主机移到被删除分组的上一级"""
+        row = self.conn.execute("SELECT parent_id FROM groups WHERE id=?", (group_id,)).fetchone()
+        if row is None:
+            return False
+        subtree = [r[0] for r in self.conn.execute(
+            "SELECT id FROM groups WHERE EXISTS (SELECT 1 FROM json_each(ancestors) WHERE value = ?)",
+            (group_id,))]
+        try:
+            self.conn.execute(
+                "UPDATE hosts SET group_id=? WHERE group_id IN (SELECT value FROM json_each(?))",
+                (row[0], json.dumps(subtree)))
+            self.conn.execute(
+                "DELETE FROM groups WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(subtree),))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._notify('groups', None)
+        return True
+
+    def move_hosts(self, host_ids: Iterable[int], group_id: Optional[int]) -> int:
+        """把多个主机移到分组（None 为未分组）"""
+        return self.update_hosts(host_ids, group_id=group_id)
+
+    def get_group_paths(self) -> List[tuple]:
+        """所有分组的 (id, 完整路径)，如 (3, 'prod / eu')，按路径排序，供选择分组使用"""
+        groups = {row[0]: row for row in self.get_groups()}
+
+        def path(group_id):
+            _, name, parent_id, _ = groups[group_id]
+            return f"{path(parent_id)} / {name}" if parent_id in groups else name
+
+        return sorted(((group_id, path(group_id)) for group_id in groups), key=lambda item: item[1])
+
+    def count_ungrouped(self) -> int:
+        """未分组的主机数（在 group_id 索引上计数）"""
+        return self.conn.execute("SELECT COUNT(*) FROM hosts WHERE group_id IS NULL").fetchone()[0]
+
+    def count_hosts(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM hosts").fetchone()[0]
+
+    def get_group_hosts(self, group_id: Optional[int], after: tuple = ('', 0),
+                        limit: int = HOST_PAGE_SIZE) -> List[HostRecord]:
+        """分组中直接包含的主机（None 为未分组），按名称分页：after 为上一页最后一项的 (name, id)"""
+        return self._query_records(f"""
+            SELECT {HostRecord.COLUMNS} FROM hosts
+            WHERE group_id IS ? AND (name, id) > (?, ?)
+            ORDER BY name, id LIMIT ?
+        """, (group_id, *after, limit))
+
+    def get_subtree_hosts(self, group_id: int) -> List[HostRecord]:
+        """分组及其所有子分组中的主机，按名称排序"""
+        return self._query_records(f"""
+            SELECT {HostRecord.COLUMNS} FROM hosts WHERE group_id IN
+                (SELECT id FROM groups WHERE EXISTS (SELECT 1 FROM json_each(ancestors) WHERE value = ?))
+            ORDER BY name, id
+        """, (group_id,))
+
+    def find_hosts(self, names: Iterable[str]) -> List[HostRecord]:
+        """按名称（或地址）精确查找主机，按名称排序"""
+        names = json.dumps(list(names))
+        return self._query_records(f"""
+            SELECT {HostRecord.COLUMNS} FROM hosts
+            WHERE name IN (SELECT value FROM json_each(?)) OR host IN (SELECT value FROM json_each(?))
+            ORDER BY name, id
+        """, (names, names))
+
+    # ---- 标签 ----
+
+    def get_tags(self) -> List[tuple]:
+        """所有标签 (id, name, host_count)，按名称排序"""
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute("SELECT id, name, host_count FROM tags ORDER BY name").fetchall()
+
+    def get_host_tags(self, host_id: int) -> List[str]:
+        return [row[0] for row in self.conn.execute("""
+            SELECT tags.name FROM host_tags JOIN tags ON tags.id = host_tags.tag_id
+            WHERE host_tags.host_id = ? ORDER BY tags.name
+        """, (host_id,))]
+
+    def get_host_tag_ids(self, host_id: int) -> List[int]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT tag_id FROM host_tags WHERE host_id = ?", (host_id,))]
+
+    def get_tag_hosts(self, tag_id: int, after: tuple = ('', 0),
+                      limit: int = HOST_PAGE_SIZE) -> List[HostRecord]:
+        """带有某个标签的主机，分页方式同 get_group_hosts"""
+        columns = ', '.join(f"hosts.{column}" for column in HostRecord.__slots__)
+        return self._query_records(f"""
+            SELECT {columns} FROM host_tags JOIN hosts ON hosts.id = host_tags.host_id
+            WHERE host_tags.tag_id = ? AND (hosts.name, hosts.id) > (?, ?)
+            ORDER BY hosts.name, hosts.id LIMIT ?
+        """, (tag_id, *after, limit))
+
+    def tag_hosts(self, host_ids: Iterable[int], tag: str) -> int:
+        """给多个主机添加标签，返回新加标签的主机数"""
+        tag_id = self._tag_id(tag)
+        cursor = self.conn.executemany(
+            "INSERT OR IGNORE INTO host_tags (host_id, tag_id) VALUES (?, ?)",
+            [(host_id, tag_id) for host_id in host_ids])
+        self.conn.commit()
+        self._notify('reset', None)
+        return cursor.rowcount
+
+    def _tag_id(self, name: str) -> int:
+        self.conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
+        return self.conn.execute("SELECT id FROM tags WHERE name=?", (name,)).fetchone()[0]
+
+    def _set_host_tags(self, host_id: int, tags: Iterable[str]):
+        """替换主机的标签（在调用方的事务中执行）"""
+        tag_ids = {self._tag_id(name) for name in (tag.strip() for tag in tags) if name}
+        current = set(self.get_host_tag_ids(host_id))
+        self.conn.executemany("DELETE FROM host_tags WHERE host_id=? AND tag_id=?",
+                              [(host_id, tag_id) for tag_id in current - tag_ids])
+        self.conn.executemany("INSERT INTO host_tags (host_id, tag_id) VALUES (?, ?)",
+                              [(host_id, tag_id) for tag_id in tag_ids - current])
+
+    def get_forwards(self, host_id: int) -> List[dict]:
+        """主机的端口转发，键与 port_forward.ForwardSpec.to_dict() 相同"""
+        columns = ', '.join(_FORWARD_COLUMNS)
+        return [dict(row) for row in self.conn.execute(
+            f"SELECT {columns} FROM forwards WHERE host_id = ? ORDER BY id", (host_id,))]
+
+    def _set_host_forwards(self, host_id: int, forwards: Iterable[dict]):
+        """替换主机的端口转发（在调用方的事务中执行）"""
+        self.conn.execute("DELETE FROM forwards WHERE host_id=?", (host_id,))
+        self.conn.executemany(f"""
+            INSERT INTO forwards (host_id, {', '.join(_FORWARD_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)
+        """, [(host_id, forward['kind'], forward.get('bind_address') or '', forward['bind_port'],
+               forward.get('dest_host') or '', forward.get('dest_port') or 0) for forward in forwards])
+
+    def add_listener(self, callback):
+        """注册主机变更回调 callback(event, host_id)
+
+        event 为 'added' / 'updated' / 'deleted'；批量操作后为 'reset'，分组变化后为 'groups'，
+        这两种情况 host_id 为None，需重新加载。
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, event: str, host_id: int):
+        for callback in list(self._listeners):
+            callback(event, host_id)
+
     def get_host(self, host_id: int) -> Optional[dict]:
-        """获取单个主机信息"""
+        """获取单个主机的完整信息（含解密后的密码），用于编辑"""
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM hosts WHERE id=?", (host_id,))
         row = cursor.fetchone()
         if row:
             host_data = dict(row)
             host_data['password'] = self._decrypt_password(host_data['password'])
+            host_data['tags'] = self.get_host_tags(host_id)
+            host_data['forwards'] = self.get_forwards(host_id)
             return host_data
         return None
 
-    def get_all_hosts(self) -> List[dict]:
-        """获取所有主机"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM hosts ORDER BY name")
-        rows = cursor.fetchall()
-        hosts = []
-        for row in rows:
-            host_data = dict(row)
-            host_data['password'] = self._decrypt_password(host_data['password'])
-            hosts.append(host_data)
-        return hosts
+    def get_credentials(self, host_id: int) -> str:
+        """连接时按需解密主机密码，结果按 credential_ttl 短暂缓存"""
+        now = time.monotonic()
+        cached = self._credentials.get(host_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
 
-    def search_hosts(self, keyword: str) -> List[dict]:
-        """搜索主机"""
+        row = self.conn.execute("SELECT password FROM hosts WHERE id=?", (host_id,)).fetchone()
+        password = self._decrypt_password(row[0]) if row else ""
+        if self.credential_ttl > 0:
+            self._credentials[host_id] = (now + self.credential_ttl, password)
+        return password
+
+    def clear_credentials(self):
+        """清除缓存的明文密码"""
+        self._credentials.clear()
+
+    def _query_records(self, sql: str, params: tuple = ()) -> List[HostRecord]:
+        """执行列表查询，直接按列构造 HostRecord，不读取密码列"""
         cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT * FROM hosts
-            WHERE name LIKE ? OR host LIKE ? OR username LIKE ? OR description LIKE ?
-            ORDER BY name
-        """, (f"%{keyword}%", f"%{keyword}%", f"%{keyword}%", f"%{keyword}%"))
-        rows = cursor.fetchall()
-        hosts = []
-        for row in rows:
-            host_data = dict(row)
-            host_data['password'] = self._decrypt_password(host_data['password'])
-            hosts.append(host_data)
-        return hosts
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        return [HostRecord(*row) for row in cursor]
+
+    def get_host_record(self, host_id: int) -> Optional[HostRecord]:
+        """获取单个主机的列表记录（不含密码）"""
+        records = self._query_records(f"SELECT {HostRecord.COLUMNS} FROM hosts WHERE id=?", (host_id,))
+        return records[0] if records else None
+
+    def get_all_hosts(self) -> List[HostRecord]:
+        """获取所有主机（不含密码）"""
+        return self._query_records(f"SELECT {HostRecord.COLUMNS} FROM hosts ORDER BY name")
+
+    def search_hosts(self, keyword: str, limit: int = -1) -> List[HostRecord]:
+        """搜索主机（不含密码），按相关度排序"""
+        return self.get_host_records(self.search_host_ids(keyword, limit))
+
+    def get_host_records(self, host_ids: List[int]) -> List[HostRecord]:
+        """按ID列表读取主机记录，保持列表中的顺序，不存在的ID被跳过"""
+        ids = list(host_ids)
+        if not ids:
+            return []
+        order = {host_id: i for i, host_id in enumerate(ids)}
+        records = self._query_records(
+            f"SELECT {HostRecord.COLUMNS} FROM hosts WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),))
+        records.sort(key=lambda record: order[record.id])
+        return records
+
+    def search_host_ids(self, keyword: str, limit: int = -1) -> List[int]:
+        """搜索主机ID，按相关度排序
+
+        每个词按前缀匹配名称、地址、用户名和描述，多个词须全部命中，按bm25排序（名称权重最高）；
+        前缀没有结果时按子串匹配（如词中间的部分），由三元组索引加速。
+        """
+        terms = keyword.split()
+        if not terms:
+            return []
+        quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+
+        if self.fts_enabled:
+            ids = self._fts_search('hosts_fts', ' '.join(q + '*' for q in quoted), limit)
+            if ids:
+                return ids
+        if self.trigram_enabled and all(len(term) >= 3 for term in terms):
+            return self._fts_search('hosts_trgm', ' AND '.join(quoted), limit)
+        return self._like_search(terms, limit)
+
+    def _fts_search(self, table: str, query: str, limit: int) -> List[int]:
+        """在全文索引中搜索，命中不多时按加权bm25排序"""
+        try:
+            cursor = self.conn.execute(f"SELECT rowid FROM {table} WHERE {table} MATCH ?", (query,))
+            ids = [row[0] for row in cursor.fetchmany(MAX_RANKED_RESULTS + 1)]
+            if len(ids) <= 1:
+                return ids
+            if len(ids) <= MAX_RANKED_RESULTS:
+                weights = ', '.join(str(w) for w in SEARCH_WEIGHTS)
+                rows = self.conn.execute(f"""
+                    SELECT rowid FROM {table} WHERE {table} MATCH ?
+                    ORDER BY bm25({table}, {weights}) LIMIT ?
+                """, (query, limit)).fetchall()
+                return [row[0] for row in rows]
+            # 命中过多时只区分名称是否命中；有 limit 时取够即停，不读取全部命中
+            in_name = [row[0] for row in self.conn.execute(
+                f"SELECT rowid FROM {table} WHERE {table} MATCH ? LIMIT ?",
+                ('{name}: (' + query + ')', limit))]
+            if 0 <= limit <= len(in_name):
+                return in_name
+            first = set(in_name)
+            for host_id in chain(ids, (row[0] for row in cursor)):
+                if host_id not in first:
+                    in_name.append(host_id)
+                    if len(in_name) == limit:
+                        break
+            return in_name
+        except sqlite3.OperationalError:
+            return []
+
+    def _like_search(self, terms: List[str], limit: int) -> List[int]:
+        """无索引时的子串扫描"""
+        conditions = ' AND '.join(
+            "(name LIKE ? ESCAPE '\\' OR host LIKE ? ESCAPE '\\' "
+            "OR username LIKE ? ESCAPE '\\' OR description LIKE ? ESCAPE '\\')" for _ in terms)
+        params = []
+        for term in terms:
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params.extend((pattern,) * 4)
+        rows = self.conn.execute(
+            f"SELECT id FROM hosts WHERE {conditions} ORDER BY name LIMIT ?", (*params, limit)).fetchall()
+        return [row[0] for row in rows]
 
     def close(self):
         """关闭数据库连接"""
+        self.clear_credentials()
         if self.conn:
             self.conn.close()
@@ -1,15 +1,17 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
-                             QLineEdit, QSpinBox, QComboBox, QTextEdit,
+                             QLineEdit, QSpinBox, QComboBox, QTextEdit, QPlainTextEdit,
                              QPushButton, QFileDialog, QLabel)
 from PyQt6.QtCore import Qt
+from port_forward import ForwardSpec, parse_forwards
 
 
 class HostDialog(QDialog):
     """添加/编辑主机对话框"""
 
-    def __init__(self, parent=None, host_data: dict = None):
+    def __init__(self, parent=None, host_data: dict = None, groups: list = None):
         super().__init__(parent)
         self.host_data = host_data
+        self.groups = groups or []
         self.is_edit_mode = host_data is not None
         self.setup_ui()
         if self.is_edit_mode:
@@ -71,6 +73,34 @@ class HostDialog(QDialog):
         self.description_input.setMaximumHeight(80)
         form_layout.addRow("描述:", self.description_input)
 
+        self.group_combo = QComboBox()
+        self.group_combo.addItem("（未分组）", None)
+        for group_id, path in self.groups:
+            self.group_combo.addItem(path, group_id)
+        form_layout.addRow("分组:", self.group_combo)
+
+        self.tags_input = QLineEdit()
+        self.tags_input.setPlaceholderText("多个标签用逗号分隔，例如: prod, mysql")
+        form_layout.addRow("标签:", self.tags_input)
+
+        self.recording_combo = QComboBox()
+        self.recording_combo.addItem("不录制", 0)
+        self.recording_combo.addItem("录制输出", 1)
+        self.recording_combo.addItem("录制输出和输入", 2)
+        self.recording_combo.setToolTip("连接后自动录制会话，保存为 recordings 目录下的 asciicast 文件")
+        form_layout.addRow("会话录制:", self.recording_combo)
+
+        self.forwards_input = QPlainTextEdit()
+        self.forwards_input.setPlaceholderText("每行一条，格式同 ssh 的 -L / -R / -D，例如:\n"
+                                               "L 8080:localhost:80\nR 9000:localhost:3000\nD 1080")
+        self.forwards_input.setToolTip("连接后自动启动的端口转发：\n"
+                                       "L [绑定地址:]端口:目标主机:目标端口  本地端口经远程主机转发到目标\n"
+                                       "R [绑定地址:]端口:目标主机:目标端口  远程主机的端口经本机转发到目标\n"
+                                       "D [绑定地址:]端口  本地 SOCKS5 代理\n"
+                                       "本地监听默认只绑定 127.0.0.1")
+        self.forwards_input.setMaximumHeight(80)
+        form_layout.addRow("端口转发:", self.forwards_input)
+
         layout.addLayout(form_layout)
 
         button_layout = QHBoxLayout()
@@ -126,6 +156,14 @@ class HostDialog(QDialog):
         self.key_path_input.setText(self.host_data.get('private_key_path', ''))
         self.description_input.setPlainText(self.host_data.get('description', ''))
 
+        group_index = self.group_combo.findData(self.host_data.get('group_id'))
+        self.group_combo.setCurrentIndex(max(group_index, 0))
+        self.tags_input.setText(', '.join(self.host_data.get('tags', [])))
+        recording_index = self.recording_combo.findData(self.host_data.get('recording') or 0)
+        self.recording_combo.setCurrentIndex(max(recording_index, 0))
+        self.forwards_input.setPlainText('\n'.join(
+            str(ForwardSpec.from_dict(forward)) for forward in self.host_data.get('forwards', [])))
+
     def get_host_data(self) -> dict:
         """获取主机数据"""
         auth_type = "password" if self.auth_type_combo.currentIndex() == 0 else "key"
@@ -138,7 +176,11 @@ class HostDialog(QDialog):
             'auth_type': auth_type,
             'password': self.password_input.text() if auth_type == 'password' else '',
             'private_key_path': self.key_path_input.text() if auth_type == 'key' else '',
-            'description': self.description_input.toPlainText().strip()
+            'description': self.description_input.toPlainText().strip(),
+            'group_id': self.group_combo.currentData(),
+            'tags': [tag.strip() for tag in self.tags_input.text().replace('，', ',').split(',') if tag.strip()],
+            'recording': self.recording_combo.currentData(),
+            'forwards': [spec.to_dict() for spec in parse_forwards(self.forwards_input.toPlainText())],
         }
 
         if self.is_edit_mode and self.host_data:
@@ -148,6 +190,10 @@ class HostDialog(QDialog):
 
     def validate(self) -> tuple[bool, str]:
         """验证输入"""
+        try:
+            parse_forwards(self.forwards_input.toPlainText())
+        except ValueError as e:
+            return False, f"端口转发: {e}"
         data = self.get_host_data()
 
         if not data['name']:
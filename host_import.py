@@ -0,0 +1,228 @@
+import csv
+import getpass
+import json
+import os
+import re
+import shlex
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO
+
+
+# 导入记录的字段，与 DatabaseManager.add_host 的参数一致
+HOST_FIELDS = ('name', 'host', 'port', 'username', 'password',
+               'auth_type', 'private_key_path', 'description',
+               'group_id', 'tags', 'recording')
+
+# 清单文件中常见的列名/键名别名
+FIELD_ALIASES = {
+    'hostname': 'host', 'address': 'host', 'ip': 'host', 'addr': 'host',
+    'user': 'username', 'login': 'username',
+    'identityfile': 'private_key_path', 'identity_file': 'private_key_path',
+    'key': 'private_key_path', 'key_path': 'private_key_path',
+    'comment': 'description', 'desc': 'description', 'alias': 'name',
+    'group': 'group_id', 'tag': 'tags',
+}
+
+# 原样保留类型的字段（JSON 中的数字、列表）
+_RAW_FIELDS = ('port', 'group_id', 'tags', 'recording')
+
+FORMATS = ('ssh_config', 'csv', 'json')
+
+# ssh_config 的一行：关键字与值之间为空白或等号
+_CONFIG_LINE_RE = re.compile(r'(\w+)\s*(?:=\s*|\s+)(.*)')
+
+
+def normalize_host(entry: dict, default_user: str = '') -> Optional[dict]:
+    """把一条清单记录整理为 add_host 的参数，缺少主机地址时返回None"""
+    data = {}
+    for key, value in entry.items():
+        if key is None or value is None:
+            continue
+        key = key.strip().lower()
+        key = FIELD_ALIASES.get(key, key)
+        if key in HOST_FIELDS and key not in data:
+            data[key] = value if key in _RAW_FIELDS else str(value).strip()
+
+    host = data.get('host', '')
+    if not host:
+        return None
+    try:
+        port = int(data.get('port') or 22)
+    except (TypeError, ValueError):
+        port = 22
+    private_key_path = os.path.expanduser(data.get('private_key_path', ''))
+    auth_type = data.get('auth_type') or ('key' if private_key_path else 'password')
+    return {
+        'name': data.get('name') or host,
+        'host': host,
+        'port': port,
+        'username': data.get('username') or default_user,
+        'password': data.get('password', '') if auth_type == 'password' else '',
+        'auth_type': auth_type,
+        'private_key_path': private_key_path if auth_type == 'key' else '',
+        'description': data.get('description', ''),
+        'group_id': _optional_int(data.get('group_id')),
+        'tags': _tags(data.get('tags')),
+        'recording': _optional_int(data.get('recording')) or 0,
+    }
+
+
+def _optional_int(value) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _tags(value) -> list:
+    """标签可以是列表，或以逗号/空白分隔的字符串（CSV）"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = re.split(r'[,\s]+', value)
+    return [tag for tag in (str(tag).strip() for tag in value) if tag]
+
+
+# IdentityFile 中可展开的标记，与 ssh 相同
+_IDENTITY_TOKEN_RE = re.compile(r'%(.)')
+
+
+def expand_identity_file(path: str, alias: str, host: str, port, user: str) -> str:
+    """展开 IdentityFile 中的 ~ 和 %d/%u/%h/%n/%p/%r/%%，含其他标记时抛出 ValueError"""
+    tokens = {
+        '%': '%', 'd': os.path.expanduser('~'), 'u': getpass.getuser(),
+        'h': host, 'n': alias, 'p': str(port or 22), 'r': user,
+    }
+
+    def replace(match):
+        token = match.group(1)
+        if token not in tokens:
+            raise ValueError(f"主机 {alias} 的 IdentityFile 含有不支持的标记 %{token}: {path}")
+        return tokens[token]
+
+    return os.path.expanduser(_IDENTITY_TOKEN_RE.sub(replace, path))
+
+
+def parse_ssh_config(lines: Iterable[str], default_user: str = '') -> Iterator[dict]:
+    """解析OpenSSH客户端配置，每个不含通配符的 Host 别名生成一条记录
+
+    Host * 段中的 User/Port/IdentityFile 作为其他主机缺省值；Match 段被忽略。
+    IdentityFile 中的 ~ 和常用的 % 标记被展开，见 expand_identity_file()。
+    """
+    blocks = []
+    defaults = {}
+    current = None
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = _CONFIG_LINE_RE.match(line)
+        if match is None:
+            continue
+        try:
+            values = shlex.split(match.group(2))
+        except ValueError:
+            continue
+        if not values:
+            continue
+        key = match.group(1).lower()
+        if key == 'host':
+            aliases = [alias for alias in values
+                       if not alias.startswith('!') and not any(c in alias for c in '*?')]
+            current = {} if aliases else (defaults if values == ['*'] else None)
+            if aliases:
+                blocks.append((aliases, current))
+        elif key == 'match':
+            current = None
+        elif current is not None and key in ('hostname', 'port', 'user', 'identityfile'):
+            # 与ssh一致：同一选项以首次出现的值为准
+            current.setdefault(key, values[0])
+
+    for aliases, options in blocks:
+        merged = {**defaults, **options}
+        for alias in aliases:
+            host = merged.get('hostname', alias)
+            user = merged.get('user') or default_user
+            identity_file = merged.get('identityfile', '')
+            if identity_file:
+                identity_file = expand_identity_file(identity_file, alias, host, merged.get('port'), user)
+            entry = normalize_host({
+                'name': alias,
+                'host': host,
+                'port': merged.get('port'),
+                'user': user,
+                'identityfile': identity_file,
+            }, default_user)
+            if entry is not None:
+                yield entry
+
+
+def parse_csv(stream: TextIO, default_user: str = '') -> Iterator[dict]:
+    """解析带表头的CSV清单，列名见 HOST_FIELDS 及 FIELD_ALIASES"""
+    for row in csv.DictReader(stream):
+        entry = normalize_host(row, default_user)
+        if entry is not None:
+            yield entry
+
+
+def parse_json(stream: TextIO, default_user: str = '') -> Iterator[dict]:
+    """解析JSON清单：对象数组、{"hosts": [...]}，或每行一个对象的JSON Lines（逐行读取）"""
+    head = stream.read(1)
+    while head and head.isspace():
+        head = stream.read(1)
+    if head in ('[', ''):
+        items = json.loads(head + stream.read()) if head else []
+    else:
+        first = head + stream.readline()
+        try:
+            document = json.loads(first)
+        except json.JSONDecodeError:
+            # 多行书写的单个对象
+            document = json.loads(first + stream.read())
+            items = document.get('hosts', [document]) if isinstance(document, dict) else []
+        else:
+            items = _json_lines(document, stream)
+    for item in items:
+        if isinstance(item, dict):
+            entry = normalize_host(item, default_user)
+            if entry is not None:
+                yield entry
+
+
+def _json_lines(first: dict, stream: TextIO) -> Iterator[dict]:
+    if isinstance(first, dict) and isinstance(first.get('hosts'), list):
+        yield from first['hosts']
+    else:
+        yield first
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def detect_format(path: str) -> str:
+    """按文件名判断清单格式"""
+    name = Path(path).name.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.json', '.jsonl', '.ndjson')):
+        return 'json'
+    return 'ssh_config'
+
+
+def read_inventory(path: str, fmt: Optional[str] = None, default_user: Optional[str] = None) -> Iterator[dict]:
+    """逐条读取主机清单文件，fmt 为 FORMATS 之一，省略时按文件名判断"""
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的清单格式: {fmt}")
+    if default_user is None:
+        default_user = getpass.getuser()
+    path = Path(path).expanduser()
+    with open(path, encoding='utf-8-sig', newline='' if fmt == 'csv' else None) as stream:
+        if fmt == 'csv':
+            yield from parse_csv(stream, default_user)
+        elif fmt == 'json':
+            yield from parse_json(stream, default_user)
+        else:
+            yield from parse_ssh_config(stream, default_user)
+
@@ -1,20 +1,363 @@
+from bisect import bisect_left
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit,
-                             QPushButton, QListWidget, QListWidgetItem, QMenu)
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QIcon
+                             QPushButton, QTreeView, QMenu, QAbstractItemView)
+from PyQt6.QtCore import (Qt, QAbstractItemModel, QAbstractListModel, QModelIndex,
+                          QTimer, pyqtSignal)
+
+
+def _host_text(host) -> str:
+    return f"{host['name']} ({host['username']}@{host['host']}:{host['port']})"
+
+
+def _host_key(host) -> tuple:
+    return (host['name'], host['id'])
+
+
+class HostListModel(QAbstractListModel):
+    """搜索结果列表模型
+
+    ids 为按相关度排序的全部命中主机ID，rows 为已读取的记录。视图只看到已读取的行，
+    滚动到底部时再按 FETCH_BATCH 从数据库读取下一批，命中再多也只读取看得到的部分。
+    """
+
+    # 每次读取并追加到视图的行数
+    FETCH_BATCH = 500
+
+    def __init__(self, fetch_records, parent=None):
+        super().__init__(parent)
+        self.fetch_records = fetch_records
+        self.ids = []
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        host = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return _host_text(host)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return host['description'] or None
+        if role == Qt.ItemDataRole.UserRole:
+            return host
+        return None
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and len(self.rows) < len(self.ids)
+
+    def fetchMore(self, parent: QModelIndex):
+        if parent.isValid():
+            return
+        records = self._load(len(self.rows))
+        if records:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(records) - 1)
+            self.rows.extend(records)
+            self.endInsertRows()
+
+    def _load(self, start: int) -> list:
+        """读取从 start 开始的一批记录，期间已被删除的主机从结果中去掉"""
+        batch = self.ids[start:start + self.FETCH_BATCH]
+        records = self.fetch_records(batch) if batch else []
+        if len(records) < len(batch):
+            found = {record['id'] for record in records}
+            self.ids[start:start + len(batch)] = [host_id for host_id in batch if host_id in found]
+        return records
+
+    @property
+    def match_count(self) -> int:
+        """命中总数（含尚未读取的行）"""
+        return len(self.ids)
+
+    def set_ids(self, ids):
+        """替换搜索结果"""
+        self.beginResetModel()
+        self.ids = list(ids)
+        self.rows = []
+        self.rows = self._load(0)
+        self.endResetModel()
+
+    def _row_of(self, host_id: int) -> int:
+        for row, host in enumerate(self.rows):
+            if host['id'] == host_id:
+                return row
+        return -1
+
+    # ---- 行级变更 ----
+
+    def add_host(self, host):
+        """新命中的主机追加在结果末尾"""
+        self.ids.append(host['id'])
+        if len(self.rows) == len(self.ids) - 1:
+            row = len(self.rows)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.rows.append(host)
+            self.endInsertRows()
+
+    def update_host(self, host, visible: bool):
+        """更新主机，不再命中时移除，新命中时追加"""
+        if host['id'] not in self.ids:
+            if visible:
+                self.add_host(host)
+            return
+        if not visible:
+            self.remove_host(host['id'])
+            return
+        row = self._row_of(host['id'])
+        if row >= 0:
+            self.rows[row] = host
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def remove_host(self, host_id: int):
+        if host_id not in self.ids:
+            return
+        self.ids.remove(host_id)
+        row = self._row_of(host_id)
+        if row >= 0:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.rows[row]
+            self.endRemoveRows()
+
+
+class _TreeNode:
+    """主机树节点：分组、未分组、标签目录、标签或主机
+
+    分组类节点的 children 先是子分组/标签（建树时一次创建），从 host_start 起是按名称分页读取的主机。
+    """
+
+    __slots__ = ('kind', 'key', 'name', 'count', 'parent', 'children',
+                 'host_start', 'last', 'exhausted', 'host')
+
+    def __init__(self, kind: str, key=None, name: str = '', count: int = 0, parent=None, host=None):
+        self.kind = kind
+        self.key = key
+        self.name = name
+        self.count = count
+        self.parent = parent
+        self.children = []
+        self.host_start = 0
+        self.last = ('', 0)
+        self.exhausted = kind not in HostTreeModel.HOST_BUCKETS
+        self.host = host
+
+
+class HostTreeModel(QAbstractItemModel):
+    """按分组和标签浏览主机的树模型
+
+    建树时只读取分组和标签（含触发器维护的主机数），分组展开时才按页读取其中的主机，
+    滚动到末尾再读取下一页，主机再多也不需要一次全部加载。
+    """
+
+    GROUP, UNGROUPED, TAGS, TAG, HOST = 'group', 'ungrouped', 'tags', 'tag', 'host'
+
+    # 直接包含主机、需要分页读取的节点
+    HOST_BUCKETS = (GROUP, UNGROUPED, TAG)
+
+    # 每次展开或滚动到末尾时读取的主机数
+    PAGE_SIZE = 500
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.source = source
+        self.root = _TreeNode('root')
+        self.buckets = {}
+        self.host_nodes = {}
+
+    # ---- 建树 ----
+
+    def reload(self):
+        """重新读取分组和标签，已读取的主机全部丢弃"""
+        self.beginResetModel()
+        self.root = _TreeNode('root')
+        self.buckets = {}
+        self.host_nodes = {}
+
+        groups = self.source.get_groups()
+        for group_id, name, _, count in groups:
+            self.buckets[(self.GROUP, group_id)] = _TreeNode(self.GROUP, group_id, name, count)
+        for group_id, _, parent_id, _ in groups:
+            node = self.buckets[(self.GROUP, group_id)]
+            node.parent = self.buckets.get((self.GROUP, parent_id), self.root)
+            node.parent.children.append(node)
+
+        ungrouped = _TreeNode(self.UNGROUPED, None, "未分组", self.source.count_ungrouped(), self.root)
+        tags = _TreeNode(self.TAGS, None, "标签", parent=self.root)
+        for tag_id, name, count in self.source.get_tags():
+            tag = _TreeNode(self.TAG, tag_id, name, count, tags)
+            tags.children.append(tag)
+            self.buckets[(self.TAG, tag_id)] = tag
+        self.root.children.extend((ungrouped, tags))
+        self.buckets[(self.UNGROUPED, None)] = ungrouped
+        self.buckets[(self.TAGS, None)] = tags
+
+        for node in self.buckets.values():
+            node.host_start = len(node.children)
+        self.endResetModel()
+
+    def refresh_counts(self) -> bool:
+        """重新读取各分组和标签的计数；树尚未建立或分组、标签本身有增减时重建整棵树并返回False"""
+        groups = {group_id: count for group_id, _, _, count in self.source.get_groups()}
+        tags = {tag_id: count for tag_id, _, count in self.source.get_tags()}
+        known = {key for key in self.buckets if key[0] in (self.GROUP, self.TAG)}
+        if ((self.UNGROUPED, None) not in self.buckets
+                or known != {(self.GROUP, key) for key in groups} | {(self.TAG, key) for key in tags}):
+            self.reload()
+            return False
+        counts = {(self.UNGROUPED, None): self.source.count_ungrouped()}
+        counts.update(((self.GROUP, key), count) for key, count in groups.items())
+        counts.update(((self.TAG, key), count) for key, count in tags.items())
+        for key, count in counts.items():
+            node = self.buckets[key]
+            if node.count != count:
+                node.count = count
+                index = self.index_of(node)
+                self.dataChanged.emit(index, index)
+        return True
+
+    # ---- QAbstractItemModel ----
+
+    def node_at(self, index: QModelIndex) -> _TreeNode:
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index_of(self, node: _TreeNode) -> QModelIndex:
+        if node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.parent.children.index(node), 0, node)
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self.node_at(parent)
+        if column != 0 or not 0 <= row < len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self.index_of(index.internalPointer().parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self.node_at(parent).children)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        node = self.node_at(parent)
+        return node.kind != self.HOST and (bool(node.children) or node.count > 0)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not self.node_at(parent).exhausted
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self.node_at(parent)
+        if node.exhausted:
+            return
+        if node.kind == self.TAG:
+            records = self.source.get_tag_hosts(node.key, node.last, self.PAGE_SIZE)
+        else:
+            records = self.source.get_group_hosts(node.key, node.last, self.PAGE_SIZE)
+        if len(records) < self.PAGE_SIZE:
+            node.exhausted = True
+        if not records:
+            return
+        node.last = _host_key(records[-1])
+        start = len(node.children)
+        self.beginInsertRows(parent, start, start + len(records) - 1)
+        node.children.extend(self._host_node(record, node) for record in records)
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if node.kind == self.HOST:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return _host_text(node.host)
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return node.host['description'] or None
+            if role == Qt.ItemDataRole.UserRole:
+                return node.host
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return node.name if node.kind == self.TAGS else f"{node.name} ({node.count})"
+        return None
+
+    # ---- 行级变更 ----
+
+    def _host_node(self, record, bucket: _TreeNode) -> _TreeNode:
+        node = _TreeNode(self.HOST, record['id'], parent=bucket, host=record)
+        self.host_nodes.setdefault(record['id'], []).append(node)
+        return node
+
+    def _buckets_for(self, record, tag_ids) -> list:
+        group_id = record['group_id']
+        keys = [(self.GROUP, group_id) if group_id is not None else (self.UNGROUPED, None)]
+        keys.extend((self.TAG, tag_id) for tag_id in tag_ids)
+        return [self.buckets[key] for key in keys if key in self.buckets]
+
+    def add_host(self, record, tag_ids=()):
+        """把主机插入已读取到相应位置的分组/标签中，尚未读取到的位置留给后续分页"""
+        if not self.refresh_counts():
+            return
+        key = _host_key(record)
+        for bucket in self._buckets_for(record, tag_ids):
+            if not bucket.exhausted and key > bucket.last:
+                continue
+            hosts = bucket.children[bucket.host_start:]
+            row = bucket.host_start + bisect_left(hosts, key, key=lambda node: _host_key(node.host))
+            self.beginInsertRows(self.index_of(bucket), row, row)
+            bucket.children.insert(row, self._host_node(record, bucket))
+            self.endInsertRows()
+
+    def update_host(self, record, tag_ids=()):
+        self._remove_nodes(record['id'])
+        self.add_host(record, tag_ids)
+
+    def remove_host(self, host_id: int):
+        self._remove_nodes(host_id)
+        self.refresh_counts()
+
+    def _remove_nodes(self, host_id: int):
+        for node in self.host_nodes.pop(host_id, []):
+            bucket = node.parent
+            row = bucket.children.index(node)
+            self.beginRemoveRows(self.index_of(bucket), row, row)
+            del bucket.children[row]
+            self.endRemoveRows()
 
 
 class HostListWidget(QWidget):
-    """主机列表组件"""
+    """主机列表组件：无搜索时按分组/标签树形浏览，有搜索时显示按相关度排序的结果"""
 
-    host_double_clicked = pyqtSignal(dict)
+    host_double_clicked = pyqtSignal(object)
+    connect_selected_clicked = pyqtSignal(list)
     add_host_clicked = pyqtSignal()
-    edit_host_clicked = pyqtSignal(dict)
+    edit_host_clicked = pyqtSignal(object)
     delete_host_clicked = pyqtSignal(int)
+    delete_selected_clicked = pyqtSignal(list)
+    import_hosts_clicked = pyqtSignal()
+    replay_clicked = pyqtSignal()
+    move_hosts_requested = pyqtSignal(list, object)
+    create_group_requested = pyqtSignal(object)
+    rename_group_requested = pyqtSignal(int)
+    delete_group_requested = pyqtSignal(int)
+    batch_run_requested = pyqtSignal(list)
+    group_batch_run_requested = pyqtSignal(int)
+
+    # 搜索输入停止后多久开始筛选（毫秒）
+    FILTER_DELAY = 120
 
     def __init__(self):
         super().__init__()
-        self.hosts = []
+        self.source = None
+        self.tree_model = None
+        self.search_model = None
+        self.last_keyword = ''
+        self.expanded = set()
         self.setup_ui()
 
     def setup_ui(self):
@@ -32,70 +375,207 @@ class HostListWidget(QWidget):
         self.add_button.clicked.connect(self.add_host_clicked.emit)
         search_layout.addWidget(self.add_button)
 
+        self.import_button = QPushButton("导入")
+        self.import_button.setToolTip("从 ~/.ssh/config、CSV 或 JSON 清单批量导入主机")
+        self.import_button.clicked.connect(self.import_hosts_clicked.emit)
+        search_layout.addWidget(self.import_button)
+
+        self.replay_button = QPushButton("回放")
+        self.replay_button.setToolTip("打开会话录制并回放")
+        self.replay_button.clicked.connect(self.replay_clicked.emit)
+        search_layout.addWidget(self.replay_button)
+
         layout.addLayout(search_layout)
 
-        self.host_list = QListWidget()
-        self.host_list.itemDoubleClicked.connect(self._on_item_double_clicked)
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.FILTER_DELAY)
+        self.filter_timer.timeout.connect(self.refresh_list)
+
+        self.host_list = QTreeView()
+        self.host_list.setHeaderHidden(True)
+        self.host_list.setUniformRowHeights(True)
+        self.host_list.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.host_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.host_list.doubleClicked.connect(self._on_item_double_clicked)
         self.host_list.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.host_list.customContextMenuRequested.connect(self._show_context_menu)
         layout.addWidget(self.host_list)
 
         self.setLayout(layout)
 
-    def load_hosts(self, hosts: list):
-        """加载主机列表"""
-        self.hosts = hosts
-        self.refresh_list()
+    def set_source(self, source):
+        """设置数据来源（DatabaseManager）：分组/标签、分页读取主机和搜索都通过它进行"""
+        self.source = source
+        self.tree_model = HostTreeModel(source, self)
+        self.search_model = HostListModel(source.get_host_records, self)
+        self.tree_model.modelAboutToBeReset.connect(self._on_tree_about_to_reset)
+        # 排队执行：视图自身在重置时会清空展开状态，须在它之后恢复
+        self.tree_model.modelReset.connect(self._on_tree_reset, Qt.ConnectionType.QueuedConnection)
+        self.host_list.setModel(self.tree_model)
 
-    def refresh_list(self):
-        """刷新列表显示"""
-        self.host_list.clear()
-        keyword = self.search_input.text().lower()
-
-        for host in self.hosts:
-            if keyword and keyword not in host['name'].lower() and \
-               keyword not in host['host'].lower() and \
-               keyword not in host['username'].lower():
-                continue
+    def reload(self):
+        """重新读取分组树，保留展开状态和当前搜索"""
+        self.tree_model.reload()
+        if self.last_keyword:
+            self.refresh_list()
+
+    def _on_tree_about_to_reset(self):
+        if self.host_list.model() is self.tree_model:
+            self._save_expanded()
+
+    def _on_tree_reset(self):
+        if self.host_list.model() is self.tree_model:
+            self._restore_expanded()
+
+    def _save_expanded(self):
+        self.expanded = {key for key, node in self.tree_model.buckets.items()
+                         if self.host_list.isExpanded(self.tree_model.index_of(node))}
+
+    def _restore_expanded(self):
+        for key in self.expanded:
+            node = self.tree_model.buckets.get(key)
+            if node is not None:
+                self.host_list.expand(self.tree_model.index_of(node))
 
-            item = QListWidgetItem(f"{host['name']} ({host['username']}@{host['host']}:{host['port']})")
-            item.setData(Qt.ItemDataRole.UserRole, host)
-            self.host_list.addItem(item)
+    # ---- 行级更新 ----
+
+    def host_added(self, host):
+        self.tree_model.add_host(host, self.source.get_host_tag_ids(host['id']))
+        if self.last_keyword and self._matches(host):
+            self.search_model.add_host(host)
+
+    def host_updated(self, host):
+        self.tree_model.update_host(host, self.source.get_host_tag_ids(host['id']))
+        if self.last_keyword:
+            self.search_model.update_host(host, self._matches(host))
+
+    def host_removed(self, host_id: int):
+        self.tree_model.remove_host(host_id)
+        self.search_model.remove_host(host_id)
+
+    def _matches(self, host) -> bool:
+        """单个主机是否符合当前搜索条件"""
+        return host['id'] in self.source.search_host_ids(self.last_keyword)
+
+    # ---- 筛选 ----
+
+    def refresh_list(self):
+        """按当前搜索关键字在树形浏览和搜索结果之间切换"""
+        self.filter_timer.stop()
+        keyword = self.search_input.text().strip()
+        searching = self.host_list.model() is self.search_model
+        if not keyword:
+            if searching:
+                self.host_list.setModel(self.tree_model)
+                self.host_list.setRootIsDecorated(True)
+                self._restore_expanded()
+        else:
+            if not searching:
+                self._save_expanded()
+            self.search_model.set_ids(self.source.search_host_ids(keyword))
+            if not searching:
+                self.host_list.setModel(self.search_model)
+                self.host_list.setRootIsDecorated(False)
+        self.last_keyword = keyword
 
     def filter_hosts(self):
-        """过滤主机列表"""
-        self.refresh_list()
+        """过滤主机列表（输入停顿后执行）"""
+        self.filter_timer.start()
+
+    # ---- 交互 ----
 
-    def _on_item_double_clicked(self, item: QListWidgetItem):
-        """双击主机项"""
-        host = item.data(Qt.ItemDataRole.UserRole)
-        self.host_double_clicked.emit(host)
+    def _on_item_double_clicked(self, index: QModelIndex):
+        """双击主机项；双击分组由视图展开/折叠"""
+        host = index.data(Qt.ItemDataRole.UserRole)
+        if host is not None:
+            self.host_double_clicked.emit(host)
 
     def _show_context_menu(self, pos):
         """显示右键菜单"""
-        item = self.host_list.itemAt(pos)
-        if not item:
-            return
+        index = self.host_list.indexAt(pos)
+        host = index.data(Qt.ItemDataRole.UserRole) if index.isValid() else None
+        if host is not None:
+            self._show_host_menu(pos, host)
+        elif self.host_list.model() is self.tree_model:
+            self._show_group_menu(pos, self.tree_model.node_at(index))
 
-        host = item.data(Qt.ItemDataRole.UserRole)
+    def _show_group_menu(self, pos, node):
+        """分组节点或空白处的右键菜单"""
+        is_group = node.kind == HostTreeModel.GROUP
+        menu = QMenu(self)
+        new_group_action = menu.addAction("新建子分组" if is_group else "新建分组")
+        rename_action = menu.addAction("重命名分组") if is_group else None
+        delete_action = menu.addAction("删除分组") if is_group else None
+        batch_action = None
+        if is_group:
+            menu.addSeparator()
+            batch_action = menu.addAction(f"在组内批量执行 ({node.count})")
+
+        action = menu.exec(self.host_list.mapToGlobal(pos))
+
+        if action == new_group_action:
+            self.create_group_requested.emit(node.key if is_group else None)
+        elif action is not None and action == rename_action:
+            self.rename_group_requested.emit(node.key)
+        elif action is not None and action == delete_action:
+            self.delete_group_requested.emit(node.key)
+        elif action is not None and action == batch_action:
+            self.group_batch_run_requested.emit(node.key)
+
+    def _show_host_menu(self, pos, host):
+        """主机的右键菜单"""
+        selected = self.get_selected_hosts()
+        if not any(selected_host['id'] == host['id'] for selected_host in selected):
+            selected = [host]
+        selected_ids = [selected_host['id'] for selected_host in selected]
 
         menu = QMenu(self)
         connect_action = menu.addAction("连接")
+        connect_selected_action = None
+        if len(selected) > 1:
+            connect_selected_action = menu.addAction(f"连接所选主机 ({len(selected)})")
+        batch_action = menu.addAction(f"批量执行命令 ({len(selected)})" if len(selected) > 1 else "执行命令")
         edit_action = menu.addAction("编辑")
+        move_menu = menu.addMenu(f"移动到分组 ({len(selected)})" if len(selected) > 1 else "移动到分组")
+        move_actions = {move_menu.addAction("（未分组）"): None}
+        for group_id, path in self.source.get_group_paths():
+            move_actions[move_menu.addAction(path)] = group_id
         delete_action = menu.addAction("删除")
+        delete_selected_action = None
+        if len(selected) > 1:
+            delete_selected_action = menu.addAction(f"删除所选主机 ({len(selected)})")
 
         action = menu.exec(self.host_list.mapToGlobal(pos))
 
         if action == connect_action:
             self.host_double_clicked.emit(host)
+        elif action is not None and action == connect_selected_action:
+            self.connect_selected_clicked.emit(selected)
+        elif action == batch_action:
+            self.batch_run_requested.emit(selected)
         elif action == edit_action:
             self.edit_host_clicked.emit(host)
+        elif action in move_actions:
+            self.move_hosts_requested.emit(selected_ids, move_actions[action])
         elif action == delete_action:
             self.delete_host_clicked.emit(host['id'])
+        elif action is not None and action == delete_selected_action:
+            self.delete_selected_clicked.emit(selected_ids)
+
+    def get_selected_hosts(self) -> list:
+        """获取所有选中的主机（按显示顺序，同一主机只出现一次）"""
+        indexes = sorted(self.host_list.selectionModel().selectedRows(),
+                         key=lambda index: self.host_list.visualRect(index).top())
+        hosts, seen = [], set()
+        for index in indexes:
+            host = index.data(Qt.ItemDataRole.UserRole)
+            if host is not None and host['id'] not in seen:
+                seen.add(host['id'])
+                hosts.append(host)
+        return hosts
 
     def get_selected_host(self):
         """获取选中的主机"""
-        item = self.host_list.currentItem()
-        if item:
-            return item.data(Qt.ItemDataRole.UserRole)
-        return None
+        index = self.host_list.currentIndex()
+        return index.data(Qt.ItemDataRole.UserRole) if index.isValid() else None
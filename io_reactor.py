@@ -0,0 +1,290 @@
+import selectors
+import socket
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+
+# 默认I/O线程数，1 表示所有会话共用一个线程
+DEFAULT_WORKERS = 1
+
+# 有待发送数据时的轮询间隔（秒）：SSH通道的发送窗口打开没有对应的fd事件
+WRITE_POLL_INTERVAL = 0.01
+
+
+class _ReactorLoop:
+    """单个I/O线程：用selector等待一组通道可读，并为有待发送数据的通道调用发送函数"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.selector = selectors.DefaultSelector()
+        self.handlers = {}
+        self.writers = {}
+        self.paused = set()
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+
+        # 自唤醒管道：其他线程增删通道后唤醒select
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ)
+
+    @property
+    def load(self) -> int:
+        return len(self.handlers) + len(self.pending)
+
+    def start(self):
+        """按需启动线程"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """停止线程；线程未启动时直接释放selector和唤醒管道"""
+        if self.running:
+            self.submit(('stop', None, None, None))
+        else:
+            self._close()
+
+    def submit(self, op: tuple):
+        """提交增删操作并唤醒线程"""
+        with self.lock:
+            self.pending.append(op)
+        self.wakeup()
+
+    def submit_many(self, ops: list):
+        """一次提交多个操作，只唤醒一次线程"""
+        with self.lock:
+            self.pending.extend(ops)
+        self.wakeup()
+
+    def wakeup(self):
+        """唤醒阻塞中的select"""
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self.thread
+
+    def _apply_pending(self):
+        """在I/O线程中执行挂起的注册/注销操作"""
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return
+                op = self.pending.popleft()
+
+            action, fd, owner, payload = op
+            if action == 'add':
+                self._remove(fd)
+                self.handlers[fd] = (owner, payload)
+                try:
+                    self.selector.register(fd, selectors.EVENT_READ)
+                except (KeyError, ValueError, OSError):
+                    self.handlers.pop(fd, None)
+            elif action == 'write':
+                entry = self.handlers.get(fd)
+                if entry is not None and entry[0] is owner:
+                    self.writers[fd] = (owner, payload)
+            elif action == 'pause':
+                entry = self.handlers.get(fd)
+                if entry is not None and entry[0] is owner and fd not in self.paused:
+                    self.paused.add(fd)
+                    self.selector.unregister(fd)
+            elif action == 'resume':
+                entry = self.handlers.get(fd)
+                if entry is not None and entry[0] is owner and fd in self.paused:
+                    self.paused.discard(fd)
+                    self.selector.register(fd, selectors.EVENT_READ)
+            elif action == 'remove':
+                self._remove(fd, owner)
+                payload.set()
+            elif action == 'stop':
+                self.running = False
+
+    def _remove(self, fd: int, owner=None):
+        """注销fd；指定owner时只注销该通道自己的注册，防止fd号复用后误删"""
+        entry = self.handlers.get(fd)
+        if entry is None or (owner is not None and entry[0] is not owner):
+            return
+        del self.handlers[fd]
+        self.writers.pop(fd, None)
+        if fd in self.paused:
+            # 暂停中的fd没有在selector中注册
+            self.paused.discard(fd)
+            return
+        try:
+            self.selector.unregister(fd)
+        except (KeyError, ValueError, OSError):
+            pass
+
+    def _service_writers(self):
+        """调用发送函数；返回False表示数据已发完，True表示还有数据（等待发送窗口）"""
+        for fd, (owner, writer) in list(self.writers.items()):
+            try:
+                more = writer()
+            except Exception:
+                more = False
+            if not more and self.writers.get(fd, (None,))[0] is owner:
+                del self.writers[fd]
+
+    def _run(self):
+        """事件循环：只有数据到达时才会被唤醒"""
+        while self.running:
+            self._apply_pending()
+            if not self.running:
+                break
+            try:
+                events = self.selector.select(WRITE_POLL_INTERVAL if self.writers else None)
+            except OSError:
+                continue
+
+            for key, _ in events:
+                if key.fileobj is self._wake_r:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+
+                entry = self.handlers.get(key.fd)
+                if entry is None:
+                    continue
+                try:
+                    keep = entry[1]()
+                except Exception:
+                    keep = False
+                if not keep:
+                    self._remove(key.fd)
+
+            self._service_writers()
+
+        for fd in list(self.handlers):
+            self._remove(fd)
+        self._close()
+
+    def _close(self):
+        self.selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+
+class IOReactor:
+    """共享I/O反应器，所有会话的通道都由少量线程统一等待
+
+    workers=1 时所有通道共用一个线程；大于1时通道按负载分配到线程池中。
+    处理函数在I/O线程中调用，返回False表示通道已结束并自动注销。
+    发送同样在I/O线程中完成：want_write() 登记的发送函数会被反复调用，直到它报告数据已发完。
+    pause() / resume() 暂停和恢复读取某个通道，用于下游处理不过来时让远端减速。
+    shutdown() 之后不能再注册通道。
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self._loops = [_ReactorLoop(f"sshive-io-{i}") for i in range(max(1, workers))]
+        self._owners = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def workers(self) -> int:
+        return len(self._loops)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def register(self, channel, handler: Callable[[], bool]) -> None:
+        """注册通道，可读时在I/O线程中调用handler；反应器已关闭时抛出 RuntimeError"""
+        fd = channel.fileno()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("I/O反应器已关闭")
+            loop = min(self._loops, key=lambda l: l.load)
+            self._owners[channel] = (loop, fd)
+            # 在锁内启动，不会与 shutdown() 交错而在已关闭的selector上重新启动线程
+            loop.start()
+            loop.submit(('add', fd, channel, handler))
+
+    def want_write(self, channel, writer: Callable[[], bool]) -> None:
+        """请求在I/O线程中调用writer发送数据，直到它返回False"""
+        with self._lock:
+            owner = self._owners.get(channel)
+        if owner is None:
+            return
+        loop, fd = owner
+        loop.submit(('write', fd, channel, writer))
+
+    def want_write_many(self, requests) -> None:
+        """为多个通道同时请求发送，requests 为 (channel, writer) 序列；每个I/O线程只唤醒一次"""
+        ops = {}
+        with self._lock:
+            for channel, writer in requests:
+                owner = self._owners.get(channel)
+                if owner is not None:
+                    loop, fd = owner
+                    ops.setdefault(loop, []).append(('write', fd, channel, writer))
+        for loop, loop_ops in ops.items():
+            loop.submit_many(loop_ops)
+
+    def pause(self, channel) -> None:
+        """暂停读取通道：不再读取后SSH通道窗口不再扩大，由远端停止发送"""
+        self._submit(channel, 'pause')
+
+    def resume(self, channel) -> None:
+        """恢复读取暂停的通道"""
+        self._submit(channel, 'resume')
+
+    def _submit(self, channel, action: str) -> None:
+        with self._lock:
+            owner = self._owners.get(channel)
+        if owner is not None:
+            loop, fd = owner
+            loop.submit((action, fd, channel, None))
+
+    def unregister(self, channel, timeout: float = 1.0) -> None:
+        """注销通道；在其他线程调用时等待I/O线程确认，避免关闭fd后仍被select"""
+        with self._lock:
+            owner = self._owners.pop(channel, None)
+        if owner is None:
+            return
+        loop, fd = owner
+
+        if loop.in_loop_thread():
+            loop._remove(fd, channel)
+            return
+
+        done = threading.Event()
+        loop.submit(('remove', fd, channel, done))
+        done.wait(timeout)
+
+    def shutdown(self) -> None:
+        """停止所有I/O线程并释放selector；已注册的通道随之注销，之后的注销和发送请求直接忽略"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._owners.clear()
+            for loop in self._loops:
+                loop.stop()
+
+
+_reactor: Optional[IOReactor] = None
+_reactor_lock = threading.Lock()
+
+
+def get_reactor(workers: int = DEFAULT_WORKERS) -> IOReactor:
+    """获取全局共享的I/O反应器，首次调用时决定线程数"""
+    global _reactor
+    with _reactor_lock:
+        if _reactor is None:
+            _reactor = IOReactor(workers)
+        return _reactor
@@ -0,0 +1,218 @@
+import functools
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+
+# 发送保活探测的间隔（秒），0 表示不探测
+KEEPALIVE_INTERVAL = 15
+
+# 连续这么多个间隔没有收到探测回应时认为对端已失联，关闭连接
+KEEPALIVE_COUNT_MAX = 3
+
+# 探测使用的全局请求，服务端不认识时回复失败，同样证明对端仍然存活
+PROBE_REQUEST = "keepalive@openssh.com"
+
+# 等待探测回应时检查连接是否已关闭的间隔（秒）
+_PROBE_POLL_INTERVAL = 0.1
+
+
+_requests = weakref.WeakKeyDictionary()
+_requests_lock = threading.Lock()
+
+
+class _GlobalRequests:
+    """一条连接上已发送、等待回应的全局请求
+
+    服务端按发送顺序回应全局请求，回应本身不带请求标识。paramiko 同一时间只能等待一个
+    全局请求，因此远程端口转发的建立、取消仍须依次进行；保活探测则只在发送时占用 lock，
+    之后在自己的 Event 上等待，不再阻塞转发请求。pending 按发送顺序记录每个请求：
+    探测为其 Event，由 paramiko 等待的请求为 _PASS_THROUGH，回应到达时按顺序分派。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self._pending_lock = threading.Lock()
+
+    def install(self, transport):
+        """接管连接的全局请求回应处理"""
+        from paramiko.common import MSG_REQUEST_FAILURE, MSG_REQUEST_SUCCESS
+
+        # paramiko 支持按实例修改 _handler_table；处理函数只由连接自身引用，不形成从这里到连接的强引用
+        table = transport._handler_table
+        for ptype in (MSG_REQUEST_SUCCESS, MSG_REQUEST_FAILURE):
+            table[ptype] = functools.partial(self._on_reply, table[ptype])
+
+    def add(self, entry):
+        with self._pending_lock:
+            self.pending.append(entry)
+
+    def discard(self, entry):
+        with self._pending_lock:
+            try:
+                self.pending.remove(entry)
+            except ValueError:
+                pass
+
+    def _on_reply(self, handler, m):
+        """在连接的读线程中收到回应：交给最早发送的请求"""
+        with self._pending_lock:
+            entry = self.pending.popleft() if self.pending else _PASS_THROUGH
+        if entry is _PASS_THROUGH:
+            handler(m)
+        else:
+            entry.set()
+
+
+# pending 中由 paramiko 自己等待回应的请求
+_PASS_THROUGH = object()
+
+
+def _global_requests(transport) -> _GlobalRequests:
+    with _requests_lock:
+        requests = _requests.get(transport)
+        if requests is None:
+            requests = _requests[transport] = _GlobalRequests()
+            requests.install(transport)
+        return requests
+
+
+@contextmanager
+def global_request_lock(transport):
+    """在其中通过 paramiko 发送一个需要等待回应的全局请求（远程端口转发的建立、取消）
+
+    这样的请求须依次进行；与保活探测只共用发送顺序，不会等待探测的回应。
+    """
+    requests = _global_requests(transport)
+    with requests.lock:
+        entry = _PASS_THROUGH
+        requests.add(entry)
+        try:
+            yield
+        except BaseException:
+            # 请求没有发出（连接已关闭），不再等待它的回应
+            requests.discard(entry)
+            raise
+
+
+def send_probe(transport) -> threading.Event:
+    """发送保活探测，不等待回应；返回收到回应（成功或失败）时置位的 Event"""
+    from paramiko import Message
+    from paramiko.common import cMSG_GLOBAL_REQUEST
+
+    requests = _global_requests(transport)
+    answered = threading.Event()
+    m = Message()
+    m.add_byte(cMSG_GLOBAL_REQUEST)
+    m.add_string(PROBE_REQUEST)
+    m.add_boolean(True)
+    with requests.lock:
+        requests.add(answered)
+        try:
+            transport._send_user_message(m)
+        except BaseException:
+            requests.discard(answered)
+            raise
+    return answered
+
+
+class _Probe:
+    """一条连接的探测状态"""
+
+    __slots__ = ('sent', 'answered')
+
+    def __init__(self):
+        self.sent = 0.0
+        self.answered = True
+
+
+class KeepaliveMonitor:
+    """连接保活与失联检测
+
+    一个线程定期为每条受监视的连接发送需要回应的全局请求：既保持NAT和防火墙的会话，
+    又能在对端失联时及时发现。探测超过 interval * count_max 秒没有回应时关闭连接，
+    连接上的所有通道随之关闭，使用者（终端、批量执行、命令行）即可按连接断开处理。
+    单个探测在独立的短线程中等待回应，不阻塞对其他连接的探测。
+    """
+
+    def __init__(self, interval: float = KEEPALIVE_INTERVAL, count_max: int = KEEPALIVE_COUNT_MAX):
+        self.interval = interval
+        self.count_max = max(1, count_max)
+        self._watched = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def watch(self, transport):
+        """开始监视连接，连接关闭后自动移除"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            self._watched[transport] = _Probe()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sshive-keepalive", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, transport):
+        with self._lock:
+            self._watched.pop(transport, None)
+
+    def configure(self, interval: float, count_max: int = None):
+        """修改探测间隔和允许的无回应次数，对已监视的连接同样生效"""
+        self.interval = interval
+        if count_max is not None:
+            self.count_max = max(1, count_max)
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval if self.interval > 0 else None)
+            self._wakeup.clear()
+            if self.interval > 0:
+                self._check(time.monotonic())
+
+    def _check(self, now: float):
+        with self._lock:
+            watched = list(self._watched.items())
+        for transport, probe in watched:
+            if not transport.is_active():
+                self.unwatch(transport)
+            elif not probe.answered:
+                if now - probe.sent >= self.interval * self.count_max:
+                    # 对端失联：关闭连接，阻塞中的探测和所有通道随之结束
+                    self.unwatch(transport)
+                    transport.close()
+            else:
+                probe.sent = now
+                probe.answered = False
+                threading.Thread(target=self._probe, args=(transport, probe),
+                                 name="sshive-keepalive-probe", daemon=True).start()
+
+    @staticmethod
+    def _probe(transport, probe: _Probe):
+        """发送探测并等待回应，连接关闭时结束；等待期间不妨碍连接上的其他全局请求"""
+        try:
+            answered = send_probe(transport)
+        except Exception:
+            return
+        while not answered.wait(_PROBE_POLL_INTERVAL):
+            if not transport.is_active():
+                return
+        probe.answered = True
+
+
+_monitor: Optional[KeepaliveMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_keepalive_monitor() -> KeepaliveMonitor:
+    """获取全局共享的保活监视器"""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = KeepaliveMonitor()
+        return _monitor
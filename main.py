@@ -1,16 +1,35 @@
 import sys
-from PyQt6.QtWidgets import QApplication
-from main_window import MainWindow
+from startup_profile import StartupProfiler, call_after_first_paint
 
 
 def main():
+    profiler = StartupProfiler.from_argv(sys.argv)
+
+    from PyQt6.QtWidgets import QApplication
+    from main_window import MainWindow
+    profiler.mark("导入模块")
+
     app = QApplication(sys.argv)
     app.setApplicationName("SSHive")
     app.setOrganizationName("SSHive")
+    profiler.mark("创建应用")
 
     window = MainWindow()
     window.show()
+    profiler.mark("创建窗口")
+
+    def on_first_paint():
+        # 窗口先显示出来，再在后台线程中打开数据库，完成后加载主机列表
+        profiler.mark(StartupProfiler.FIRST_PAINT)
+        window.open_database(on_database_ready)
+
+    def on_database_ready():
+        profiler.mark("加载主机")
+        code = profiler.finish()
+        if profiler.checking:
+            app.exit(code)
 
+    call_after_first_paint(window, on_first_paint)
     sys.exit(app.exec())
 
 
@@ -1,21 +1,44 @@
+import os
+import threading
+from typing import Callable
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QHBoxLayout, QSplitter,
                              QMessageBox, QStatusBar, QTabWidget, QVBoxLayout,
-                             QPushButton, QLabel)
-from PyQt6.QtCore import Qt
+                             QPushButton, QLabel, QMenu, QFileDialog, QApplication, QInputDialog)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor
 from database import DatabaseManager
 from host_list_widget import HostListWidget
 from host_dialog import HostDialog
+from batch_panel import BatchRunPanel
+from replay_panel import ReplayPanel
+from broadcast import InputBroadcaster
 from terminal_widget import TerminalWidget
 from ssh_client import SSHClient
+from session_recorder import (RECORD_ALL, RECORDINGS_DIR, SessionRecorder, get_recording_writer,
+                              recording_path)
+from transport_pool import get_transport_pool
 
 
 class SSHTerminalTab(QWidget):
     """SSH终端标签页"""
 
-    def __init__(self, host_data: dict):
+    # 重连前恢复终端的本地状态：退出备用屏、取消滚动区域和各种模式，旧会话中的全屏程序不会残留
+    RESET_SESSION_MODES = "\x1b[?1049l\x1b7\x1b[r\x1b8\x1b[0m\x1b[?1l\x1b[?2004l\x1b[4l\x1b[?25h"
+
+    # 端口转发状态的刷新间隔（毫秒）
+    FORWARD_REFRESH_INTERVAL = 1000
+
+    def __init__(self, host_data, get_password: Callable[[int], str] = None,
+                 broadcaster: InputBroadcaster = None, get_forwards: Callable[[int], list] = None):
         super().__init__()
         self.host_data = host_data
+        self.get_password = get_password
+        self.broadcaster = broadcaster
+        self.get_forwards = get_forwards
         self.ssh_client = SSHClient()
+        self.ssh_client.bracketed_paste = lambda: self.terminal.screen.bracketed_paste
+        self.recorder = None
+        self.forwarder = None
         self.setup_ui()
         self.connect_signals()
 
@@ -29,63 +52,241 @@ class SSHTerminalTab(QWidget):
         info_layout.addWidget(self.status_label)
         info_layout.addStretch()
 
+        self.recording_label = QLabel("● 录制中")
+        self.recording_label.setStyleSheet("color: #d32f2f;")
+        self.recording_label.setVisible(False)
+        info_layout.addWidget(self.recording_label)
+
+        self.forward_label = QLabel()
+        self.forward_label.setVisible(False)
+        info_layout.addWidget(self.forward_label)
+
+        self.sftp_button = QPushButton("文件传输")
+        self.sftp_button.setCheckable(True)
+        self.sftp_button.toggled.connect(self.toggle_sftp_panel)
+        info_layout.addWidget(self.sftp_button)
+
         self.disconnect_button = QPushButton("断开连接")
         self.disconnect_button.clicked.connect(self.disconnect)
         info_layout.addWidget(self.disconnect_button)
 
         layout.addLayout(info_layout)
 
+        # 文件传输面板在第一次打开时创建，位于终端下方
+        self.splitter = QSplitter(Qt.Orientation.Vertical)
         self.terminal = TerminalWidget()
-        layout.addWidget(self.terminal)
+        self.splitter.addWidget(self.terminal)
+        self.sftp_panel = None
+        layout.addWidget(self.splitter)
 
         self.setLayout(layout)
 
+        self.forward_timer = QTimer(self)
+        self.forward_timer.setInterval(self.FORWARD_REFRESH_INTERVAL)
+        self.forward_timer.timeout.connect(self.update_forward_status)
+
     def connect_signals(self):
         """连接信号"""
-        self.terminal.command_entered.connect(self.ssh_client.send_command)
+        self.terminal.command_entered.connect(self.send_input)
+        self.terminal.paste_requested.connect(self.send_paste)
+        self.terminal.reply_ready.connect(self.ssh_client.send_command)
+        self.ssh_client.paste_progress.connect(self.on_paste_progress)
+        self.terminal.size_changed.connect(self.ssh_client.resize_terminal)
         self.ssh_client.output_received.connect(self.terminal.append_output)
         self.ssh_client.connection_error.connect(self.on_connection_error)
         self.ssh_client.connection_closed.connect(self.on_connection_closed)
+        self.ssh_client.connect_progress.connect(self.on_connect_progress)
+        self.ssh_client.connected.connect(self.on_connected)
+        self.ssh_client.reconnecting.connect(self.on_reconnecting)
 
     def connect_ssh(self):
-        """连接SSH"""
-        success = self.ssh_client.connect(
+        """在后台建立SSH连接，界面不被阻塞"""
+        self.ssh_client.resize_terminal(self.terminal.screen.cols, self.terminal.screen.rows)
+        self.disconnect_button.setText("取消连接")
+        auth_type = self.host_data.get('auth_type', 'password')
+        password = self.host_data.get('password') or ''
+        if not password and auth_type == 'password' and self.get_password:
+            # 密码只在连接时解密，不随主机记录保存在界面对象中
+            password = self.get_password(self.host_data['id'])
+        self.ssh_client.connect_async(
             host=self.host_data['host'],
             port=self.host_data['port'],
             username=self.host_data['username'],
-            password=self.host_data.get('password', ''),
-            auth_type=self.host_data.get('auth_type', 'password'),
+            password=password,
+            auth_type=auth_type,
             private_key_path=self.host_data.get('private_key_path', '')
         )
 
-        if success:
-            self.status_label.setText(f"已连接到 {self.host_data['name']} ({self.host_data['host']})")
+    @property
+    def broadcasting(self) -> bool:
+        return self.broadcaster is not None and self.ssh_client in self.broadcaster
+
+    def send_input(self, data: bytes):
+        """键盘输入：本会话在广播中时发给所有广播会话"""
+        if self.broadcasting:
+            self.broadcaster.send(data)
+        else:
+            self.ssh_client.send_command(data)
+
+    def send_paste(self, data: bytes, bracketed: bool):
+        """粘贴：本会话在广播中时发给所有广播会话"""
+        if self.broadcasting:
+            self.broadcaster.paste(data, bracketed)
         else:
-            self.status_label.setText(f"连接失败: {self.host_data['name']}")
+            self.ssh_client.send_paste(data, bracketed)
 
     def disconnect(self):
-        """断开连接"""
+        """断开连接（连接中则取消）"""
         self.ssh_client.disconnect()
 
+    def toggle_sftp_panel(self, visible: bool):
+        """显示或隐藏文件传输面板（隐藏时传输继续进行）"""
+        if self.sftp_panel is None:
+            if not visible:
+                return
+            from sftp_panel import SFTPPanel
+
+            host = self.host_data
+            self.sftp_panel = SFTPPanel(self.sftp_transport, f"{host['username']}@{host['host']}:{host['port']}")
+            self.splitter.addWidget(self.sftp_panel)
+            self.splitter.setSizes([self.height() * 3 // 5, self.height() * 2 // 5])
+        self.sftp_panel.setVisible(visible)
+
+    def sftp_transport(self):
+        """文件传输使用会话的已认证连接（重连后为新的连接）"""
+        lease = self.ssh_client.lease
+        if lease is None or not lease.is_active():
+            raise ConnectionError("会话未连接")
+        return lease.transport
+
+    def close_sftp(self):
+        """关闭文件传输面板，取消进行中的传输"""
+        if self.sftp_panel is not None:
+            self.sftp_panel.close_panel()
+
+    def start_forwards(self):
+        """连接成功后启动主机的端口转发：本地监听只在第一次连接时建立，
+        远程转发在每次（重新）连接后于后台线程中向服务器请求"""
+        if self.forwarder is None:
+            host_id = self.host_data.get('id')
+            if self.get_forwards is None or host_id is None:
+                return
+            forwards = self.get_forwards(host_id)
+            if not forwards:
+                return
+            from port_forward import ForwardSpec, PortForwarder
+
+            self.forwarder = PortForwarder([ForwardSpec.from_dict(forward) for forward in forwards],
+                                           self.sftp_transport)
+            self.forwarder.start()
+            self.forward_label.setVisible(True)
+            self.forward_timer.start()
+        threading.Thread(target=self.forwarder.attach, daemon=True).start()
+        self.update_forward_status()
+
+    def stop_forwards(self):
+        """停止端口转发，断开所有转发连接"""
+        forwarder, self.forwarder = self.forwarder, None
+        if forwarder is None:
+            return
+        forwarder.stop()
+        self.forward_timer.stop()
+        self.forward_label.setVisible(False)
+
+    def update_forward_status(self):
+        if self.forwarder is None:
+            return
+        self.forward_label.setText(self.forwarder.summary())
+        self.forward_label.setStyleSheet("color: #d32f2f;" if self.forwarder.failed else "")
+        self.forward_label.setToolTip('\n'.join(forward.describe() for forward in self.forwarder.forwards))
+
+    @property
+    def recording(self) -> bool:
+        return self.recorder is not None
+
+    def start_recording(self):
+        """开始录制本会话；主机设置为录制输入时同时记录键盘输入"""
+        if self.recorder is not None:
+            return
+        name = self.host_data['name']
+        self.recorder = SessionRecorder(
+            recording_path(name), self.terminal.screen.cols, self.terminal.screen.rows,
+            record_input=self.host_data.get('recording') == RECORD_ALL,
+            title=f"{name} ({self.host_data['username']}@{self.host_data['host']})")
+        self.ssh_client.recorder = self.recorder
+        self.recording_label.setToolTip(self.recorder.path)
+        self.recording_label.setVisible(True)
+
+    def stop_recording(self):
+        """结束录制，剩余数据在后台写入文件"""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return
+        self.ssh_client.recorder = None
+        recorder.close()
+        self.recording_label.setVisible(False)
+
+    def on_connect_progress(self, message: str):
+        """连接进度"""
+        self.status_label.setText(f"{self.host_data['name']}: {message}")
+
+    def on_paste_progress(self, sent: int, total: int):
+        """粘贴进度，total 为0表示已发完或已取消"""
+        if total:
+            self.status_label.setText(f"正在粘贴 {sent * 100 // total}% ({sent}/{total} 字节)，Ctrl+C 取消")
+        else:
+            self.status_label.setText(f"已连接到 {self.host_data['name']} ({self.host_data['host']})")
+
+    def on_connected(self):
+        """连接成功，主机设置了会话录制时开始录制（重连后继续写入同一个录制）"""
+        if self.host_data.get('recording') and self.recorder is None:
+            self.start_recording()
+        self.disconnect_button.setText("断开连接")
+        self.status_label.setText(f"已连接到 {self.host_data['name']} ({self.host_data['host']})")
+        self.start_forwards()
+
+    def on_reconnecting(self, attempt: int, delay: float):
+        """连接中断，正在自动重连"""
+        self.disconnect_button.setText("停止重连")
+        wait = f"，{delay:.0f} 秒后" if delay else ""
+        self.status_label.setText(f"{self.host_data['name']}: 连接中断{wait}第 {attempt} 次重连...")
+        if attempt == 1:
+            if self.recorder is not None:
+                self.recorder.marker("连接中断")
+            self.terminal.append_output(self.RESET_SESSION_MODES + "\r\n\r\n[连接中断，正在重新连接]\r\n")
+
     def on_connection_error(self, error: str):
         """连接错误"""
+        if not self.ssh_client.is_connected:
+            self.stop_recording()
+            self.stop_forwards()
+        self.disconnect_button.setText("断开连接")
         self.status_label.setText(f"错误: {error}")
-        self.terminal.append_output(f"\n\n[错误] {error}\n")
+        self.terminal.append_output(f"\r\n\r\n[错误] {error}\r\n")
 
     def on_connection_closed(self):
         """连接关闭"""
+        self.stop_recording()
+        self.stop_forwards()
+        self.disconnect_button.setText("断开连接")
         self.status_label.setText(f"已断开连接: {self.host_data['name']}")
-        self.terminal.append_output("\n\n[连接已关闭]\n")
+        self.terminal.append_output("\r\n\r\n[连接已关闭]\r\n")
 
 
 class MainWindow(QMainWindow):
     """主窗口"""
 
+    # 后台线程打开数据库后发出，参数为 DatabaseManager 或打开时的异常
+    database_opened = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
-        self.db = DatabaseManager()
+        # 数据库在窗口首次绘制后由 open_database() 在后台线程中打开，窗口不必等待数据库和主机列表
+        self.db = None
+        self._opening_database = False
+        self._on_database_ready = None
+        self.broadcaster = InputBroadcaster(self)
         self.setup_ui()
-        self.load_hosts()
 
     def setup_ui(self):
         """设置UI"""
@@ -108,6 +309,9 @@ class MainWindow(QMainWindow):
         self.terminal_tabs = QTabWidget()
         self.terminal_tabs.setTabsClosable(True)
         self.terminal_tabs.tabCloseRequested.connect(self.close_terminal_tab)
+        tab_bar = self.terminal_tabs.tabBar()
+        tab_bar.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        tab_bar.customContextMenuRequested.connect(self._show_tab_context_menu)
         splitter.addWidget(self.terminal_tabs)
 
         splitter.setStretchFactor(0, 1)
@@ -116,44 +320,105 @@ class MainWindow(QMainWindow):
         layout.addWidget(splitter)
         central_widget.setLayout(layout)
 
-        self.statusBar().showMessage("就绪")
+        self.host_list_widget.setEnabled(False)
+        self.statusBar().showMessage("正在加载主机...")
 
         self.connect_signals()
 
     def connect_signals(self):
         """连接信号"""
         self.host_list_widget.host_double_clicked.connect(self.connect_to_host)
+        self.host_list_widget.connect_selected_clicked.connect(self.connect_to_hosts)
         self.host_list_widget.add_host_clicked.connect(self.add_host)
         self.host_list_widget.edit_host_clicked.connect(self.edit_host)
         self.host_list_widget.delete_host_clicked.connect(self.delete_host)
+        self.host_list_widget.delete_selected_clicked.connect(self.delete_hosts)
+        self.host_list_widget.import_hosts_clicked.connect(self.import_hosts)
+        self.host_list_widget.replay_clicked.connect(self.open_replay)
+        self.host_list_widget.move_hosts_requested.connect(self.move_hosts)
+        self.host_list_widget.create_group_requested.connect(self.create_group)
+        self.host_list_widget.rename_group_requested.connect(self.rename_group)
+        self.host_list_widget.delete_group_requested.connect(self.delete_group)
+        self.host_list_widget.batch_run_requested.connect(self.open_batch_tab)
+        self.host_list_widget.group_batch_run_requested.connect(self.open_group_batch_tab)
+        self.broadcaster.target_dropped.connect(self.on_broadcast_target_dropped)
+        self.broadcaster.targets_changed.connect(self.update_broadcast_marks)
+        self.database_opened.connect(self._on_database_opened)
+
+    def open_database(self, on_ready: Callable[[], None] = None):
+        """在窗口首次绘制之后调用：后台线程打开数据库（可能需要恢复WAL、升级表结构或重建索引），
+        完成后回到GUI线程接入并加载主机列表，再调用 on_ready"""
+        if self.db is not None or self._opening_database:
+            return
+        self._opening_database = True
+        self._on_database_ready = on_ready
+        threading.Thread(target=self._open_database_worker, daemon=True).start()
+
+    def _open_database_worker(self):
+        try:
+            db = DatabaseManager()
+        except Exception as e:
+            db = e
+        self.database_opened.emit(db)
+
+    def _on_database_opened(self, db):
+        self._opening_database = False
+        if isinstance(db, Exception):
+            self.statusBar().showMessage("打开数据库失败")
+            QMessageBox.critical(self, "错误", f"打开数据库失败: {str(db)}")
+        else:
+            self.db = db
+            self.host_list_widget.set_source(db)
+            db.add_listener(self.on_host_changed)
+            self.load_hosts()
+        on_ready, self._on_database_ready = self._on_database_ready, None
+        if on_ready is not None:
+            on_ready()
 
     def load_hosts(self):
-        """加载主机列表"""
-        hosts = self.db.get_all_hosts()
-        self.host_list_widget.load_hosts(hosts)
-        self.statusBar().showMessage(f"已加载 {len(hosts)} 个主机")
+        """加载主机列表（只读取分组，主机在展开分组时按需读取）"""
+        self.host_list_widget.reload()
+        self.host_list_widget.setEnabled(True)
+        self.statusBar().showMessage(f"共 {self.db.count_hosts()} 个主机")
+
+    def on_host_changed(self, event: str, host_id: int):
+        """数据库中单个主机变更后，只更新列表中对应的行"""
+        if event in ('reset', 'groups'):
+            self.load_hosts()
+            return
+        if event == 'deleted':
+            self.host_list_widget.host_removed(host_id)
+            return
+        record = self.db.get_host_record(host_id)
+        if record is None:
+            return
+        if event == 'added':
+            self.host_list_widget.host_added(record)
+        else:
+            self.host_list_widget.host_updated(record)
 
     def add_host(self):
         """添加主机"""
-        dialog = HostDialog(self)
+        dialog = HostDialog(self, groups=self.db.get_group_paths())
         if dialog.exec():
             host_data = dialog.get_host_data()
             try:
                 self.db.add_host(**host_data)
-                self.load_hosts()
                 QMessageBox.information(self, "成功", "主机已添加")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"添加主机失败: {str(e)}")
 
-    def edit_host(self, host_data: dict):
+    def edit_host(self, host_data):
         """编辑主机"""
-        dialog = HostDialog(self, host_data)
+        host_data = self.db.get_host(host_data['id'])
+        if host_data is None:
+            return
+        dialog = HostDialog(self, host_data, self.db.get_group_paths())
         if dialog.exec():
             updated_data = dialog.get_host_data()
             try:
                 host_id = updated_data.pop('id', host_data['id'])
                 self.db.update_host(host_id, **updated_data)
-                self.load_hosts()
                 QMessageBox.information(self, "成功", "主机已更新")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"更新主机失败: {str(e)}")
@@ -169,12 +434,95 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             try:
                 self.db.delete_host(host_id)
-                self.load_hosts()
                 QMessageBox.information(self, "成功", "主机已删除")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"删除主机失败: {str(e)}")
 
-    def connect_to_host(self, host_data: dict):
+    def delete_hosts(self, host_ids: list):
+        """删除多个主机"""
+        reply = QMessageBox.question(
+            self, "确认删除",
+            f"确定要删除所选的 {len(host_ids)} 个主机吗？",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+
+        if reply == QMessageBox.StandardButton.Yes:
+            try:
+                count = self.db.delete_hosts(host_ids)
+                self.statusBar().showMessage(f"已删除 {count} 个主机")
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"删除主机失败: {str(e)}")
+
+    def move_hosts(self, host_ids: list, group_id):
+        """把主机移到分组"""
+        try:
+            count = self.db.move_hosts(host_ids, group_id)
+            self.statusBar().showMessage(f"已移动 {count} 个主机")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"移动主机失败: {str(e)}")
+
+    def create_group(self, parent_id):
+        """新建分组，parent_id 为None时创建顶级分组"""
+        name, ok = QInputDialog.getText(self, "新建分组", "分组名称:")
+        if ok and name.strip():
+            try:
+                self.db.add_group(name.strip(), parent_id)
+            except ValueError as e:
+                QMessageBox.critical(self, "错误", str(e))
+
+    def rename_group(self, group_id: int):
+        """重命名分组"""
+        current = next((name for gid, name, _, _ in self.db.get_groups() if gid == group_id), "")
+        name, ok = QInputDialog.getText(self, "重命名分组", "分组名称:", text=current)
+        if ok and name.strip() and name.strip() != current:
+            try:
+                self.db.rename_group(group_id, name.strip())
+            except ValueError as e:
+                QMessageBox.critical(self, "错误", str(e))
+
+    def delete_group(self, group_id: int):
+        """删除分组，其中的主机移到上一级"""
+        reply = QMessageBox.question(
+            self, "确认删除",
+            "确定要删除这个分组及其子分组吗？其中的主机会移到上一级分组。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply == QMessageBox.StandardButton.Yes:
+            self.db.delete_group(group_id)
+
+    def import_hosts(self):
+        """从 ssh_config / CSV / JSON 清单批量导入主机"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "导入主机", os.path.join(os.path.expanduser("~"), ".ssh"),
+            "所有支持的文件 (config *.conf *.csv *.json *.jsonl);;"
+            "SSH配置 (config *.conf);;CSV (*.csv);;JSON (*.json *.jsonl);;所有文件 (*)")
+        if not path:
+            return
+
+        from host_import import read_inventory
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            count = self.db.add_hosts(read_inventory(path), skip_existing=True)
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(self, "错误", f"导入主机失败: {str(e)}")
+            return
+        QApplication.restoreOverrideCursor()
+        QMessageBox.information(self, "导入完成", f"已导入 {count} 个主机（已存在的主机被跳过）")
+
+    def open_replay(self):
+        """选择录制文件并在新标签页中回放"""
+        directory = RECORDINGS_DIR if os.path.isdir(RECORDINGS_DIR) else ""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "回放录制", directory, "会话录制 (*.cast *.cast.gz);;所有文件 (*)")
+        if not path:
+            return
+        panel = ReplayPanel(path)
+        index = self.terminal_tabs.addTab(panel, f"回放: {os.path.basename(path)}")
+        self.terminal_tabs.setCurrentIndex(index)
+
+    def connect_to_host(self, host_data):
         """连接到主机"""
         tab_name = f"{host_data['name']}"
 
@@ -183,7 +531,11 @@ class MainWindow(QMainWindow):
                 self.terminal_tabs.setCurrentIndex(i)
                 return
 
-        terminal_tab = SSHTerminalTab(host_data)
+        self.open_terminal_tab(host_data, tab_name)
+
+    def open_terminal_tab(self, host_data, tab_name: str):
+        """新建终端标签页并开始连接"""
+        terminal_tab = SSHTerminalTab(host_data, self.db.get_credentials, self.broadcaster, self.db.get_forwards)
         index = self.terminal_tabs.addTab(terminal_tab, tab_name)
         self.terminal_tabs.setCurrentIndex(index)
 
@@ -191,11 +543,129 @@ class MainWindow(QMainWindow):
 
         self.statusBar().showMessage(f"正在连接到 {host_data['name']}...")
 
+    def open_batch_tab(self, hosts: list, title: str = ""):
+        """打开批量执行标签页"""
+        if not hosts:
+            return
+        panel = BatchRunPanel(hosts, self.db.get_credentials, title)
+        tab_name = f"批量执行: {title}" if title else (
+            f"批量执行 ({len(hosts)})" if len(hosts) > 1 else f"执行: {hosts[0]['name']}")
+        index = self.terminal_tabs.addTab(panel, tab_name)
+        self.terminal_tabs.setCurrentIndex(index)
+        panel.command_input.setFocus()
+
+    def open_group_batch_tab(self, group_id: int):
+        """在分组（含子分组）的所有主机上批量执行"""
+        hosts = self.db.get_subtree_hosts(group_id)
+        if not hosts:
+            self.statusBar().showMessage("分组中没有主机")
+            return
+        title = dict(self.db.get_group_paths()).get(group_id, "")
+        self.open_batch_tab(hosts, title)
+
+    def duplicate_tab(self, index: int):
+        """在同一主机上再开一个终端，已认证的连接会被复用"""
+        widget = self.terminal_tabs.widget(index)
+        if not isinstance(widget, SSHTerminalTab):
+            return
+        self.open_terminal_tab(widget.host_data, self._unique_tab_name(widget.host_data['name']))
+
+    def _unique_tab_name(self, name: str) -> str:
+        """生成不与现有标签重名的标题：name (2)、name (3)…"""
+        names = {self.terminal_tabs.tabText(i) for i in range(self.terminal_tabs.count())}
+        n = 2
+        while f"{name} ({n})" in names:
+            n += 1
+        return f"{name} ({n})"
+
+    def _show_tab_context_menu(self, pos):
+        """标签页右键菜单"""
+        tab_bar = self.terminal_tabs.tabBar()
+        index = tab_bar.tabAt(pos)
+        if index < 0:
+            return
+
+        widget = self.terminal_tabs.widget(index)
+        is_terminal = isinstance(widget, SSHTerminalTab)
+        menu = QMenu(self)
+        duplicate_action = menu.addAction("复制标签页") if is_terminal else None
+        broadcast_action = broadcast_all_action = stop_broadcast_action = record_action = None
+        if is_terminal:
+            record_action = menu.addAction("停止录制" if widget.recording else "开始录制")
+            record_action.setEnabled(widget.recording or widget.ssh_client.is_connected)
+            menu.addSeparator()
+            broadcast_action = menu.addAction("移出广播" if widget.broadcasting else "加入广播")
+            broadcast_all_action = menu.addAction("广播到所有终端")
+            if len(self.broadcaster):
+                stop_broadcast_action = menu.addAction(f"停止广播 ({len(self.broadcaster)})")
+            menu.addSeparator()
+        close_action = menu.addAction("关闭")
+
+        action = menu.exec(tab_bar.mapToGlobal(pos))
+
+        if action is None:
+            return
+        if action == duplicate_action:
+            self.duplicate_tab(index)
+        elif action == broadcast_action:
+            if widget.broadcasting:
+                self.broadcaster.remove(widget.ssh_client)
+            else:
+                self.broadcaster.add(widget.ssh_client)
+        elif action == broadcast_all_action:
+            for tab in self._terminal_tabs():
+                self.broadcaster.add(tab.ssh_client)
+        elif action == stop_broadcast_action:
+            self.broadcaster.clear()
+        elif action == record_action:
+            if widget.recording:
+                widget.stop_recording()
+            else:
+                widget.start_recording()
+                self.statusBar().showMessage(f"正在录制到 {widget.recorder.path}")
+        elif action == close_action:
+            self.close_terminal_tab(index)
+
+    def _terminal_tabs(self) -> list:
+        return [widget for widget in map(self.terminal_tabs.widget, range(self.terminal_tabs.count()))
+                if isinstance(widget, SSHTerminalTab)]
+
+    def update_broadcast_marks(self, count: int = 0):
+        """广播中的标签页标题显示为橙色"""
+        tab_bar = self.terminal_tabs.tabBar()
+        for i in range(self.terminal_tabs.count()):
+            widget = self.terminal_tabs.widget(i)
+            broadcasting = isinstance(widget, SSHTerminalTab) and widget.broadcasting
+            tab_bar.setTabTextColor(i, QColor("#ef6c00") if broadcasting else QColor())
+        if count:
+            self.statusBar().showMessage(f"广播输入: 在橙色标签页中的输入会发送到全部 {count} 个会话")
+        else:
+            self.statusBar().showMessage("广播已停止")
+
+    def on_broadcast_target_dropped(self, client):
+        """会话积压过多未发送的输入，已被移出广播"""
+        name = next((tab.host_data['name'] for tab in self._terminal_tabs() if tab.ssh_client is client), "")
+        self.statusBar().showMessage(f"{name} 响应过慢，已移出广播")
+
+    def connect_to_hosts(self, hosts: list):
+        """同时连接多个主机，各连接在后台并行建立"""
+        for host_data in hosts:
+            self.connect_to_host(host_data)
+        if len(hosts) > 1:
+            self.statusBar().showMessage(f"正在连接 {len(hosts)} 个主机...")
+
     def close_terminal_tab(self, index: int):
         """关闭终端标签页"""
         widget = self.terminal_tabs.widget(index)
         if isinstance(widget, SSHTerminalTab):
+            self.broadcaster.remove(widget.ssh_client)
+            widget.close_sftp()
+            widget.stop_forwards()
             widget.disconnect()
+        elif isinstance(widget, BatchRunPanel):
+            widget.cancel()
+        elif isinstance(widget, ReplayPanel):
+            widget.close_replay()
         self.terminal_tabs.removeTab(index)
 
     def closeEvent(self, event):
@@ -203,7 +673,17 @@ class MainWindow(QMainWindow):
         for i in range(self.terminal_tabs.count()):
             widget = self.terminal_tabs.widget(i)
             if isinstance(widget, SSHTerminalTab):
+                widget.close_sftp()
+                widget.stop_forwards()
                 widget.disconnect()
-
-        self.db.close()
+            elif isinstance(widget, BatchRunPanel):
+                widget.cancel()
+            elif isinstance(widget, ReplayPanel):
+                widget.close_replay()
+
+        get_transport_pool().close_all()
+        # 等待录制的剩余数据写入文件
+        get_recording_writer().close_all()
+        if self.db is not None:
+            self.db.close()
         event.accept()
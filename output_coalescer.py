@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import deque
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+
+class OutputCoalescer(QObject):
+    """输出合并器
+
+    I/O线程收到的数据先在这里累积，再按显示帧率批量交给终端，
+    每帧最多投递 chunk_size 字节，并根据终端处理耗时自动调整。
+    积压超过 HIGH_WATER 时调用 on_pause 暂停读取通道，SSH通道窗口随之让远端停止发送；
+    投递到 LOW_WATER 以下时调用 on_resume 恢复。积压有上限，内存不会无限增长，
+    Ctrl+C 之后的输出也不必排在大量旧输出之后。
+    """
+
+    output_ready = pyqtSignal(bytes)
+    _wake = pyqtSignal()
+
+    DEFAULT_FPS = 60
+    MIN_CHUNK = 16 * 1024
+    MAX_CHUNK = 4 * 1024 * 1024
+    INITIAL_CHUNK = 256 * 1024
+    HIGH_WATER = 1024 * 1024
+    LOW_WATER = 256 * 1024
+
+    def __init__(self, fps: int = DEFAULT_FPS, parent: QObject = None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._pending_len = 0
+        self._scheduled = False
+        self._last_flush = 0.0
+        self.chunk_size = self.INITIAL_CHUNK
+        self.paused = False
+        # 暂停/恢复读取的回调，在持有锁时调用以保证先后顺序，不能回调本对象
+        self.on_pause = None
+        self.on_resume = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._flush_frame)
+        self._wake.connect(self._schedule, Qt.ConnectionType.QueuedConnection)
+        self.set_fps(fps)
+
+    def set_fps(self, fps: int):
+        """设置最大投递帧率"""
+        self.fps = max(1, int(fps))
+        self._interval = 1.0 / self.fps
+
+    def feed(self, data: bytes):
+        """追加数据，可在任意线程调用"""
+        if not data:
+            return
+        with self._lock:
+            self._pending.append(data)
+            self._pending_len += len(data)
+            if self._pending_len >= self.HIGH_WATER and not self.paused and self.on_pause is not None:
+                self.paused = True
+                self.on_pause()
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._wake.emit()
+
+    def flush(self):
+        """立即投递全部挂起数据（GUI线程）"""
+        self._timer.stop()
+        with self._lock:
+            data = b''.join(self._pending)
+            self._pending.clear()
+            self._pending_len = 0
+            self._scheduled = False
+            self._check_resume()
+        if data:
+            self._last_flush = time.monotonic()
+            self.output_ready.emit(data)
+
+    def _schedule(self):
+        """空闲后的首批数据若已过一帧则立即投递，保证按键回显不被延迟"""
+        if self._timer.isActive():
+            return
+        wait = self._interval - (time.monotonic() - self._last_flush)
+        self._timer.start(max(0, int(wait * 1000)))
+
+    def _take(self) -> bytes:
+        parts = []
+        size = 0
+        with self._lock:
+            while self._pending and size < self.chunk_size:
+                piece = self._pending.popleft()
+                room = self.chunk_size - size
+                if len(piece) > room:
+                    self._pending.appendleft(piece[room:])
+                    piece = piece[:room]
+                parts.append(piece)
+                size += len(piece)
+            self._pending_len -= size
+            self._check_resume()
+        return b''.join(parts)
+
+    def _check_resume(self):
+        if self.paused and self._pending_len <= self.LOW_WATER:
+            self.paused = False
+            if self.on_resume is not None:
+                self.on_resume()
+
+    def _flush_frame(self):
+        """投递一帧数据，并根据耗时调整下一帧的块大小"""
+        chunk = self._take()
+        if chunk:
+            start = time.monotonic()
+            self.output_ready.emit(chunk)
+            self._last_flush = time.monotonic()
+            self._adapt(self._last_flush - start, len(chunk))
+
+        with self._lock:
+            if not self._pending_len:
+                self._scheduled = False
+                return
+        self._timer.start(max(1, int(self._interval * 1000)))
+
+    def _adapt(self, elapsed: float, size: int):
+        """处理超过半帧则减半，远低于预算且数据已积压则加倍"""
+        budget = self._interval / 2
+        if elapsed > budget:
+            self.chunk_size = max(self.MIN_CHUNK, self.chunk_size // 2)
+        elif elapsed < budget / 2 and size >= self.chunk_size:
+            self.chunk_size = min(self.MAX_CHUNK, self.chunk_size * 2)
@@ -0,0 +1,752 @@
+import heapq
+import itertools
+import selectors
+import socket
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+from keepalive import global_request_lock
+
+
+LOCAL = 'L'
+REMOTE = 'R'
+DYNAMIC = 'D'
+
+# 本地监听的默认地址，与 ssh 一样只接受本机连接
+DEFAULT_BIND_ADDRESS = "127.0.0.1"
+
+# 每个方向缓冲的最大字节数，达到后暂停读取该方向的来源，由对端的窗口或TCP流量控制自然反压
+BUFFER_SIZE = 256 * 1024
+
+# 单次从套接字或通道读取的字节数
+READ_SIZE = 64 * 1024
+
+# 单次写入通道的字节数（SSH数据包的上限）
+SEND_SIZE = 32 * 1024
+
+# 有数据等待通道发送窗口时的轮询间隔（秒）：SSH通道的窗口打开没有对应的fd事件
+WRITE_POLL_INTERVAL = 0.01
+
+# 打开转发通道或连接本地目标的线程数，以及单次打开的超时（秒）；数据转发不占用这些线程
+OPEN_WORKERS = 8
+OPEN_TIMEOUT = 15.0
+
+# 监听套接字的连接队列长度
+LISTEN_BACKLOG = 128
+
+# 接受连接出错（如文件描述符用尽）后暂停监听的秒数，期间新连接留在连接队列中
+ACCEPT_RETRY_DELAY = 1.0
+
+# SOCKS5 握手阶段最多缓冲的字节数
+_SOCKS_MAX_REQUEST = 1024
+
+# 转发状态
+STOPPED = 'stopped'
+STARTING = 'starting'
+ACTIVE = 'active'
+FAILED = 'failed'
+
+
+class ForwardSpec:
+    """一条转发的配置，文本格式与 ssh 的 -L / -R / -D 参数相同：
+
+        L [绑定地址:]端口:目标主机:目标端口   本地端口经远程主机连接到目标
+        R [绑定地址:]端口:目标主机:目标端口   远程主机上的端口经本机连接到目标
+        D [绑定地址:]端口                    本地 SOCKS5 代理，经远程主机连接任意目标
+
+    IPv6 地址写在方括号中，例如 L [::1]:8080:db:5432。
+    """
+
+    __slots__ = ('kind', 'bind_address', 'bind_port', 'dest_host', 'dest_port')
+
+    def __init__(self, kind: str, bind_port: int, dest_host: str = "", dest_port: int = 0,
+                 bind_address: str = ""):
+        self.kind = kind
+        self.bind_address = bind_address
+        self.bind_port = bind_port
+        self.dest_host = dest_host
+        self.dest_port = dest_port
+
+    @classmethod
+    def parse(cls, text: str) -> 'ForwardSpec':
+        """解析一行转发配置，格式错误时抛出 ValueError"""
+        parts = text.split(None, 1)
+        if len(parts) != 2 or parts[0].lstrip('-').upper() not in (LOCAL, REMOTE, DYNAMIC):
+            raise ValueError(f"无法识别的转发: {text.strip()}（应以 L、R 或 D 开头）")
+        kind = parts[0].lstrip('-').upper()
+        fields = _split_address(parts[1].strip())
+        if kind == DYNAMIC:
+            if len(fields) not in (1, 2):
+                raise ValueError(f"动态转发的格式为 D [绑定地址:]端口: {text.strip()}")
+            return cls(kind, _port(fields[-1]), bind_address=fields[0] if len(fields) == 2 else "")
+        if len(fields) not in (3, 4) or not fields[-2]:
+            raise ValueError(f"转发的格式为 {kind} [绑定地址:]端口:目标主机:目标端口: {text.strip()}")
+        bind_address = fields[0] if len(fields) == 4 else ""
+        return cls(kind, _port(fields[-3], allow_zero=kind == REMOTE), fields[-2], _port(fields[-1]), bind_address)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ForwardSpec':
+        return cls(data['kind'], data['bind_port'], data.get('dest_host') or "", data.get('dest_port') or 0,
+                   data.get('bind_address') or "")
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @property
+    def listen_address(self) -> str:
+        """实际绑定的地址：本地监听默认只绑定本机；远程转发留空时由服务器决定"""
+        if self.kind == REMOTE:
+            return self.bind_address
+        return self.bind_address or DEFAULT_BIND_ADDRESS
+
+    def __str__(self) -> str:
+        bind = f"{_join_host(self.bind_address)}:{self.bind_port}" if self.bind_address else str(self.bind_port)
+        if self.kind == DYNAMIC:
+            return f"{self.kind} {bind}"
+        return f"{self.kind} {bind}:{_join_host(self.dest_host)}:{self.dest_port}"
+
+    def __repr__(self) -> str:
+        return f"ForwardSpec({str(self)!r})"
+
+
+def parse_forwards(text: str) -> List[ForwardSpec]:
+    """解析多行转发配置（空行和 # 开头的行被忽略）"""
+    return [ForwardSpec.parse(line) for line in text.splitlines() if line.strip() and not line.strip().startswith('#')]
+
+
+def _split_address(text: str) -> List[str]:
+    """按冒号分割，方括号中的 IPv6 地址作为整体"""
+    fields = []
+    while text:
+        if text.startswith('['):
+            end = text.find(']')
+            if end < 0:
+                raise ValueError(f"缺少右方括号: {text}")
+            fields.append(text[1:end])
+            text = text[end + 1:]
+            if text and not text.startswith(':'):
+                raise ValueError(f"方括号后应为冒号: {text}")
+            text = text[1:]
+        else:
+            field, _, text = text.partition(':')
+            fields.append(field)
+    return fields
+
+
+def _join_host(host: str) -> str:
+    return f"[{host}]" if ':' in host else host
+
+
+def _port(text: str, allow_zero: bool = False) -> int:
+    try:
+        port = int(text)
+    except ValueError:
+        raise ValueError(f"无效的端口: {text}") from None
+    if not (0 if allow_zero else 1) <= port <= 65535:
+        raise ValueError(f"端口超出范围: {text}")
+    return port
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class Forward:
+    """一条正在运行的转发及其计数；计数只由转发线程修改，界面直接读取"""
+
+    def __init__(self, spec: ForwardSpec, get_transport: Callable[[], object]):
+        self.spec = spec
+        self.get_transport = get_transport
+        self.status = STOPPED
+        self.error = ''
+        # 当前连接数、累计连接数、打开失败的连接数
+        self.active = 0
+        self.connections = 0
+        self.failures = 0
+        # 本地 → 远程、远程 → 本地 的字节数
+        self.sent = 0
+        self.received = 0
+        self.listener = None
+        self.remote = None
+        self.tunnels = set()
+
+    @property
+    def stopped(self) -> bool:
+        return self.status in (STOPPED, FAILED)
+
+    def describe(self) -> str:
+        spec = self.spec
+        if spec.kind == DYNAMIC:
+            route = f"SOCKS5 {_join_host(spec.listen_address)}:{spec.bind_port}"
+        elif spec.kind == LOCAL:
+            route = f"本地 {_join_host(spec.listen_address)}:{spec.bind_port} → {_join_host(spec.dest_host)}:{spec.dest_port}"
+        else:
+            bind = _join_host(spec.bind_address) + ':' if spec.bind_address else ''
+            port = self.remote[1] if self.remote else spec.bind_port
+            route = f"远程 {bind}{port} → {_join_host(spec.dest_host)}:{spec.dest_port}"
+        if self.status == FAILED:
+            return f"{route}  失败: {self.error}"
+        state = {STOPPED: "已停止", STARTING: "启动中", ACTIVE: "运行中"}[self.status]
+        text = (f"{route}  {state}  连接 {self.active}/{self.connections}"
+                f"  ↑{format_bytes(self.sent)} ↓{format_bytes(self.received)}")
+        if self.failures:
+            text += f"  失败 {self.failures} 次（{self.error}）"
+        return text
+
+
+class _Tunnel:
+    """一个转发连接：本地套接字与SSH通道之间的双向泵送，所有方法在转发线程中调用"""
+
+    __slots__ = ('loop', 'forward', 'sock', 'chan', 'to_chan', 'to_sock', 'sock_eof', 'chan_eof',
+                 'eof_sent', 'sock_mask', 'chan_mask', 'closed')
+
+    def __init__(self, loop: 'ForwardingLoop', forward: Forward, sock: socket.socket, chan, pending: bytes = b''):
+        self.loop = loop
+        self.forward = forward
+        self.sock = sock
+        self.chan = chan
+        self.to_chan = bytearray(pending)
+        self.to_sock = bytearray()
+        self.sock_eof = False
+        self.chan_eof = False
+        self.eof_sent = False
+        self.sock_mask = 0
+        self.chan_mask = 0
+        self.closed = False
+
+    def start(self):
+        forward = self.forward
+        if forward.stopped:
+            self.sock.close()
+            self.chan.close()
+            return
+        forward.active += 1
+        forward.connections += 1
+        forward.tunnels.add(self)
+        try:
+            self.flush_to_chan()
+            self.update()
+        except Exception:
+            self.close()
+
+    def on_sock(self, mask: int):
+        if mask & selectors.EVENT_WRITE:
+            self.flush_to_sock()
+        if mask & selectors.EVENT_READ:
+            try:
+                data = self.sock.recv(READ_SIZE)
+            except (BlockingIOError, InterruptedError):
+                data = None
+            if data == b'':
+                self.sock_eof = True
+            elif data:
+                self.to_chan += data
+            self.flush_to_chan()
+        self.update()
+
+    def on_chan(self, mask: int):
+        try:
+            data = self.chan.recv(READ_SIZE)
+        except socket.timeout:
+            data = None
+        if data == b'':
+            self.chan_eof = True
+        elif data:
+            self.to_sock += data
+        if data is not None:
+            self.flush_to_sock()
+        self.update()
+
+    def on_window(self, mask: int):
+        """有数据等待发送窗口时由转发线程轮询"""
+        self.flush_to_chan()
+        self.update()
+
+    def flush_to_chan(self):
+        """在通道发送窗口允许的范围内发送，不阻塞"""
+        chan = self.chan
+        while self.to_chan and chan.send_ready():
+            sent = chan.send(bytes(self.to_chan[:SEND_SIZE]))
+            if sent <= 0:
+                raise EOFError("通道已关闭")
+            del self.to_chan[:sent]
+            self.forward.sent += sent
+        if self.sock_eof and not self.to_chan and not self.eof_sent:
+            self.eof_sent = True
+            chan.shutdown_write()
+
+    def flush_to_sock(self):
+        try:
+            sent = self.sock.send(self.to_sock)
+        except (BlockingIOError, InterruptedError):
+            return
+        del self.to_sock[:sent]
+        self.forward.received += sent
+        if self.chan_eof and not self.to_sock:
+            try:
+                self.sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    def update(self):
+        """按缓冲状态调整关注的事件；两个方向都结束后关闭"""
+        if self.closed:
+            return
+        if not self.to_sock and self.chan_eof and ((self.sock_eof and not self.to_chan) or self.chan.closed):
+            self.close()
+            return
+        loop = self.loop
+        sock_mask = ((selectors.EVENT_READ if not self.sock_eof and len(self.to_chan) < BUFFER_SIZE else 0)
+                     | (selectors.EVENT_WRITE if self.to_sock else 0))
+        chan_mask = selectors.EVENT_READ if not self.chan_eof and len(self.to_sock) < BUFFER_SIZE else 0
+        self.sock_mask = loop.watch(self.sock, self.sock_mask, sock_mask, self.on_sock)
+        self.chan_mask = loop.watch(self.chan, self.chan_mask, chan_mask, self.on_chan)
+        if self.to_chan:
+            loop.blocked.add(self)
+        else:
+            loop.blocked.discard(self)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        loop = self.loop
+        loop.watch(self.sock, self.sock_mask, 0, None)
+        loop.watch(self.chan, self.chan_mask, 0, None)
+        loop.blocked.discard(self)
+        self.sock.close()
+        self.chan.close()
+        self.forward.active -= 1
+        self.forward.tunnels.discard(self)
+
+
+class _SocksClient:
+    """动态转发的客户端在 SOCKS5 握手阶段的状态（只支持无认证的 CONNECT）"""
+
+    __slots__ = ('loop', 'forward', 'sock', 'buffer', 'greeted', 'closed')
+
+    def __init__(self, loop: 'ForwardingLoop', forward: Forward, sock: socket.socket):
+        self.loop = loop
+        self.forward = forward
+        self.sock = sock
+        self.buffer = bytearray()
+        self.greeted = False
+        self.closed = False
+
+    def on_sock(self, mask: int):
+        data = self.sock.recv(READ_SIZE)
+        if not data:
+            self.close()
+            return
+        self.buffer += data
+        if len(self.buffer) > _SOCKS_MAX_REQUEST:
+            self.close()
+            return
+        buffer = self.buffer
+        if not self.greeted:
+            if len(buffer) < 2 or len(buffer) < 2 + buffer[1]:
+                return
+            if buffer[0] != 5 or 0 not in buffer[2:2 + buffer[1]]:
+                self.sock.send(b'\x05\xff')
+                self.close()
+                return
+            self.sock.send(b'\x05\x00')
+            del buffer[:2 + buffer[1]]
+            self.greeted = True
+        request = self._parse_request(buffer)
+        if request is None:
+            return
+        (host, port), length = request
+        # 握手完成：停止关注，打开通道后作为普通转发连接继续
+        self.loop.watch(self.sock, selectors.EVENT_READ, 0, None)
+        self.forward.tunnels.discard(self)
+        self.loop.open_channel(self.forward, self.sock, (host, port), bytes(buffer[length:]), socks=True)
+
+    def _parse_request(self, buffer: bytearray):
+        """解析 CONNECT 请求，返回 ((主机, 端口), 请求长度)，数据不完整时返回None"""
+        if len(buffer) < 5:
+            return None
+        if buffer[0] != 5 or buffer[1] != 1:
+            self.sock.send(b'\x05\x07\x00\x01' + bytes(6))
+            self.close()
+            return None
+        atyp = buffer[3]
+        if atyp == 1:
+            end = 4 + 4
+            host = socket.inet_ntop(socket.AF_INET, bytes(buffer[4:end])) if len(buffer) >= end else None
+        elif atyp == 3:
+            end = 5 + buffer[4]
+            host = bytes(buffer[5:end]).decode('utf-8', 'replace') if len(buffer) >= end else None
+        elif atyp == 4:
+            end = 4 + 16
+            host = socket.inet_ntop(socket.AF_INET6, bytes(buffer[4:end])) if len(buffer) >= end else None
+        else:
+            self.sock.send(b'\x05\x08\x00\x01' + bytes(6))
+            self.close()
+            return None
+        if host is None or len(buffer) < end + 2:
+            return None
+        return (host, int.from_bytes(buffer[end:end + 2], 'big')), end + 2
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.watch(self.sock, selectors.EVENT_READ, 0, None)
+        self.forward.tunnels.discard(self)
+        self.sock.close()
+
+
+class _Listener:
+    """本地监听（-L / -D），接受的连接交给转发线程"""
+
+    __slots__ = ('loop', 'forward', 'sock', 'closed', 'watching')
+
+    def __init__(self, loop: 'ForwardingLoop', forward: Forward, sock: socket.socket):
+        self.loop = loop
+        self.forward = forward
+        self.sock = sock
+        self.closed = False
+        self.watching = False
+
+    def start(self):
+        if not self.closed and not self.watching:
+            self.watching = True
+            self.loop.watch(self.sock, 0, selectors.EVENT_READ, self.on_sock)
+
+    def on_sock(self, mask: int):
+        while True:
+            try:
+                conn, origin = self.sock.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # 暂时无法接受（如文件描述符用尽）：监听套接字仍然可读，继续关注会空转，
+                # 暂停一段时间后再接受
+                self.forward.failures += 1
+                self.forward.error = f"接受连接失败: {e.strerror or e}"
+                self.watching = False
+                self.loop.watch(self.sock, selectors.EVENT_READ, 0, None)
+                self.loop.call_later(ACCEPT_RETRY_DELAY, self.start)
+                return
+            conn.setblocking(False)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            forward = self.forward
+            if forward.spec.kind == DYNAMIC:
+                client = _SocksClient(self.loop, forward, conn)
+                forward.tunnels.add(client)
+                self.loop.watch(conn, 0, selectors.EVENT_READ, client.on_sock)
+            else:
+                self.loop.open_channel(forward, conn, (forward.spec.dest_host, forward.spec.dest_port),
+                                       origin=origin[:2])
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.watching:
+                self.loop.watch(self.sock, selectors.EVENT_READ, 0, None)
+            self.sock.close()
+
+
+class ForwardingLoop:
+    """转发线程：一个selector等待所有监听套接字、转发连接的套接字和SSH通道
+
+    每个连接两个方向各有最多 BUFFER_SIZE 的缓冲，缓冲满时暂停读取来源，慢的一端通过
+    SSH通道窗口或TCP流量控制让快的一端减速。数百个并发连接只占用这一个线程；
+    需要等待往返的打开通道和连接本地目标在少量辅助线程中进行。
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.blocked = set()
+        self.pending = deque()
+        # 定时执行的操作 (时间, 序号, 函数)，只在转发线程中访问
+        self.timers = []
+        self._timer_seq = itertools.count()
+        self.lock = threading.Lock()
+        self.thread = None
+        self._executor = None
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def call(self, function: Callable, *args):
+        """在转发线程中执行 function(*args)"""
+        with self.lock:
+            self.pending.append((function, args))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="sshive-forward", daemon=True)
+                self.thread.start()
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def call_later(self, delay: float, function: Callable[[], None]):
+        """delay 秒后在转发线程中执行 function()（只能在转发线程中调用）"""
+        heapq.heappush(self.timers, (time.monotonic() + delay, next(self._timer_seq), function))
+
+    def submit(self, function: Callable, *args):
+        """在辅助线程中执行可能阻塞的操作"""
+        with self.lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(OPEN_WORKERS, thread_name_prefix="sshive-forward-open")
+        self._executor.submit(function, *args)
+
+    def watch(self, fileobj, old: int, new: int, callback) -> int:
+        """把 fileobj 关注的事件从 old 改为 new（0 表示不关注），返回 new"""
+        if old == new:
+            return new
+        if not old:
+            self.selector.register(fileobj, new, callback)
+        elif not new:
+            self.selector.unregister(fileobj)
+        else:
+            self.selector.modify(fileobj, new, callback)
+        return new
+
+    def open_channel(self, forward: Forward, sock: socket.socket, dest: tuple, pending: bytes = b'',
+                     socks: bool = False, origin: tuple = ('127.0.0.1', 0)):
+        """在辅助线程中打开 direct-tcpip 通道，成功后连接加入转发线程"""
+        self.submit(self._open_channel, forward, sock, dest, pending, socks, origin)
+
+    def _open_channel(self, forward: Forward, sock: socket.socket, dest: tuple, pending: bytes,
+                      socks: bool, origin: tuple):
+        try:
+            chan = forward.get_transport().open_channel('direct-tcpip', dest, origin, timeout=OPEN_TIMEOUT)
+        except Exception as e:
+            forward.failures += 1
+            forward.error = f"{_join_host(dest[0])}:{dest[1]}: {getattr(e, 'text', None) or e or type(e).__name__}"
+            if socks:
+                # 5: 连接被拒绝
+                _send_quietly(sock, b'\x05\x05\x00\x01' + bytes(6))
+            sock.close()
+            return
+        chan.settimeout(0.0)
+        if socks:
+            _send_quietly(sock, b'\x05\x00\x00\x01' + bytes(6))
+        self.call(_Tunnel(self, forward, sock, chan, pending).start)
+
+    def connect_local(self, forward: Forward, chan):
+        """远程转发的新连接：在辅助线程中连接本地目标"""
+        self.submit(self._connect_local, forward, chan)
+
+    def _connect_local(self, forward: Forward, chan):
+        spec = forward.spec
+        try:
+            sock = socket.create_connection((spec.dest_host, spec.dest_port), timeout=OPEN_TIMEOUT)
+        except OSError as e:
+            forward.failures += 1
+            forward.error = f"{_join_host(spec.dest_host)}:{spec.dest_port}: {e.strerror or e}"
+            chan.close()
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        chan.settimeout(0.0)
+        self.call(_Tunnel(self, forward, sock, chan).start)
+
+    def _run(self):
+        while True:
+            while True:
+                with self.lock:
+                    if not self.pending:
+                        break
+                    function, args = self.pending.popleft()
+                try:
+                    function(*args)
+                except Exception:
+                    pass
+            timeout = max(0.0, self.timers[0][0] - time.monotonic()) if self.timers else None
+            if self.blocked:
+                timeout = WRITE_POLL_INTERVAL if timeout is None else min(timeout, WRITE_POLL_INTERVAL)
+            try:
+                events = self.selector.select(timeout)
+            except OSError:
+                continue
+            for key, mask in events:
+                if key.data is None:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    continue
+                self._dispatch(key.data, mask)
+            for tunnel in list(self.blocked):
+                self._dispatch(tunnel.on_window, 0)
+            now = time.monotonic()
+            while self.timers and self.timers[0][0] <= now:
+                function = heapq.heappop(self.timers)[2]
+                try:
+                    function()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _dispatch(callback, mask: int):
+        try:
+            callback(mask)
+        except Exception:
+            # 套接字或通道出错：关闭这个连接（或监听），不影响其他连接
+            callback.__self__.close()
+
+
+def _send_quietly(sock: socket.socket, data: bytes):
+    try:
+        sock.send(data)
+    except OSError:
+        pass
+
+
+_loop: Optional[ForwardingLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_forwarding_loop() -> ForwardingLoop:
+    """获取全局共享的转发线程"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = ForwardingLoop()
+        return _loop
+
+
+# 每条连接上已建立的远程转发 {分配的端口: Forward}。paramiko 每条连接只有一个远程转发回调，
+# 同一连接上的多个远程转发（可能来自共用连接的多个会话）按端口分发
+_remote_forwards = weakref.WeakKeyDictionary()
+_remote_lock = threading.Lock()
+
+
+def _on_forwarded(chan, origin: tuple, server: tuple):
+    """远程转发的新连接（在 paramiko 的连接线程中调用，不能阻塞）"""
+    with _remote_lock:
+        forward = _remote_forwards.get(chan.get_transport(), {}).get(server[1])
+    if forward is None or forward.stopped:
+        chan.close()
+        return
+    get_forwarding_loop().connect_local(forward, chan)
+
+
+class PortForwarder:
+    """一个会话的全部转发
+
+    start() 绑定本地监听（-L / -D），新的连接使用 get_transport() 返回的当前连接，
+    会话重连后无需重新监听；attach() 在当前连接上请求远程转发（-R），需等待往返，
+    应在后台线程中调用，每次重连后再次调用。stop() 关闭监听、取消远程转发并断开所有转发连接。
+    """
+
+    def __init__(self, specs: Iterable[ForwardSpec], get_transport: Callable[[], object]):
+        self.get_transport = get_transport
+        self.loop = get_forwarding_loop()
+        self.forwards = [Forward(spec, get_transport) for spec in specs]
+
+    @property
+    def failed(self) -> List[Forward]:
+        return [forward for forward in self.forwards if forward.status == FAILED]
+
+    def start(self):
+        for forward in self.forwards:
+            if forward.spec.kind == REMOTE:
+                forward.status = STARTING
+                continue
+            try:
+                sock = self._listen(forward.spec)
+            except OSError as e:
+                forward.status = FAILED
+                forward.error = e.strerror or str(e)
+                continue
+            forward.status = ACTIVE
+            forward.listener = _Listener(self.loop, forward, sock)
+            self.loop.call(forward.listener.start)
+
+    @staticmethod
+    def _listen(spec: ForwardSpec) -> socket.socket:
+        address = spec.listen_address
+        info = socket.getaddrinfo(address, spec.bind_port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)[0]
+        sock = socket.socket(info[0], socket.SOCK_STREAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(info[4])
+            sock.listen(LISTEN_BACKLOG)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def attach(self):
+        """在当前连接上（重新）请求远程转发"""
+        for forward in self.forwards:
+            if forward.spec.kind != REMOTE or forward.status == STOPPED:
+                continue
+            spec = forward.spec
+            try:
+                transport = self.get_transport()
+                # paramiko 同一时间只能等待一个全局请求的回应；保活探测的回应不会被当作这里的回应
+                with global_request_lock(transport):
+                    port = transport.request_port_forward(spec.bind_address, spec.bind_port, _on_forwarded)
+            except Exception as e:
+                forward.status = FAILED
+                forward.error = str(e) or type(e).__name__
+                continue
+            if forward.status == STOPPED:
+                # 等待回应期间转发已被停止
+                self._cancel_remote([(transport, spec.bind_address, port)])
+                continue
+            with _remote_lock:
+                _remote_forwards.setdefault(transport, {})[port] = forward
+            forward.remote = (transport, port)
+            forward.status = ACTIVE
+            forward.error = ''
+
+    def stop(self):
+        """停止所有转发；远程转发的取消请求在后台发送"""
+        cancels = []
+        for forward in self.forwards:
+            forward.status = STOPPED
+            if forward.listener is not None:
+                self.loop.call(forward.listener.close)
+                forward.listener = None
+            if forward.remote is not None:
+                transport, port = forward.remote
+                forward.remote = None
+                with _remote_lock:
+                    ports = _remote_forwards.get(transport, {})
+                    if ports.get(port) is forward:
+                        del ports[port]
+                if transport.is_active():
+                    cancels.append((transport, forward.spec.bind_address, port))
+            self.loop.call(self._close_tunnels, forward)
+        if cancels:
+            threading.Thread(target=self._cancel_remote, args=(cancels,), daemon=True).start()
+
+    @staticmethod
+    def _close_tunnels(forward: Forward):
+        for tunnel in list(forward.tunnels):
+            tunnel.close()
+
+    @staticmethod
+    def _cancel_remote(cancels: list):
+        for transport, address, port in cancels:
+            try:
+                # 不用 cancel_port_forward：它会清除整条连接的转发回调，影响共用连接的其他会话
+                with global_request_lock(transport):
+                    transport.global_request("cancel-tcpip-forward", (address, port), wait=True)
+            except Exception:
+                pass
+
+    def summary(self) -> str:
+        """状态栏中的简要说明"""
+        active = sum(forward.active for forward in self.forwards)
+        sent = sum(forward.sent for forward in self.forwards)
+        received = sum(forward.received for forward in self.forwards)
+        text = f"转发 {len(self.forwards)}  连接 {active}  ↑{format_bytes(sent)} ↓{format_bytes(received)}"
+        failed = len(self.failed)
+        return text + f"  {failed} 个失败" if failed else text
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSlider,
+                             QComboBox, QProgressBar)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from session_replay import ReplayIndex, ReplayPlayer
+from terminal_widget import TerminalWidget
+
+
+# 播放速度选项（倍）
+SPEEDS = (1, 2, 5, 10, 25, 50, 100)
+
+# 播放时的刷新间隔（毫秒）
+FRAME_INTERVAL = 16
+
+# 每次刷新用于解析输出的时间上限（秒），其余时间留给绘制和界面事件；
+# 高倍速下解析跟不上时，播放器直接跳到关键帧
+FRAME_BUDGET = 0.010
+
+
+def format_duration(seconds: float) -> str:
+    """时长显示为 分:秒 或 时:分:秒"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class ReplayPanel(QWidget):
+    """录制回放面板：播放 asciicast 录制，可拖动进度条跳转到任意位置，支持 1x–100x 倍速
+
+    打开时在后台线程中建立（或续建）索引，完成后即可播放；跳转只从最近的关键帧开始解码。
+    """
+
+    # 由索引线程发出，跨线程自动排队到界面线程
+    index_progress = pyqtSignal(float)
+    index_finished = pyqtSignal(bool, str)
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.index = ReplayIndex(path)
+        self.player = None
+        self.playing = False
+        self.speed = SPEEDS[0]
+        self.target = 0.0
+        self.seek_requested = False
+        # 开始播放（或改变速度、跳转）时的 (录制时间, 时钟)，播放位置由此推算
+        self.anchor = (0.0, 0.0)
+        self.cancel_event = threading.Event()
+        self.setup_ui()
+        self.index_progress.connect(self.on_index_progress)
+        self.index_finished.connect(self.on_index_finished)
+        threading.Thread(target=self._build_index, name="sshive-replay-index", daemon=True).start()
+
+    def setup_ui(self):
+        """设置UI"""
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        info_layout = QHBoxLayout()
+        self.status_label = QLabel(f"正在建立索引: {os.path.basename(self.path)}")
+        info_layout.addWidget(self.status_label)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setMaximumWidth(200)
+        info_layout.addWidget(self.progress_bar)
+        info_layout.addStretch()
+        layout.addLayout(info_layout)
+
+        self.terminal = TerminalWidget()
+        self.terminal.follow_viewport = False
+        self.terminal.set_readonly(True)
+        layout.addWidget(self.terminal)
+
+        control_layout = QHBoxLayout()
+        self.play_button = QPushButton("播放")
+        self.play_button.setEnabled(False)
+        self.play_button.clicked.connect(self.toggle_playing)
+        control_layout.addWidget(self.play_button)
+
+        self.position_slider = QSlider(Qt.Orientation.Horizontal)
+        self.position_slider.setEnabled(False)
+        self.position_slider.valueChanged.connect(self.on_slider_changed)
+        control_layout.addWidget(self.position_slider)
+
+        self.time_label = QLabel(format_duration(0))
+        control_layout.addWidget(self.time_label)
+
+        self.speed_combo = QComboBox()
+        for speed in SPEEDS:
+            self.speed_combo.addItem(f"{speed}x", speed)
+        self.speed_combo.currentIndexChanged.connect(self.on_speed_changed)
+        control_layout.addWidget(self.speed_combo)
+        layout.addLayout(control_layout)
+
+        self.setLayout(layout)
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(FRAME_INTERVAL)
+        self.frame_timer.timeout.connect(self.on_frame)
+
+    def _build_index(self):
+        try:
+            done = self.index.build(self.index_progress.emit, self.cancel_event)
+        except Exception as e:
+            self.index_finished.emit(False, str(e) or type(e).__name__)
+            return
+        self.index_finished.emit(done, "")
+
+    def on_index_progress(self, fraction: float):
+        self.progress_bar.setValue(int(fraction * 1000))
+
+    def on_index_finished(self, done: bool, error: str):
+        if error:
+            self.status_label.setText(f"无法打开录制: {error}")
+            self.progress_bar.hide()
+            return
+        if not done or self.cancel_event.is_set():
+            return
+        self.index.load()
+        self.player = ReplayPlayer(self.index, self.terminal)
+        self.progress_bar.hide()
+        self.status_label.setText(f"{os.path.basename(self.path)}  {self.player.reader.header.get('title', '')}")
+        self.position_slider.setRange(0, int(self.index.duration * 1000))
+        self.position_slider.setSingleStep(1000)
+        self.position_slider.setPageStep(10000)
+        self.position_slider.setEnabled(True)
+        self.play_button.setEnabled(True)
+        self.seek(0.0)
+
+    # ---- 播放控制 ----
+
+    def toggle_playing(self):
+        if self.playing:
+            self.pause()
+        else:
+            self.play()
+
+    def play(self):
+        if self.player is None:
+            return
+        if self.target >= self.index.duration:
+            self.seek(0.0)
+        self.playing = True
+        self.anchor = (self.target, time.monotonic())
+        self.play_button.setText("暂停")
+        self.frame_timer.start()
+
+    def pause(self):
+        self.playing = False
+        self.play_button.setText("播放")
+
+    def seek(self, at: float):
+        """跳转到 at 秒，实际解码在下一次刷新时进行，拖动进度条时的连续跳转只执行最后一次"""
+        self.target = min(max(at, 0.0), self.index.duration)
+        self.anchor = (self.target, time.monotonic())
+        self.seek_requested = True
+        self.frame_timer.start()
+
+    def on_slider_changed(self, value: int):
+        if self.player is not None:
+            self.seek(value / 1000)
+
+    def on_speed_changed(self, index: int):
+        self.speed = self.speed_combo.itemData(index)
+        self.anchor = (self.target, time.monotonic())
+
+    def on_frame(self):
+        """按时钟推进播放位置，每次解码的时间不超过 FRAME_BUDGET"""
+        if self.playing:
+            at, started = self.anchor
+            self.target = min(at + (time.monotonic() - started) * self.speed, self.index.duration)
+        if self.seek_requested:
+            self.seek_requested = False
+            reached = self.player.seek(self.target, FRAME_BUDGET)
+        else:
+            reached = self.player.advance(self.target, FRAME_BUDGET)
+
+        if self.playing and self.target >= self.index.duration and reached:
+            self.pause()
+        if not self.playing and reached:
+            self.frame_timer.stop()
+
+        self.time_label.setText(f"{format_duration(self.player.time)} / {format_duration(self.index.duration)}")
+        if not self.position_slider.isSliderDown():
+            self.position_slider.blockSignals(True)
+            self.position_slider.setValue(int(self.player.time * 1000))
+            self.position_slider.blockSignals(False)
+
+    def close_replay(self):
+        """关闭面板：停止播放和建立中的索引（已建立的部分下次继续使用）"""
+        self.cancel_event.set()
+        self.frame_timer.stop()
+        self.playing = False
+        self.index.close()
@@ -0,0 +1,237 @@
+import struct
+import sys
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from typing import Iterable, List
+from terminal_screen import ATTR_SIZE, DEFAULT_ATTR, Line, attr_runs
+
+
+# 默认历史上限：行数和字节数，任一超出都会丢弃最旧的页
+DEFAULT_MAX_LINES = 100000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# 每页行数
+PAGE_LINES = 256
+
+# 保持未压缩的最新页数，更早的页压缩存放
+HOT_PAGES = 4
+
+# 解压后缓存的页数，供滚动浏览时反复访问
+DECODED_PAGES = 8
+
+_HEADER = struct.Struct('<IIII')
+
+
+def _attr_bytes(attr: int) -> bytes:
+    return attr.to_bytes(ATTR_SIZE, sys.byteorder)
+
+
+def _line_text(line: Line) -> str:
+    """行内容：去掉行尾默认属性的空白"""
+    text = line.chars.tounicode()
+    styled = -(-len(line.attrs.tobytes().rstrip(b'\0')) // ATTR_SIZE)
+    return text[:max(len(text.rstrip(' ')), styled)]
+
+
+class _Page:
+    """一页历史行的紧凑表示
+
+    文本按行以换行符连接（去掉行尾默认属性的空白），属性保存为 (长度, 属性) 的游程序列，
+    另记下每行原来的列数，还原时补齐行尾空白；冷页再整体用zlib压缩。
+    """
+
+    __slots__ = ('count', 'text', 'runs', 'offsets', 'widths', 'wrapped', 'blob', 'nbytes')
+
+    def __init__(self, lines: List[Line]):
+        texts = []
+        runs = array('I')
+        offsets = array('I')
+        widths = array('I')
+        wrapped = bytearray()
+        for line in lines:
+            text = _line_text(line)
+            texts.append(text)
+            widths.append(len(line))
+            offsets.append(len(runs))
+            runs.extend([value for _, count, attr in attr_runs(line.attrs[:len(text)])
+                         for value in (count, attr)])
+            wrapped.append(line.wrapped)
+        offsets.append(len(runs))
+
+        self.count = len(lines)
+        self.text = '\n'.join(texts)
+        self.runs = runs
+        self.offsets = offsets
+        self.widths = widths
+        self.wrapped = bytes(wrapped)
+        self.blob = None
+        self.nbytes = len(self.text) * 4 + (len(runs) + len(offsets) + len(widths)) * 4 + len(wrapped)
+
+    @property
+    def compressed(self) -> bool:
+        return self.blob is not None
+
+    def compress(self):
+        """压缩页内容，释放未压缩的数据"""
+        if self.blob is not None:
+            return
+        text = self.text.encode('utf-8')
+        runs = self.runs.tobytes()
+        offsets = self.offsets.tobytes()
+        widths = self.widths.tobytes()
+        self.blob = zlib.compress(_HEADER.pack(len(text), len(runs), len(offsets), len(widths))
+                                  + text + runs + offsets + widths + self.wrapped, 1)
+        self.text = self.runs = self.offsets = self.widths = self.wrapped = None
+        self.nbytes = len(self.blob)
+
+    def plain_text(self) -> str:
+        """各行文本（以换行符连接）；可以在其他线程中调用，压缩页只解压文本部分"""
+        text = self.text
+        if text is not None:
+            return text
+        # compress() 先设置 blob 再清空 text，text 为None时 blob 一定可用
+        decompressor = zlib.decompressobj()
+        header = decompressor.decompress(self.blob, _HEADER.size)
+        text_len = _HEADER.unpack(header)[0]
+        return decompressor.decompress(decompressor.unconsumed_tail, text_len).decode('utf-8')
+
+    def decode(self) -> List[Line]:
+        """还原为行对象，每行恢复为封存时的列数"""
+        if self.blob is None:
+            text, runs, offsets, widths, wrapped = self.text, self.runs, self.offsets, self.widths, self.wrapped
+        else:
+            raw = zlib.decompress(self.blob)
+            text_len, runs_len, offsets_len, widths_len = _HEADER.unpack_from(raw)
+            pos = _HEADER.size
+            text = raw[pos:pos + text_len].decode('utf-8')
+            pos += text_len
+            runs = array('I')
+            runs.frombytes(raw[pos:pos + runs_len])
+            pos += runs_len
+            offsets = array('I')
+            offsets.frombytes(raw[pos:pos + offsets_len])
+            pos += offsets_len
+            widths = array('I')
+            widths.frombytes(raw[pos:pos + widths_len])
+            wrapped = raw[pos + widths_len:]
+
+        blank = _attr_bytes(DEFAULT_ATTR)
+        lines = []
+        for i, chars in enumerate(text.split('\n')):
+            start, end = offsets[i], offsets[i + 1]
+            pad = widths[i] - len(chars)
+            attrs = array('I')
+            attrs.frombytes(b''.join([_attr_bytes(attr) * count
+                                      for count, attr in zip(runs[start:end:2], runs[start + 1:end:2])])
+                            + blank * pad)
+            lines.append(Line.from_arrays(array('w', chars + ' ' * pad), attrs, bool(wrapped[i])))
+        return lines
+
+
+class Scrollback:
+    """有界的终端历史
+
+    最新的行保存在热区，每满 PAGE_LINES 行封存为一页紧凑表示，
+    超过 HOT_PAGES 的旧页可选地用zlib压缩，滚动查看时按需解压。
+    行数或字节数超出上限时整页丢弃最旧的历史，单个标签页的内存因此有界。
+    每行有一个不随丢弃旧行而改变的序号：第 i 行为 dropped + i，供搜索结果定位。
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_MAX_LINES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 compress: bool = True):
+        self.max_lines = max(PAGE_LINES, max_lines)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.pages = deque()
+        self.hot: List[Line] = []
+        self.page_bytes = 0
+        self.hot_bytes = 0
+        self.decoded = OrderedDict()
+        # 已丢弃（含清空）的行数
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.pages) * PAGE_LINES + len(self.hot)
+
+    @property
+    def nbytes(self) -> int:
+        """当前占用的大致字节数"""
+        return self.page_bytes + self.hot_bytes
+
+    def append(self, line: Line):
+        self.hot.append(line)
+        self.hot_bytes += len(line) * 8
+        if len(self.hot) >= PAGE_LINES:
+            self._seal()
+
+    def extend(self, lines: Iterable[Line]):
+        for line in lines:
+            self.append(line)
+
+    def clear(self):
+        self.dropped += len(self)
+        self.pages.clear()
+        self.hot = []
+        self.page_bytes = 0
+        self.hot_bytes = 0
+        self.decoded.clear()
+
+    def __getitem__(self, index: int) -> Line:
+        if index < 0:
+            index += len(self)
+        page_index, offset = divmod(index, PAGE_LINES)
+        if page_index == len(self.pages):
+            return self.hot[offset]
+        if not 0 <= page_index < len(self.pages):
+            raise IndexError(index)
+        return self._page_lines(self.pages[page_index])[offset]
+
+    def segments(self, since: int = 0) -> list:
+        """历史文本的分段 [(首行序号, 页或文本)]，只含序号不小于 since 的行所在的段
+
+        封存的页直接返回（在其他线程中只通过 plain_text() 读取），热区的行在这里转换为文本。
+        """
+        result = []
+        serial = self.dropped
+        for page in self.pages:
+            if serial + page.count > since:
+                result.append((serial, page))
+            serial += page.count
+        skip = max(0, since - serial)
+        if len(self.hot) > skip:
+            result.append((serial + skip, '\n'.join(_line_text(line) for line in self.hot[skip:])))
+        return result
+
+    def _page_lines(self, page: _Page) -> List[Line]:
+        """解压页并缓存；以页对象本身为键，丢弃的页从缓存中移除，键不会与新页混淆"""
+        lines = self.decoded.get(page)
+        if lines is not None:
+            self.decoded.move_to_end(page)
+            return lines
+        lines = page.decode()
+        self.decoded[page] = lines
+        if len(self.decoded) > DECODED_PAGES:
+            self.decoded.popitem(last=False)
+        return lines
+
+    def _seal(self):
+        """把热区封存为一页，压缩变冷的页并按上限丢弃旧页"""
+        page = _Page(self.hot)
+        self.hot = []
+        self.hot_bytes = 0
+        self.pages.append(page)
+        self.page_bytes += page.nbytes
+
+        if self.compress and len(self.pages) > HOT_PAGES:
+            cold = self.pages[-HOT_PAGES - 1]
+            if not cold.compressed:
+                self.page_bytes -= cold.nbytes
+                cold.compress()
+                self.page_bytes += cold.nbytes
+
+        while self.pages and (len(self) > self.max_lines or self.nbytes > self.max_bytes):
+            old = self.pages.popleft()
+            self.dropped += old.count
+            self.page_bytes -= old.nbytes
+            self.decoded.pop(old, None)
@@ -0,0 +1,275 @@
+import re
+from PyQt6.QtWidgets import QFrame, QHBoxLayout, QLineEdit, QCheckBox, QPushButton, QLabel
+from PyQt6.QtCore import Qt, QEvent, QTimer, pyqtSignal
+from terminal_search import MAX_MATCHES, ScrollbackSearch, compile_pattern, screen_text
+
+
+# 输入停止后多久开始搜索（毫秒）
+SEARCH_DELAY = 200
+
+# 搜索完成后检查新输出的间隔（毫秒），新进入历史的行只搜索增加的部分
+FOLLOW_INTERVAL = 1000
+
+
+class SearchBar(QFrame):
+    """终端历史搜索栏（Ctrl+Shift+F）
+
+    搜索在工作线程中进行，界面只取出历史分段的引用；结果分批到达时逐步高亮，
+    第一批即跳到最近的匹配。搜索完成后继续跟踪新输出，只搜索新增的行。
+    Enter / 上箭头查找更早的匹配，Shift+Enter / 下箭头查找更新的匹配，Esc 关闭。
+    """
+
+    # 由搜索线程发出，跨线程自动排队到界面线程；第一个参数为搜索编号，用于丢弃过期结果
+    matches_found = pyqtSignal(int, list)
+    search_finished = pyqtSignal(int, bool)
+
+    def __init__(self, terminal):
+        super().__init__(terminal)
+        self.terminal = terminal
+        self.search = None
+        self.generation = 0
+        self.pattern = None
+        self.matches = []
+        self.current = -1
+        # 分批结果插入 matches 的位置：完整搜索从最新向前，批次依次插到最前；跟踪搜索插在旧结果之后
+        self.insert_at = 0
+        # 已搜索到的历史末尾（序号），之后的行（含当时的屏幕内容）由跟踪搜索重新搜索
+        self.searched_upto = 0
+        self.truncated = False
+        self.setup_ui()
+        self.matches_found.connect(self.on_matches_found)
+        self.search_finished.connect(self.on_search_finished)
+        self.hide()
+
+    def setup_ui(self):
+        """设置UI"""
+        self.setFrameShape(QFrame.Shape.StyledPanel)
+        self.setAutoFillBackground(True)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(4, 2, 4, 2)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索历史...")
+        self.search_input.setMinimumWidth(220)
+        self.search_input.textChanged.connect(self.schedule_search)
+        self.search_input.installEventFilter(self)
+        layout.addWidget(self.search_input)
+
+        self.regex_check = QCheckBox("正则")
+        self.regex_check.toggled.connect(self.schedule_search)
+        layout.addWidget(self.regex_check)
+
+        self.case_check = QCheckBox("区分大小写")
+        self.case_check.toggled.connect(self.schedule_search)
+        layout.addWidget(self.case_check)
+
+        self.status_label = QLabel()
+        self.status_label.setMinimumWidth(110)
+        layout.addWidget(self.status_label)
+
+        self.previous_button = QPushButton("↑")
+        self.previous_button.setToolTip("更早的匹配 (Enter)")
+        self.previous_button.clicked.connect(self.find_previous)
+        layout.addWidget(self.previous_button)
+
+        self.next_button = QPushButton("↓")
+        self.next_button.setToolTip("更新的匹配 (Shift+Enter)")
+        self.next_button.clicked.connect(self.find_next)
+        layout.addWidget(self.next_button)
+
+        self.close_button = QPushButton("✕")
+        self.close_button.clicked.connect(self.close_search)
+        layout.addWidget(self.close_button)
+
+        for button in (self.previous_button, self.next_button, self.close_button):
+            button.setFixedWidth(28)
+            button.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setLayout(layout)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.start_search)
+
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(FOLLOW_INTERVAL)
+        self.follow_timer.timeout.connect(self.follow_output)
+
+    def open(self, text: str = ""):
+        """显示并聚焦搜索框"""
+        self.show()
+        self.raise_()
+        if text:
+            self.search_input.setText(text)
+        self.search_input.setFocus()
+        self.search_input.selectAll()
+
+    def close_search(self):
+        """关闭搜索：取消进行中的搜索并清除高亮"""
+        self._cancel()
+        self.follow_timer.stop()
+        self.search_timer.stop()
+        self.pattern = None
+        self.clear_results()
+        self.hide()
+        self.terminal.setFocus()
+
+    def eventFilter(self, obj, event):
+        if obj is self.search_input and event.type() == QEvent.Type.KeyPress:
+            key = event.key()
+            shift = event.modifiers() & Qt.KeyboardModifier.ShiftModifier
+            if key == Qt.Key.Key_Escape:
+                self.close_search()
+                return True
+            if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                if self.search_timer.isActive():
+                    self.start_search()
+                elif shift:
+                    self.find_next()
+                else:
+                    self.find_previous()
+                return True
+            if key == Qt.Key.Key_Up:
+                self.find_previous()
+                return True
+            if key == Qt.Key.Key_Down:
+                self.find_next()
+                return True
+        return super().eventFilter(obj, event)
+
+    # ---- 搜索 ----
+
+    def schedule_search(self):
+        self.search_timer.start()
+
+    def _cancel(self):
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+        self.generation += 1
+
+    def clear_results(self):
+        """清除结果（终端被清空或跳转回放位置后，原有的行序号不再有效）"""
+        self._cancel()
+        self.matches = []
+        self.current = -1
+        self.truncated = False
+        self.terminal.set_highlights([])
+        if self.pattern is not None and self.isVisible():
+            self.schedule_search()
+        self._update_status()
+
+    def start_search(self):
+        """在全部历史和当前屏幕中重新搜索"""
+        self.search_timer.stop()
+        self._cancel()
+        self.matches = []
+        self.current = -1
+        self.truncated = False
+        self.terminal.set_highlights([])
+        text = self.search_input.text()
+        self.search_input.setStyleSheet("")
+        if not text:
+            self.pattern = None
+            self.follow_timer.stop()
+            self._update_status()
+            return
+        try:
+            self.pattern = compile_pattern(text, self.regex_check.isChecked(), self.case_check.isChecked())
+        except re.error as e:
+            self.pattern = None
+            self.search_input.setStyleSheet("QLineEdit { color: #c62828; }")
+            self.status_label.setText(f"正则错误: {e.msg}")
+            return
+        self.insert_at = 0
+        self._run(0)
+        self.follow_timer.start()
+
+    def follow_output(self):
+        """搜索新进入历史的行和当前屏幕（上次搜索中屏幕部分的结果先移除）"""
+        if self.pattern is None or self.search is not None or self.truncated:
+            return
+        history = self.terminal.screen.history
+        if self.terminal.line_serial_base() + len(history) == self.searched_upto:
+            return
+        # 已被丢弃的旧行上的匹配，以及上次搜索时仍在屏幕上（内容可能已变化）的匹配
+        base = self.terminal.line_serial_base()
+        keep = [match for match in self.matches if base <= match[0] < self.searched_upto]
+        current = self.matches[self.current] if 0 <= self.current < len(self.matches) else None
+        self.matches = keep
+        self.current = keep.index(current) if current in keep else len(keep) - 1
+        self.insert_at = len(keep)
+        self.terminal.set_highlights(keep, keep[self.current] if keep else None)
+        self._run(self.searched_upto)
+
+    def _run(self, since: int):
+        terminal = self.terminal
+        history = terminal.screen.history
+        segments = history.segments(since) if hasattr(history, 'segments') else []
+        end = terminal.line_serial_base() + len(history)
+        segments.append((end, screen_text(terminal.screen.primary)))
+        self.searched_upto = end
+        generation = self.generation
+        self.search = ScrollbackSearch(
+            self.pattern, segments,
+            lambda batch: self.matches_found.emit(generation, batch),
+            lambda truncated: self.search_finished.emit(generation, truncated),
+            since, MAX_MATCHES - len(self.matches))
+        self.search.start()
+        self._update_status()
+
+    def on_matches_found(self, generation: int, batch: list):
+        if generation != self.generation:
+            return
+        first = not self.matches
+        self.matches[self.insert_at:self.insert_at] = batch
+        if self.current >= self.insert_at:
+            self.current += len(batch)
+        if first or self.current < 0:
+            # 第一批结果：跳到最近的匹配
+            self.current = len(self.matches) - 1
+            self._show_current()
+        else:
+            self.terminal.set_highlights(self.matches, self.matches[self.current])
+        self._update_status()
+
+    def on_search_finished(self, generation: int, truncated: bool):
+        if generation != self.generation:
+            return
+        self.search = None
+        self.truncated = truncated
+        self._update_status()
+
+    # ---- 导航 ----
+
+    def find_previous(self):
+        """更早的匹配（向上）"""
+        if self.matches:
+            self.current = (self.current - 1) % len(self.matches)
+            self._show_current()
+
+    def find_next(self):
+        """更新的匹配（向下）"""
+        if self.matches:
+            self.current = (self.current + 1) % len(self.matches)
+            self._show_current()
+
+    def _show_current(self):
+        match = self.matches[self.current]
+        self.terminal.set_highlights(self.matches, match)
+        self.terminal.scroll_to_serial(match[0])
+        self._update_status()
+
+    def _update_status(self):
+        if self.pattern is None:
+            self.status_label.setText("")
+            return
+        total = len(self.matches)
+        text = f"{self.current + 1}/{total}" if total else ""
+        if self.search is not None:
+            text += " 搜索中..."
+        elif not total:
+            text = "无匹配"
+        elif self.truncated:
+            text += f"（仅前 {MAX_MATCHES} 个）"
+        self.status_label.setText(text)
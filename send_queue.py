@@ -0,0 +1,112 @@
+import threading
+from collections import deque
+from typing import Tuple
+
+
+class _Paste:
+    """一次粘贴：待发送数据、已发送位置和必须补发的结尾标记长度"""
+
+    __slots__ = ('data', 'pos', 'suffix_len')
+
+    def __init__(self, data: bytes, suffix_len: int):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.suffix_len = suffix_len
+
+
+class SendQueue:
+    """会话的发送队列，可在任意线程写入，由I/O线程取出发送
+
+    键盘输入进入交互队列，优先于粘贴等大块数据发送；大块数据按需分块取出，
+    未发送的部分可以随时取消。带结尾标记的粘贴（如括号粘贴的 ESC [201~）一旦开始
+    发送，键盘输入要等结尾标记发出后再发，避免按键落在开始和结尾标记之间被当作
+    粘贴内容。已开始发送的粘贴被取消时，结尾标记先于排队的按键补发，保证远端不会
+    停留在粘贴模式。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._input = deque()
+        self._pastes = deque()
+        self.bulk_total = 0
+        self.bulk_sent = 0
+        self.input_pending = 0
+
+    def __bool__(self) -> bool:
+        with self._lock:
+            return bool(self._input or self._pastes)
+
+    def put(self, data: bytes):
+        """追加交互输入"""
+        if data:
+            with self._lock:
+                self._input.append(data)
+                self.input_pending += len(data)
+
+    def put_bulk(self, data: bytes, suffix: bytes = b''):
+        """追加大块数据，suffix 为取消后也必须发送的结尾"""
+        self.put_payload(data + suffix if suffix else data, len(suffix))
+
+    def put_payload(self, payload: bytes, suffix_len: int = 0):
+        """追加已带结尾的大块数据（最后 suffix_len 字节为结尾）；payload 不被复制，可在多个队列间共享"""
+        if payload:
+            with self._lock:
+                self._pastes.append(_Paste(payload, suffix_len))
+                self.bulk_total += len(payload)
+
+    def peek(self, limit: int) -> Tuple[bytes, bool]:
+        """下一段待发送数据及其是否属于大块数据，队列为空时返回 (b'', False)"""
+        with self._lock:
+            paste = self._pastes[0] if self._pastes else None
+            if self._input and not (paste and paste.pos and paste.suffix_len):
+                return self._input[0][:limit], False
+            if paste:
+                return bytes(paste.data[paste.pos:paste.pos + limit]), True
+        return b'', False
+
+    def consume(self, size: int, bulk: bool):
+        """确认已发送 size 字节"""
+        with self._lock:
+            if not bulk:
+                if not self._input:
+                    return
+                head = self._input.popleft()
+                if size < len(head):
+                    self._input.appendleft(head[size:])
+                self.input_pending -= min(size, len(head))
+                return
+            if not self._pastes:
+                return
+            paste = self._pastes[0]
+            paste.pos += size
+            self.bulk_sent += size
+            if paste.pos >= len(paste.data):
+                self._pastes.popleft()
+                if not self._pastes:
+                    self.bulk_total = self.bulk_sent = 0
+
+    def cancel_bulk(self) -> int:
+        """丢弃未发送的大块数据，返回丢弃的字节数"""
+        with self._lock:
+            dropped = 0
+            for paste in self._pastes:
+                remaining = len(paste.data) - paste.pos
+                if paste.pos > 0:
+                    # 已经开始的粘贴补发结尾标记，排在等待中的按键之前
+                    tail_start = max(paste.pos, len(paste.data) - paste.suffix_len)
+                    tail = bytes(paste.data[tail_start:])
+                    if tail:
+                        self._input.appendleft(tail)
+                        self.input_pending += len(tail)
+                    remaining -= len(tail)
+                dropped += remaining
+            self._pastes.clear()
+            self.bulk_total = self.bulk_sent = 0
+            return dropped
+
+    def clear(self):
+        """清空所有待发送数据"""
+        with self._lock:
+            self._input.clear()
+            self._pastes.clear()
+            self.bulk_total = self.bulk_sent = self.input_pending = 0
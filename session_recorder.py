@@ -0,0 +1,248 @@
+import codecs
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Optional
+
+
+# 主机的录制设置（hosts.recording 列）
+RECORD_OFF = 0
+RECORD_OUTPUT = 1
+RECORD_ALL = 2
+
+# 录制文件目录，与数据库一样相对于工作目录
+RECORDINGS_DIR = "recordings"
+
+# 写入线程把缓冲的事件写入文件的间隔（秒），程序崩溃时最多丢失这么长时间的录制
+FLUSH_INTERVAL = 2.0
+
+# 单个会话缓冲的未写入数据上限（字节），写入跟不上时丢弃超出部分并在录制中留下标记
+MAX_PENDING = 16 * 1024 * 1024
+
+# 缓冲超过该值时提前唤醒写入线程，突发大量输出时内存占用保持在较低水平
+WAKE_PENDING = 1024 * 1024
+
+# 间隔小于该值（秒）的相邻同类事件合并为一条（合并后不超过 MERGE_LIMIT 字节），
+# 减少大量小块输出的编码和文件开销，同时不产生回放时难以处理的超大事件
+MERGE_INTERVAL = 0.01
+MERGE_LIMIT = 64 * 1024
+
+# gzip 压缩级别：3 与最快的1级CPU开销相近，文件小约四分之一；更高级别CPU开销成倍增加
+COMPRESS_LEVEL = 3
+
+
+def recording_path(name: str, directory: str = RECORDINGS_DIR) -> str:
+    """按主机名和当前时间生成录制文件路径：<目录>/<名称>-<年月日-时分秒>.cast.gz"""
+    safe = re.sub(r'[^\w.-]+', '_', name).strip('._') or 'session'
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(directory, f"{safe}-{stamp}.cast.gz")
+    n = 2
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{safe}-{stamp}-{n}.cast.gz")
+        n += 1
+    return path
+
+
+class SessionRecorder:
+    """会话录制：把终端的输出（可选输入）记录为 gzip 压缩的 asciicast v2 文件
+
+    output() / input() / resize() 只在内存队列中追加带时间戳的原始字节，可在I/O线程中调用，
+    不做编码、压缩和文件操作；这些工作由共享的写入线程按 FLUSH_INTERVAL 批量完成。
+    每次写入是一个完整的 gzip 成员，文件在任意两次写入之间都是有效的 gzip，
+    可直接用 gzip.open 读取（多个成员首尾相接）。
+    """
+
+    def __init__(self, path: str, width: int, height: int, record_input: bool = False,
+                 title: str = "", writer: 'RecordingWriter' = None):
+        self.path = path
+        self.record_input = record_input
+        self.started = time.monotonic()
+        self.closed = False
+        self.dropped = 0
+        self._header = {
+            'version': 2, 'width': width, 'height': height,
+            'timestamp': int(time.time()), 'title': title, 'env': {'TERM': 'xterm'},
+        }
+        self._events = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._writer = writer or get_recording_writer()
+        self._writer.add(self)
+
+    def output(self, data: bytes):
+        """记录远端输出"""
+        self._put('o', data)
+
+    def input(self, data: bytes):
+        """记录键盘输入和粘贴，record_input 为假时忽略"""
+        if self.record_input:
+            self._put('i', data)
+
+    def resize(self, width: int, height: int):
+        self._put('r', f"{width}x{height}".encode())
+
+    def marker(self, label: str):
+        """在录制中插入标记（如连接中断）"""
+        self._put('m', label.encode('utf-8'))
+
+    def _put(self, kind: str, data: bytes):
+        if self.closed or not data:
+            return
+        size = len(data)
+        with self._lock:
+            if self._pending + size > MAX_PENDING:
+                self.dropped += size
+                return
+            self._events.append((time.monotonic(), kind, data))
+            self._pending += size
+            wake = self._pending >= WAKE_PENDING
+        if wake:
+            self._writer.wakeup()
+
+    def _take(self) -> list:
+        """取出缓冲的事件（写入线程）"""
+        with self._lock:
+            events, self._events = self._events, deque()
+            self._pending = 0
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            events.append((time.monotonic(), 'm', f"[录制缓冲已满，丢弃 {dropped} 字节]".encode('utf-8')))
+        return events
+
+    def close(self, wait: float = 0):
+        """结束录制，剩余数据由写入线程写完；wait 大于0时最多等待这么多秒"""
+        if not self.closed:
+            self.closed = True
+            self._writer.wakeup()
+        if wait > 0:
+            self._finished.wait(wait)
+
+
+class _OpenRecording:
+    """写入线程中一个录制文件的状态"""
+
+    __slots__ = ('recorder', 'file', 'decoders')
+
+    def __init__(self, recorder: SessionRecorder):
+        self.recorder = recorder
+        directory = os.path.dirname(recorder.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(recorder.path, 'ab')
+        self.decoders = {}
+
+    def text(self, kind: str, data: bytes) -> str:
+        """按事件类型增量解码UTF-8，跨数据块的多字节字符不会被拆坏"""
+        decoder = self.decoders.get(kind)
+        if decoder is None:
+            decoder = self.decoders[kind] = codecs.getincrementaldecoder('utf-8')('replace')
+        return decoder.decode(data)
+
+    def encode(self, events) -> str:
+        """把事件转换为 asciicast 的JSON行，相邻的同类事件合并"""
+        started = self.recorder.started
+        lines = []
+        merged_at = merged_kind = None
+        merged = []
+        merged_size = 0
+
+        def emit():
+            if merged:
+                data = b''.join(merged)
+                text = data.decode('utf-8') if merged_kind in ('r', 'm') else self.text(merged_kind, data)
+                if text:
+                    lines.append(json.dumps([round(merged_at - started, 6), merged_kind, text],
+                                            ensure_ascii=False))
+
+        for at, kind, data in events:
+            if (kind == merged_kind and kind in ('o', 'i') and at - merged_at < MERGE_INTERVAL
+                    and merged_size + len(data) <= MERGE_LIMIT):
+                merged.append(data)
+                merged_size += len(data)
+                continue
+            emit()
+            merged_at, merged_kind, merged, merged_size = at, kind, [data], len(data)
+        emit()
+        return ''.join(line + '\n' for line in lines)
+
+    def write(self, text: str):
+        """写入一个完整的 gzip 成员"""
+        if text:
+            compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+            self.file.write(compressor.compress(text.encode('utf-8')) + compressor.flush())
+            self.file.flush()
+
+
+class RecordingWriter:
+    """所有录制共用的写入线程：定期取出各录制缓冲的事件，编码、压缩后追加到文件"""
+
+    def __init__(self, interval: float = FLUSH_INTERVAL):
+        self.interval = interval
+        self._recorders = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, recorder: SessionRecorder):
+        with self._lock:
+            self._recorders.append(recorder)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sshive-recorder", daemon=True)
+                self._thread.start()
+
+    def wakeup(self):
+        self._wakeup.set()
+
+    def close_all(self, wait: float = 2.0):
+        """结束所有录制并等待写完（程序退出时调用）"""
+        with self._lock:
+            recorders = list(self._recorders)
+        for recorder in recorders:
+            recorder.close()
+        deadline = time.monotonic() + wait
+        for recorder in recorders:
+            recorder._finished.wait(max(0.0, deadline - time.monotonic()))
+
+    def _run(self):
+        opened = {}
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self._lock:
+                recorders = list(self._recorders)
+            for recorder in recorders:
+                closing = recorder.closed
+                try:
+                    state = opened.get(recorder)
+                    if state is None:
+                        state = opened[recorder] = _OpenRecording(recorder)
+                        state.write(json.dumps(recorder._header, ensure_ascii=False) + '\n')
+                    state.write(state.encode(recorder._take()))
+                except OSError:
+                    # 无法写入（磁盘已满、目录不可写），放弃这个录制，不影响会话
+                    closing = recorder.closed = True
+                if closing:
+                    state = opened.pop(recorder, None)
+                    if state is not None:
+                        state.file.close()
+                    with self._lock:
+                        self._recorders.remove(recorder)
+                    recorder._finished.set()
+
+
+_writer: Optional[RecordingWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_recording_writer() -> RecordingWriter:
+    """获取全局共享的录制写入线程"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = RecordingWriter()
+        return _writer
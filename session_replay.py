@@ -0,0 +1,385 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from typing import Callable, Iterator, Optional
+
+from ansi_parser import AnsiParser
+from terminal_screen import Screen
+
+
+# 索引格式版本，格式变化后旧索引自动重建
+INDEX_VERSION = 1
+
+# 索引是录制文件旁的 sqlite 文件：<录制文件>.idx
+INDEX_SUFFIX = ".idx"
+
+# 距上一个关键帧累计这么多字符的输出，或经过这么多秒（期间有输出）后保存一个关键帧。
+# 跳转只需从最近的关键帧开始重新解析，最多 KEYFRAME_CHARS 个字符（通常几十毫秒）
+KEYFRAME_CHARS = 128 * 1024
+KEYFRAME_INTERVAL = 60.0
+
+# 每批交给终端模型的最大字符数，播放时每批之后检查时间预算
+FEED_BATCH = 64 * 1024
+
+# 事件在文件中的位置：(文件偏移, 解压后跳过的字节数)，见 CastReader
+START = (0, 0)
+
+_READ_SIZE = 256 * 1024
+
+
+class CastReader:
+    """asciicast v2 录制文件的读取，支持未压缩的 .cast 和多成员 gzip 压缩的 .cast.gz
+
+    事件的位置记为 (文件偏移, 跳过字节数)：未压缩文件是行首的偏移和0；gzip 文件是事件所在
+    成员的起点和行首在该成员解压数据中的偏移，位置按元组比较即为文件中的先后顺序。
+    本程序的录制每次写入一个成员（约两秒），从任意位置开始读取只需解压一个成员以内的数据；
+    其他工具生成的单成员 gzip 文件同样可读，但每次都要从文件开头解压。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # 最近一次读取到的文件偏移，用于显示进度
+        self.offset = 0
+        with open(path, 'rb') as f:
+            self.compressed = f.read(2) == b'\x1f\x8b'
+        lines = self._lines(START)
+        first = next(lines, (b'', START))[0]
+        lines.close()
+        try:
+            header = json.loads(first)
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get('version') != 2:
+            raise ValueError("不是 asciicast v2 录制文件")
+        self.header = header
+
+    @property
+    def width(self) -> int:
+        return int(self.header.get('width') or 80)
+
+    @property
+    def height(self) -> int:
+        return int(self.header.get('height') or 24)
+
+    def events(self, position: tuple = START) -> Iterator[tuple]:
+        """从位置开始读取事件，产生 (时间, 类型, 文本, 位置)；无法解析的行被跳过"""
+        loads = json.loads
+        for line, at in self._lines(position):
+            try:
+                event = loads(line)
+                if isinstance(event, list) and len(event) == 3 and isinstance(event[2], str):
+                    yield float(event[0]), event[1], event[2], at
+            except (ValueError, TypeError):
+                continue
+
+    def _lines(self, position: tuple) -> Iterator[tuple]:
+        """从位置开始逐行读取，产生 (行, 行首位置)"""
+        raw, skip = position
+        plain = not self.compressed
+        decompressor = None if plain else zlib.decompressobj(31)
+        partial = b''
+        line_at = position
+        with open(self.path, 'rb') as f:
+            f.seek(raw)
+            read_at = base = raw
+            offset = 0
+            while True:
+                chunk = f.read(_READ_SIZE)
+                if not chunk:
+                    break
+                read_at += len(chunk)
+                self.offset = read_at
+                # (成员起点, 数据在成员中的偏移, 数据)；未压缩文件整体视为一个成员
+                pieces = []
+                if plain:
+                    pieces.append((base, offset, chunk))
+                    offset += len(chunk)
+                else:
+                    try:
+                        while chunk:
+                            data = decompressor.decompress(chunk)
+                            pieces.append((base, offset, data))
+                            offset += len(data)
+                            if not decompressor.eof:
+                                break
+                            # 成员结束，剩余数据属于下一个成员
+                            chunk = decompressor.unused_data
+                            base, offset = read_at - len(chunk), 0
+                            decompressor = zlib.decompressobj(31)
+                    except zlib.error:
+                        # 文件末尾的填充或损坏的数据：到此为止
+                        chunk = None
+
+                for piece_base, piece_offset, data in pieces:
+                    start = 0
+                    if skip:
+                        start = min(skip, len(data))
+                        skip -= start
+                    n = len(data)
+                    while start < n:
+                        if not partial:
+                            at = piece_offset + start
+                            line_at = (piece_base + at, 0) if plain else (piece_base, at)
+                        end = data.find(b'\n', start)
+                        if end < 0:
+                            partial += data[start:]
+                            break
+                        yield partial + data[start:end], line_at
+                        partial = b''
+                        start = end + 1
+                if chunk is None:
+                    break
+        if partial:
+            yield partial, line_at
+
+
+class ReplayIndex:
+    """录制文件的回放索引
+
+    索引是录制文件旁的 sqlite 文件，keyframes 表保存定期的屏幕快照和快照之后第一个事件的位置，
+    meta 表保存录制时长和已建立索引的文件大小。索引只需建立一次；录制仍在写入时再次打开，
+    从最后一个关键帧继续建立，不重新读取整个文件。关键帧的时间和位置全部读入内存，
+    快照本身在跳转时按需读取。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.duration = 0.0
+        self.times = []
+        self.positions = []
+        self._ids = []
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        try:
+            conn = sqlite3.connect(self.index_path)
+            self._create_tables(conn)
+        except sqlite3.Error:
+            # 录制目录不可写时，索引放在临时目录中（只在这时导入，不拖慢界面启动）
+            import hashlib
+            import tempfile
+            digest = hashlib.sha1(os.path.abspath(self.path).encode('utf-8')).hexdigest()[:16]
+            self.index_path = os.path.join(tempfile.gettempdir(), f"sshive-replay-{digest}{INDEX_SUFFIX}")
+            conn = sqlite3.connect(self.index_path)
+            self._create_tables(conn)
+        return conn
+
+    @staticmethod
+    def _create_tables(conn: sqlite3.Connection):
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS keyframes (
+                id INTEGER PRIMARY KEY,
+                time REAL NOT NULL,
+                raw INTEGER NOT NULL,
+                skip INTEGER NOT NULL,
+                state BLOB NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def build(self, progress: Callable[[float], None] = None,
+              cancel: threading.Event = None) -> bool:
+        """建立或续建索引，返回是否完成（被取消时为假，已保存的关键帧下次继续使用）
+
+        progress(比例) 在建立过程中定期调用；可以在工作线程中调用本方法。
+        """
+        reader = CastReader(self.path)
+        size = os.path.getsize(self.path)
+        header = json.dumps(reader.header, sort_keys=True, ensure_ascii=False)
+        conn = self._connect()
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if (meta.get('version') != str(INDEX_VERSION) or meta.get('header') != header
+                    or int(meta.get('size', 0)) > size):
+                # 新文件、格式变化或录制文件被替换：重新建立
+                conn.execute("DELETE FROM keyframes")
+                conn.execute("DELETE FROM meta")
+                # size 记为0：建立中途取消时，下次从已保存的关键帧继续
+                meta = {'size': '0'}
+                self._write_meta(conn, header, meta)
+            elif int(meta.get('size', 0)) == size:
+                return True
+
+            screen = Screen(reader.width, reader.height, history_limit=0)
+            last = conn.execute("SELECT time, raw, skip, state FROM keyframes ORDER BY id DESC LIMIT 1").fetchone()
+            if last is None:
+                keyframe_time, position = 0.0, START
+                self._save_keyframe(conn, keyframe_time, position, screen)
+            else:
+                keyframe_time, position = last[0], (last[1], last[2])
+                screen.restore(_decode_state(last[3]))
+            duration = float(meta.get('duration', 0))
+            last_at = keyframe_time
+
+            parser = AnsiParser()
+            batch = []
+            batch_size = 0
+            chars = 0
+            saved = 0
+
+            def flush():
+                nonlocal batch, batch_size
+                if batch:
+                    screen.feed(parser.feed_text(''.join(batch)))
+                    batch, batch_size = [], 0
+
+            for at, kind, text, position in reader.events(position):
+                if chars >= KEYFRAME_CHARS or (chars and at - keyframe_time >= KEYFRAME_INTERVAL):
+                    flush()
+                    # 未完成的转义序列不在快照中，等它完整后再保存
+                    if not parser.pending:
+                        self._save_keyframe(conn, last_at, position, screen)
+                        keyframe_time, chars = last_at, 0
+                        saved += 1
+                        if saved % 16 == 0:
+                            conn.commit()
+                        if progress is not None:
+                            progress(min(reader.offset / max(size, 1), 1.0))
+                        if cancel is not None and cancel.is_set():
+                            conn.commit()
+                            return False
+                last_at = at
+                duration = max(duration, at)
+                if kind == 'o':
+                    batch.append(text)
+                    batch_size += len(text)
+                    chars += len(text)
+                    if batch_size >= FEED_BATCH:
+                        flush()
+                elif kind == 'r':
+                    size_value = _parse_size(text)
+                    if size_value:
+                        flush()
+                        screen.resize(*size_value)
+                        chars += 1
+
+            self._write_meta(conn, header, {'size': str(size), 'duration': repr(duration)})
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _write_meta(conn: sqlite3.Connection, header: str, values: dict):
+        values = dict(values, version=str(INDEX_VERSION), header=header)
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", values.items())
+
+    @staticmethod
+    def _save_keyframe(conn: sqlite3.Connection, at: float, position: tuple, screen: Screen):
+        state = json.dumps(screen.snapshot(), ensure_ascii=False, separators=(',', ':'))
+        conn.execute("INSERT INTO keyframes (time, raw, skip, state) VALUES (?, ?, ?, ?)",
+                     (at, position[0], position[1], zlib.compress(state.encode('utf-8'))))
+
+    def load(self):
+        """读入关键帧列表（在使用索引的线程中调用，之后 state() 也只能在该线程中调用）"""
+        self.close()
+        self._conn = self._connect()
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.duration = float(meta.get('duration', 0))
+        rows = self._conn.execute("SELECT id, time, raw, skip FROM keyframes ORDER BY id").fetchall()
+        self._ids = [row[0] for row in rows]
+        self.times = [row[1] for row in rows]
+        self.positions = [(row[2], row[3]) for row in rows]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def keyframe_at(self, at: float) -> int:
+        """时间 at 之前（含）最近的关键帧序号"""
+        return max(0, bisect_right(self.times, at) - 1)
+
+    def state(self, i: int) -> dict:
+        """第 i 个关键帧的屏幕快照"""
+        row = self._conn.execute("SELECT state FROM keyframes WHERE id = ?", (self._ids[i],)).fetchone()
+        return _decode_state(row[0])
+
+
+def _decode_state(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def _parse_size(text: str) -> Optional[tuple]:
+    """解析 resize 事件的 "宽x高"，无效时返回None"""
+    width, _, height = text.partition('x')
+    if width.isdigit() and height.isdigit() and int(width) > 0 and int(height) > 0:
+        return int(width), int(height)
+    return None
+
+
+class ReplayPlayer:
+    """按时间把录制回放到终端上
+
+    terminal 需提供 append_output(text)、load_snapshot(state) 和 resize_screen(cols, rows)，
+    通常是 TerminalWidget。跳转时恢复目标时间之前最近的关键帧，只解码其后的事件；
+    高倍速播放落后超过一个关键帧时同样直接跳到关键帧，不逐字节追赶。
+    """
+
+    def __init__(self, index: ReplayIndex, terminal):
+        self.index = index
+        self.terminal = terminal
+        self.reader = CastReader(index.path)
+        self.time = 0.0
+        self._events = None
+        self._next = None
+
+    @property
+    def finished(self) -> bool:
+        """已播放到录制末尾"""
+        return self._events is not None and self._next is None
+
+    def seek(self, at: float, budget: float = None) -> bool:
+        """跳转到 at 秒，返回值同 advance()"""
+        self._jump(self.index.keyframe_at(at))
+        return self.advance(at, budget)
+
+    def _jump(self, i: int):
+        self.terminal.load_snapshot(self.index.state(i))
+        self._events = self.reader.events(self.index.positions[i])
+        self._next = next(self._events, None)
+        self.time = self.index.times[i]
+
+    def advance(self, at: float, budget: float = None) -> bool:
+        """播放到 at 秒；budget 为本次最多使用的秒数，用完时返回False（还未到达 at）"""
+        if self._events is None:
+            return self.seek(at, budget)
+        i = self.index.keyframe_at(at)
+        if self._next is not None and self.index.positions[i] > self._next[3]:
+            self._jump(i)
+
+        deadline = time.perf_counter() + budget if budget else None
+        batch = []
+        batch_size = 0
+        event = self._next
+        while event is not None and event[0] <= at:
+            kind, text = event[1], event[2]
+            if kind == 'o':
+                batch.append(text)
+                batch_size += len(text)
+            elif kind == 'r':
+                size = _parse_size(text)
+                if size:
+                    if batch:
+                        self.terminal.append_output(''.join(batch))
+                        batch, batch_size = [], 0
+                    self.terminal.resize_screen(*size)
+            self.time = event[0]
+            event = next(self._events, None)
+            if batch_size >= FEED_BATCH:
+                self.terminal.append_output(''.join(batch))
+                batch, batch_size = [], 0
+                if deadline is not None and time.perf_counter() >= deadline:
+                    self._next = event
+                    return False
+        if batch:
+            self.terminal.append_output(''.join(batch))
+        self._next = event
+        self.time = at
+        return True
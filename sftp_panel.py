@@ -0,0 +1,294 @@
+import os
+import posixpath
+import stat
+import threading
+import time
+from typing import Callable
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+                             QSplitter, QFileDialog)
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor
+from sftp_transfer import (CANCELLED, DONE, FAILED, PENDING, RUNNING, UPLOAD, SFTPTransferManager,
+                           list_directory, open_sftp)
+
+
+# 传输列表的刷新间隔（毫秒）
+REFRESH_INTERVAL = 500
+
+STATUS_TEXT = {PENDING: "等待中", RUNNING: "传输中", DONE: "完成", FAILED: "失败", CANCELLED: "已取消"}
+
+
+def format_size(size: float) -> str:
+    """字节数显示为 B / KB / MB / GB"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_eta(seconds) -> str:
+    """剩余时间显示为 分:秒 或 时:分:秒，未知时为空"""
+    if seconds is None:
+        return ""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+class SFTPPanel(QWidget):
+    """会话的文件传输面板：浏览远程目录，上传/下载文件和目录，显示进度、速度和剩余时间
+
+    传输和目录浏览都使用会话的已认证连接（各自的SFTP通道），不再单独登录。
+    目录列表在后台线程中读取，传输由 SFTPTransferManager 的工作线程进行，界面定时读取进度。
+    """
+
+    # 由列表线程发出，跨线程自动排队到界面线程；第一个参数为请求编号，用于丢弃过期结果
+    listing_ready = pyqtSignal(int, str, list, str)
+
+    def __init__(self, get_transport: Callable[[], object], label: str = ""):
+        super().__init__()
+        self.get_transport = get_transport
+        self.manager = SFTPTransferManager(get_transport, label)
+        self.cwd = ""
+        self.entries = []
+        self.generation = 0
+        # 目录浏览用的SFTP通道，只在列表线程中使用（browse_lock 保护）
+        self.browser = None
+        self.browse_lock = threading.Lock()
+        self.finished = set()
+        self.setup_ui()
+        self.listing_ready.connect(self.on_listing_ready)
+        self.navigate(".")
+
+    def setup_ui(self):
+        """设置UI"""
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        path_layout = QHBoxLayout()
+        self.up_button = QPushButton("上级")
+        self.up_button.clicked.connect(self.go_up)
+        path_layout.addWidget(self.up_button)
+        self.path_input = QLineEdit()
+        self.path_input.setPlaceholderText("远程路径")
+        self.path_input.returnPressed.connect(lambda: self.navigate(self.path_input.text().strip() or "."))
+        path_layout.addWidget(self.path_input)
+        self.refresh_button = QPushButton("刷新")
+        self.refresh_button.clicked.connect(self.refresh)
+        path_layout.addWidget(self.refresh_button)
+        self.upload_button = QPushButton("上传文件")
+        self.upload_button.clicked.connect(self.upload_files)
+        path_layout.addWidget(self.upload_button)
+        self.upload_dir_button = QPushButton("上传目录")
+        self.upload_dir_button.clicked.connect(self.upload_directory)
+        path_layout.addWidget(self.upload_dir_button)
+        self.download_button = QPushButton("下载")
+        self.download_button.clicked.connect(self.download_selected)
+        path_layout.addWidget(self.download_button)
+        layout.addLayout(path_layout)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+
+        self.file_table = QTableWidget(0, 3)
+        self.file_table.setHorizontalHeaderLabels(["名称", "大小", "修改时间"])
+        self.file_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.file_table.verticalHeader().setVisible(False)
+        self.file_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.file_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.file_table.cellDoubleClicked.connect(self.on_file_double_clicked)
+        splitter.addWidget(self.file_table)
+
+        transfer_widget = QWidget()
+        transfer_layout = QVBoxLayout()
+        transfer_layout.setContentsMargins(0, 0, 0, 0)
+        self.transfer_table = QTableWidget(0, 5)
+        self.transfer_table.setHorizontalHeaderLabels(["名称", "进度", "速度", "剩余时间", "状态"])
+        header = self.transfer_table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.transfer_table.verticalHeader().setVisible(False)
+        self.transfer_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.transfer_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        transfer_layout.addWidget(self.transfer_table)
+
+        button_layout = QHBoxLayout()
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.cancel_selected)
+        button_layout.addWidget(self.cancel_button)
+        self.retry_button = QPushButton("继续")
+        self.retry_button.setToolTip("重新开始失败或取消的传输，已完成的部分不再传输")
+        self.retry_button.clicked.connect(self.retry_selected)
+        button_layout.addWidget(self.retry_button)
+        self.clear_button = QPushButton("清除已完成")
+        self.clear_button.clicked.connect(self.clear_finished)
+        button_layout.addWidget(self.clear_button)
+        button_layout.addStretch()
+        transfer_layout.addLayout(button_layout)
+        transfer_widget.setLayout(transfer_layout)
+        splitter.addWidget(transfer_widget)
+        splitter.setStretchFactor(0, 1)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter, 1)
+
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
+        self.setLayout(layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.refresh_transfers)
+
+    # ---- 远程目录 ----
+
+    def navigate(self, path: str):
+        """在后台读取远程目录，完成后显示"""
+        if path != "." and not posixpath.isabs(path) and self.cwd:
+            path = posixpath.join(self.cwd, path)
+        self.generation += 1
+        self.status_label.setText(f"正在读取 {path}...")
+        threading.Thread(target=self._list, args=(self.generation, path), daemon=True).start()
+
+    def refresh(self):
+        self.navigate(self.cwd or ".")
+
+    def go_up(self):
+        if self.cwd and self.cwd != "/":
+            self.navigate(posixpath.dirname(self.cwd.rstrip("/")) or "/")
+
+    def _list(self, generation: int, path: str):
+        """列表线程：通道在连接变化（会话重连）后重新打开"""
+        try:
+            with self.browse_lock:
+                transport = self.get_transport()
+                if self.browser is None or self.browser.get_channel().get_transport() is not transport \
+                        or self.browser.get_channel().closed:
+                    if self.browser is not None:
+                        self.browser.close()
+                    self.browser = open_sftp(transport)
+                path = self.browser.normalize(path)
+                entries = list_directory(self.browser, path)
+        except Exception as e:
+            self.listing_ready.emit(generation, path, [], str(e) or type(e).__name__)
+            return
+        self.listing_ready.emit(generation, path, entries, "")
+
+    def on_listing_ready(self, generation: int, path: str, entries: list, error: str):
+        if generation != self.generation:
+            return
+        if error:
+            self.status_label.setText(f"无法读取 {path}: {error}")
+            return
+        self.cwd = path
+        self.entries = entries
+        self.path_input.setText(path)
+        self.file_table.setRowCount(len(entries))
+        for row, entry in enumerate(entries):
+            is_dir = stat.S_ISDIR(entry.st_mode or 0)
+            self.file_table.setItem(row, 0, QTableWidgetItem(entry.filename + ("/" if is_dir else "")))
+            self.file_table.setItem(row, 1, QTableWidgetItem("" if is_dir else format_size(entry.st_size or 0)))
+            modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.st_mtime)) if entry.st_mtime else ""
+            self.file_table.setItem(row, 2, QTableWidgetItem(modified))
+        self.status_label.setText(f"{path}  共 {len(entries)} 项")
+
+    def on_file_double_clicked(self, row: int, column: int):
+        entry = self.entries[row]
+        if stat.S_ISDIR(entry.st_mode or 0):
+            self.navigate(posixpath.join(self.cwd, entry.filename))
+
+    # ---- 传输 ----
+
+    def upload_files(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "上传文件")
+        for path in paths:
+            self.manager.upload(path, posixpath.join(self.cwd, os.path.basename(path)))
+        self._transfers_added()
+
+    def upload_directory(self):
+        path = QFileDialog.getExistingDirectory(self, "上传目录")
+        if path:
+            self.manager.upload(path, posixpath.join(self.cwd, os.path.basename(os.path.normpath(path))))
+            self._transfers_added()
+
+    def download_selected(self):
+        rows = sorted({index.row() for index in self.file_table.selectionModel().selectedRows()})
+        if not rows:
+            return
+        directory = QFileDialog.getExistingDirectory(self, "下载到")
+        if not directory:
+            return
+        for row in rows:
+            name = self.entries[row].filename
+            self.manager.download(posixpath.join(self.cwd, name), os.path.join(directory, name))
+        self._transfers_added()
+
+    def _transfers_added(self):
+        self.refresh_transfers()
+        self.refresh_timer.start()
+
+    def _selected_tasks(self) -> list:
+        rows = {index.row() for index in self.transfer_table.selectionModel().selectedRows()}
+        return [task for row, task in enumerate(self.manager.tasks) if row in rows]
+
+    def cancel_selected(self):
+        for task in self._selected_tasks():
+            self.manager.cancel(task)
+        self.refresh_transfers()
+
+    def retry_selected(self):
+        for task in self._selected_tasks():
+            self.finished.discard(task)
+            self.manager.retry(task)
+        self._transfers_added()
+
+    def clear_finished(self):
+        for task in list(self.manager.tasks):
+            if task.status == DONE:
+                self.manager.remove(task)
+                self.finished.discard(task)
+        self.refresh_transfers()
+
+    def refresh_transfers(self):
+        """按任务的当前状态更新传输列表；上传到当前目录的任务完成后刷新目录"""
+        tasks = self.manager.tasks
+        self.transfer_table.setRowCount(len(tasks))
+        reload = False
+        for row, task in enumerate(tasks):
+            arrow = "↑" if task.direction == UPLOAD else "↓"
+            percent = task.done * 100 // task.total if task.total else (100 if task.status == DONE else 0)
+            files = f" [{task.files_done}/{task.files}]" if task.files > 1 else ""
+            rate = task.rate
+            status = STATUS_TEXT[task.status] + (f": {task.error}" if task.error else "")
+            values = (f"{arrow} {task.name}",
+                      f"{percent}%  {format_size(task.done)} / {format_size(task.total)}{files}",
+                      f"{format_size(rate)}/s" if rate else "",
+                      format_eta(task.eta),
+                      status)
+            for column, text in enumerate(values):
+                item = self.transfer_table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    self.transfer_table.setItem(row, column, item)
+                if item.text() != text:
+                    item.setText(text)
+            self.transfer_table.item(row, 4).setForeground(
+                QColor("#c62828") if task.status == FAILED else self.palette().text().color())
+            if not task.active and task not in self.finished:
+                self.finished.add(task)
+                reload |= task.direction == UPLOAD and posixpath.dirname(task.target) == self.cwd
+        if reload:
+            self.refresh()
+        if not any(task.active for task in tasks):
+            self.refresh_timer.stop()
+
+    def close_panel(self):
+        """关闭面板：取消进行中的传输（已完成的块保留，可在下次继续）"""
+        self.refresh_timer.stop()
+        self.generation += 1
+        self.manager.close()
+        # 不等待列表线程（可能正阻塞在网络上），直接关闭通道
+        browser, self.browser = self.browser, None
+        if browser is not None:
+            browser.close()
@@ -0,0 +1,550 @@
+import json
+import os
+import posixpath
+import queue
+import stat
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterator, List, Optional
+
+
+# 同时进行的传输单元数：每个工作线程在同一条连接上使用自己的SFTP通道。
+# OpenSSH 默认每条连接最多10个会话通道（MaxSessions），终端和目录浏览各占一个
+DEFAULT_WORKERS = 4
+
+# 大文件按此大小分块，不同的块由不同的工作线程同时传输；中断后以块为单位续传
+RANGE_SIZE = 16 * 1024 * 1024
+
+# 单个读写请求的大小，paramiko 和 OpenSSH 的SFTP实现都以32KB为上限
+REQUEST_SIZE = 32 * 1024
+
+# 每个通道同时在途的读请求数，下载时不必逐个等待往返
+PIPELINE_DEPTH = 128
+
+# SFTP通道的接收窗口（字节），须容纳所有在途请求的响应，否则服务器发送会被窗口卡住
+WINDOW_SIZE = 8 * 1024 * 1024
+
+# 分块传输的进度日志目录（与数据库一样相对于工作目录），用于中断后续传
+JOURNAL_DIR = "transfers"
+
+# 速度按最近几秒内传输的字节计算
+RATE_WINDOW = 5.0
+
+# 未完成的文件使用的临时名后缀，全部块完成后改为目标名
+PARTIAL_SUFFIX = ".part"
+
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+
+# 任务状态
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def open_sftp(transport) -> 'paramiko.SFTPClient':
+    """在已认证的连接上打开SFTP通道，接收窗口加大以容纳流水线读请求的响应"""
+    import paramiko
+
+    return paramiko.SFTPClient.from_transport(transport, window_size=WINDOW_SIZE)
+
+
+def list_directory(sftp, path: str) -> list:
+    """列出远程目录，返回 SFTPAttributes 列表（目录在前，按名称排序）"""
+    entries = sftp.listdir_attr(path)
+    entries.sort(key=lambda entry: (not stat.S_ISDIR(entry.st_mode or 0), entry.filename.lower()))
+    return entries
+
+
+class TransferStopped(Exception):
+    """任务已取消或已失败，其余传输单元不再进行"""
+
+
+class RateMeter:
+    """最近 window 秒内的平均速度（字节/秒），样本按 0.25 秒合并"""
+
+    BUCKET = 0.25
+
+    def __init__(self, window: float = RATE_WINDOW):
+        self.window = window
+        self.samples = deque()
+        self.started = None
+
+    def add(self, count: int, now: float = None):
+        now = time.monotonic() if now is None else now
+        if self.started is None:
+            self.started = now
+        bucket = now - now % self.BUCKET
+        if self.samples and self.samples[-1][0] == bucket:
+            self.samples[-1][1] += count
+        else:
+            self.samples.append([bucket, count])
+        self._trim(now)
+
+    def rate(self, now: float = None) -> float:
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        if not self.samples:
+            return 0.0
+        # 刚开始传输时按实际经过的时间计算，不被窗口长度拉低
+        span = min(self.window, now - self.started)
+        return sum(count for _, count in self.samples) / max(span, self.BUCKET)
+
+    def reset(self):
+        self.samples.clear()
+        self.started = None
+
+    def _trim(self, now: float):
+        while self.samples and self.samples[0][0] <= now - self.window:
+            self.samples.popleft()
+
+
+class TransferTask:
+    """一次上传或下载（单个文件或整个目录树），由工作线程更新，界面定期读取"""
+
+    def __init__(self, direction: str, source: str, target: str):
+        self.direction = direction
+        self.source = source
+        self.target = target
+        self.name = os.path.basename(source.rstrip('/\\')) or source
+        self.status = PENDING
+        self.error = ''
+        self.total = 0
+        self.done = 0
+        self.files = 0
+        self.files_done = 0
+        self.meter = RateMeter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # 尚未完成的文件数，规划完成前多计一个，避免规划途中被误判为全部完成
+        self._remaining = 0
+
+    @property
+    def active(self) -> bool:
+        return self.status in (PENDING, RUNNING)
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    @property
+    def rate(self) -> float:
+        return self.meter.rate() if self.status == RUNNING else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """剩余时间（秒），速度未知时为None"""
+        rate = self.rate
+        return (self.total - self.done) / rate if rate > 0 else None
+
+    def _reset(self):
+        self.status = PENDING
+        self.error = ''
+        self.total = self.done = 0
+        self.files = self.files_done = 0
+        self.meter.reset()
+        # 每次开始使用新的停止标志，上一次运行中仍在队列里的单元随旧标志一起失效
+        self._stop = threading.Event()
+        self._remaining = 1
+
+    def _progress(self, count: int):
+        with self._lock:
+            self.done += count
+            self.meter.add(count)
+
+    def _skip(self, count: int):
+        """已在目标端的数据（相同的文件或续传时已完成的块），计入进度但不计入速度"""
+        with self._lock:
+            self.done += count
+
+    def _add_files(self, count: int):
+        with self._lock:
+            self.files += count
+            self._remaining += count
+
+    def _file_finished(self, planned: bool = False) -> bool:
+        """一个文件完成（planned 表示规划结束），返回任务是否全部完成"""
+        with self._lock:
+            if not planned:
+                self.files_done += 1
+            self._remaining -= 1
+            finished = self._remaining == 0 and self.status == RUNNING
+            if finished:
+                self.status = DONE
+            return finished
+
+    def _fail(self, error: Exception):
+        with self._lock:
+            if self.status in (PENDING, RUNNING):
+                self.status = FAILED
+                self.error = str(error) or type(error).__name__
+        self._stop.set()
+
+    def _cancel(self):
+        with self._lock:
+            if self.status in (PENDING, RUNNING):
+                self.status = CANCELLED
+        self._stop.set()
+
+
+class _FileJob:
+    """任务中的一个文件，按 RANGE_SIZE 分为若干块"""
+
+    def __init__(self, task: TransferTask, source: str, target: str, size: int, mtime: int):
+        self.task = task
+        self.stop = task._stop
+        self.source = source
+        self.target = target
+        self.partial = target + PARTIAL_SUFFIX
+        self.size = size
+        self.mtime = mtime
+        self.count = max(1, -(-size // RANGE_SIZE))
+        self.completed = set()
+        self.journal = None
+        self.lock = threading.Lock()
+
+    def span(self, index: int) -> tuple:
+        start = index * RANGE_SIZE
+        return start, min(start + RANGE_SIZE, self.size)
+
+
+class SFTPTransferManager:
+    """SFTP传输管理器：在一条已认证的连接上以有界的工作线程池执行上传和下载
+
+    大文件分块后由多个工作线程（各自的SFTP通道）同时传输，块内的读写请求流水线发送，
+    吞吐量不再受单个请求往返的限制。文件先写入 .part 临时文件，全部块完成后改名并设置修改时间；
+    多块文件已完成的块记录在 JOURNAL_DIR 中，取消、断线或程序退出后重新开始同一传输时跳过。
+    目录树中目标已存在且大小和修改时间与源相同的文件直接跳过。
+
+    get_transport 返回当前可用的 paramiko.Transport（会话重连后可能变化），label 用于区分
+    不同主机上同名路径的续传日志。
+    """
+
+    def __init__(self, get_transport: Callable[[], object], label: str = "",
+                 workers: int = DEFAULT_WORKERS, journal_dir: str = JOURNAL_DIR):
+        self.get_transport = get_transport
+        self.label = label
+        self.workers = workers
+        self.journal_dir = journal_dir
+        self.tasks: List[TransferTask] = []
+        self._queue = queue.Queue()
+        self._threads = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def upload(self, local: str, remote: str) -> TransferTask:
+        """上传本地文件或目录到远程路径 remote（目录时为远程的同名目录）"""
+        return self._submit(TransferTask(UPLOAD, local, remote))
+
+    def download(self, remote: str, local: str) -> TransferTask:
+        """下载远程文件或目录到本地路径 local"""
+        return self._submit(TransferTask(DOWNLOAD, remote, local))
+
+    def retry(self, task: TransferTask):
+        """重新开始失败或取消的任务，已完成的文件和块不再传输"""
+        if not task.active:
+            self._start(task)
+
+    def cancel(self, task: TransferTask):
+        """取消任务，已完成的块保留，可用 retry 继续"""
+        task._cancel()
+
+    def remove(self, task: TransferTask):
+        """从列表中移除已结束的任务"""
+        if not task.active and task in self.tasks:
+            self.tasks.remove(task)
+
+    def close(self):
+        """取消所有任务并结束工作线程"""
+        self._closed = True
+        for task in self.tasks:
+            task._cancel()
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    def _submit(self, task: TransferTask) -> TransferTask:
+        self.tasks.append(task)
+        self._start(task)
+        return task
+
+    def _start(self, task: TransferTask):
+        if self._closed:
+            raise RuntimeError("传输管理器已关闭")
+        task._reset()
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="sshive-sftp", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        self._queue.put((task, task._stop, None, None))
+
+    # ---- 工作线程 ----
+
+    def _work(self):
+        sftp = None
+        while True:
+            unit = self._queue.get()
+            if unit is None:
+                break
+            task, stop, job, index = unit
+            if stop.is_set() or stop is not task._stop:
+                continue
+            try:
+                sftp = self._channel(sftp)
+                if job is None:
+                    self._plan(sftp, task)
+                else:
+                    self._transfer(sftp, job, index)
+            except TransferStopped:
+                pass
+            except Exception as e:
+                if stop is task._stop:
+                    task._fail(e)
+                # 通道可能已不可用，下一个单元重新打开
+                if sftp is not None:
+                    sftp.close()
+                    sftp = None
+        if sftp is not None:
+            sftp.close()
+
+    def _channel(self, sftp):
+        """工作线程的SFTP通道，连接变化（会话重连）或通道关闭后重新打开"""
+        transport = self.get_transport()
+        if sftp is not None:
+            channel = sftp.get_channel()
+            if not channel.closed and channel.get_transport() is transport:
+                return sftp
+            sftp.close()
+        return open_sftp(transport)
+
+    def _plan(self, sftp, task: TransferTask):
+        """遍历要传输的文件，建立目标目录，跳过相同的文件，把各文件的块放入队列
+
+        每列出一个目录就把其中的文件交给其他工作线程，大目录树不必等全部列完才开始传输。
+        """
+        task.status = RUNNING
+        for job in (self._plan_upload if task.direction == UPLOAD else self._plan_download)(sftp, task):
+            if job.stop.is_set():
+                raise TransferStopped()
+            task._add_files(1)
+            self._prepare(sftp, job)
+            if len(job.completed) == job.count:
+                self._finish(sftp, job)
+                continue
+            for index in range(job.count):
+                if index not in job.completed:
+                    self._queue.put((task, job.stop, job, index))
+        task._file_finished(planned=True)
+
+    def _plan_upload(self, sftp, task: TransferTask) -> Iterator[_FileJob]:
+        source, target = task.source, task.target
+        if not os.path.isdir(source):
+            st = os.stat(source)
+            task.total += st.st_size
+            try:
+                existing = sftp.stat(target)
+            except FileNotFoundError:
+                existing = None
+            if not self._same(task, existing, st):
+                yield _FileJob(task, source, target, st.st_size, int(st.st_mtime))
+            return
+
+        for directory, names, filenames in os.walk(source):
+            if task.stopped:
+                raise TransferStopped()
+            relative = os.path.relpath(directory, source)
+            remote_dir = target if relative == '.' else posixpath.join(target, *relative.split(os.sep))
+            # 每个目录只需一次列表请求，不必逐个文件查询
+            existing = self._remote_entries(sftp, remote_dir)
+            if existing is None:
+                sftp.mkdir(remote_dir)
+                existing = {}
+            for name in filenames:
+                path = os.path.join(directory, name)
+                st = os.stat(path)
+                task.total += st.st_size
+                if not self._same(task, existing.get(name), st):
+                    yield _FileJob(task, path, posixpath.join(remote_dir, name), st.st_size, int(st.st_mtime))
+
+    def _plan_download(self, sftp, task: TransferTask) -> Iterator[_FileJob]:
+        source, target = task.source, task.target
+        st = sftp.stat(source)
+        if not stat.S_ISDIR(st.st_mode or 0):
+            task.total += st.st_size
+            if not self._same(task, self._local_stat(target), st):
+                yield _FileJob(task, source, target, st.st_size, int(st.st_mtime))
+            return
+
+        pending = [(source, target)]
+        while pending:
+            if task.stopped:
+                raise TransferStopped()
+            remote_dir, local_dir = pending.pop()
+            os.makedirs(local_dir, exist_ok=True)
+            for entry in sftp.listdir_attr(remote_dir):
+                remote = posixpath.join(remote_dir, entry.filename)
+                local = os.path.join(local_dir, entry.filename)
+                mode = entry.st_mode or 0
+                if stat.S_ISDIR(mode):
+                    pending.append((remote, local))
+                elif stat.S_ISREG(mode):
+                    task.total += entry.st_size
+                    if not self._same(task, self._local_stat(local), entry):
+                        yield _FileJob(task, remote, local, entry.st_size, int(entry.st_mtime))
+
+    @staticmethod
+    def _remote_entries(sftp, path: str) -> Optional[dict]:
+        """远程目录中的 {名称: 属性}，目录不存在时返回None"""
+        try:
+            return {entry.filename: entry for entry in sftp.listdir_attr(path)}
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _local_stat(path: str):
+        try:
+            return os.stat(path)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _same(task: TransferTask, existing, st) -> bool:
+        """目标与源大小和修改时间都相同时视为已传输，计入进度"""
+        if existing is None or existing.st_size != st.st_size or int(existing.st_mtime or 0) != int(st.st_mtime):
+            return False
+        task._skip(st.st_size)
+        return True
+
+    # ---- 续传日志 ----
+
+    def _journal_path(self, job: _FileJob) -> str:
+        import hashlib
+
+        key = '\0'.join((job.task.direction, self.label, job.source, job.target))
+        return os.path.join(self.journal_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _load_journal(self, job: _FileJob) -> set:
+        """读取与当前源文件（大小、修改时间、分块大小）一致的已完成块"""
+        try:
+            with open(job.journal, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return set()
+        if (state.get('size'), state.get('mtime'), state.get('range_size')) != (job.size, job.mtime, RANGE_SIZE):
+            return set()
+        return {index for index in state.get('completed', []) if 0 <= index < job.count}
+
+    def _save_journal(self, job: _FileJob):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        temp = job.journal + '.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'source': job.source, 'target': job.target, 'size': job.size, 'mtime': job.mtime,
+                       'range_size': RANGE_SIZE, 'completed': sorted(job.completed)}, f)
+        os.replace(temp, job.journal)
+
+    def _drop_journal(self, job: _FileJob):
+        if job.journal is not None:
+            try:
+                os.remove(job.journal)
+            except FileNotFoundError:
+                pass
+
+    # ---- 传输 ----
+
+    def _prepare(self, sftp, job: _FileJob):
+        """建立 .part 文件；多块文件有有效的续传日志且 .part 仍在时沿用已完成的块
+
+        单块文件由传输它的线程直接创建，目录树中大量小文件不必各多一次往返。
+        """
+        if job.count == 1:
+            return
+        job.journal = self._journal_path(job)
+        completed = self._load_journal(job)
+        if job.task.direction == DOWNLOAD:
+            if completed and self._local_stat(job.partial) is not None:
+                job.completed = completed
+            with open(job.partial, 'r+b' if job.completed else 'wb') as f:
+                f.truncate(job.size)
+        else:
+            if completed:
+                try:
+                    sftp.stat(job.partial)
+                    job.completed = completed
+                except FileNotFoundError:
+                    pass
+            if not job.completed:
+                sftp.open(job.partial, 'wb').close()
+        if job.completed:
+            job.task._skip(sum(end - start for start, end in map(job.span, job.completed)))
+
+    def _transfer(self, sftp, job: _FileJob, index: int):
+        if job.task.direction == DOWNLOAD:
+            self._download_range(sftp, job, index)
+        else:
+            self._upload_range(sftp, job, index)
+        with job.lock:
+            job.completed.add(index)
+            finished = len(job.completed) == job.count
+            if not finished:
+                self._save_journal(job)
+        if finished:
+            self._finish(sftp, job)
+
+    def _download_range(self, sftp, job: _FileJob, index: int):
+        task = job.task
+        start, end = job.span(index)
+        chunks = [(offset, min(REQUEST_SIZE, end - offset)) for offset in range(start, end, REQUEST_SIZE)]
+        with sftp.open(job.source, 'rb') as remote, open(job.partial, 'wb' if job.count == 1 else 'r+b') as local:
+            local.seek(start)
+            if not chunks:
+                return
+            for (offset, length), data in zip(chunks, remote.readv(chunks, PIPELINE_DEPTH)):
+                if job.stop.is_set():
+                    raise TransferStopped()
+                if len(data) != length:
+                    raise IOError(f"{job.source} 在传输过程中变短")
+                local.write(data)
+                task._progress(length)
+
+    def _upload_range(self, sftp, job: _FileJob, index: int):
+        task = job.task
+        start, end = job.span(index)
+        with open(job.source, 'rb') as local, sftp.open(job.partial, 'wb' if job.count == 1 else 'r+b') as remote:
+            # 写请求不逐个等待确认，关闭文件时统一检查
+            remote.set_pipelined(True)
+            local.seek(start)
+            remote.seek(start)
+            position = start
+            while position < end:
+                if job.stop.is_set():
+                    raise TransferStopped()
+                data = local.read(min(REQUEST_SIZE * 8, end - position))
+                if not data:
+                    raise IOError(f"{job.source} 在传输过程中变短")
+                remote.write(data)
+                position += len(data)
+                task._progress(len(data))
+
+    def _finish(self, sftp, job: _FileJob):
+        """全部块完成：.part 改为目标名并设置修改时间"""
+        times = (job.mtime, job.mtime)
+        if job.task.direction == DOWNLOAD:
+            os.replace(job.partial, job.target)
+            os.utime(job.target, times)
+        else:
+            try:
+                sftp.posix_rename(job.partial, job.target)
+            except IOError:
+                # 服务器不支持 posix-rename 扩展时，普通 rename 不能覆盖已有文件
+                try:
+                    sftp.remove(job.target)
+                except IOError:
+                    pass
+                sftp.rename(job.partial, job.target)
+            sftp.utime(job.target, times)
+        self._drop_journal(job)
+        job.task._file_finished()
@@ -1,85 +1,462 @@
-import paramiko
+import socket
 import threading
 import time
-from PyQt6.QtCore import QObject, pyqtSignal
+from typing import TYPE_CHECKING, Optional
+from PyQt6.QtCore import QObject, Qt, QTimer, pyqtSignal
+from io_reactor import IOReactor, get_reactor
+from output_coalescer import OutputCoalescer
+from send_queue import SendQueue
+from ssh_connect import ConnectCancelled, authenticate, connect_slot
+from transport_pool import TransportLease, auth_fingerprint, get_transport_pool
+
+if TYPE_CHECKING:
+    # paramiko 在第一次连接时由 ssh_connect 导入，线程池在第一次连接时创建，都不拖慢启动
+    from concurrent.futures import ThreadPoolExecutor
+    import paramiko
+
+
+# 同时建立连接的最大数量
+CONNECT_WORKERS = 16
+
+_connect_pool: Optional['ThreadPoolExecutor'] = None
+_connect_pool_lock = threading.Lock()
+
+
+def get_connect_pool() -> 'ThreadPoolExecutor':
+    """获取全局共享的连接线程池"""
+    global _connect_pool
+    with _connect_pool_lock:
+        if _connect_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _connect_pool = ThreadPoolExecutor(CONNECT_WORKERS, thread_name_prefix="sshive-connect")
+        return _connect_pool
+
+
+def paste_payload(data: bytes, bracketed: bool = False) -> tuple:
+    """粘贴数据及其结尾标记长度 (payload, suffix_len)，括号粘贴时加上 ESC [200~ / ESC [201~"""
+    if bracketed:
+        return b'\x1b[200~' + data + b'\x1b[201~', 6
+    return data, 0
 
 
 class SSHClient(QObject):
     """SSH客户端，处理连接和命令执行"""
 
-    output_received = pyqtSignal(str)
+    output_received = pyqtSignal(bytes)
     connection_closed = pyqtSignal()
     connection_error = pyqtSignal(str)
+    connect_progress = pyqtSignal(str)
+    connected = pyqtSignal()
+    reconnecting = pyqtSignal(int, float)
+    paste_progress = pyqtSignal(int, int)
+    _send_failed = pyqtSignal(str)
+    _progress = pyqtSignal(str, object)
+    _established = pyqtSignal(object, object)
+    _remote_closed = pyqtSignal(bool)
+
+    # 每次可读事件最多读取的字节数，避免单个会话长时间占用共享I/O线程
+    MAX_READ_PER_EVENT = 256 * 1024
+    # 每次发送调用的数据块大小，以及每轮最多发送的字节数
+    SEND_CHUNK = 32 * 1024
+    MAX_WRITE_PER_EVENT = 256 * 1024
+    # 粘贴数据最多占用的远端窗口，超出后暂停粘贴，随后的按键只需排在这部分数据之后；
+    # 窗口超过 BULK_STALL_TIMEOUT 秒没有增长时不再限制，以免远端迟迟不调整窗口而卡住
+    MAX_BULK_IN_FLIGHT = 512 * 1024
+    BULK_STALL_TIMEOUT = 1.0
+    # 连接意外中断后自动重连的次数；第一次立即重连，之后的等待时间从 RECONNECT_BASE_DELAY
+    # 起逐次加倍，最长 RECONNECT_MAX_DELAY 秒
+    RECONNECT_ATTEMPTS = 8
+    RECONNECT_BASE_DELAY = 1.0
+    RECONNECT_MAX_DELAY = 30.0
 
-    def __init__(self):
+    def __init__(self, reactor: IOReactor = None, output_fps: int = OutputCoalescer.DEFAULT_FPS):
         super().__init__()
         self.client = None
+        self.lease = None
         self.channel = None
         self.is_connected = False
-        self.read_thread = None
+        self.is_connecting = False
+        self.term_width = 80
+        self.term_height = 24
+        self.reactor = reactor or get_reactor()
+        self._cancel = threading.Event()
+        self._sock = None
+        self._sock_lock = threading.Lock()
+        self._shell_size = None
+        self.send_queue = SendQueue()
+        self._peak_window = 0
+        self._last_window = 0
+        self._window_grew = 0.0
+        self.auto_reconnect = True
+        # 会话录制（SessionRecorder），由标签页设置；输出在I/O线程中直接交给它
+        self.recorder = None
+        # 返回本会话终端当前是否启用括号粘贴，由标签页设置；广播粘贴时按各会话分别决定
+        self.bracketed_paste = None
+        self._target = None
+        self._reconnect_attempt = 0
+        self._reconnect_timer = QTimer(self)
+        self._reconnect_timer.setSingleShot(True)
+        self._reconnect_timer.timeout.connect(self._reconnect)
+
+        # I/O线程的输出经合并器按帧率投递，output_received 总是在GUI线程发出
+        self.coalescer = OutputCoalescer(output_fps, self)
+        self.coalescer.output_ready.connect(self.output_received)
+        # 终端处理不过来时暂停读取通道，由SSH通道窗口让远端减速
+        self.coalescer.on_pause = self._pause_reading
+        self.coalescer.on_resume = self._resume_reading
+        self._remote_closed.connect(self._on_remote_closed, Qt.ConnectionType.QueuedConnection)
+        self._progress.connect(self._on_progress, Qt.ConnectionType.QueuedConnection)
+        self._established.connect(self._on_established, Qt.ConnectionType.QueuedConnection)
+        self._send_failed.connect(self.connection_error, Qt.ConnectionType.QueuedConnection)
 
     def connect(self, host: str, port: int, username: str, password: str = "",
                 auth_type: str = "password", private_key_path: str = ""):
-        """连接到SSH服务器"""
+        """同步连接到SSH服务器（阻塞调用线程）"""
+        self._target = (host, port, username, password, auth_type, private_key_path)
+        self._cancel = threading.Event()
         try:
-            self.client = paramiko.SSHClient()
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            lease, channel = self._open(self._cancel, host, port, username, password,
+                                        auth_type, private_key_path)
+        except Exception as e:
+            self.connection_error.emit(f"连接失败: {str(e)}")
+            return False
+        self._attach(lease, channel)
+        return True
 
-            if auth_type == "key" and private_key_path:
-                key = paramiko.RSAKey.from_private_key_file(private_key_path)
-                self.client.connect(host, port=port, username=username, pkey=key, timeout=10)
-            else:
-                self.client.connect(host, port=port, username=username, password=password, timeout=10)
+    def connect_async(self, host: str, port: int, username: str, password: str = "",
+                      auth_type: str = "password", private_key_path: str = ""):
+        """在连接线程池中建立连接，立即返回
 
-            self.channel = self.client.invoke_shell(term='xterm', width=80, height=24)
-            self.channel.settimeout(0.1)
-            self.is_connected = True
+        过程中发出 connect_progress，成功后发出 connected，失败发出 connection_error；
+        cancel_connect() 或 disconnect() 可随时取消。连接参数保留在内存中供断线后自动重连。
+        """
+        if self.is_connected or self.is_connecting:
+            return
+        self._target = (host, port, username, password, auth_type, private_key_path)
+        self._reconnect_attempt = 0
+        self._start_connect()
 
-            self.read_thread = threading.Thread(target=self._read_output, daemon=True)
-            self.read_thread.start()
+    def _start_connect(self):
+        self.is_connecting = True
+        cancel = self._cancel = threading.Event()
+        get_connect_pool().submit(self._connect_worker, cancel, *self._target)
 
-            return True
+    def cancel_connect(self):
+        """取消进行中的连接，阻塞在网络读写上的握手会被立即打断"""
+        if not self.is_connecting:
+            return
+        self.is_connecting = False
+        self._cancel.set()
+        with self._sock_lock:
+            sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _connect_worker(self, cancel: threading.Event, *args):
+        """连接线程：建立连接后交回GUI线程"""
+        try:
+            lease, channel = self._open(cancel, *args)
         except Exception as e:
-            self.connection_error.emit(f"连接失败: {str(e)}")
+            self._established.emit(e, cancel)
+            return
+        self._established.emit((lease, channel), cancel)
+
+    def _open(self, cancel: threading.Event, host: str, port: int, username: str, password: str,
+              auth_type: str, private_key_path: str):
+        """获取已认证的连接（优先复用连接池中的连接）并打开交互式终端，返回 (lease, channel)"""
+        pool = get_transport_pool()
+        auth = auth_fingerprint(auth_type, password, private_key_path)
+        lease = pool.acquire(host, port, username, auth)
+        if lease is None:
+            with connect_slot(host, port, username, cancel):
+                # 等待期间其他标签页可能已经建立了连接
+                lease = pool.acquire(host, port, username, auth)
+                if lease is None:
+                    client = self._authenticate(cancel, host, port, username, password,
+                                                auth_type, private_key_path)
+                    lease = pool.add(host, port, username, auth, client)
+                    return lease, self._open_shell(cancel, lease)
+
+        self._progress.emit("复用已有连接...", cancel)
+        try:
+            return lease, self._open_shell(cancel, lease)
+        except ConnectCancelled:
+            raise
+        except Exception:
+            # 复用的连接无法再打开通道（如服务端限制了会话数），改为新建连接
+            pass
+        client = self._authenticate(cancel, host, port, username, password, auth_type, private_key_path)
+        lease = pool.add(host, port, username, auth, client)
+        return lease, self._open_shell(cancel, lease)
+
+    def _authenticate(self, cancel: threading.Event, host: str, port: int, username: str, password: str,
+                      auth_type: str, private_key_path: str) -> 'paramiko.SSHClient':
+        """建立TCP连接并完成握手和认证，连接中的socket登记后可被 cancel_connect 关闭"""
+        def on_socket(sock):
+            with self._sock_lock:
+                self._sock = sock
+
+        return authenticate(host, port, username, password, auth_type, private_key_path, cancel=cancel,
+                            progress=lambda message: self._progress.emit(message, cancel),
+                            on_socket=on_socket)
+
+    def _open_shell(self, cancel: threading.Event, lease: TransportLease):
+        """在连接上打开交互式终端通道，失败时释放对连接的引用"""
+        try:
+            self._progress.emit("正在打开终端...", cancel)
+            self._shell_size = (self.term_width, self.term_height)
+            channel = lease.client.invoke_shell(term='xterm', width=self.term_width, height=self.term_height)
+            channel.settimeout(0.1)
+            if cancel.is_set():
+                channel.close()
+                raise ConnectCancelled()
+            return channel
+        except BaseException:
+            get_transport_pool().release(lease)
+            raise
+
+    def _on_progress(self, message: str, cancel: threading.Event):
+        """转发连接进度，取消后不再报告"""
+        if cancel is self._cancel and not cancel.is_set():
+            self.connect_progress.emit(message)
+
+    def _on_established(self, result, cancel: threading.Event):
+        """连接线程完成（GUI线程），result 为 (lease, channel) 或连接时的异常"""
+        failed = isinstance(result, Exception)
+        if cancel is not self._cancel or cancel.is_set():
+            # 已取消或已被新的连接替代，丢弃迟到的结果
+            if not failed:
+                result[1].close()
+                get_transport_pool().release(result[0])
+            return
+        self.is_connecting = False
+        if not failed:
+            self._reconnect_attempt = 0
+            self._attach(*result)
+            self.connected.emit()
+        elif self._reconnect_attempt and self._should_retry(result):
+            self._schedule_reconnect()
+        else:
+            self._reconnect_attempt = 0
+            self.connection_error.emit(f"连接失败: {str(result)}")
+
+    def _should_retry(self, error: Exception) -> bool:
+        """重连失败后是否继续重试：次数未用完且不是认证失败（密码或密钥错误，重试也无用）"""
+        import paramiko
+
+        return (self._reconnect_attempt < self.RECONNECT_ATTEMPTS
+                and not isinstance(error, paramiko.AuthenticationException))
+
+    def _schedule_reconnect(self):
+        """安排下一次重连，发出 reconnecting(第几次, 等待秒数)"""
+        self._reconnect_attempt += 1
+        attempt = self._reconnect_attempt
+        delay = 0.0 if attempt == 1 else min(self.RECONNECT_BASE_DELAY * 2 ** (attempt - 2),
+                                             self.RECONNECT_MAX_DELAY)
+        self.reconnecting.emit(attempt, delay)
+        self._reconnect_timer.start(int(delay * 1000))
+
+    def _reconnect(self):
+        if self.is_connected or self.is_connecting or self._target is None:
+            return
+        self._start_connect()
+
+    def _attach(self, lease: TransportLease, channel):
+        """接管已建立的会话并开始监听输出"""
+        self.lease = lease
+        self.client = lease.client
+        self.channel = channel
+        self.is_connected = True
+        # 窗口统计属于上一个通道，重连后从新通道的窗口重新开始
+        self._peak_window = 0
+        self._last_window = 0
+        self._window_grew = 0.0
+        self.reactor.register(channel, self._on_readable)
+        if (self.term_width, self.term_height) != self._shell_size:
+            # 连接期间终端大小已改变
+            self.resize_terminal(self.term_width, self.term_height)
+
+    def _on_readable(self) -> bool:
+        """通道可读时由I/O线程调用，返回False表示停止监听"""
+        channel = self.channel
+        if not self.is_connected or channel is None:
             return False
 
-    def _read_output(self):
-        """读取SSH输出"""
-        while self.is_connected:
-            try:
-                if self.channel and self.channel.recv_ready():
-                    data = self.channel.recv(4096).decode('utf-8', errors='ignore')
-                    self.output_received.emit(data)
+        recorder = self.recorder
+        try:
+            received = 0
+            while channel.recv_ready() and received < self.MAX_READ_PER_EVENT and not self.coalescer.paused:
+                data = channel.recv(65536)
+                if not data:
+                    break
+                received += len(data)
+                self.coalescer.feed(data)
+                if recorder is not None:
+                    recorder.output(data)
+
+            if received == 0 and (channel.closed or channel.eof_received) and not channel.recv_ready():
+                # 远端关闭了会话或连接已断开，交给GUI线程在投递完剩余输出后处理
+                self._remote_closed.emit(self._connection_lost(channel))
+                return False
+            return True
+        except Exception as e:
+            if self.is_connected:
+                if self._connection_lost(channel):
+                    self._remote_closed.emit(True)
                 else:
-                    time.sleep(0.01)
-            except Exception as e:
-                if self.is_connected:
                     self.connection_error.emit(f"读取输出错误: {str(e)}")
-                break
+            return False
+
+    def _pause_reading(self):
+        channel = self.channel
+        if channel is not None:
+            self.reactor.pause(channel)
+
+    def _resume_reading(self):
+        channel = self.channel
+        if channel is not None:
+            self.reactor.resume(channel)
+
+    def _connection_lost(self, channel) -> bool:
+        """通道结束是否由连接中断引起：远端正常退出时总会先发送EOF，连接断开则没有"""
+        lease = self.lease
+        return not channel.eof_received and (lease is None or not lease.is_active())
 
     def send_command(self, command: bytes):
-        """发送命令到SSH服务器"""
-        if self.is_connected and self.channel:
-            try:
-                self.channel.send(command)
-            except Exception as e:
-                self.connection_error.emit(f"发送命令失败: {str(e)}")
+        """发送键盘输入，排在待发送的粘贴数据之前；Ctrl+C 同时取消未发送的粘贴"""
+        if self.queue_input(command):
+            self.reactor.want_write(self.channel, self._on_writable)
+
+    def send_paste(self, data: bytes, bracketed: bool = False):
+        """发送粘贴内容，由I/O线程按发送窗口分块发出，不阻塞界面"""
+        if data and self.queue_paste(*paste_payload(data, bracketed)):
+            self.reactor.want_write(self.channel, self._on_writable)
+
+    def queue_input(self, command: bytes) -> bool:
+        """只把键盘输入放入发送队列，不请求发送；返回False表示未连接"""
+        if not (self.is_connected and self.channel):
+            return False
+        if b'\x03' in command:
+            self.cancel_paste()
+        self.send_queue.put(command)
+        if self.recorder is not None:
+            self.recorder.input(command)
+        return True
+
+    def queue_paste(self, payload: bytes, suffix_len: int = 0) -> bool:
+        """只把 paste_payload() 生成的粘贴数据放入发送队列，不请求发送；payload 可在多个会话间共享"""
+        if not (self.is_connected and self.channel):
+            return False
+        self.send_queue.put_payload(payload, suffix_len)
+        self.paste_progress.emit(self.send_queue.bulk_sent, self.send_queue.bulk_total)
+        if self.recorder is not None:
+            self.recorder.input(payload)
+        return True
+
+    def write_request(self) -> tuple:
+        """(channel, writer)，供 IOReactor.want_write_many 批量请求发送"""
+        return self.channel, self._on_writable
+
+    def cancel_paste(self):
+        """取消尚未发送的粘贴内容"""
+        if self.send_queue.cancel_bulk():
+            self.paste_progress.emit(0, 0)
+            if self.channel:
+                self.reactor.want_write(self.channel, self._on_writable)
+
+    def _on_writable(self) -> bool:
+        """由I/O线程调用，按远端窗口发送队列中的数据；返回True表示还有数据等待发送"""
+        channel = self.channel
+        if not self.is_connected or channel is None:
+            return False
+
+        queue = self.send_queue
+        budget = self.MAX_WRITE_PER_EVENT
+        sent_bulk = False
+        try:
+            while budget > 0:
+                chunk, bulk = queue.peek(min(budget, self.SEND_CHUNK))
+                if not chunk:
+                    break
+                if not channel.send_ready():
+                    # 远端窗口已满，等窗口调整后再发
+                    break
+                if bulk and self._bulk_throttled(channel):
+                    break
+                sent = channel.send(chunk)
+                if sent <= 0:
+                    break
+                queue.consume(sent, bulk)
+                budget -= sent
+                sent_bulk = sent_bulk or bulk
+        except Exception as e:
+            # 连接中断时由读取一侧处理重连，这里不再报告错误
+            if self.is_connected and not self._connection_lost(channel):
+                self._send_failed.emit(f"发送数据失败: {str(e)}")
+            return False
+
+        if sent_bulk:
+            self.paste_progress.emit(queue.bulk_sent, queue.bulk_total)
+        return bool(queue)
+
+    def _bulk_throttled(self, channel) -> bool:
+        """在途的粘贴数据是否已达上限"""
+        window = channel.out_window_size
+        now = time.monotonic()
+        if window > self._last_window:
+            self._window_grew = now
+        self._last_window = window
+        self._peak_window = max(self._peak_window, window)
+        in_flight = self._peak_window - window
+        if in_flight < self.MAX_BULK_IN_FLIGHT:
+            return False
+        if now - self._window_grew > self.BULK_STALL_TIMEOUT:
+            return False
+        return True
 
     def resize_terminal(self, width: int, height: int):
         """调整终端大小"""
+        if self.recorder is not None and (width, height) != (self.term_width, self.term_height):
+            self.recorder.resize(width, height)
+        self.term_width, self.term_height = width, height
         if self.is_connected and self.channel:
             try:
                 self.channel.resize_pty(width=width, height=height)
             except Exception as e:
                 pass
 
+    def _on_remote_closed(self, lost: bool):
+        """远端关闭会话；连接中断时自动重连，重连使用当前的终端大小"""
+        if not self.is_connected:
+            return
+        if lost and self.auto_reconnect and self._target is not None:
+            self._close_session()
+            self._schedule_reconnect()
+        else:
+            self.disconnect()
+
     def disconnect(self):
-        """断开连接"""
-        self.is_connected = False
-        if self.channel:
-            self.channel.close()
-            self.channel = None
-        if self.client:
-            self.client.close()
-            self.client = None
+        """断开连接，连接尚未完成时取消连接，等待重连时不再重连"""
+        self._reconnect_timer.stop()
+        self._reconnect_attempt = 0
+        self.cancel_connect()
+        self._close_session()
         self.connection_closed.emit()
+
+    def _close_session(self):
+        """关闭通道并释放连接"""
+        self.is_connected = False
+        self.coalescer.flush()
+        self.send_queue.clear()
+        channel, self.channel = self.channel, None
+        if channel:
+            self.reactor.unregister(channel)
+            channel.close()
+        self.client = None
+        lease, self.lease = self.lease, None
+        if lease:
+            # 连接可能还被其他标签页使用，由连接池按引用计数关闭
+            get_transport_pool().release(lease)
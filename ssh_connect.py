@@ -0,0 +1,239 @@
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Optional
+from keepalive import KEEPALIVE_COUNT_MAX, KEEPALIVE_INTERVAL, get_keepalive_monitor
+from transport_pool import TransportLease, auth_fingerprint, get_transport_pool
+
+if TYPE_CHECKING:
+    import paramiko
+
+
+# TCP连接、协议握手和认证各自的超时（秒）
+CONNECT_TIMEOUT = 10
+
+# 解析出的地址缓存的秒数，重连时不必再次查询DNS
+ADDRESS_TTL = 300
+
+_addresses = {}
+_addresses_lock = threading.Lock()
+_keys = {}
+_keys_lock = threading.Lock()
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+class ConnectCancelled(Exception):
+    """连接过程被取消"""
+
+
+class _ConnectSlot:
+    """同一目标的连接建立互斥，以及最近一次失败的原因"""
+
+    __slots__ = ('lock', 'users', 'failure')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+        self.failure = None
+
+
+def _no_progress(message: str):
+    pass
+
+
+def resolve(host: str, port: int) -> list:
+    """解析主机地址 [(family, type, proto, address)]，结果缓存 ADDRESS_TTL 秒"""
+    key = (host, port)
+    now = time.monotonic()
+    with _addresses_lock:
+        cached = _addresses.get(key)
+        if cached is not None and cached[0] > now:
+            return list(cached[1])
+    infos = [(family, type_, proto, address) for family, type_, proto, _, address
+             in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    with _addresses_lock:
+        _addresses[key] = (now + ADDRESS_TTL, infos)
+    return list(infos)
+
+
+def _remember_address(host: str, port: int, info: tuple):
+    """把连接成功的地址排到最前，下次优先尝试"""
+    with _addresses_lock:
+        cached = _addresses.get((host, port))
+        if cached is not None and info in cached[1]:
+            cached[1].remove(info)
+            cached[1].insert(0, info)
+
+
+def _forget_addresses(host: str, port: int):
+    with _addresses_lock:
+        _addresses.pop((host, port), None)
+
+
+def enable_keepalive(sock: socket.socket, interval: float = KEEPALIVE_INTERVAL,
+                     count_max: int = KEEPALIVE_COUNT_MAX):
+    """开启TCP保活；Linux 下同时限制未确认数据的等待时间，对端失联时由系统及时断开连接
+
+    这是保活探测（见 keepalive.py）之外的系统级保障，不支持的选项直接跳过。
+    """
+    if interval <= 0:
+        return
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    for name, value in (('TCP_KEEPIDLE', interval), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count_max),
+                        ('TCP_USER_TIMEOUT', interval * count_max * 1000)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), int(value)))
+    for level, option, value in options:
+        try:
+            sock.setsockopt(level, option, value)
+        except OSError:
+            pass
+
+
+def open_socket(host: str, port: int, cancel: Optional[threading.Event] = None,
+                on_socket: Callable[[Optional[socket.socket]], None] = None,
+                timeout: float = CONNECT_TIMEOUT) -> socket.socket:
+    """依次尝试解析出的地址建立TCP连接
+
+    每个尝试中的socket都会交给 on_socket 登记，取消方关闭它即可打断阻塞中的连接。
+    所有地址都连接失败时丢弃地址缓存，下次连接重新解析。
+    """
+    error = None
+    for info in resolve(host, port):
+        family, type_, proto, address = info
+        if cancel is not None and cancel.is_set():
+            raise ConnectCancelled()
+        sock = socket.socket(family, type_, proto)
+        if on_socket is not None:
+            on_socket(sock)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            error = e
+            sock.close()
+            continue
+        if cancel is not None and cancel.is_set():
+            sock.close()
+            raise ConnectCancelled()
+        _remember_address(host, port, info)
+        enable_keepalive(sock, get_keepalive_monitor().interval, get_keepalive_monitor().count_max)
+        return sock
+    _forget_addresses(host, port)
+    raise error or OSError(f"无法解析地址: {host}")
+
+
+def load_private_key(path: str) -> 'paramiko.PKey':
+    """读取私钥，解析结果按文件修改时间缓存，重连时不必重新读取和解析"""
+    import paramiko
+
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _keys_lock:
+        pkey = _keys.get(path)
+        if pkey is not None and pkey[0] == key:
+            return pkey[1]
+    pkey = paramiko.RSAKey.from_private_key_file(path)
+    with _keys_lock:
+        _keys[path] = (key, pkey)
+    return pkey
+
+
+@contextmanager
+def connect_slot(host: str, port: int, username: str, cancel: Optional[threading.Event] = None):
+    """同一 (主机, 端口, 用户名) 同时只有一个连接在建立
+
+    多个标签页同时连接（或断线后同时重连）同一主机时，后来者等第一个完成后直接复用
+    它的连接，只进行一次握手和认证；第一个失败时等待者得到同样的错误，不再逐个超时。
+    等待期间可被 cancel 打断。
+    """
+    key = (host, port, username)
+    with _slots_lock:
+        slot = _slots.get(key) or _slots.setdefault(key, _ConnectSlot())
+        slot.users += 1
+    try:
+        waited = not slot.lock.acquire(blocking=False)
+        if waited:
+            while not slot.lock.acquire(timeout=0.1):
+                if cancel is not None and cancel.is_set():
+                    raise ConnectCancelled()
+        try:
+            if waited and slot.failure is not None:
+                raise slot.failure
+            slot.failure = None
+            try:
+                yield
+            except ConnectCancelled:
+                raise
+            except Exception as e:
+                import paramiko
+
+                # 认证失败只与这一次使用的凭据有关，不传给等待者
+                if not isinstance(e, paramiko.AuthenticationException):
+                    slot.failure = e
+                raise
+        finally:
+            slot.lock.release()
+    finally:
+        with _slots_lock:
+            slot.users -= 1
+            if slot.users == 0:
+                del _slots[key]
+
+
+def authenticate(host: str, port: int, username: str, password: str = "",
+                 auth_type: str = "password", private_key_path: str = "",
+                 cancel: Optional[threading.Event] = None,
+                 progress: Callable[[str], None] = _no_progress,
+                 on_socket: Callable[[Optional[socket.socket]], None] = None,
+                 timeout: float = CONNECT_TIMEOUT) -> 'paramiko.SSHClient':
+    """建立TCP连接并完成握手和认证，返回已认证的 paramiko.SSHClient"""
+    # paramiko 导入较慢，只在真正建立连接时导入
+    import paramiko
+
+    progress(f"正在连接 {host}:{port}...")
+    sock = open_socket(host, port, cancel, on_socket, timeout)
+    client = paramiko.SSHClient()
+    try:
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        progress("正在认证...")
+        options = dict(port=port, username=username, sock=sock, timeout=timeout,
+                       banner_timeout=timeout, auth_timeout=timeout)
+        if auth_type == "key" and private_key_path:
+            options['pkey'] = load_private_key(private_key_path)
+        else:
+            options['password'] = password
+        client.connect(host, **options)
+        if cancel is not None and cancel.is_set():
+            raise ConnectCancelled()
+        get_keepalive_monitor().watch(client.get_transport())
+        return client
+    except BaseException:
+        client.close()
+        sock.close()
+        raise
+    finally:
+        if on_socket is not None:
+            on_socket(None)
+
+
+def lease_connection(host: str, port: int, username: str, password: str = "",
+                     auth_type: str = "password", private_key_path: str = "",
+                     **options) -> TransportLease:
+    """从连接池获取到主机的已认证连接，没有可用连接时新建并登记；用完后须 release"""
+    pool = get_transport_pool()
+    auth = auth_fingerprint(auth_type, password, private_key_path)
+    lease = pool.acquire(host, port, username, auth)
+    if lease is not None:
+        return lease
+    with connect_slot(host, port, username, options.get('cancel')):
+        # 等待期间其他线程可能已经建立了连接
+        lease = pool.acquire(host, port, username, auth)
+        if lease is not None:
+            return lease
+        client = authenticate(host, port, username, password, auth_type, private_key_path, **options)
+        return pool.add(host, port, username, auth, client)
@@ -0,0 +1,244 @@
+import argparse
+import sys
+
+# 命令行工具只导入各子命令真正用到的模块：PyQt6 从不导入，paramiko 和 cryptography
+# 只在需要建立连接或解密密码时才导入，list/search 只需要 sqlite3。
+
+
+# 退出码：全部成功 / 有主机失败 / 参数错误 / 被中断
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+def _normalize_path(path: str) -> str:
+    return ' / '.join(part.strip() for part in path.split('/') if part.strip())
+
+
+def open_database(args):
+    from database import DatabaseManager
+    return DatabaseManager(args.db)
+
+
+def print_hosts(db, hosts: list, as_json: bool = False):
+    """输出主机列表：默认为对齐的文本列，--json 时每行一个JSON对象"""
+    groups = dict(db.get_group_paths()) if any(host.group_id for host in hosts) else {}
+    if as_json:
+        import json
+        sys.stdout.writelines(json.dumps({**host.to_dict(), 'group': groups.get(host.group_id, '')},
+                                         ensure_ascii=False) + '\n' for host in hosts)
+        return
+    rows = [(host.name, f"{host.username}@{host.host}:{host.port}", groups.get(host.group_id, ''),
+             host.description) for host in hosts]
+    widths = [max((len(row[i]) for row in rows), default=0) for i in range(3)]
+    lines = ('  '.join(value.ljust(width) for value, width in zip(row, widths)) + ('  ' + row[3] if row[3] else '')
+             for row in rows)
+    sys.stdout.writelines(line.rstrip() + '\n' for line in lines)
+
+
+def cmd_list(args) -> int:
+    """列出主机，可按分组或标签过滤"""
+    db = open_database(args)
+    try:
+        if args.group or args.tag:
+            args.all, args.hosts = False, []
+            hosts = select_hosts(db, args)
+        else:
+            hosts = db.get_all_hosts()
+        print_hosts(db, hosts, args.json)
+        return EXIT_OK
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    finally:
+        db.close()
+
+
+def cmd_search(args) -> int:
+    """按相关度搜索主机，没有结果时返回1"""
+    db = open_database(args)
+    try:
+        hosts = db.search_hosts(' '.join(args.keyword), args.limit)
+        print_hosts(db, hosts, args.json)
+        return EXIT_OK if hosts else EXIT_FAILED
+    finally:
+        db.close()
+
+
+def resolve_host(db, name: str):
+    """按名称或地址精确查找，找不到时取唯一的搜索结果；无法确定时抛出 ValueError"""
+    hosts = db.find_hosts([name]) or db.search_hosts(name, 10)
+    if not hosts:
+        raise ValueError(f"找不到主机: {name}")
+    if len(hosts) > 1:
+        names = ', '.join(host.name for host in hosts[:10])
+        raise ValueError(f"匹配到多个主机: {names}")
+    return hosts[0]
+
+
+def cmd_connect(args) -> int:
+    """在当前终端中打开到主机的交互式会话，返回远端shell的退出码"""
+    import os
+    from cli_shell import run_shell, terminal_size
+    from ssh_connect import authenticate
+
+    db = open_database(args)
+    try:
+        host = resolve_host(db, args.host)
+        password = db.get_credentials(host.id) if host.auth_type == 'password' else ''
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    finally:
+        db.close()
+
+    try:
+        client = authenticate(host.host, host.port, host.username, password, host.auth_type,
+                              host.private_key_path, progress=lambda message: print(message, file=sys.stderr))
+    except Exception as e:
+        print(f"连接失败: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    try:
+        width, height = terminal_size()
+        channel = client.get_transport().open_session()
+        channel.get_pty(term=os.environ.get('TERM', 'xterm'), width=width, height=height)
+        channel.invoke_shell()
+        run_shell(channel)
+        return channel.recv_exit_status() if channel.exit_status_ready() else EXIT_OK
+    finally:
+        client.close()
+
+
+def select_hosts(db, args) -> list:
+    """按命令行参数从数据库中选出主机，找不到时抛出 ValueError"""
+    hosts = {}
+    if args.all:
+        hosts.update((host.id, host) for host in db.get_all_hosts())
+    if args.hosts:
+        found = db.find_hosts(args.hosts)
+        known = {host.name for host in found} | {host.host for host in found}
+        missing = [name for name in args.hosts if name not in known]
+        if missing:
+            raise ValueError(f"找不到主机: {', '.join(missing)}")
+        hosts.update((host.id, host) for host in found)
+    for path in args.group or ():
+        paths = {group_path: group_id for group_id, group_path in db.get_group_paths()}
+        group_id = paths.get(_normalize_path(path))
+        if group_id is None:
+            raise ValueError(f"找不到分组: {path}")
+        hosts.update((host.id, host) for host in db.get_subtree_hosts(group_id))
+    for name in args.tag or ():
+        tag_id = next((tag_id for tag_id, tag_name, _ in db.get_tags() if tag_name == name), None)
+        if tag_id is None:
+            raise ValueError(f"找不到标签: {name}")
+        hosts.update((host.id, host) for host in db.get_tag_hosts(tag_id, limit=-1))
+    return sorted(hosts.values(), key=lambda host: (host.name, host.id))
+
+
+def cmd_exec(args) -> int:
+    """在选中的主机上批量执行命令，输出按行加 [主机名] 前缀"""
+    import threading
+    from batch_runner import BatchRunner, LineBuffer, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+
+    if not (args.all or args.hosts or args.group or args.tag):
+        print("错误: 需要指定主机名、--group、--tag 或 --all", file=sys.stderr)
+        return EXIT_USAGE
+
+    db = open_database(args)
+    try:
+        hosts = select_hosts(db, args)
+        if not hosts:
+            print("错误: 没有匹配的主机", file=sys.stderr)
+            return EXIT_USAGE
+        runner = BatchRunner(args.jobs or DEFAULT_CONCURRENCY, args.timeout or DEFAULT_TIMEOUT,
+                             db.get_credentials)
+        lines = LineBuffer()
+        write_lock = threading.Lock()
+
+        def write(items):
+            with write_lock:
+                for host, stream, line in items:
+                    out = sys.stderr if stream == 'stderr' else sys.stdout
+                    out.write(f"[{host['name']}] {line}\n")
+                sys.stdout.flush()
+
+        def on_output(host, stream, data):
+            if not args.quiet:
+                write(lines.feed(host, stream, data))
+
+        def on_result(result):
+            if not args.quiet:
+                write(lines.flush(result.host))
+            if not result.ok:
+                with write_lock:
+                    print(f"[{result.host['name']}] {result.status_text}", file=sys.stderr, flush=True)
+
+        outcome = {}
+        # 密码在这里（主线程）取出，执行放到后台线程，主线程保持响应 Ctrl+C
+        jobs = runner.fetch_passwords(hosts)
+        worker = threading.Thread(
+            target=lambda: outcome.setdefault('summary', runner.run(jobs, args.command, on_output, on_result)),
+            daemon=True)
+        worker.start()
+        interrupted = False
+        while worker.is_alive():
+            try:
+                worker.join(0.2)
+            except KeyboardInterrupt:
+                interrupted = True
+                runner.cancel()
+        summary = outcome['summary']
+        print(summary.format(), file=sys.stderr)
+        if interrupted:
+            return EXIT_INTERRUPTED
+        return EXIT_OK if not summary.failed else EXIT_FAILED
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    finally:
+        db.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sshive", description="SSHive 命令行工具")
+    parser.add_argument("--db", default="sshive.db", help="数据库文件（默认 sshive.db）")
+    commands = parser.add_subparsers(dest="command_name", required=True)
+
+    list_parser = commands.add_parser("list", help="列出主机")
+    list_parser.add_argument("-g", "--group", action="append", help="只列出分组（含子分组）中的主机，可重复")
+    list_parser.add_argument("-t", "--tag", action="append", help="只列出带有标签的主机，可重复")
+    list_parser.add_argument("--json", action="store_true", help="每行输出一个JSON对象")
+    list_parser.set_defaults(handler=cmd_list)
+
+    search_parser = commands.add_parser("search", help="搜索主机（名称、地址、用户名、描述）")
+    search_parser.add_argument("keyword", nargs="+", help="关键词")
+    search_parser.add_argument("-n", "--limit", type=int, default=-1, help="最多显示的结果数")
+    search_parser.add_argument("--json", action="store_true", help="每行输出一个JSON对象")
+    search_parser.set_defaults(handler=cmd_search)
+
+    connect_parser = commands.add_parser("connect", help="在当前终端中连接主机")
+    connect_parser.add_argument("host", help="主机名称或地址，不完全匹配时使用唯一的搜索结果")
+    connect_parser.set_defaults(handler=cmd_connect)
+
+    exec_parser = commands.add_parser("exec", help="在多台主机上批量执行命令")
+    exec_parser.add_argument("command", help="要执行的命令")
+    exec_parser.add_argument("hosts", nargs="*", help="主机名称或地址")
+    exec_parser.add_argument("-g", "--group", action="append", help="分组路径，如 prod/eu（含子分组），可重复")
+    exec_parser.add_argument("-t", "--tag", action="append", help="标签，可重复")
+    exec_parser.add_argument("-a", "--all", action="store_true", help="所有主机")
+    # 默认值在 cmd_exec 中取 batch_runner 的设置，解析参数时不导入 batch_runner
+    exec_parser.add_argument("-j", "--jobs", type=int, help="同时执行的主机数（默认 32）")
+    exec_parser.add_argument("--timeout", type=float, help="单个主机的超时秒数（默认 60）")
+    exec_parser.add_argument("-q", "--quiet", action="store_true", help="不显示命令输出，只显示失败和汇总")
+    exec_parser.set_defaults(handler=cmd_exec)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import sys
+import time
+
+
+# 本模块被导入的时刻作为计时起点，main.py 应最先导入本模块
+_STARTED = time.perf_counter()
+
+# --startup-check 未给出预算时，首次绘制允许的耗时（毫秒）
+DEFAULT_BUDGET_MS = 1000.0
+
+
+class StartupProfiler:
+    """启动阶段计时
+
+    mark() 记录各阶段结束的时刻，report() 给出每个阶段的耗时和累计耗时。
+    未启用时 mark() 仍记录时刻（开销可忽略），只是不输出报告。
+    """
+
+    FIRST_PAINT = "首次绘制"
+
+    def __init__(self, enabled: bool = False, budget_ms: float = None):
+        self.enabled = enabled or budget_ms is not None
+        self.budget_ms = budget_ms
+        self.marks = []
+
+    @classmethod
+    def from_argv(cls, argv: list) -> 'StartupProfiler':
+        """从命令行参数中取出 --profile-startup / --startup-check[=毫秒]，并从 argv 中移除"""
+        enabled, budget_ms = False, None
+        for arg in list(argv[1:]):
+            if arg == '--profile-startup':
+                enabled = True
+            elif arg == '--startup-check' or arg.startswith('--startup-check='):
+                value = arg.partition('=')[2]
+                budget_ms = float(value) if value else DEFAULT_BUDGET_MS
+            else:
+                continue
+            argv.remove(arg)
+        return cls(enabled, budget_ms)
+
+    @property
+    def checking(self) -> bool:
+        """是否为 --startup-check 模式：报告后退出，超出预算时返回非零"""
+        return self.budget_ms is not None
+
+    def mark(self, phase: str):
+        self.marks.append((phase, time.perf_counter()))
+
+    def elapsed_ms(self, phase: str) -> float:
+        """从起点到某个阶段结束的毫秒数，阶段不存在时返回-1"""
+        for name, at in self.marks:
+            if name == phase:
+                return (at - _STARTED) * 1000
+        return -1.0
+
+    def report(self) -> str:
+        lines = ["启动耗时:"]
+        previous = _STARTED
+        for phase, at in self.marks:
+            lines.append(f"  {phase:<8} {(at - previous) * 1000:8.1f} ms   累计 {(at - _STARTED) * 1000:8.1f} ms")
+            previous = at
+        return '\n'.join(lines)
+
+    def finish(self) -> int:
+        """输出报告；检查模式下返回退出码：首次绘制超出预算时为1"""
+        if not self.enabled:
+            return 0
+        print(self.report(), file=sys.stderr)
+        if not self.checking:
+            return 0
+        first_paint = self.elapsed_ms(self.FIRST_PAINT)
+        if first_paint < 0 or first_paint > self.budget_ms:
+            print(f"首次绘制 {first_paint:.1f} ms 超出预算 {self.budget_ms:.0f} ms", file=sys.stderr)
+            return 1
+        return 0
+
+
+def call_after_first_paint(widget, callback):
+    """widget 第一次绘制完成、回到事件循环后调用 callback"""
+    from PyQt6.QtCore import QObject, QEvent, QTimer
+
+    class FirstPaintFilter(QObject):
+        def eventFilter(self, obj, event):
+            if obj is widget and event.type() == QEvent.Type.Paint:
+                widget.removeEventFilter(self)
+                QTimer.singleShot(0, callback)
+            return False
+
+    widget.installEventFilter(FirstPaintFilter(widget))
@@ -0,0 +1,923 @@
+import re
+import sys
+import unicodedata
+from array import array
+from collections import deque
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+
+# 属性位（低8位为样式标志）
+ATTR_BOLD = 1 << 0
+ATTR_DIM = 1 << 1
+ATTR_ITALIC = 1 << 2
+ATTR_UNDERLINE = 1 << 3
+ATTR_BLINK = 1 << 4
+ATTR_REVERSE = 1 << 5
+ATTR_HIDDEN = 1 << 6
+ATTR_STRIKE = 1 << 7
+
+# 前景/背景颜色码：0 表示默认色，1..256 表示256色调色板下标+1，
+# RGB_BASE 及以上为驻留表中的24位真彩色
+FG_SHIFT = 8
+BG_SHIFT = 20
+COLOR_MASK = 0xfff
+FG_MASK = COLOR_MASK << FG_SHIFT
+BG_MASK = COLOR_MASK << BG_SHIFT
+RGB_BASE = 257
+MAX_RGB_COLORS = COLOR_MASK + 1 - RGB_BASE
+
+DEFAULT_ATTR = 0
+
+# 在属性数组的原始字节上按单元匹配相同属性的最长游程，扫描在C代码中完成
+ATTR_SIZE = array('I').itemsize
+_ATTR_RUN_RE = re.compile(b'(.{%d})\\1*' % ATTR_SIZE, re.DOTALL)
+
+# 宽字符占两格，第二格用占位符填充
+WIDE_PLACEHOLDER = '\x00'
+
+# SGR代码 -> (置位, 清除) 的样式标志
+_SGR_FLAGS = {
+    1: (ATTR_BOLD, 0), 2: (ATTR_DIM, 0), 3: (ATTR_ITALIC, 0), 4: (ATTR_UNDERLINE, 0),
+    5: (ATTR_BLINK, 0), 7: (ATTR_REVERSE, 0), 8: (ATTR_HIDDEN, 0), 9: (ATTR_STRIKE, 0),
+    22: (0, ATTR_BOLD | ATTR_DIM), 23: (0, ATTR_ITALIC), 24: (0, ATTR_UNDERLINE),
+    25: (0, ATTR_BLINK), 27: (0, ATTR_REVERSE), 28: (0, ATTR_HIDDEN), 29: (0, ATTR_STRIKE),
+}
+
+# DEC特殊图形字符集（ESC ( 0），用于画线
+DEC_GRAPHICS = str.maketrans({
+    '`': '◆', 'a': '▒', 'f': '°', 'g': '±', 'j': '┘', 'k': '┐', 'l': '┌', 'm': '└',
+    'n': '┼', 'o': '⎺', 'p': '⎻', 'q': '─', 'r': '⎼', 's': '⎽', 't': '├', 'u': '┤',
+    'v': '┴', 'w': '┬', 'x': '│', 'y': '≤', 'z': '≥', '{': 'π', '|': '≠', '}': '£',
+    '~': '·',
+})
+
+
+# 真彩色驻留表：同一RGB值在所有会话中共用一个颜色码，属性仍是一个32位整数
+_rgb_values: List[int] = []
+_rgb_codes = {}
+
+
+def xterm_rgb(index: int) -> int:
+    """256色调色板中 16..255 号颜色的RGB值（6x6x6色立方和24级灰度）"""
+    if index >= 232:
+        level = 8 + (index - 232) * 10
+        return level * 0x10101
+    index -= 16
+    r, g, b = index // 36, index // 6 % 6, index % 6
+    return sum((v * 40 + 55 if v else 0) << shift for v, shift in ((r, 16), (g, 8), (b, 0)))
+
+
+def _nearest_xterm(r: int, g: int, b: int) -> int:
+    """最接近的256色调色板下标（驻留表已满时使用）"""
+    def level(v):
+        return 0 if v < 48 else 1 if v < 115 else (v - 35) // 40
+    return 16 + 36 * level(r) + 6 * level(g) + level(b)
+
+
+def rgb_color_code(r: int, g: int, b: int) -> int:
+    """24位颜色对应的颜色码，首次出现时驻留，表满后退化为最接近的256色"""
+    rgb = ((r & 0xff) << 16) | ((g & 0xff) << 8) | (b & 0xff)
+    code = _rgb_codes.get(rgb)
+    if code is None:
+        if len(_rgb_values) >= MAX_RGB_COLORS:
+            return _nearest_xterm(r & 0xff, g & 0xff, b & 0xff) + 1
+        code = _rgb_codes[rgb] = RGB_BASE + len(_rgb_values)
+        _rgb_values.append(rgb)
+    return code
+
+
+def rgb_of(code: int) -> int:
+    """颜色码（RGB_BASE 及以上）对应的24位RGB值"""
+    return _rgb_values[code - RGB_BASE]
+
+
+def _extended_color(params, i: int):
+    """解析 38/48 的扩展颜色参数，返回 (颜色码或None, 下一个参数位置)"""
+    if i + 1 >= len(params):
+        return None, len(params)
+    mode = params[i + 1]
+    values = params[i + 2:i + (3 if mode == 5 else 5)]
+    if not all(isinstance(v, int) for v in values):
+        return None, len(params)
+    if mode == 5 and len(values) == 1:
+        return (values[0] & 0xff) + 1, i + 3
+    if mode == 2 and len(values) == 3:
+        return rgb_color_code(*values), i + 5
+    return None, len(params)
+
+
+def _subparam_color(sub: tuple):
+    """解析冒号形式 38:5:n、38:2:r:g:b 或 38:2:cs:r:g:b 的颜色码"""
+    if len(sub) >= 3 and sub[1] == 5:
+        return (sub[2] & 0xff) + 1
+    if len(sub) >= 5 and sub[1] == 2:
+        return rgb_color_code(*sub[-3:])
+    return None
+
+
+def attr_runs(attrs: array) -> List[Tuple[int, int, int]]:
+    """属性数组中相同属性的最长游程列表 [(起始列, 长度, 属性), ...]"""
+    size = ATTR_SIZE
+    from_bytes = int.from_bytes
+    order = sys.byteorder
+    return [(start // size, (end - start) // size, from_bytes(m.group(1), order))
+            for m in _ATTR_RUN_RE.finditer(attrs.tobytes())
+            for start, end in (m.span(),)]
+
+
+@lru_cache(maxsize=4096)
+def apply_sgr(attr: int, params: tuple) -> int:
+    """对属性应用一组SGR参数，支持16色、256色（38;5;n）和24位真彩色（38;2;r;g;b）及冒号子参数形式。
+
+    属性状态是驻留的整数，(属性, 参数) -> 新属性 的转换按调用缓存，重复的着色序列不再逐项解析。
+    """
+    i = 0
+    n = len(params)
+    while i < n:
+        code = params[i]
+        i += 1
+        if isinstance(code, tuple):
+            if code and code[0] in (38, 48):
+                color = _subparam_color(code)
+                if color is not None:
+                    shift = FG_SHIFT if code[0] == 38 else BG_SHIFT
+                    attr = (attr & ~(COLOR_MASK << shift)) | (color << shift)
+            continue
+        if code == 0:
+            attr = DEFAULT_ATTR
+        elif code in _SGR_FLAGS:
+            on, off = _SGR_FLAGS[code]
+            attr = (attr | on) & ~off
+        elif 30 <= code <= 37:
+            attr = (attr & ~FG_MASK) | ((code - 30 + 1) << FG_SHIFT)
+        elif 90 <= code <= 97:
+            attr = (attr & ~FG_MASK) | ((code - 90 + 9) << FG_SHIFT)
+        elif code == 39:
+            attr &= ~FG_MASK
+        elif 40 <= code <= 47:
+            attr = (attr & ~BG_MASK) | ((code - 40 + 1) << BG_SHIFT)
+        elif 100 <= code <= 107:
+            attr = (attr & ~BG_MASK) | ((code - 100 + 9) << BG_SHIFT)
+        elif code == 49:
+            attr &= ~BG_MASK
+        elif code in (38, 48, 58):
+            color, i = _extended_color(params, i - 1)
+            if color is not None and code != 58:
+                shift = FG_SHIFT if code == 38 else BG_SHIFT
+                attr = (attr & ~(COLOR_MASK << shift)) | (color << shift)
+    return attr
+
+
+@lru_cache(maxsize=4096)
+def char_width(char: str) -> int:
+    """字符显示宽度：组合字符为0，东亚宽字符为2"""
+    if unicodedata.combining(char) or unicodedata.category(char) in ('Mn', 'Me', 'Cf'):
+        return 0
+    if unicodedata.east_asian_width(char) in ('W', 'F'):
+        return 2
+    return 1
+
+
+class Line:
+    """屏幕上的一行，字符和属性分别存放在紧凑数组中"""
+
+    __slots__ = ('chars', 'attrs', 'wrapped')
+
+    def __init__(self, cols: int, attr: int = DEFAULT_ATTR):
+        self.chars = array('w', ' ' * cols)
+        self.attrs = array('I', [attr]) * cols
+        self.wrapped = False
+
+    @classmethod
+    def from_arrays(cls, chars: array, attrs: array, wrapped: bool = False) -> 'Line':
+        """由已有的字符和属性数组构造"""
+        line = cls.__new__(cls)
+        line.chars = chars
+        line.attrs = attrs
+        line.wrapped = wrapped
+        return line
+
+    def __len__(self) -> int:
+        return len(self.chars)
+
+    def text(self) -> str:
+        """行文本（去掉宽字符占位符和行尾空白）"""
+        return self.chars.tounicode().replace(WIDE_PLACEHOLDER, '').rstrip()
+
+    def erase(self, start: int, end: int, attr: int):
+        """把 [start, end) 填充为空白"""
+        n = end - start
+        if n > 0:
+            self.chars[start:end] = array('w', ' ' * n)
+            self.attrs[start:end] = array('I', [attr]) * n
+
+    def resize(self, cols: int):
+        """调整列数，不做重排"""
+        n = len(self.chars)
+        if cols < n:
+            del self.chars[cols:]
+            del self.attrs[cols:]
+        elif cols > n:
+            self.chars.extend(' ' * (cols - n))
+            self.attrs.extend(array('I', [DEFAULT_ATTR]) * (cols - n))
+
+
+class _Cursor:
+    """光标位置与属性，用于DECSC/DECRC保存恢复"""
+
+    __slots__ = ('x', 'y', 'attr', 'graphics', 'origin', 'pending_wrap')
+
+    def __init__(self, x=0, y=0, attr=DEFAULT_ATTR, graphics=False, origin=False, pending_wrap=False):
+        self.x = x
+        self.y = y
+        self.attr = attr
+        self.graphics = graphics
+        self.origin = origin
+        self.pending_wrap = pending_wrap
+
+
+# 畸形参数导致的错误；只丢弃出错的动作
+_BAD_ACTION_ERRORS = (IndexError, KeyError, TypeError, ValueError, OverflowError)
+
+
+class Screen:
+    """终端屏幕模型
+
+    基于字符网格实现主屏/备用屏、滚动区域、光标寻址和擦除操作，
+    接收 AnsiParser 产生的动作。自上次 take_dirty() 以来变化的行号记录在 dirty 中，
+    主屏整屏滚动时被挤出顶部的行追加到 history，进入历史的行数累计在 scrolled 中供显示层消费。
+    history 可以是任何支持 append/extend/clear/len/下标访问的容器（如 scrollback.Scrollback），
+    未指定时使用有界deque。
+    """
+
+    def __init__(self, cols: int = 80, rows: int = 24, history=None, history_limit: int = 10000):
+        self.cols = max(1, cols)
+        self.rows = max(1, rows)
+        self.history = history if history is not None else deque(maxlen=history_limit)
+        self.scrolled = 0
+        self.reply: Optional[Callable[[str], None]] = None
+        self.title = ''
+        self.dropped_actions = 0
+        self.reset()
+
+    # ---- 状态 ----
+
+    def reset(self):
+        """完全重置（RIS）"""
+        self.primary = self._blank_lines(self.rows)
+        self.alternate = self._blank_lines(self.rows)
+        self.lines = self.primary
+        self.alt_active = False
+        self.cursor = _Cursor()
+        self.saved_cursor = _Cursor()
+        self.saved_primary_cursor = _Cursor()
+        self.top = 0
+        self.bottom = self.rows - 1
+        self.autowrap = True
+        self.insert_mode = False
+        self.newline_mode = False
+        self.cursor_visible = True
+        self.application_cursor = False
+        self.bracketed_paste = False
+        self.tab_stops = set(range(8, self.cols, 8))
+        self.dirty = set(range(self.rows))
+        self.all_dirty = True
+
+    def _blank_lines(self, count: int, attr: int = DEFAULT_ATTR) -> List[Line]:
+        return [Line(self.cols, attr) for _ in range(count)]
+
+    def mark_all_dirty(self):
+        self.all_dirty = True
+        self.dirty.update(range(self.rows))
+
+    def take_dirty(self) -> set:
+        """取出并清空变化的行号集合"""
+        dirty = self.dirty
+        self.dirty = set()
+        self.all_dirty = False
+        return dirty
+
+    def take_scrolled(self) -> int:
+        """取出自上次调用以来进入历史的行数"""
+        scrolled = self.scrolled
+        self.scrolled = 0
+        return scrolled
+
+    def display_lines(self) -> List[str]:
+        """当前屏幕的文本内容"""
+        return [line.text() for line in self.lines]
+
+    def _blank_attr(self) -> int:
+        """擦除时使用当前背景色（BCE）"""
+        return self.cursor.attr & BG_MASK
+
+    # ---- 动作分派 ----
+
+    def feed(self, actions: list):
+        """应用一批解析器动作；某个动作的参数异常（畸形的远程输出）时只丢弃该动作，继续处理其余动作
+
+        只捕获参数类型/取值错误，其它异常说明屏幕模型本身有问题，照常抛出。
+        丢弃的动作数累计在 dropped_actions 中。
+        """
+        remaining = iter(actions)
+        while True:
+            try:
+                self._apply(remaining)
+                return
+            except _BAD_ACTION_ERRORS:
+                # 出错的动作已从迭代器中取出
+                self.dropped_actions += 1
+
+    def _apply(self, actions):
+        for action in actions:
+            kind = action[0]
+            if kind == 'print':
+                text = action[1]
+                c = self.cursor
+                size = len(text)
+                if (not c.pending_wrap and c.x + size < self.cols and not self.insert_mode
+                        and not c.graphics and text.isascii()):
+                    # 最常见的情况：同一属性的一段文本整段落在当前行内，直接按段写入
+                    line = self.lines[c.y]
+                    x = c.x
+                    line.chars[x:x + size] = array('w', text)
+                    line.attrs[x:x + size] = array('I', [c.attr]) * size
+                    self.dirty.add(c.y)
+                    c.x = x + size
+                else:
+                    self.draw(text)
+            elif kind == 'control':
+                for char in action[1]:
+                    self.control(char)
+            elif kind == 'sgr':
+                self.cursor.attr = apply_sgr(self.cursor.attr, action[1] or (0,))
+            elif kind == 'cursor':
+                self._cursor_action(action[1], action[2])
+            elif kind == 'erase':
+                self._erase_action(action[1], action[2])
+            elif kind == 'edit':
+                self._edit_action(action[1], action[2])
+            elif kind == 'margins':
+                self.set_margins(*action[2][:2])
+            elif kind == 'mode':
+                self.set_mode(action[2], action[1] == 'h', action[3])
+            elif kind == 'esc':
+                self._esc_action(action[1], action[2])
+            elif kind == 'csi':
+                self._csi_action(action[1], action[2], action[3])
+            elif kind == 'osc':
+                self._osc_action(action[1])
+
+    def control(self, char: str):
+        """执行C0控制字符"""
+        if char == '\n' or char == '\x0b' or char == '\x0c':
+            self.index()
+            if self.newline_mode:
+                self.carriage_return()
+        elif char == '\r':
+            self.carriage_return()
+        elif char == '\x08':
+            self.cursor.pending_wrap = False
+            if self.cursor.x > 0:
+                self.cursor.x -= 1
+        elif char == '\t':
+            self.tab()
+        elif char == '\x0e':
+            self.cursor.graphics = True
+        elif char == '\x0f':
+            self.cursor.graphics = False
+        # BEL等其他控制字符忽略
+
+    def _cursor_action(self, final: str, params: tuple):
+        n = params[0] if params and params[0] else 1
+        c = self.cursor
+        if final == 'A':
+            self.cursor_to(c.x, max(c.y - n, self.top if c.y >= self.top else 0))
+        elif final == 'B' or final == 'e':
+            self.cursor_to(c.x, min(c.y + n, self.bottom if c.y <= self.bottom else self.rows - 1))
+        elif final == 'C' or final == 'a':
+            self.cursor_to(c.x + n, c.y)
+        elif final == 'D':
+            self.cursor_to(c.x - n, c.y)
+        elif final == 'E':
+            self.cursor_to(0, min(c.y + n, self.bottom))
+        elif final == 'F':
+            self.cursor_to(0, max(c.y - n, self.top))
+        elif final == 'G' or final == '`':
+            self.cursor_to(n - 1, c.y)
+        elif final == 'd':
+            self.cursor_to(c.x, self._origin_row(n - 1))
+        elif final == 'H' or final == 'f':
+            row = params[0] if params and params[0] else 1
+            col = params[1] if len(params) > 1 and params[1] else 1
+            self.cursor_to(col - 1, self._origin_row(row - 1))
+        elif final == 's':
+            self.save_cursor()
+        elif final == 'u':
+            self.restore_cursor()
+
+    def _erase_action(self, final: str, params: tuple):
+        mode = params[0] if params else 0
+        if final == 'J':
+            self.erase_in_display(mode)
+        elif final == 'K':
+            self.erase_in_line(mode)
+        elif final == 'X':
+            c = self.cursor
+            self.lines[c.y].erase(c.x, min(self.cols, c.x + max(1, mode)), self._blank_attr())
+            self.dirty.add(c.y)
+
+    def _edit_action(self, final: str, params: tuple):
+        n = params[0] if params and params[0] else 1
+        if final == 'P':
+            self.delete_characters(n)
+        elif final == '@':
+            self.insert_characters(n)
+        elif final == 'L':
+            self.insert_lines(n)
+        elif final == 'M':
+            self.delete_lines(n)
+        elif final == 'S':
+            self.scroll_up(n)
+        elif final == 'T':
+            self.scroll_down(n)
+
+    def _esc_action(self, final: str, inter: str):
+        if inter == '(':
+            self.cursor.graphics = final == '0'
+        elif inter:
+            return
+        elif final == '7':
+            self.save_cursor()
+        elif final == '8':
+            self.restore_cursor()
+        elif final == 'D':
+            self.index()
+        elif final == 'E':
+            self.index()
+            self.carriage_return()
+        elif final == 'M':
+            self.reverse_index()
+        elif final == 'H':
+            self.tab_stops.add(self.cursor.x)
+        elif final == 'c':
+            self.reset()
+
+    def _csi_action(self, final: str, params: tuple, private: str):
+        if final == 'n' and not private and self.reply:
+            code = params[0] if params else 0
+            if code == 5:
+                self.reply('\x1b[0n')
+            elif code == 6:
+                row = self.cursor.y - (self.top if self.cursor.origin else 0)
+                self.reply(f'\x1b[{row + 1};{self.cursor.x + 1}R')
+        elif final == 'c' and self.reply:
+            if not private:
+                self.reply('\x1b[?1;2c')
+            elif private == '>':
+                self.reply('\x1b[>0;0;0c')
+        elif final == 'g' and not private:
+            mode = params[0] if params else 0
+            if mode == 0:
+                self.tab_stops.discard(self.cursor.x)
+            elif mode == 3:
+                self.tab_stops.clear()
+
+    def _osc_action(self, text: str):
+        code, _, value = text.partition(';')
+        if code in ('0', '2'):
+            self.title = value
+
+    # ---- 光标 ----
+
+    def _origin_row(self, row: int) -> int:
+        if self.cursor.origin:
+            return min(self.top + row, self.bottom)
+        return row
+
+    def cursor_to(self, x: int, y: int):
+        c = self.cursor
+        c.x = min(max(x, 0), self.cols - 1)
+        c.y = min(max(y, 0), self.rows - 1)
+        c.pending_wrap = False
+
+    def carriage_return(self):
+        self.cursor.x = 0
+        self.cursor.pending_wrap = False
+
+    def tab(self):
+        c = self.cursor
+        stops = [s for s in self.tab_stops if s > c.x]
+        c.x = min(stops) if stops else self.cols - 1
+        c.pending_wrap = False
+
+    def save_cursor(self):
+        c = self.cursor
+        self.saved_cursor = _Cursor(c.x, c.y, c.attr, c.graphics, c.origin, c.pending_wrap)
+
+    def restore_cursor(self):
+        s = self.saved_cursor
+        self.cursor = _Cursor(min(s.x, self.cols - 1), min(s.y, self.rows - 1),
+                              s.attr, s.graphics, s.origin, s.pending_wrap)
+
+    # ---- 写入字符 ----
+
+    def draw(self, text: str):
+        """在光标处输出一段可打印文本，处理自动换行和宽字符"""
+        if self.cursor.graphics:
+            text = text.translate(DEC_GRAPHICS)
+        if text.isascii():
+            self._draw_narrow(text)
+        else:
+            self._draw_unicode(text)
+
+    def _draw_narrow(self, text: str):
+        """输出每个字符都占一格的文本"""
+        c = self.cursor
+        cols = self.cols
+        pos = 0
+        n = len(text)
+        while pos < n:
+            if c.pending_wrap:
+                if self.autowrap:
+                    self.lines[c.y].wrapped = True
+                    self.carriage_return()
+                    self.index()
+                else:
+                    c.pending_wrap = False
+            space = cols - c.x
+            chunk = text[pos:pos + space]
+            size = len(chunk)
+            if not self.autowrap and pos + size < n:
+                # 关闭自动换行时多余的字符都落在最后一列
+                chunk = chunk[:-1] + text[-1]
+                pos = n
+            else:
+                pos += size
+            self._put(chunk, size)
+
+    def _draw_unicode(self, text: str):
+        """逐字符输出含宽字符/组合字符的文本"""
+        c = self.cursor
+        run = []
+        for char in text:
+            width = 1 if char < '\x7f' else char_width(char)
+            if width == 1:
+                run.append(char)
+                continue
+            if run:
+                self._draw_narrow(''.join(run))
+                run = []
+            if width == 0 or self.cols < 2:
+                # 只有一列时宽字符放不下，丢弃
+                continue
+            if c.pending_wrap or c.x >= self.cols - 1:
+                if self.autowrap:
+                    self.lines[c.y].wrapped = True
+                    self.carriage_return()
+                    self.index()
+                else:
+                    c.pending_wrap = False
+                    c.x = max(0, self.cols - 2)
+            self._put(char + WIDE_PLACEHOLDER, 2)
+        if run:
+            self._draw_narrow(''.join(run))
+
+    def _put(self, chunk: str, size: int):
+        """把不超过行尾的一段字符写到光标处"""
+        c = self.cursor
+        line = self.lines[c.y]
+        x = c.x
+        if self.insert_mode:
+            del line.chars[self.cols - size:]
+            del line.attrs[self.cols - size:]
+            line.chars[x:x] = array('w', chunk)
+            line.attrs[x:x] = array('I', [c.attr]) * size
+        else:
+            line.chars[x:x + size] = array('w', chunk)
+            line.attrs[x:x + size] = array('I', [c.attr]) * size
+        self.dirty.add(c.y)
+        x += size
+        if x >= self.cols:
+            c.x = self.cols - 1
+            c.pending_wrap = True
+        else:
+            c.x = x
+
+    # ---- 滚动 ----
+
+    def index(self):
+        """光标下移一行，到达滚动区域底部时上滚"""
+        c = self.cursor
+        if c.y == self.bottom:
+            self.scroll_up(1)
+        elif c.y < self.rows - 1:
+            c.y += 1
+        c.pending_wrap = False
+
+    def reverse_index(self):
+        """光标上移一行，到达滚动区域顶部时下滚"""
+        c = self.cursor
+        if c.y == self.top:
+            self.scroll_down(1)
+        elif c.y > 0:
+            c.y -= 1
+        c.pending_wrap = False
+
+    def scroll_up(self, n: int):
+        """滚动区域上滚n行；主屏整屏滚动时被挤出的行进入历史"""
+        top, bottom = self.top, self.bottom
+        lines = self.lines
+        attr = self.cursor.attr & BG_MASK
+        if n == 1:
+            # 逐行输出时最常见的情况
+            removed = (lines.pop(top),)
+            lines.insert(bottom, Line(self.cols, attr))
+        else:
+            n = min(n, bottom - top + 1)
+            removed = lines[top:top + n]
+            del lines[top:top + n]
+            lines[bottom - n + 1:bottom - n + 1] = self._blank_lines(n, attr)
+        if top == 0 and not self.alt_active:
+            self.history.extend(removed)
+            self.scrolled += len(removed)
+        if len(self.dirty) < self.rows:
+            self.dirty.update(range(top, bottom + 1))
+
+    def scroll_down(self, n: int):
+        """滚动区域下滚n行"""
+        top, bottom = self.top, self.bottom
+        n = min(n, bottom - top + 1)
+        del self.lines[bottom - n + 1:bottom + 1]
+        self.lines[top:top] = self._blank_lines(n, self._blank_attr())
+        self.dirty.update(range(top, bottom + 1))
+
+    def set_margins(self, top: int = 0, bottom: int = 0):
+        """设置滚动区域（DECSTBM），参数从1开始"""
+        top = (top or 1) - 1
+        bottom = (bottom or self.rows) - 1
+        if bottom > self.rows - 1:
+            bottom = self.rows - 1
+        if top < bottom:
+            self.top, self.bottom = top, bottom
+            self.cursor_to(0, self._origin_row(0))
+
+    # ---- 擦除与编辑 ----
+
+    def erase_in_display(self, mode: int):
+        c = self.cursor
+        attr = self._blank_attr()
+        if mode == 0:
+            self.lines[c.y].erase(c.x, self.cols, attr)
+            rows = range(c.y + 1, self.rows)
+            self.dirty.add(c.y)
+        elif mode == 1:
+            self.lines[c.y].erase(0, c.x + 1, attr)
+            rows = range(0, c.y)
+            self.dirty.add(c.y)
+        elif mode == 2:
+            rows = range(self.rows)
+        elif mode == 3:
+            self.history.clear()
+            return
+        else:
+            return
+        for y in rows:
+            self.lines[y] = Line(self.cols, attr)
+            self.dirty.add(y)
+
+    def erase_in_line(self, mode: int):
+        c = self.cursor
+        line = self.lines[c.y]
+        attr = self._blank_attr()
+        if mode == 0:
+            line.erase(c.x, self.cols, attr)
+        elif mode == 1:
+            line.erase(0, c.x + 1, attr)
+        elif mode == 2:
+            line.erase(0, self.cols, attr)
+        self.dirty.add(c.y)
+
+    def delete_characters(self, n: int):
+        c = self.cursor
+        line = self.lines[c.y]
+        n = min(n, self.cols - c.x)
+        del line.chars[c.x:c.x + n]
+        del line.attrs[c.x:c.x + n]
+        line.chars.extend(' ' * n)
+        line.attrs.extend(array('I', [self._blank_attr()]) * n)
+        self.dirty.add(c.y)
+
+    def insert_characters(self, n: int):
+        c = self.cursor
+        line = self.lines[c.y]
+        n = min(n, self.cols - c.x)
+        del line.chars[self.cols - n:]
+        del line.attrs[self.cols - n:]
+        line.chars[c.x:c.x] = array('w', ' ' * n)
+        line.attrs[c.x:c.x] = array('I', [self._blank_attr()]) * n
+        self.dirty.add(c.y)
+
+    def insert_lines(self, n: int):
+        c = self.cursor
+        if not self.top <= c.y <= self.bottom:
+            return
+        top = self.top
+        self.top = c.y
+        self.scroll_down(n)
+        self.top = top
+        self.carriage_return()
+
+    def delete_lines(self, n: int):
+        c = self.cursor
+        if not self.top <= c.y <= self.bottom:
+            return
+        top, bottom = c.y, self.bottom
+        n = min(n, bottom - top + 1)
+        del self.lines[top:top + n]
+        self.lines[bottom - n + 1:bottom - n + 1] = self._blank_lines(n, self._blank_attr())
+        self.dirty.update(range(top, bottom + 1))
+        self.carriage_return()
+
+    # ---- 属性与模式 ----
+
+    def select_graphic_rendition(self, params: tuple):
+        """处理SGR参数"""
+        self.cursor.attr = apply_sgr(self.cursor.attr, params or (0,))
+
+    def set_mode(self, params: tuple, enabled: bool, private: str):
+        """处理 SM/RM 及 DEC 私有模式"""
+        for mode in params:
+            if private == '?':
+                if mode == 1:
+                    self.application_cursor = enabled
+                elif mode == 6:
+                    self.cursor.origin = enabled
+                    self.cursor_to(0, self._origin_row(0))
+                elif mode == 7:
+                    self.autowrap = enabled
+                elif mode == 25:
+                    self.cursor_visible = enabled
+                elif mode in (47, 1047, 1049):
+                    self._switch_screen(enabled, save_cursor=mode == 1049)
+                elif mode == 2004:
+                    self.bracketed_paste = enabled
+            elif not private:
+                if mode == 4:
+                    self.insert_mode = enabled
+                elif mode == 20:
+                    self.newline_mode = enabled
+
+    def _switch_screen(self, alternate: bool, save_cursor: bool):
+        """在主屏和备用屏之间切换"""
+        if alternate == self.alt_active:
+            return
+        if alternate:
+            if save_cursor:
+                c = self.cursor
+                self.saved_primary_cursor = _Cursor(c.x, c.y, c.attr, c.graphics, c.origin, c.pending_wrap)
+            self.alternate = self._blank_lines(self.rows)
+            self.lines = self.alternate
+        else:
+            self.lines = self.primary
+            if save_cursor:
+                s = self.saved_primary_cursor
+                self.cursor = _Cursor(s.x, s.y, s.attr, s.graphics, s.origin, s.pending_wrap)
+        self.alt_active = alternate
+        self.top, self.bottom = 0, self.rows - 1
+        self.cursor_to(self.cursor.x, self.cursor.y)
+        self.mark_all_dirty()
+
+    # ---- 尺寸 ----
+
+    def resize(self, cols: int, rows: int):
+        """调整屏幕大小；行数减少时顶部的行进入历史"""
+        cols = max(1, cols)
+        rows = max(1, rows)
+        if cols == self.cols and rows == self.rows:
+            return
+
+        for screen in (self.primary, self.alternate):
+            if rows < len(screen):
+                excess = len(screen) - rows
+                cursor_y = self.cursor.y if screen is self.lines else 0
+                # 优先裁掉光标下方的空行
+                while excess and len(screen) - 1 > cursor_y and not screen[-1].text():
+                    screen.pop()
+                    excess -= 1
+                if excess:
+                    removed = screen[:excess]
+                    del screen[:excess]
+                    if screen is self.primary:
+                        self.history.extend(removed)
+                        self.scrolled += len(removed)
+                    if screen is self.lines:
+                        self.cursor.y = max(0, self.cursor.y - excess)
+                        self.saved_cursor.y = max(0, self.saved_cursor.y - excess)
+                    if screen is self.primary:
+                        self.saved_primary_cursor.y = max(0, self.saved_primary_cursor.y - excess)
+            for line in screen:
+                line.resize(cols)
+            while len(screen) < rows:
+                screen.append(Line(cols))
+
+        self.cols = cols
+        self.rows = rows
+        self.top, self.bottom = 0, rows - 1
+        self.tab_stops = set(range(8, cols, 8))
+        self.cursor_to(self.cursor.x, self.cursor.y)
+        # 保存的光标也要落在新尺寸内，否则 DECRC 或退出备用屏时会恢复到屏幕外
+        for saved in (self.saved_cursor, self.saved_primary_cursor):
+            saved.x = min(saved.x, cols - 1)
+            saved.y = min(saved.y, rows - 1)
+            saved.pending_wrap = False
+        self.mark_all_dirty()
+
+    # ---- 快照 ----
+
+    def snapshot(self) -> dict:
+        """当前屏幕状态的快照（不含历史），只由JSON可表示的值组成，用于录制回放的关键帧
+
+        每行记为 [字符, 属性游程, 是否折行]，属性游程为扁平的 [长度, 属性, ...]。
+        真彩色的颜色码只在本进程内有效，用到的颜色码和RGB值一并记录，恢复时重新驻留。
+        """
+        rgb = {}
+
+        def note(attr):
+            for shift in (FG_SHIFT, BG_SHIFT):
+                code = attr >> shift & COLOR_MASK
+                if code >= RGB_BASE:
+                    rgb[str(code)] = rgb_of(code)
+            return attr
+
+        def lines(screen):
+            result = []
+            for line in screen:
+                runs = []
+                for _, length, attr in attr_runs(line.attrs):
+                    runs += (length, note(attr))
+                result.append([line.chars.tounicode(), runs, line.wrapped])
+            return result
+
+        def cursor(c):
+            return [c.x, c.y, note(c.attr), c.graphics, c.origin, c.pending_wrap]
+
+        return {
+            'cols': self.cols, 'rows': self.rows,
+            'primary': lines(self.primary),
+            # 备用屏每次进入时都会清空，不在使用中时无需保存
+            'alternate': lines(self.alternate) if self.alt_active else None,
+            'cursor': cursor(self.cursor),
+            'saved_cursor': cursor(self.saved_cursor),
+            'saved_primary_cursor': cursor(self.saved_primary_cursor),
+            'margins': [self.top, self.bottom],
+            'modes': [self.autowrap, self.insert_mode, self.newline_mode, self.cursor_visible,
+                      self.application_cursor, self.bracketed_paste],
+            'tab_stops': sorted(self.tab_stops),
+            'title': self.title,
+            'rgb': rgb,
+        }
+
+    def restore(self, state: dict):
+        """恢复 snapshot() 得到的屏幕状态，历史保持不变"""
+        remap = {int(code): rgb_color_code(value >> 16, value >> 8 & 0xff, value & 0xff)
+                 for code, value in state['rgb'].items()}
+        remap = {old: new for old, new in remap.items() if old != new}
+
+        def fix(attr):
+            if remap:
+                for shift in (FG_SHIFT, BG_SHIFT):
+                    code = attr >> shift & COLOR_MASK
+                    if code in remap:
+                        attr = attr & ~(COLOR_MASK << shift) | remap[code] << shift
+            return attr
+
+        def lines(saved):
+            result = []
+            for chars, runs, wrapped in saved:
+                attrs = array('I')
+                for i in range(0, len(runs), 2):
+                    attrs += array('I', [fix(runs[i + 1])]) * runs[i]
+                result.append(Line.from_arrays(array('w', chars), attrs, wrapped))
+            return result
+
+        def cursor(saved):
+            x, y, attr, graphics, origin, pending_wrap = saved
+            return _Cursor(x, y, fix(attr), graphics, origin, pending_wrap)
+
+        self.cols = state['cols']
+        self.rows = state['rows']
+        self.primary = lines(state['primary'])
+        self.alt_active = state['alternate'] is not None
+        self.alternate = lines(state['alternate']) if self.alt_active else self._blank_lines(self.rows)
+        self.lines = self.alternate if self.alt_active else self.primary
+        self.cursor = cursor(state['cursor'])
+        self.saved_cursor = cursor(state['saved_cursor'])
+        self.saved_primary_cursor = cursor(state['saved_primary_cursor'])
+        self.top, self.bottom = state['margins']
+        (self.autowrap, self.insert_mode, self.newline_mode, self.cursor_visible,
+         self.application_cursor, self.bracketed_paste) = state['modes']
+        self.tab_stops = set(state['tab_stops'])
+        self.title = state['title']
+        self.mark_all_dirty()
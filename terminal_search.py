@@ -0,0 +1,135 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, List
+from terminal_screen import WIDE_PLACEHOLDER
+
+
+# 最多保留的匹配数，达到后停止搜索
+MAX_MATCHES = 100000
+
+# 向界面交付一批结果的最长间隔（秒），界面据此逐步显示高亮
+REPORT_INTERVAL = 0.05
+
+
+def compile_pattern(text: str, regex: bool = False, case_sensitive: bool = False) -> re.Pattern:
+    """把搜索框的内容编译为正则表达式，正则无效时抛出 re.error"""
+    return re.compile(text if regex else re.escape(text), 0 if case_sensitive else re.IGNORECASE)
+
+
+def screen_text(lines) -> str:
+    """屏幕行的文本（以换行符连接），与历史分段的格式一致"""
+    return '\n'.join(line.chars.tounicode().rstrip(' ') for line in lines)
+
+
+def _cell_column(line: str, index: int) -> int:
+    """去掉宽字符占位符后的第 index 个字符在原行中的列号"""
+    seen = 0
+    for column, char in enumerate(line):
+        if char != WIDE_PLACEHOLDER:
+            if seen == index:
+                return column
+            seen += 1
+    return len(line)
+
+
+def find_in_text(pattern: re.Pattern, text: str, first: int, since: int = 0) -> List[tuple]:
+    """在以换行符连接的多行文本中查找，返回 [(行序号, 起始列, 结束列)]
+
+    整段文本一次交给正则引擎扫描，只为有匹配的段计算行边界。匹配跨行时截断到行尾，
+    空匹配被忽略。宽字符的占位符在匹配前去掉（否则无法匹配连续的中文），列号再换算回屏幕列。
+    """
+    wide = WIDE_PLACEHOLDER in text
+    haystack = text.replace(WIDE_PLACEHOLDER, '') if wide else text
+    newlines = None
+    lines = None
+    result = []
+    for match in pattern.finditer(haystack):
+        start, end = match.span()
+        if start == end:
+            continue
+        if newlines is None:
+            newlines = [m.start() for m in re.finditer('\n', haystack)]
+        row = bisect_left(newlines, start)
+        if first + row < since:
+            continue
+        line_start = newlines[row - 1] + 1 if row else 0
+        line_end = newlines[row] if row < len(newlines) else len(haystack)
+        start -= line_start
+        end = min(end, line_end) - line_start
+        if wide:
+            if lines is None:
+                lines = text.split('\n')
+            start, end = _cell_column(lines[row], start), _cell_column(lines[row], end)
+        result.append((first + row, start, end))
+    return result
+
+
+class ScrollbackSearch:
+    """在终端历史中搜索
+
+    segments 为 [(首行序号, 页或文本)]（见 Scrollback.segments()），在工作线程中从最新的段
+    向前搜索，结果按 REPORT_INTERVAL 分批交给 on_matches(批次)，每批按位置升序且都早于之前的批次。
+    结束时调用 on_finished(是否因匹配过多而截断)；被取消时不再调用任何回调。
+    """
+
+    def __init__(self, pattern: re.Pattern, segments: list,
+                 on_matches: Callable[[list], None], on_finished: Callable[[bool], None],
+                 since: int = 0, limit: int = MAX_MATCHES):
+        self.pattern = pattern
+        self.segments = segments
+        self.on_matches = on_matches
+        self.on_finished = on_finished
+        self.since = since
+        self.limit = limit
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sshive-search", daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self.cancelled
+
+    def _run(self):
+        found = 0
+        parts = []
+        reported = time.monotonic()
+        truncated = False
+        for first, item in reversed(self.segments):
+            if self._cancel.is_set():
+                return
+            text = item if isinstance(item, str) else item.plain_text()
+            matches = find_in_text(self.pattern, text, first, self.since)
+            if matches:
+                if found + len(matches) > self.limit:
+                    matches = matches[len(matches) - (self.limit - found):]
+                    truncated = True
+                parts.append(matches)
+                found += len(matches)
+            now = time.monotonic()
+            if parts and (truncated or now - reported >= REPORT_INTERVAL):
+                self._report(parts)
+                parts = []
+                reported = now
+            if truncated:
+                break
+        if self._cancel.is_set():
+            return
+        if parts:
+            self._report(parts)
+        self.on_finished(truncated)
+
+    def _report(self, parts: list):
+        if not self._cancel.is_set():
+            self.on_matches([match for matches in reversed(parts) for match in matches])
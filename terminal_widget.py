@@ -1,19 +1,60 @@
-from PyQt6.QtWidgets import QTextEdit, QApplication
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QFont, QTextCursor, QKeyEvent, QColor, QTextCharFormat
-import re
-
-
-class TerminalWidget(QTextEdit):
-    """终端显示组件"""
+from bisect import bisect_left
+from collections import OrderedDict
+from PyQt6.QtWidgets import QAbstractScrollArea, QApplication, QMenu
+from PyQt6.QtCore import Qt, QPointF, QRect, QRectF, pyqtSignal
+from PyQt6.QtGui import (QFont, QFontMetricsF, QKeyEvent, QColor, QPainter, QPixmap,
+                         QInputMethodEvent, QMouseEvent)
+from ansi_parser import AnsiParser
+from scrollback import Scrollback, DEFAULT_MAX_LINES, DEFAULT_MAX_BYTES
+from terminal_screen import (Screen, Line, WIDE_PLACEHOLDER, FG_SHIFT, BG_SHIFT, COLOR_MASK,
+                             RGB_BASE, ATTR_BOLD, ATTR_DIM, ATTR_ITALIC, ATTR_UNDERLINE,
+                             ATTR_REVERSE, ATTR_HIDDEN, ATTR_STRIKE, attr_runs, rgb_of, xterm_rgb)
+
+
+class TerminalWidget(QAbstractScrollArea):
+    """终端显示组件
+
+    直接按字符网格绘制屏幕模型和历史行。每行渲染结果按内容缓存为位图，
+    输出只触发变化行所在区域的重绘，滚动浏览历史时只绘制可见行。
+    """
 
     command_entered = pyqtSignal(bytes)
-
-    def __init__(self):
+    paste_requested = pyqtSignal(bytes, bool)
+    # 终端自动应答（光标位置报告、设备属性等），只应发回产生它的会话
+    reply_ready = pyqtSignal(bytes)
+    size_changed = pyqtSignal(int, int)
+
+    # 内边距（像素）
+    MARGIN = 5
+    # 行位图缓存条数
+    LINE_CACHE_SIZE = 2048
+    # 属性 -> 颜色的缓存上限；缓存在所有终端间共用，相同属性只解析一次
+    COLOR_CACHE_SIZE = 65536
+    _color_cache = {}
+
+    def __init__(self, scrollback_lines: int = DEFAULT_MAX_LINES,
+                 scrollback_bytes: int = DEFAULT_MAX_BYTES):
         super().__init__()
-        self.current_format = QTextCharFormat()
+        self.parser = AnsiParser()
+        self.screen = Screen(80, 24, history=Scrollback(scrollback_lines, scrollback_bytes))
+        self.screen.reply = self._send_reply
+        self.read_only = False
+        # 为假时屏幕大小不随窗口变化，由 resize_screen() 设置（录制回放）
+        self.follow_viewport = True
+        self.history_seen = 0
+        self.line_cache = OrderedDict()
+        self.fonts = {}
+        self.selection_anchor = None
+        self.selection_end = None
         self.default_fg_color = QColor("#d4d4d4")
         self.default_bg_color = QColor("#1e1e1e")
+        self.selection_color = QColor(38, 79, 120, 160)
+        # 历史搜索：搜索栏首次使用时创建；高亮为按位置排序的 [(行序号, 起始列, 结束列)]
+        self.search_bar = None
+        self.highlights = []
+        self.current_highlight = None
+        self.highlight_color = QColor(255, 200, 0, 90)
+        self.current_highlight_color = QColor(255, 120, 0, 170)
         self.setup_colors()
         self.setup_ui()
 
@@ -39,27 +80,41 @@ class TerminalWidget(QTextEdit):
             96: QColor("#29b8db"),  # 亮青
             97: QColor("#ffffff"),  # 亮白
         }
+        # 256色调色板：下标 0-15 对应 30-37、90-97，其余为xterm色立方和灰度
+        self.palette = [self.ansi_colors[code] for code in (*range(30, 38), *range(90, 98))]
+        self.palette += [QColor(xterm_rgb(index)) for index in range(16, 256)]
 
     def setup_ui(self):
         """设置UI样式"""
         font = QFont("Consolas", 10)
         font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setFixedPitch(True)
         self.setFont(font)
+        self._update_metrics()
 
         self.setStyleSheet("""
-            QTextEdit {
+            QAbstractScrollArea {
                 background-color: #1e1e1e;
-                color: #d4d4d4;
                 border: none;
-                padding: 5px;
             }
         """)
-
-        self.setReadOnly(True)
-        self.setUndoRedoEnabled(False)
-
-        # 设置默认文本格式
-        self.current_format.setForeground(self.default_fg_color)
+        self.viewport().setAutoFillBackground(False)
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.setAttribute(Qt.WidgetAttribute.WA_InputMethodEnabled, True)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.viewport().setCursor(Qt.CursorShape.IBeamCursor)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+        self._update_scrollbar()
+
+    def _update_metrics(self):
+        """根据字体计算字符格大小"""
+        metrics = QFontMetricsF(self.font())
+        self.cell_width = metrics.horizontalAdvance('M')
+        self.cell_height = int(metrics.lineSpacing() + 0.5)
+        self.ascent = metrics.ascent()
+        self.fonts.clear()
+        self.line_cache.clear()
 
     def keyPressEvent(self, event: QKeyEvent):
         """处理键盘事件 - 将所有输入直接发送到SSH"""
@@ -67,6 +122,29 @@ class TerminalWidget(QTextEdit):
         modifiers = event.modifiers()
         text = event.text()
 
+        # Ctrl+Shift+F (搜索历史)，只读时同样可用
+        copy_paste_modifiers = Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier
+        if key == Qt.Key.Key_F and modifiers == copy_paste_modifiers:
+            self.show_search()
+            return
+
+        if self.read_only:
+            return
+
+        # Ctrl+Shift+C / Ctrl+Shift+V (复制/粘贴)
+        if key == Qt.Key.Key_C and modifiers == copy_paste_modifiers:
+            self.copy_selection()
+            return
+        if key == Qt.Key.Key_V and modifiers == copy_paste_modifiers:
+            self.paste_clipboard()
+            return
+
+        # 输入时回到底部并取消选择
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        if self.selection_anchor is not None:
+            self.selection_anchor = self.selection_end = None
+            self.viewport().update()
+
         # Ctrl+C
         if key == Qt.Key.Key_C and modifiers == Qt.KeyboardModifier.ControlModifier:
             self.command_entered.emit(b'\x03')
@@ -89,13 +167,7 @@ class TerminalWidget(QTextEdit):
 
         # Ctrl+V (粘贴)
         if key == Qt.Key.Key_V and modifiers == Qt.KeyboardModifier.ControlModifier:
-            clipboard = QApplication.clipboard()
-            text = clipboard.text()
-            if text:
-                try:
-                    self.command_entered.emit(text.encode('utf-8'))
-                except:
-                    pass
+            self.paste_clipboard()
             return
 
         # Enter/Return
@@ -113,26 +185,27 @@ class TerminalWidget(QTextEdit):
             self.command_entered.emit(b'\t')
             return
 
-        # Arrow keys
+        # Arrow keys（应用光标模式下使用 SS3 前缀）
+        prefix = b'\x1bO' if self.screen.application_cursor else b'\x1b['
         if key == Qt.Key.Key_Up:
-            self.command_entered.emit(b'\x1b[A')
+            self.command_entered.emit(prefix + b'A')
             return
         if key == Qt.Key.Key_Down:
-            self.command_entered.emit(b'\x1b[B')
+            self.command_entered.emit(prefix + b'B')
             return
         if key == Qt.Key.Key_Right:
-            self.command_entered.emit(b'\x1b[C')
+            self.command_entered.emit(prefix + b'C')
             return
         if key == Qt.Key.Key_Left:
-            self.command_entered.emit(b'\x1b[D')
+            self.command_entered.emit(prefix + b'D')
             return
 
         # Home/End
         if key == Qt.Key.Key_Home:
-            self.command_entered.emit(b'\x1b[H')
+            self.command_entered.emit(prefix + b'H')
             return
         if key == Qt.Key.Key_End:
-            self.command_entered.emit(b'\x1b[F')
+            self.command_entered.emit(prefix + b'F')
             return
 
         # Delete
@@ -155,126 +228,427 @@ class TerminalWidget(QTextEdit):
             except:
                 pass
 
-    def append_output(self, text: str):
-        """添加输出文本，解析ANSI转义序列"""
-        # 规范化换行符：将 \r\n 和单独的 \r 都转换为 \n
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-
-        cursor = self.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-
-        # 正则表达式匹配ANSI转义序列
-        ansi_escape = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]|\x1b\][^\x07]*\x07|\x1b[=>]|\x1b\[[?][0-9;]*[a-zA-Z]')
-
-        pos = 0
-        for match in ansi_escape.finditer(text):
-            # 插入转义序列之前的普通文本
-            if match.start() > pos:
-                plain_text = text[pos:match.start()]
-                # 处理backspace和其他控制字符
-                cursor = self._process_text_with_backspace(plain_text, cursor)
-
-            # 处理转义序列
-            escape_seq = match.group()
-            self._process_escape_sequence(escape_seq)
-
-            pos = match.end()
-
-        # 插入剩余的普通文本
-        if pos < len(text):
-            remaining_text = text[pos:]
-            # 处理backspace和其他控制字符
-            cursor = self._process_text_with_backspace(remaining_text, cursor)
-
-        self.setTextCursor(cursor)
-        self.ensureCursorVisible()
-
-    def _process_text_with_backspace(self, text: str, cursor: QTextCursor) -> QTextCursor:
-        """处理包含控制字符的文本"""
-        i = 0
-        while i < len(text):
-            char = text[i]
-
-            if char == '\x08':
-                # Backspace: 删除前一个字符
-                if not cursor.atStart():
-                    cursor.deletePreviousChar()
-            elif char == '\x7f':
-                # DEL字符：忽略，避免显示为方框
-                pass
-            elif char == '\x07':
-                # Bell响铃字符：忽略
-                pass
-            elif ord(char) >= 32 or char in '\n\t':
-                # 可打印字符或常用控制字符（换行、制表符）
-                # 注意：\r 已经在 append_output 中被转换为 \n
-                cursor.insertText(char, self.current_format)
-            # 其他控制字符默认忽略
 
+    def focusNextPrevChild(self, next: bool) -> bool:
+        """Tab键交给终端处理，而不是切换焦点"""
+        return False
+
+    def inputMethodEvent(self, event: QInputMethodEvent):
+        """输入法提交的文本直接发送"""
+        text = event.commitString()
+        if text and not self.read_only:
+            self.command_entered.emit(text.encode('utf-8'))
+        event.accept()
+
+    def inputMethodQuery(self, query):
+        if query == Qt.InputMethodQuery.ImCursorRectangle:
+            return QRectF(self._cell_rect(self.screen.cursor.x, self._cursor_view_row()))
+        return super().inputMethodQuery(query)
+
+    # ---- 输出 ----
+
+    def append_output(self, data):
+        """添加输出，接受原始字节或文本，交给屏幕模型后只重绘变化的行"""
+        try:
+            if isinstance(data, str):
+                actions = self.parser.feed_text(data)
+            else:
+                actions = self.parser.feed(data)
+            self.screen.feed(actions)
+        except Exception:
+            # 槽函数中未捕获的异常会使 PyQt 终止整个程序；丢弃这段输出，不影响其他会话
+            self.parser.reset()
+        self._schedule_repaint()
+
+    def _schedule_repaint(self):
+        """根据脏行和新增历史安排重绘"""
+        screen = self.screen
+        scrolled = screen.take_scrolled()
+        dirty = screen.take_dirty()
+        bar = self.verticalScrollBar()
+        following = bar.value() >= bar.maximum()
+
+        # 历史已满时旧行被丢弃，查看历史时要相应上移以保持视图内容不动
+        history = len(screen.history)
+        dropped = max(0, self.history_seen + scrolled - history)
+        self.history_seen = history
+        self._update_scrollbar()
+        if dropped and not following:
+            bar.setValue(bar.value() - dropped)
+
+        if scrolled or not following:
+            self.viewport().update()
+            return
+
+        first = self._screen_view_offset()
+        for y in dirty:
+            self.viewport().update(self._row_rect(first + y))
+        self.viewport().update(self._row_rect(first + screen.cursor.y))
+
+    def _update_scrollbar(self):
+        """滚动条范围为历史行数，值为视图顶端对应的行号"""
+        bar = self.verticalScrollBar()
+        following = bar.value() >= bar.maximum()
+        history = 0 if self.screen.alt_active else len(self.screen.history)
+        bar.setRange(0, history)
+        bar.setPageStep(self.screen.rows)
+        bar.setSingleStep(1)
+        if following:
+            bar.setValue(history)
+
+    def scrollContentsBy(self, dx: int, dy: int):
+        self.viewport().update()
+
+    # ---- 行号换算 ----
+
+    def _history_size(self) -> int:
+        return 0 if self.screen.alt_active else len(self.screen.history)
+
+    def _screen_view_offset(self) -> int:
+        """屏幕第0行在视图中的行号"""
+        return self._history_size() - self.verticalScrollBar().value()
+
+    def _cursor_view_row(self) -> int:
+        return self._screen_view_offset() + self.screen.cursor.y
+
+    def _line_at(self, index: int):
+        """按绝对行号（历史+屏幕）取行"""
+        history = self._history_size()
+        if index < 0:
+            return None
+        if index < history:
+            return self.screen.history[index]
+        index -= history
+        if index < self.screen.rows:
+            return self.screen.lines[index]
+        return None
+
+    def _row_rect(self, row: int) -> QRect:
+        return QRect(0, self.MARGIN + row * self.cell_height, self.viewport().width(), self.cell_height)
+
+    def _cell_rect(self, col: int, row: int) -> QRect:
+        return QRect(int(self.MARGIN + col * self.cell_width), self.MARGIN + row * self.cell_height,
+                     int(self.cell_width + 0.5), self.cell_height)
+
+    # ---- 绘制 ----
+
+    def paintEvent(self, event):
+        """只绘制失效区域内的行，每行从位图缓存取得"""
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), self.default_bg_color)
+
+        rect = event.rect()
+        first_row = max(0, (rect.top() - self.MARGIN) // self.cell_height)
+        last_row = min(self.screen.rows, (rect.bottom() - self.MARGIN) // self.cell_height + 1)
+        top_line = self.verticalScrollBar().value()
+
+        for row in range(first_row, last_row):
+            line = self._line_at(top_line + row)
+            if line is None:
+                continue
+            y = self.MARGIN + row * self.cell_height
+            painter.drawPixmap(self.MARGIN, y, self._line_pixmap(line))
+            if self.highlights:
+                self._paint_highlights(painter, top_line + row, y)
+            self._paint_selection(painter, top_line + row, y)
+
+        self._paint_cursor(painter)
+        painter.end()
+
+    def _line_pixmap(self, line: Line) -> QPixmap:
+        """按行内容和属性缓存渲染结果"""
+        key = (line.chars.tobytes(), line.attrs.tobytes())
+        pixmap = self.line_cache.get(key)
+        if pixmap is not None:
+            self.line_cache.move_to_end(key)
+            return pixmap
+
+        ratio = self.devicePixelRatioF()
+        width = self.cell_width * len(line)
+        pixmap = QPixmap(int(width * ratio + 1), int(self.cell_height * ratio + 1))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(self.default_bg_color)
+
+        painter = QPainter(pixmap)
+        chars = line.chars.tounicode()
+        for x, n, attr in attr_runs(line.attrs):
+            self._draw_run(painter, chars[x:x + n], x, attr)
+        painter.end()
+
+        self.line_cache[key] = pixmap
+        if len(self.line_cache) > self.LINE_CACHE_SIZE:
+            self.line_cache.popitem(last=False)
+        return pixmap
+
+    def _draw_run(self, painter: QPainter, text: str, col: int, attr: int):
+        """绘制同一属性的一段字符"""
+        fg, bg = self._colors_for(attr)
+        left = col * self.cell_width
+        if bg is not None:
+            painter.fillRect(QRectF(left, 0, len(text) * self.cell_width, self.cell_height), bg)
+        if not text.strip(' ' + WIDE_PLACEHOLDER) and not attr & (ATTR_UNDERLINE | ATTR_STRIKE):
+            return
+
+        painter.setFont(self._font_for(attr))
+        painter.setPen(fg)
+        if text.isascii():
+            painter.drawText(QPointF(left, self.ascent), text)
+            return
+        # 含宽字符时逐字对齐到格子
+        for i, char in enumerate(text):
+            if char != ' ' and char != WIDE_PLACEHOLDER:
+                painter.drawText(QPointF(left + i * self.cell_width, self.ascent), char)
+
+    def _color(self, code: int):
+        """颜色码 -> QColor，0 表示默认色（返回None）"""
+        if not code:
+            return None
+        if code >= RGB_BASE:
+            return QColor(rgb_of(code))
+        return self.palette[code - 1]
+
+    def _colors_for(self, attr: int):
+        """属性对应的前景/背景色，按属性缓存"""
+        colors = self._color_cache.get(attr)
+        if colors is not None:
+            return colors
+
+        fg = self._color((attr >> FG_SHIFT) & COLOR_MASK) or self.default_fg_color
+        bg = self._color((attr >> BG_SHIFT) & COLOR_MASK)
+        if attr & ATTR_REVERSE:
+            fg, bg = bg or self.default_bg_color, fg
+        if attr & ATTR_HIDDEN:
+            fg = bg or self.default_bg_color
+        if attr & ATTR_DIM:
+            fg = fg.darker(150)
+
+        if len(self._color_cache) >= self.COLOR_CACHE_SIZE:
+            self._color_cache.clear()
+        colors = self._color_cache[attr] = (fg, bg)
+        return colors
+
+    def _font_for(self, attr: int) -> QFont:
+        key = attr & (ATTR_BOLD | ATTR_ITALIC | ATTR_UNDERLINE | ATTR_STRIKE)
+        font = self.fonts.get(key)
+        if font is None:
+            font = QFont(self.font())
+            font.setBold(bool(attr & ATTR_BOLD))
+            font.setItalic(bool(attr & ATTR_ITALIC))
+            font.setUnderline(bool(attr & ATTR_UNDERLINE))
+            font.setStrikeOut(bool(attr & ATTR_STRIKE))
+            self.fonts[key] = font
+        return font
+
+    def _paint_cursor(self, painter: QPainter):
+        screen = self.screen
+        if not screen.cursor_visible or self.read_only:
+            return
+        row = self._cursor_view_row()
+        if not 0 <= row < screen.rows:
+            return
+        rect = self._cell_rect(screen.cursor.x, row)
+        if self.hasFocus():
+            painter.fillRect(rect, QColor(212, 212, 212, 160))
+        else:
+            painter.setPen(self.default_fg_color)
+            painter.drawRect(rect.adjusted(0, 0, -1, -1))
+
+    # ---- 历史搜索 ----
+
+    def show_search(self):
+        """显示历史搜索栏，以选中的文本作为初始内容"""
+        if self.search_bar is None:
+            # 首次搜索时才导入，不拖慢界面启动
+            from search_bar import SearchBar
+            self.search_bar = SearchBar(self)
+        self.search_bar.open(self.selected_text().split('\n')[0])
+        self._place_search_bar()
+
+    def _place_search_bar(self):
+        if self.search_bar is not None:
+            bar = self.search_bar
+            bar.adjustSize()
+            bar.move(max(0, self.viewport().width() - bar.width() - self.MARGIN), self.MARGIN)
+
+    def line_serial_base(self) -> int:
+        """视图第0行（历史最旧的一行）的行序号，序号不随旧历史被丢弃而改变"""
+        return getattr(self.screen.history, 'dropped', 0)
+
+    def set_highlights(self, highlights: list, current=None):
+        """设置搜索高亮 [(行序号, 起始列, 结束列)]（按位置排序），current 为当前匹配"""
+        self.highlights = highlights
+        self.current_highlight = current
+        self.viewport().update()
+
+    def scroll_to_serial(self, serial: int):
+        """滚动视图使该序号的行可见（已在视图中时不滚动）"""
+        if self.screen.alt_active:
+            return
+        index = serial - self.line_serial_base()
+        bar = self.verticalScrollBar()
+        if index < 0 or bar.value() <= index < bar.value() + self.screen.rows:
+            return
+        bar.setValue(min(max(index - self.screen.rows // 2, 0), bar.maximum()))
+
+    def _paint_highlights(self, painter: QPainter, index: int, y: int):
+        # 备用屏（全屏程序）不显示历史，也不显示历史中的匹配
+        if self.screen.alt_active:
+            return
+        serial = self.line_serial_base() + index
+        highlights = self.highlights
+        i = bisect_left(highlights, (serial,))
+        while i < len(highlights) and highlights[i][0] == serial:
+            match = highlights[i]
+            color = self.current_highlight_color if match == self.current_highlight else self.highlight_color
+            painter.fillRect(QRectF(self.MARGIN + match[1] * self.cell_width, y,
+                                    (match[2] - match[1]) * self.cell_width, self.cell_height), color)
             i += 1
 
-        return cursor
-
-    def _process_escape_sequence(self, seq: str):
-        """处理ANSI转义序列"""
-        # 清屏序列：ESC [ 2 J 或 ESC [ H ESC [ 2 J
-        if seq == '\x1b[2J' or seq == '\x1b[H':
-            if seq == '\x1b[2J':
-                self.clear()
-                self.current_format = QTextCharFormat()
-                self.current_format.setForeground(self.default_fg_color)
-            return
-
-        # 清除行序列：ESC [ K
-        if seq == '\x1b[K':
-            return
-
-        # 光标移动序列 - 暂时忽略
-        if seq.startswith('\x1b[') and seq[-1] in 'ABCDEFGH':
-            return
-
-        # CSI序列：ESC [ ... m (SGR - 设置图形属性)
-        if seq.startswith('\x1b[') and seq.endswith('m'):
-            params = seq[2:-1]
-            if not params:
-                params = '0'
-
-            codes = [int(code) if code else 0 for code in params.split(';')]
-
-            for code in codes:
-                if code == 0:  # 重置
-                    self.current_format = QTextCharFormat()
-                    self.current_format.setForeground(self.default_fg_color)
-                elif code == 1:  # 粗体
-                    self.current_format.setFontWeight(QFont.Weight.Bold)
-                elif code == 2:  # 暗淡
-                    pass
-                elif code == 3:  # 斜体
-                    self.current_format.setFontItalic(True)
-                elif code == 4:  # 下划线
-                    self.current_format.setFontUnderline(True)
-                elif code == 22:  # 正常强度
-                    self.current_format.setFontWeight(QFont.Weight.Normal)
-                elif code == 23:  # 非斜体
-                    self.current_format.setFontItalic(False)
-                elif code == 24:  # 非下划线
-                    self.current_format.setFontUnderline(False)
-                elif code in self.ansi_colors:  # 前景色
-                    self.current_format.setForeground(self.ansi_colors[code])
-                elif code == 39:  # 默认前景色
-                    self.current_format.setForeground(self.default_fg_color)
-                elif 40 <= code <= 47:  # 背景色
-                    bg_color = self.ansi_colors.get(code - 10)
-                    if bg_color:
-                        self.current_format.setBackground(bg_color)
-                elif code == 49:  # 默认背景色
-                    self.current_format.clearBackground()
+    # ---- 选择与复制 ----
+
+    def _paint_selection(self, painter: QPainter, index: int, y: int):
+        bounds = self._selection_bounds()
+        if bounds is None:
+            return
+        (start_line, start_col), (end_line, end_col) = bounds
+        if not start_line <= index <= end_line:
+            return
+        left = start_col if index == start_line else 0
+        right = end_col if index == end_line else self.screen.cols
+        painter.fillRect(QRectF(self.MARGIN + left * self.cell_width, y,
+                                (right - left) * self.cell_width, self.cell_height),
+                         self.selection_color)
+
+    def _selection_bounds(self):
+        if self.selection_anchor is None or self.selection_end is None:
+            return None
+        start, end = sorted((self.selection_anchor, self.selection_end))
+        if start == end:
+            return None
+        return start, end
+
+    def _position_at(self, pos) -> tuple:
+        """视图坐标 -> (绝对行号, 列号)"""
+        row = int((pos.y() - self.MARGIN) // self.cell_height)
+        col = int((pos.x() - self.MARGIN) / self.cell_width + 0.5)
+        row = min(max(row, 0), self.screen.rows - 1)
+        col = min(max(col, 0), self.screen.cols)
+        return self.verticalScrollBar().value() + row, col
+
+    def mousePressEvent(self, event: QMouseEvent):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.selection_anchor = self._position_at(event.position())
+            self.selection_end = self.selection_anchor
+            self.viewport().update()
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event: QMouseEvent):
+        if event.buttons() & Qt.MouseButton.LeftButton and self.selection_anchor is not None:
+            self.selection_end = self._position_at(event.position())
+            self.viewport().update()
+
+    def selected_text(self) -> str:
+        """当前选中的文本"""
+        bounds = self._selection_bounds()
+        if bounds is None:
+            return ''
+        (start_line, start_col), (end_line, end_col) = bounds
+        parts = []
+        for index in range(start_line, end_line + 1):
+            line = self._line_at(index)
+            if line is None:
+                continue
+            chars = line.chars.tounicode()
+            left = start_col if index == start_line else 0
+            right = end_col if index == end_line else len(chars)
+            text = chars[left:right].replace(WIDE_PLACEHOLDER, '')
+            if index != end_line and not line.wrapped:
+                text = text.rstrip() + '\n'
+            parts.append(text)
+        return ''.join(parts)
+
+    def copy_selection(self):
+        """复制选中文本到剪贴板"""
+        text = self.selected_text()
+        if text:
+            QApplication.clipboard().setText(text)
+
+    def paste_clipboard(self):
+        """粘贴剪贴板内容：换行转为回车，远端开启括号粘贴模式时由发送方加上标记"""
+        text = QApplication.clipboard().text()
+        if text and not self.read_only:
+            text = text.replace('\r\n', '\r').replace('\n', '\r')
+            self.paste_requested.emit(text.encode('utf-8'), self.screen.bracketed_paste)
+
+    def _show_context_menu(self, pos):
+        menu = QMenu(self)
+        copy_action = menu.addAction("复制")
+        copy_action.setEnabled(self._selection_bounds() is not None)
+        paste_action = menu.addAction("粘贴")
+        paste_action.setEnabled(not self.read_only)
+        action = menu.exec(self.mapToGlobal(pos))
+        if action == copy_action:
+            self.copy_selection()
+        elif action == paste_action:
+            self.paste_clipboard()
+
+    # ---- 尺寸 ----
+
+    def _send_reply(self, text: str):
+        """把终端应答（如光标位置报告）发回远端；不经过键盘输入，广播时也不会发给其他会话"""
+        self.reply_ready.emit(text.encode('utf-8'))
+
+    def resizeEvent(self, event):
+        """窗口大小变化时调整屏幕行列数"""
+        super().resizeEvent(event)
+        self._update_screen_size()
+        self._place_search_bar()
+
+    def _update_screen_size(self):
+        if not self.follow_viewport:
+            return
+        width = self.viewport().width() - self.MARGIN * 2
+        height = self.viewport().height() - self.MARGIN * 2
+        cols = max(20, int(width // self.cell_width))
+        rows = max(5, height // self.cell_height)
+        if (cols, rows) == (self.screen.cols, self.screen.rows):
+            return
+        self.screen.resize(cols, rows)
+        self._schedule_repaint()
+        self.viewport().update()
+        self.size_changed.emit(cols, rows)
 
     def clear_terminal(self):
         """清空终端"""
-        self.clear()
-        self.input_buffer = ""
+        self.parser.reset()
+        self.screen.reset()
+        self.screen.history.clear()
+        self.selection_anchor = self.selection_end = None
+        if self.search_bar is not None:
+            self.search_bar.clear_results()
+        self._schedule_repaint()
+        self.viewport().update()
+
+    def resize_screen(self, cols: int, rows: int):
+        """直接设置屏幕行列数（follow_viewport 为假时使用）"""
+        self.screen.resize(cols, rows)
+        self._schedule_repaint()
+        self.viewport().update()
+
+    def load_snapshot(self, state: dict):
+        """恢复 Screen.snapshot() 得到的屏幕状态，历史清空"""
+        self.parser.reset()
+        self.screen.history.clear()
+        self.screen.take_scrolled()
+        self.history_seen = 0
+        self.screen.restore(state)
+        self.selection_anchor = self.selection_end = None
+        if self.search_bar is not None:
+            self.search_bar.clear_results()
+        self._schedule_repaint()
+        self.viewport().update()
 
     def set_readonly(self, readonly: bool):
         """设置只读模式"""
-        self.setReadOnly(readonly)
+        self.read_only = readonly
+        self.viewport().update()
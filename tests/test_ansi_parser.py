@@ -0,0 +1,74 @@
+import unittest
+
+from ansi_parser import MAX_PARAM, AnsiParser, parse_params
+
+
+def _merge(actions):
+    """合并相邻的文本/控制字符动作，分块位置不同时结果才可比较"""
+    merged = []
+    for action in actions:
+        if action[0] in ('print', 'control') and merged and merged[-1][0] == action[0]:
+            merged[-1] = (action[0], merged[-1][1] + action[1])
+        else:
+            merged.append(action)
+    return merged
+
+
+class ParseParamsTest(unittest.TestCase):
+    def test_empty_and_defaults(self):
+        self.assertEqual(parse_params(''), ())
+        self.assertEqual(parse_params('1;;3'), (1, 0, 3))
+
+    def test_subparameters(self):
+        self.assertEqual(parse_params('38:2::255:0:0;1'), ((38, 2, 0, 255, 0, 0), 1))
+
+    def test_overlong_values_are_clamped(self):
+        self.assertEqual(parse_params('9' * 5000), (MAX_PARAM,))
+        self.assertEqual(parse_params('70000;000000012;1:99999999'), (MAX_PARAM, 12, (1, MAX_PARAM)))
+
+
+class AnsiParserTest(unittest.TestCase):
+    SAMPLE = ('héllo \x1b[1;31mred\x1b[0m 中文 \x1b]0;title\x07\x1b[?1049h\x1b[38:2::255:0:0mX\r\n'
+              '\x1bP1$r\x1b\\ok\x1b(B').encode()
+
+    def test_any_chunk_boundary(self):
+        expected = _merge(AnsiParser().feed(self.SAMPLE))
+        for split in range(1, len(self.SAMPLE)):
+            parser = AnsiParser()
+            actions = parser.feed(self.SAMPLE[:split]) + parser.feed(self.SAMPLE[split:])
+            self.assertEqual(_merge(actions), expected, split)
+
+    def test_actions(self):
+        actions = AnsiParser().feed(b'a\x1b[1;31mb\x1b[5;10Hc\x1b]2;t\x07')
+        self.assertEqual(actions, [('print', 'a'), ('sgr', (1, 31)), ('print', 'b'),
+                                   ('cursor', 'H', (5, 10)), ('print', 'c'), ('osc', '2;t')])
+
+    def test_unrecognized_escape_is_passed_through(self):
+        self.assertEqual(AnsiParser().feed(b'a\x1b\x07b'),
+                         [('print', 'a'), ('control', '\x1b'), ('control', '\x07'), ('print', 'b')])
+        self.assertEqual(AnsiParser().feed('\x1bé'.encode()), [('control', '\x1b'), ('print', 'é')])
+
+    def test_lone_escape_waits_for_next_chunk(self):
+        parser = AnsiParser()
+        self.assertEqual(parser.feed(b'a\x1b'), [('print', 'a')])
+        self.assertTrue(parser.pending)
+        self.assertEqual(parser.feed(b'[1mb'), [('sgr', (1,)), ('print', 'b')])
+
+    def test_control_strings(self):
+        self.assertEqual(AnsiParser().feed(b'\x1bP1$r\x1b\\x\x1b_app\x1b\\'),
+                         [('string', 'P', '1$r'), ('print', 'x'), ('string', '_', 'app')])
+
+    def test_cached_actions_are_reused_across_feeds(self):
+        parser = AnsiParser()
+        first = parser.feed(b'\x1b[1mab  \x1b[0m')
+        second = parser.feed(b'\x1b[1mab  \x1b[0m')
+        self.assertEqual(first, [('sgr', (1,)), ('print', 'ab  '), ('sgr', (0,))])
+        self.assertEqual(first, second)
+        self.assertTrue(all(a is b for a, b in zip(first, second)))
+
+    def test_huge_parameter_does_not_raise(self):
+        self.assertEqual(AnsiParser().feed(b'\x1b[' + b'9' * 5000 + b'm'), [('sgr', (MAX_PARAM,))])
+
+
+if __name__ == '__main__':
+    unittest.main()
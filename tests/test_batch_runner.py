@@ -0,0 +1,179 @@
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+import batch_runner
+from batch_runner import BatchRunner, LineBuffer
+
+
+class FakeChannel:
+    """按预设的输出块应答的会话通道；exit_status 为None时命令一直不结束"""
+
+    def __init__(self, chunks=(), exit_status=0):
+        self.chunks = list(chunks)
+        self.exit_status = exit_status
+        self.command = None
+        self.closed = False
+        # select 需要真实的文件描述符；这一端永远不可读
+        self._sock, self._peer = socket.socketpair()
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def exec_command(self, command):
+        self.command = command
+
+    def recv_ready(self):
+        return bool(self.chunks) and self.chunks[0][0] == 'stdout'
+
+    def recv_stderr_ready(self):
+        return bool(self.chunks) and self.chunks[0][0] == 'stderr'
+
+    def recv(self, size):
+        return self.chunks.pop(0)[1]
+
+    recv_stderr = recv
+
+    def exit_status_ready(self):
+        return self.exit_status is not None and not self.chunks
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+    def close(self):
+        self.closed = True
+        self._sock.close()
+        self._peer.close()
+
+
+class BatchRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.channels = {}
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.delay = 0
+        self.leases = []
+        patches = (mock.patch.object(batch_runner, 'lease_connection', self.lease),
+                   mock.patch.object(batch_runner, 'get_transport_pool', return_value=mock.Mock(
+                       release=mock.Mock(side_effect=self.release))))
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def lease(self, host, port, username, password, auth_type, key_path, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        lease = mock.Mock()
+        lease.password = password
+        lease.transport.open_session.return_value = self.channels.get(host) or FakeChannel()
+        self.leases.append(lease)
+        return lease
+
+    def release(self, lease):
+        with self.lock:
+            self.active -= 1
+
+    def hosts(self, count: int) -> list:
+        return [{'id': i, 'name': f'h{i}', 'host': f'10.0.0.{i}', 'port': 22, 'username': 'root',
+                 'auth_type': 'password'} for i in range(count)]
+
+    def test_output_and_exit_status(self):
+        host = self.hosts(1)[0]
+        channel = self.channels['10.0.0.0'] = FakeChannel(
+            [('stdout', b'hello\n'), ('stderr', b'warn\n'), ('stdout', b'bye\n')], exit_status=3)
+        output = []
+        runner = BatchRunner()
+        summary = runner.run([(host, 'pw')], 'uptime', lambda *item: output.append(item))
+        result, = summary.results
+        self.assertEqual(channel.command, 'uptime')
+        self.assertTrue(channel.closed)
+        self.assertEqual((result.exit_status, bytes(result.stdout), bytes(result.stderr)),
+                         (3, b'hello\nbye\n', b'warn\n'))
+        self.assertEqual(output, [(host, 'stdout', b'hello\n'), (host, 'stderr', b'warn\n'),
+                                  (host, 'stdout', b'bye\n')])
+        self.assertEqual(summary.exit_codes(), {3: 1})
+
+    def test_concurrency_limit(self):
+        self.delay = 0.05
+        finished = []
+        runner = BatchRunner(concurrency=3)
+        summary = runner.run(runner.fetch_passwords(self.hosts(10)), 'true', on_result=finished.append)
+        self.assertEqual(len(summary.succeeded), 10)
+        self.assertEqual(len(finished), 10)
+        self.assertEqual(self.peak, 3)
+
+    def test_per_host_timeout(self):
+        self.channels['10.0.0.1'] = FakeChannel(exit_status=None)
+        runner = BatchRunner(timeout=0.3)
+        started = time.monotonic()
+        summary = runner.run(runner.fetch_passwords(self.hosts(2)), 'sleep 100')
+        self.assertLess(time.monotonic() - started, 2)
+        fast, slow = summary.results
+        self.assertEqual((fast.exit_status, fast.error), (0, ''))
+        self.assertEqual((slow.exit_status, slow.error), (None, "超时"))
+        self.assertEqual(summary.failed, [slow])
+
+    def test_cancel_skips_pending_hosts(self):
+        self.channels['10.0.0.0'] = FakeChannel(exit_status=None)
+        runner = BatchRunner(concurrency=1)
+        threading.Timer(0.2, runner.cancel).start()
+        summary = runner.run(runner.fetch_passwords(self.hosts(3)), 'sleep 100')
+        self.assertEqual([result.error for result in summary.results], ["已取消"] * 3)
+        self.assertEqual(len(self.leases), 1)
+
+    def test_passwords_are_fetched_only_by_fetch_passwords(self):
+        get_password = mock.Mock(return_value='secret')
+        hosts = self.hosts(3)
+        hosts[1]['auth_type'] = 'key'
+        hosts[2]['password'] = 'inline'
+        runner = BatchRunner(get_password=get_password)
+        jobs = runner.fetch_passwords(hosts)
+        self.assertEqual([password for _, password in jobs], ['secret', '', 'inline'])
+        get_password.assert_called_once_with(0)
+
+        get_password.reset_mock()
+        runner.run(jobs, 'true')
+        get_password.assert_not_called()
+        self.assertEqual(sorted(lease.password for lease in self.leases), ['', 'inline', 'secret'])
+
+    def test_connection_error_is_reported(self):
+        refuse = mock.Mock(side_effect=ConnectionRefusedError("refused"))
+        with mock.patch.object(batch_runner, 'lease_connection', refuse):
+            summary = BatchRunner().run([(self.hosts(1)[0], '')], 'true')
+        self.assertEqual(summary.results[0].error, "失败: refused")
+
+
+class LineBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.a = {'id': 1, 'name': 'a'}
+        self.b = {'id': 2, 'name': 'b'}
+        self.buffer = LineBuffer()
+
+    def test_partial_lines_are_joined(self):
+        self.assertEqual(self.buffer.feed(self.a, 'stdout', b'hel'), [])
+        self.assertEqual(self.buffer.feed(self.a, 'stdout', b'lo\r\nwor'), [(self.a, 'stdout', 'hello')])
+        self.assertEqual(self.buffer.feed(self.a, 'stdout', b'ld\n\n'),
+                         [(self.a, 'stdout', 'world'), (self.a, 'stdout', '')])
+        self.assertEqual(self.buffer.flush(), [])
+
+    def test_hosts_and_streams_are_kept_apart(self):
+        self.buffer.feed(self.a, 'stdout', b'a-out')
+        self.buffer.feed(self.b, 'stdout', b'b-out')
+        self.buffer.feed(self.a, 'stderr', b'a-err')
+        self.assertEqual(self.buffer.feed(self.a, 'stdout', b'!\n'), [(self.a, 'stdout', 'a-out!')])
+        self.assertEqual(self.buffer.flush(self.a), [(self.a, 'stderr', 'a-err')])
+        self.assertEqual(self.buffer.flush(), [(self.b, 'stdout', 'b-out')])
+
+    def test_multibyte_character_split_across_chunks(self):
+        data = '中文\n'.encode()
+        self.assertEqual(self.buffer.feed(self.a, 'stdout', data[:2]), [])
+        self.assertEqual(self.buffer.feed(self.a, 'stdout', data[2:]), [(self.a, 'stdout', '中文')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from PyQt6.QtWidgets import QApplication
+
+from broadcast import InputBroadcaster
+
+
+class _Reactor:
+    def __init__(self):
+        self.writes = []
+
+    def want_write_many(self, writes):
+        self.writes.extend(writes)
+
+
+class _Client:
+    """只实现广播用到的接口"""
+
+    def __init__(self, reactor, bracketed_paste):
+        self.reactor = reactor
+        self.bracketed_paste = bracketed_paste
+        self.pasted = []
+
+    def queue_paste(self, payload, suffix_len=0):
+        self.pasted.append((payload, suffix_len))
+        return True
+
+    def write_request(self):
+        return self, None
+
+
+class BroadcastPasteTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_each_target_uses_its_own_bracketed_paste_mode(self):
+        reactor = _Reactor()
+        on = _Client(reactor, lambda: True)
+        off = _Client(reactor, lambda: False)
+        unknown = _Client(reactor, None)
+        broadcaster = InputBroadcaster()
+        for client in (on, off, unknown):
+            broadcaster.add(client)
+
+        broadcaster.paste(b'ls\n', bracketed=True)
+        self.assertEqual(on.pasted, [(b'\x1b[200~ls\n\x1b[201~', 6)])
+        self.assertEqual(off.pasted, [(b'ls\n', 0)])
+        self.assertEqual(unknown.pasted, [(b'\x1b[200~ls\n\x1b[201~', 6)])
+        self.assertEqual(len(reactor.writes), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from PyQt6.QtWidgets import QApplication
+
+from database import DatabaseManager, HostRecord
+from host_list_widget import HostTreeModel
+
+BENCH_HOSTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'benchmarks', 'bench_hosts.py')
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """在临时目录中打开数据库（DatabaseManager 在当前目录读写密钥文件）"""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._workdir = tempfile.TemporaryDirectory()
+        os.chdir(self._workdir.name)
+        self.db = DatabaseManager("test.db")
+
+    def tearDown(self):
+        self.db.close()
+        os.chdir(self._cwd)
+        self._workdir.cleanup()
+
+    def add(self, name: str, host: str = '10.0.0.1', username: str = 'root', **fields) -> int:
+        return self.db.add_host(name, host, 22, username, **fields)
+
+
+class HostLoadingTest(DatabaseTestCase):
+    def test_records_do_not_carry_passwords(self):
+        host_id = self.add('web-01', password='secret')
+        record = self.db.get_all_hosts()[0]
+        self.assertIsInstance(record, HostRecord)
+        self.assertEqual((record.id, record['name'], record.get('port')), (host_id, 'web-01', 22))
+        self.assertIsNone(record.get('password'))
+        self.assertNotIn('password', record.to_dict())
+
+    def test_credentials_are_decrypted_on_demand_and_dropped_on_update(self):
+        host_id = self.add('web-01', password='secret')
+        self.assertEqual(self.db.get_credentials(host_id), 'secret')
+        self.db.update_hosts([host_id], password='changed')
+        self.assertEqual(self.db.get_credentials(host_id), 'changed')
+        self.assertEqual(self.db.get_host(host_id)['password'], 'changed')
+
+    def test_ten_thousand_host_benchmark(self):
+        # 生成一万个主机，只检查分组计数和每个搜索的结果；耗时上限由CI的基准任务检查
+        result = subprocess.run([sys.executable, BENCH_HOSTS, '--hosts', '10000'],
+                                capture_output=True, text=True, timeout=300)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+
+class SearchTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.web = self.add('web-01', '10.0.0.1', 'deploy')
+        self.db_host = self.add('db-01', '10.0.0.2', description='web backend 北京机房')
+        self.cache = self.add('cache-01', '10.0.1.3', 'admin', description='50% full')
+
+    def test_index_tables_are_created(self):
+        self.assertTrue(self.db.fts_enabled)
+        self.assertTrue(self.db.trigram_enabled)
+
+    def test_prefix_search_ranks_name_hits_first(self):
+        self.assertEqual(self.db.search_host_ids('web'), [self.web, self.db_host])
+        self.assertEqual(self.db.search_host_ids('10.0.0'), [self.web, self.db_host])
+        self.assertEqual([record.name for record in self.db.search_hosts('we', limit=1)], ['web-01'])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.db.search_host_ids('web deploy'), [self.web])
+        self.assertEqual(self.db.search_host_ids('web admin'), [])
+
+    def test_substring_search(self):
+        # 词中间的部分：三个字符以上走三元组索引，更短的退回LIKE
+        self.assertEqual(self.db.search_host_ids('ackend'), [self.db_host])
+        self.assertEqual(self.db.search_host_ids('京机房'), [self.db_host])
+        self.assertEqual(self.db.search_host_ids('机房'), [self.db_host])
+
+    def test_query_syntax_is_escaped(self):
+        for keyword in ('"', 'web"', 'AND', 'a OR b', 'name:web', '*', '(web'):
+            self.db.search_host_ids(keyword)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.db.update_host(self.web, 'frontend-01', '10.0.0.1', 22, 'deploy')
+        self.assertEqual(self.db.search_host_ids('frontend'), [self.web])
+        self.assertEqual(self.db.search_host_ids('web'), [self.db_host])
+        self.db.delete_host(self.db_host)
+        self.assertEqual(self.db.search_host_ids('web'), [])
+        self.assertEqual(self.db.search_host_ids('ackend'), [])
+
+    def test_like_fallback_without_index(self):
+        self.db.fts_enabled = self.db.trigram_enabled = False
+        self.assertEqual(self.db.search_host_ids('web'), [self.db_host, self.web])
+        self.assertEqual(self.db.search_host_ids('0%'), [self.cache])
+        self.assertEqual(self.db.search_host_ids('_'), [])
+
+
+class AddHostsTest(DatabaseTestCase):
+    def insert_triggers(self) -> set:
+        return {row[0] for row in self.db.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='trigger' AND name LIKE 'hosts_%_ai'")}
+
+    def test_bulk_rows_are_indexed_and_triggers_restored(self):
+        self.add('old-01')
+        triggers = self.insert_triggers()
+        self.assertEqual(triggers, {'hosts_fts_ai', 'hosts_trgm_ai', 'hosts_group_ai'})
+        hosts = ({'name': f'bulk-{i:04d}', 'host': f'10.1.0.{i % 250}', 'username': 'root'} for i in range(2500))
+        self.assertEqual(self.db.add_hosts(hosts), 2500)
+        self.assertEqual(self.insert_triggers(), triggers)
+        self.assertEqual(len(self.db.search_host_ids('bulk')), 2500)
+        self.assertEqual(len(self.db.search_host_ids('ulk-00')), 100)
+        self.add('after-01')
+        self.assertEqual(len(self.db.search_host_ids('after')), 1)
+
+    def test_failed_import_rolls_back_and_keeps_triggers(self):
+        triggers = self.insert_triggers()
+        with self.assertRaises(KeyError):
+            self.db.add_hosts([{'name': 'a', 'host': '10.0.0.1', 'username': 'root'}, {'name': 'b'}])
+        self.assertEqual(self.db.count_hosts(), 0)
+        self.assertEqual(self.insert_triggers(), triggers)
+        self.add('later-01')
+        self.assertEqual(len(self.db.search_host_ids('later')), 1)
+
+    def test_group_tags_and_recording_are_kept(self):
+        group_id = self.db.add_group('prod')
+        self.db.add_hosts([
+            {'name': 'a', 'host': '10.0.0.1', 'username': 'root', 'group_id': group_id, 'tags': ['eu', 'web']},
+            {'name': 'b', 'host': '10.0.0.2', 'username': 'root', 'recording': 2},
+            {'name': 'c', 'host': '10.0.0.3', 'username': 'root', 'tags': [' web ', '']},
+        ])
+        a, b, c = self.db.get_all_hosts()
+        self.assertEqual((a.group_id, b.group_id, b.recording), (group_id, None, 2))
+        self.assertEqual(self.db.get_groups()[0][3], 1)
+        self.assertEqual(self.db.get_host_tags(a.id), ['eu', 'web'])
+        self.assertEqual(self.db.get_host_tags(c.id), ['web'])
+        self.assertEqual([(name, count) for _, name, count in self.db.get_tags()], [('eu', 1), ('web', 2)])
+
+    def test_unknown_group_rolls_back(self):
+        with self.assertRaisesRegex(ValueError, '分组不存在'):
+            self.db.add_hosts([{'name': 'a', 'host': '10.0.0.1', 'username': 'root', 'group_id': 99}])
+        self.assertEqual(self.db.count_hosts(), 0)
+
+    def test_skip_existing(self):
+        self.add('a', '10.0.0.1')
+        added = self.db.add_hosts([{'name': 'b', 'host': '10.0.0.1', 'username': 'root'},
+                                   {'name': 'c', 'host': '10.0.0.2', 'username': 'root'},
+                                   {'name': 'd', 'host': '10.0.0.2', 'username': 'root'}], skip_existing=True)
+        self.assertEqual(added, 1)
+
+
+class GroupCountTest(DatabaseTestCase):
+    def counts(self) -> dict:
+        return {name: count for _, name, _, count in self.db.get_groups()}
+
+    def test_counts_follow_host_changes(self):
+        parent = self.db.add_group('prod')
+        child = self.db.add_group('web', parent)
+        host_id = self.add('web-01', group_id=child)
+        self.add('db-01', group_id=parent)
+        self.assertEqual(self.counts(), {'prod': 2, 'web': 1})
+
+        self.db.move_hosts([host_id], None)
+        self.assertEqual(self.counts(), {'prod': 1, 'web': 0})
+        self.assertEqual(self.db.count_ungrouped(), 1)
+
+        self.db.move_hosts([host_id], child)
+        self.db.delete_group(child)
+        self.assertEqual(self.counts(), {'prod': 2})
+        self.assertEqual(self.db.get_host_record(host_id).group_id, parent)
+
+        self.db.delete_host(host_id)
+        self.assertEqual(self.counts(), {'prod': 1})
+
+    def test_tag_counts_and_forwards_follow_host_deletion(self):
+        host_id = self.add('web-01', tags=['eu', 'web'],
+                           forwards=[{'kind': 'L', 'bind_port': 8080, 'dest_host': 'localhost', 'dest_port': 80}])
+        self.add('web-02', tags=['web'])
+        self.assertEqual([(name, count) for _, name, count in self.db.get_tags()], [('eu', 1), ('web', 2)])
+        self.assertEqual(len(self.db.get_forwards(host_id)), 1)
+
+        self.db.delete_host(host_id)
+        self.assertEqual([(name, count) for _, name, count in self.db.get_tags()], [('web', 1)])
+        self.assertEqual(self.db.get_forwards(host_id), [])
+
+
+class HostPagingTest(DatabaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        super().setUp()
+        # 同名主机跨越分页边界，分页须按 (name, id) 继续
+        names = [f'host-{i // 3:04d}' for i in range(1200)]
+        self.db.add_hosts({'name': name, 'host': '10.0.0.1', 'username': 'root'} for name in names)
+        self.expected = sorted((record.name, record.id) for record in self.db.get_all_hosts())
+
+    def test_group_pages(self):
+        keys, after = [], ('', 0)
+        while True:
+            page = self.db.get_group_hosts(None, after, limit=500)
+            if not page:
+                break
+            keys.extend((record.name, record.id) for record in page)
+            after = keys[-1]
+        self.assertEqual(keys, self.expected)
+
+    def test_tree_model_fetches_pages_on_demand(self):
+        model = HostTreeModel(self.db)
+        model.reload()
+        ungrouped = model.index(0, 0)
+        self.assertEqual(model.node_at(ungrouped).count, 1200)
+        self.assertEqual(model.rowCount(ungrouped), 0)
+        self.assertTrue(model.hasChildren(ungrouped))
+
+        fetched = []
+        while model.canFetchMore(ungrouped):
+            model.fetchMore(ungrouped)
+            fetched.append(model.rowCount(ungrouped))
+        self.assertEqual(fetched, [500, 1000, 1200])
+        keys = [(node.host.name, node.host.id) for node in model.node_at(ungrouped).children]
+        self.assertEqual(keys, self.expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from host_import import detect_format, parse_csv, parse_json, parse_ssh_config, read_inventory
+
+HOME = os.path.expanduser('~')
+
+SSH_CONFIG = """
+# 注释
+Host *
+    User deploy
+    IdentityFile ~/.ssh/id_default
+
+Host web1 web2
+    HostName 10.0.0.1
+    Port 2222
+    Port 2200
+
+Host db
+    HostName db.example.com
+    User=postgres
+    IdentityFile "%d/.ssh/%r@%h"
+
+Host bastion-*
+    User jump
+
+Match host foo
+    User ignored
+
+Host plain
+    IdentityFile none_key
+"""
+
+
+class SshConfigTest(unittest.TestCase):
+    def parse(self, text: str) -> dict:
+        return {entry['name']: entry for entry in parse_ssh_config(text.splitlines(), 'me')}
+
+    def test_hosts_and_defaults(self):
+        hosts = self.parse(SSH_CONFIG)
+        self.assertEqual(sorted(hosts), ['db', 'plain', 'web1', 'web2'])
+        web1 = hosts['web1']
+        self.assertEqual((web1['host'], web1['port'], web1['username']), ('10.0.0.1', 2222, 'deploy'))
+        self.assertEqual(hosts['web2']['host'], '10.0.0.1')
+        self.assertEqual(hosts['db']['username'], 'postgres')
+        self.assertEqual(hosts['db']['port'], 22)
+
+    def test_identity_file_is_expanded(self):
+        hosts = self.parse(SSH_CONFIG)
+        self.assertEqual(hosts['web1']['auth_type'], 'key')
+        self.assertEqual(hosts['web1']['private_key_path'], os.path.join(HOME, '.ssh', 'id_default'))
+        self.assertEqual(hosts['db']['private_key_path'], f"{HOME}/.ssh/postgres@db.example.com")
+        self.assertEqual(hosts['plain']['private_key_path'], 'none_key')
+        self.assertEqual(hosts['plain']['password'], '')
+
+    def test_unsupported_identity_token_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, '%C'):
+            self.parse("Host x\n    IdentityFile ~/.ssh/%C\n")
+
+    def test_without_identity_file_uses_password(self):
+        entry = self.parse("Host x\n    HostName 1.2.3.4\n")['x']
+        self.assertEqual((entry['auth_type'], entry['private_key_path'], entry['username']), ('password', '', 'me'))
+
+
+class CsvTest(unittest.TestCase):
+    def test_aliases_and_extra_fields(self):
+        stream = io.StringIO(
+            "Alias,IP,Port,User,Password,Identity_File,Comment,Tags,Group,Recording\n"
+            "web,10.0.0.1,bad,root,pw,,front,\"eu, web\",3,1\n"
+            ",,22,root,,,,,,\n"
+            "db,10.0.0.2,5432,,,~/.ssh/id_db,,,,\n")
+        entries = list(parse_csv(stream, 'me'))
+        self.assertEqual(len(entries), 2)
+        web, db = entries
+        self.assertEqual((web['name'], web['host'], web['port'], web['username'], web['password']),
+                         ('web', '10.0.0.1', 22, 'root', 'pw'))
+        self.assertEqual((web['description'], web['tags'], web['group_id'], web['recording']),
+                         ('front', ['eu', 'web'], 3, 1))
+        self.assertEqual((db['port'], db['username'], db['auth_type']), (5432, 'me', 'key'))
+        self.assertEqual(db['private_key_path'], os.path.join(HOME, '.ssh', 'id_db'))
+        self.assertEqual((db['tags'], db['group_id'], db['recording']), ([], None, 0))
+
+
+class JsonTest(unittest.TestCase):
+    HOSTS = [{'name': 'a', 'host': '10.0.0.1', 'tags': ['x', 'y']}, {'hostname': '10.0.0.2', 'port': 2222}]
+
+    def names(self, text: str) -> list:
+        return [(entry['name'], entry['port']) for entry in parse_json(io.StringIO(text), 'me')]
+
+    def test_array_object_and_lines(self):
+        expected = [('a', 22), ('10.0.0.2', 2222)]
+        self.assertEqual(self.names(json.dumps(self.HOSTS)), expected)
+        self.assertEqual(self.names(json.dumps({'hosts': self.HOSTS}, indent=2)), expected)
+        self.assertEqual(self.names(json.dumps({'hosts': self.HOSTS})), expected)
+        self.assertEqual(self.names('\n'.join(json.dumps(host) for host in self.HOSTS) + '\n'), expected)
+        self.assertEqual(self.names(''), [])
+
+    def test_list_fields(self):
+        entry = next(parse_json(io.StringIO(json.dumps(self.HOSTS)), 'me'))
+        self.assertEqual(entry['tags'], ['x', 'y'])
+
+
+class ReadInventoryTest(unittest.TestCase):
+    def test_detect_format(self):
+        self.assertEqual(detect_format('hosts.CSV'), 'csv')
+        self.assertEqual(detect_format('hosts.jsonl'), 'json')
+        self.assertEqual(detect_format('~/.ssh/config'), 'ssh_config')
+
+    def test_csv_with_bom(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'hosts.csv')
+            with open(path, 'w', encoding='utf-8-sig') as f:
+                f.write("name,host\n中文主机,10.0.0.1\n")
+            entries = list(read_inventory(path, default_user='me'))
+        self.assertEqual([(entry['name'], entry['username']) for entry in entries], [('中文主机', 'me')])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            list(read_inventory('hosts.txt', fmt='yaml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
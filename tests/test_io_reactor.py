@@ -0,0 +1,139 @@
+import socket
+import threading
+import time
+import unittest
+
+from io_reactor import IOReactor
+
+
+class _Reader:
+    """读取socket并记录收到的数据；keep 为False时读完即要求注销"""
+
+    def __init__(self, sock: socket.socket, keep: bool = True):
+        self.sock = sock
+        self.keep = keep
+        self.data = b''
+        self.calls = 0
+        self.received = threading.Event()
+
+    def __call__(self) -> bool:
+        self.calls += 1
+        try:
+            data = self.sock.recv(4096)
+        except BlockingIOError:
+            return True
+        self.data += data
+        self.received.set()
+        return self.keep and bool(data)
+
+
+class IOReactorTest(unittest.TestCase):
+    def setUp(self):
+        self.reactor = IOReactor()
+        self.addCleanup(self.reactor.shutdown)
+
+    def pair(self) -> tuple:
+        local, remote = socket.socketpair()
+        local.setblocking(False)
+        self.addCleanup(local.close)
+        self.addCleanup(remote.close)
+        return local, remote
+
+    def test_register_delivers_data(self):
+        local, remote = self.pair()
+        reader = _Reader(local)
+        self.reactor.register(local, reader)
+        remote.send(b'hello')
+        self.assertTrue(reader.received.wait(2))
+        self.assertEqual(reader.data, b'hello')
+
+    def test_wakeup_picks_up_registration_while_idle(self):
+        first, _ = self.pair()
+        self.reactor.register(first, _Reader(first))
+        # 线程此时阻塞在没有超时的select中，新注册须靠唤醒管道生效
+        time.sleep(0.1)
+        local, remote = self.pair()
+        reader = _Reader(local)
+        self.reactor.register(local, reader)
+        remote.send(b'x')
+        self.assertTrue(reader.received.wait(2))
+
+    def test_unregister_stops_delivery(self):
+        local, remote = self.pair()
+        reader = _Reader(local)
+        self.reactor.register(local, reader)
+        remote.send(b'a')
+        self.assertTrue(reader.received.wait(2))
+        self.reactor.unregister(local)
+        reader.received.clear()
+        remote.send(b'b')
+        self.assertFalse(reader.received.wait(0.2))
+        self.assertEqual(reader.data, b'a')
+
+    def test_handler_returning_false_is_removed(self):
+        local, remote = self.pair()
+        reader = _Reader(local, keep=False)
+        self.reactor.register(local, reader)
+        remote.send(b'a')
+        self.assertTrue(reader.received.wait(2))
+        remote.send(b'b')
+        time.sleep(0.2)
+        self.assertEqual(reader.calls, 1)
+
+    def test_pause_and_resume(self):
+        local, remote = self.pair()
+        reader = _Reader(local)
+        self.reactor.register(local, reader)
+        self.reactor.pause(local)
+        remote.send(b'held')
+        self.assertFalse(reader.received.wait(0.2))
+        self.reactor.resume(local)
+        self.assertTrue(reader.received.wait(2))
+        self.assertEqual(reader.data, b'held')
+
+    def test_writer_runs_until_done(self):
+        local, _ = self.pair()
+        self.reactor.register(local, _Reader(local))
+        done = threading.Event()
+        calls = []
+
+        def writer() -> bool:
+            calls.append(1)
+            if len(calls) < 3:
+                return True
+            done.set()
+            return False
+        self.reactor.want_write(local, writer)
+        self.assertTrue(done.wait(2))
+        time.sleep(0.1)
+        self.assertEqual(len(calls), 3)
+
+    def test_register_after_shutdown_is_refused(self):
+        local, remote = self.pair()
+        reader = _Reader(local)
+        self.reactor.register(local, reader)
+        loop = self.reactor._loops[0]
+        self.reactor.shutdown()
+        loop.thread.join(2)
+        self.assertFalse(loop.thread.is_alive())
+        self.assertTrue(self.reactor.closed)
+
+        with self.assertRaises(RuntimeError):
+            self.reactor.register(local, reader)
+        self.assertFalse(loop.thread.is_alive())
+        # 关闭后的注销不再等待I/O线程确认
+        started = time.monotonic()
+        self.reactor.unregister(local)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_shutdown_without_started_thread(self):
+        reactor = IOReactor(workers=2)
+        reactor.shutdown()
+        local, _ = self.pair()
+        with self.assertRaises(RuntimeError):
+            reactor.register(local, _Reader(local))
+        self.assertTrue(all(loop.thread is None for loop in reactor._loops))
+
+
+if __name__ == '__main__':
+    unittest.main()
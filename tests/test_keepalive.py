@@ -0,0 +1,94 @@
+import socket
+import threading
+import unittest
+
+import paramiko
+
+from keepalive import KeepaliveMonitor, _Probe, global_request_lock, send_probe
+
+
+class _Server(paramiko.ServerInterface):
+    def __init__(self):
+        self.requests = []
+
+    def get_allowed_auths(self, username):
+        return 'none'
+
+    def check_auth_none(self, username):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_global_request(self, kind, msg):
+        self.requests.append(kind)
+        return False
+
+    def check_port_forward_request(self, address, port):
+        self.requests.append('tcpip-forward')
+        return 4242
+
+
+class GlobalRequestTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.host_key = paramiko.RSAKey.generate(1024)
+
+    def setUp(self):
+        client_sock, server_sock = socket.socketpair()
+        self.server = _Server()
+        self.server_transport = paramiko.Transport(server_sock)
+        self.server_transport.add_server_key(self.host_key)
+        # 传入 event 时 start_server 不等待协商完成
+        self.server_transport.start_server(threading.Event(), self.server)
+        self.transport = paramiko.Transport(client_sock)
+        self.transport.connect()
+        self.transport.auth_none('test')
+        self.addCleanup(self.server_transport.close)
+        self.addCleanup(self.transport.close)
+
+    def test_probe_is_answered(self):
+        self.assertTrue(send_probe(self.transport).wait(5))
+        self.assertEqual(self.server.requests, ['keepalive@openssh.com'])
+
+    def test_forward_reply_is_not_taken_by_earlier_probe(self):
+        # 探测的回应（失败）先到，不能被当作转发请求的回应
+        answered = send_probe(self.transport)
+        with global_request_lock(self.transport):
+            port = self.transport.request_port_forward('127.0.0.1', 0)
+        self.assertEqual(port, 4242)
+        self.assertTrue(answered.wait(5))
+        self.assertEqual(self.server.requests, ['keepalive@openssh.com', 'tcpip-forward'])
+
+    def test_probes_interleaved_with_requests(self):
+        probes = [send_probe(self.transport) for _ in range(3)]
+        with global_request_lock(self.transport):
+            self.assertIsNone(self.transport.global_request('unknown@example.com', wait=True))
+        probes.append(send_probe(self.transport))
+        with global_request_lock(self.transport):
+            self.assertEqual(self.transport.request_port_forward('127.0.0.1', 0), 4242)
+        for probe in probes:
+            self.assertTrue(probe.wait(5))
+
+    def test_unsent_request_is_forgotten(self):
+        with self.assertRaises(RuntimeError):
+            with global_request_lock(self.transport):
+                raise RuntimeError()
+        self.assertTrue(send_probe(self.transport).wait(5))
+        with global_request_lock(self.transport):
+            self.assertEqual(self.transport.request_port_forward('127.0.0.1', 0), 4242)
+
+    def test_monitor_marks_probe_answered(self):
+        probe = _Probe()
+        probe.answered = False
+        KeepaliveMonitor._probe(self.transport, probe)
+        self.assertTrue(probe.answered)
+
+    def test_probe_ends_when_connection_closes(self):
+        probe = _Probe()
+        probe.answered = False
+        self.server_transport.close()
+        self.transport.close()
+        KeepaliveMonitor._probe(self.transport, probe)
+        self.assertFalse(probe.answered)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from unittest import mock
+
+from PyQt6.QtWidgets import QApplication
+
+from broadcast import InputBroadcaster
+from main_window import SSHTerminalTab
+from ssh_client import SSHClient
+
+
+class BroadcastReplyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def _tab(self, name: str, broadcaster: InputBroadcaster) -> SSHTerminalTab:
+        tab = SSHTerminalTab({'id': 1, 'name': name, 'host': name, 'port': 22, 'username': 'root'},
+                             broadcaster=broadcaster)
+        broadcaster.add(tab.ssh_client)
+        return tab
+
+    def test_terminal_replies_stay_in_their_own_session(self):
+        with mock.patch.object(SSHClient, 'send_command', autospec=True) as send_command, \
+                mock.patch.object(InputBroadcaster, 'send', autospec=True) as broadcast:
+            broadcaster = InputBroadcaster()
+            source = self._tab('a', broadcaster)
+            other = self._tab('b', broadcaster)
+
+            # 光标位置报告和设备属性查询
+            source.terminal.append_output(b'\x1b[6n\x1b[c')
+            self.assertEqual(send_command.call_args_list,
+                             [mock.call(source.ssh_client, b'\x1b[1;1R'),
+                              mock.call(source.ssh_client, b'\x1b[?1;2c')])
+            broadcast.assert_not_called()
+
+            # 键盘输入仍然广播
+            source.terminal.command_entered.emit(b'ls\r')
+            broadcast.assert_called_once_with(broadcaster, b'ls\r')
+            self.assertNotIn(other.ssh_client, [call.args[0] for call in send_command.call_args_list])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from PyQt6.QtWidgets import QApplication
+
+from output_coalescer import OutputCoalescer
+
+
+class OutputCoalescerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.events = []
+        self.received = []
+        self.coalescer = OutputCoalescer()
+        self.coalescer.on_pause = lambda: self.events.append('pause')
+        self.coalescer.on_resume = lambda: self.events.append('resume')
+        self.coalescer.output_ready.connect(self.received.append)
+
+    def test_pauses_above_high_water_and_resumes_below_low_water(self):
+        piece = b'x' * 65536
+        for _ in range(OutputCoalescer.HIGH_WATER // len(piece) + 4):
+            self.coalescer.feed(piece)
+        self.assertEqual(self.events, ['pause'])
+        self.assertTrue(self.coalescer.paused)
+
+        while self.coalescer.paused:
+            self.coalescer._flush_frame()
+        self.assertEqual(self.events, ['pause', 'resume'])
+        self.assertLessEqual(self.coalescer._pending_len, OutputCoalescer.LOW_WATER)
+
+    def test_flush_delivers_everything_and_resumes(self):
+        self.coalescer.feed(b'y' * (OutputCoalescer.HIGH_WATER + 1))
+        self.coalescer.flush()
+        self.assertEqual(sum(map(len, self.received)), OutputCoalescer.HIGH_WATER + 1)
+        self.assertEqual(self.events, ['pause', 'resume'])
+        self.assertFalse(self.coalescer.paused)
+
+
+if __name__ == '__main__':
+    unittest.main()
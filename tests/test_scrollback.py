@@ -0,0 +1,138 @@
+import unittest
+from array import array
+
+from scrollback import DECODED_PAGES, HOT_PAGES, PAGE_LINES, Scrollback, _Page
+from terminal_screen import DEFAULT_ATTR, WIDE_PLACEHOLDER, Line, apply_sgr
+
+
+def _line(text: str, cols: int = 20, attr: int = DEFAULT_ATTR, wrapped: bool = False) -> Line:
+    line = Line(cols)
+    line.chars[:len(text)] = array('w', text)
+    line.attrs[:len(text)] = array('I', [attr]) * len(text)
+    line.wrapped = wrapped
+    return line
+
+
+def _cells(line: Line) -> tuple:
+    return line.chars.tounicode(), line.attrs.tolist(), line.wrapped
+
+
+class PageTest(unittest.TestCase):
+    def setUp(self):
+        red = apply_sgr(DEFAULT_ATTR, (31,))
+        styled = _line('ab', wrapped=True)
+        # 行尾带背景色的空白要保留
+        styled.attrs[5:8] = array('I', [apply_sgr(DEFAULT_ATTR, (41,))]) * 3
+        self.lines = [
+            _line('hello', attr=red),
+            styled,
+            _line(''),
+            _line('中' + WIDE_PLACEHOLDER + '文' + WIDE_PLACEHOLDER, cols=10),
+            _line('trailing   '),
+        ]
+
+    def test_round_trip(self):
+        page = _Page(self.lines)
+        self.assertEqual([_cells(line) for line in page.decode()], [_cells(line) for line in self.lines])
+
+    def test_compressed_round_trip(self):
+        page = _Page(self.lines)
+        plain = page.plain_text()
+        page.compress()
+        self.assertTrue(page.compressed)
+        self.assertEqual(page.plain_text(), plain)
+        self.assertEqual([_cells(line) for line in page.decode()], [_cells(line) for line in self.lines])
+
+    def test_decoded_lines_keep_their_width(self):
+        page = _Page(self.lines)
+        page.compress()
+        self.assertEqual([len(line) for line in page.decode()], [20, 20, 20, 10, 20])
+        self.assertEqual([len(line.attrs) for line in page.decode()], [20, 20, 20, 10, 20])
+
+
+class ScrollbackTest(unittest.TestCase):
+    def fill(self, history: Scrollback, count: int, start: int = 0):
+        # 定长的行内容，每页占用的字节数相同
+        history.extend(_line(f'line {i:05d}') for i in range(start, start + count))
+
+    def test_indexing_across_pages(self):
+        history = Scrollback()
+        self.fill(history, PAGE_LINES * (HOT_PAGES + 2) + 3)
+        self.assertEqual(len(history.pages), HOT_PAGES + 2)
+        self.assertTrue(history.pages[0].compressed)
+        self.assertFalse(history.pages[-1].compressed)
+        for index in (0, PAGE_LINES - 1, PAGE_LINES * 3 + 7, len(history) - 1):
+            self.assertEqual(history[index].text(), f'line {index:05d}')
+            self.assertEqual(len(history[index]), 20)
+        self.assertEqual(history[-1].text(), f'line {len(history) - 1:05d}')
+        with self.assertRaises(IndexError):
+            history[len(history) + PAGE_LINES]
+
+    def test_line_cap_drops_oldest_pages(self):
+        history = Scrollback(max_lines=PAGE_LINES * 2)
+        self.fill(history, PAGE_LINES * 3)
+        self.assertEqual(len(history.pages), 2)
+        self.assertEqual(history.dropped, PAGE_LINES)
+        self.assertEqual(history[0].text(), f'line {PAGE_LINES:05d}')
+        self.assertEqual(history.segments()[0][0], PAGE_LINES)
+
+    def test_byte_cap_drops_oldest_pages(self):
+        history = Scrollback(compress=False)
+        self.fill(history, PAGE_LINES)
+        page_bytes = history.nbytes
+        history = Scrollback(max_bytes=page_bytes * 2, compress=False)
+        self.fill(history, PAGE_LINES * 4)
+        self.assertLessEqual(history.nbytes, page_bytes * 2)
+        self.assertEqual(history.dropped, PAGE_LINES * 2)
+        self.assertEqual(history[0].text(), f'line {PAGE_LINES * 2:05d}')
+
+    def test_clear_counts_dropped_lines(self):
+        history = Scrollback()
+        self.fill(history, PAGE_LINES + 5)
+        history[0]
+        history.clear()
+        self.assertEqual((len(history), history.dropped, len(history.decoded)), (0, PAGE_LINES + 5, 0))
+
+
+class DecodedCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.history = Scrollback()
+        self.history.extend(_line(f'line {i}') for i in range(PAGE_LINES * (DECODED_PAGES + 2)))
+        self.decodes = 0
+        decode = _Page.decode
+
+        def counting(page):
+            self.decodes += 1
+            return decode(page)
+        _Page.decode = counting
+        self.addCleanup(setattr, _Page, 'decode', decode)
+
+    def test_pages_are_decoded_once(self):
+        first = self.history[0]
+        self.assertIs(self.history[0], first)
+        self.history[PAGE_LINES - 1]
+        self.assertEqual(self.decodes, 1)
+        self.assertIn(self.history.pages[0], self.history.decoded)
+
+    def test_least_recently_used_page_is_evicted(self):
+        for page_index in range(DECODED_PAGES):
+            self.history[page_index * PAGE_LINES]
+        self.history[0]
+        self.history[DECODED_PAGES * PAGE_LINES]
+        self.assertEqual(len(self.history.decoded), DECODED_PAGES)
+        self.assertIn(self.history.pages[0], self.history.decoded)
+        self.assertNotIn(self.history.pages[1], self.history.decoded)
+        self.assertEqual(self.decodes, DECODED_PAGES + 1)
+
+    def test_dropped_page_leaves_cache(self):
+        history = Scrollback(max_lines=PAGE_LINES * 2)
+        history.extend(_line(f'line {i}') for i in range(PAGE_LINES * 2))
+        old = history.pages[0]
+        history[0]
+        history.extend(_line('new') for _ in range(PAGE_LINES))
+        self.assertNotIn(old, history.decoded)
+        self.assertEqual(history[0].text(), f'line {PAGE_LINES}')
+
+
+if __name__ == '__main__':
+    unittest.main()
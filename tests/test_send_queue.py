@@ -0,0 +1,48 @@
+import unittest
+
+from send_queue import SendQueue
+
+
+def _drain(queue: SendQueue, limit: int = 4) -> bytes:
+    sent = b''
+    while True:
+        chunk, bulk = queue.peek(limit)
+        if not chunk:
+            return sent
+        queue.consume(len(chunk), bulk)
+        sent += chunk
+
+
+class SendQueueTest(unittest.TestCase):
+    def test_input_goes_before_unstarted_paste(self):
+        queue = SendQueue()
+        queue.put_bulk(b'paste')
+        queue.put(b'k')
+        self.assertEqual(_drain(queue), b'kpaste')
+
+    def test_input_preempts_plain_paste(self):
+        queue = SendQueue()
+        queue.put_bulk(b'abcdef')
+        queue.consume(len(queue.peek(2)[0]), True)
+        queue.put(b'k')
+        self.assertEqual(_drain(queue), b'kcdef')
+
+    def test_input_waits_for_bracketed_paste_end_marker(self):
+        queue = SendQueue()
+        queue.put_bulk(b'\x1b[200~abcdef', b'\x1b[201~')
+        queue.consume(len(queue.peek(8)[0]), True)
+        queue.put(b'k')
+        self.assertEqual(_drain(queue), b'cdef\x1b[201~k')
+        self.assertEqual(queue.input_pending, 0)
+
+    def test_cancel_sends_end_marker_before_waiting_input(self):
+        queue = SendQueue()
+        queue.put_bulk(b'\x1b[200~abcdef', b'\x1b[201~')
+        queue.consume(len(queue.peek(8)[0]), True)
+        queue.put(b'k')
+        self.assertEqual(queue.cancel_bulk(), 4)
+        self.assertEqual(_drain(queue), b'\x1b[201~k')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+from PyQt6.QtWidgets import QApplication
+
+from ssh_client import SSHClient
+
+
+class BulkThrottleTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def channel(self, window: int) -> mock.Mock:
+        channel = mock.Mock()
+        channel.out_window_size = window
+        return channel
+
+    def test_throttles_when_window_is_used_up(self):
+        client = SSHClient(reactor=mock.Mock())
+        channel = self.channel(2 * 1024 * 1024)
+        self.assertFalse(client._bulk_throttled(channel))
+        channel.out_window_size = 1024 * 1024
+        self.assertTrue(client._bulk_throttled(channel))
+
+    def test_window_tracking_restarts_on_new_channel(self):
+        client = SSHClient(reactor=mock.Mock())
+        old = self.channel(2 * 1024 * 1024)
+        client._attach(mock.Mock(), old)
+        client._bulk_throttled(old)
+        old.out_window_size = 1024 * 1024
+        self.assertTrue(client._bulk_throttled(old))
+
+        # 重连后的通道窗口较小，不能按旧通道的峰值算成已有大量数据在途
+        new = self.channel(64 * 1024)
+        client._attach(mock.Mock(), new)
+        self.assertFalse(client._bulk_throttled(new))
+        client.reactor.register.assert_called_with(new, client._on_readable)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+def _startup_check(*args: str) -> subprocess.CompletedProcess:
+    """在临时目录中以 offscreen 平台运行 main.py --startup-check，不影响当前目录的数据库"""
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    with tempfile.TemporaryDirectory() as cwd:
+        return subprocess.run([sys.executable, MAIN, *args], cwd=cwd, env=env,
+                              capture_output=True, text=True, timeout=120)
+
+
+class StartupCheckTest(unittest.TestCase):
+    def test_first_paint_within_default_budget(self):
+        result = _startup_check('--startup-check')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        # 数据库在首次绘制之后由后台线程打开，随后加载主机
+        report = result.stderr
+        self.assertLess(report.index("首次绘制"), report.index("加载主机"))
+
+    def test_over_budget_fails(self):
+        result = _startup_check('--startup-check=0.001')
+        self.assertEqual(result.returncode, 1, result.stderr)
+        self.assertIn("超出预算", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
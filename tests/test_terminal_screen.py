@@ -0,0 +1,196 @@
+import unittest
+
+from ansi_parser import AnsiParser
+from terminal_screen import Screen
+
+
+def _screen(data: bytes, cols: int = 20, rows: int = 5) -> Screen:
+    screen = Screen(cols, rows)
+    screen.feed(AnsiParser().feed(data))
+    return screen
+
+
+def _row(screen: Screen, y: int) -> str:
+    return screen.lines[y].chars.tounicode().rstrip(' ')
+
+
+class ScreenTest(unittest.TestCase):
+    def test_cursor_addressing(self):
+        screen = _screen(b'\x1b[3;5Hx')
+        self.assertEqual(_row(screen, 2), '    x')
+        self.assertEqual((screen.cursor.x, screen.cursor.y), (5, 2))
+
+    def test_colon_subparameters_outside_sgr_use_first_value(self):
+        screen = _screen(b'abc\x1b[2:9Hdef')
+        self.assertEqual(_row(screen, 0), 'abc')
+        self.assertEqual(_row(screen, 1), 'def')
+        for sequence in (b'\x1b[1:2r', b'\x1b[1:2P', b'\x1b[1:2@', b'\x1b[1:1S', b'\x1b[1:2J'):
+            _screen(b'abc' + sequence + b'def')
+
+    def test_clamped_parameters(self):
+        screen = _screen(b'\x1b[65535;65535Hx\x1b[65535S\x1b[65535@')
+        self.assertEqual((screen.cursor.x, screen.cursor.y), (19, 4))
+
+    def test_bad_action_is_dropped(self):
+        screen = Screen(20, 5)
+        screen.feed([('print', 'ab'), ('cursor', 'H', (('bad',),)), ('print', 'cd')])
+        self.assertEqual(_row(screen, 0), 'abcd')
+
+    def test_bug_in_screen_is_not_swallowed(self):
+        screen = Screen(20, 5)
+
+        def broken(final, params):
+            raise RuntimeError('bug')
+        screen._cursor_action = broken
+        with self.assertRaises(RuntimeError):
+            screen.feed([('print', 'ab'), ('cursor', 'H', (1, 1))])
+
+    def test_dropped_actions_are_counted(self):
+        screen = Screen(20, 5)
+        screen.feed([('cursor', 'H', (('bad',),)), ('edit', 'P', ('bad',))])
+        self.assertEqual(screen.dropped_actions, 2)
+
+
+class AlternateScreenTest(unittest.TestCase):
+    def test_switch_and_restore(self):
+        screen = _screen(b'primary\x1b[2;4H\x1b[?1049halt\x1b[5;1Hbottom')
+        self.assertTrue(screen.alt_active)
+        self.assertEqual((_row(screen, 0), _row(screen, 1), _row(screen, 4)), ('', '   alt', 'bottom'))
+        screen.feed(AnsiParser().feed(b'\x1b[?1049l'))
+        self.assertFalse(screen.alt_active)
+        self.assertEqual(_row(screen, 0), 'primary')
+        self.assertEqual(_row(screen, 1), '')
+        self.assertEqual((screen.cursor.x, screen.cursor.y), (3, 1))
+
+    def test_alternate_screen_does_not_feed_history(self):
+        screen = _screen(b'\x1b[?1049h' + b'line\r\n' * 10)
+        self.assertEqual(len(screen.history), 0)
+        screen = _screen(b'line\r\n' * 10)
+        self.assertEqual(len(screen.history), 6)
+
+    def test_restored_cursor_is_a_copy(self):
+        screen = _screen(b'\x1b[2;3H\x1b[?1049h\x1b[?1049l\x1b[5;5H')
+        self.assertEqual((screen.saved_primary_cursor.x, screen.saved_primary_cursor.y), (2, 1))
+
+
+class ScrollRegionTest(unittest.TestCase):
+    def filled(self) -> Screen:
+        # 五行 a..e，滚动区域为第2到4行
+        return _screen(b'a\r\nb\r\nc\r\nd\r\ne\x1b[2;4r')
+
+    def rows(self, screen: Screen) -> list:
+        return [_row(screen, y) for y in range(screen.rows)]
+
+    def test_margins_home_cursor_and_confine_scrolling(self):
+        screen = self.filled()
+        self.assertEqual((screen.top, screen.bottom), (1, 3))
+        self.assertEqual((screen.cursor.x, screen.cursor.y), (0, 0))
+        screen.feed(AnsiParser().feed(b'\x1b[4;1H\nx'))
+        self.assertEqual(self.rows(screen), ['a', 'c', 'd', 'x', 'e'])
+        self.assertEqual(len(screen.history), 0)
+
+    def test_insert_and_delete_lines(self):
+        screen = self.filled()
+        screen.feed(AnsiParser().feed(b'\x1b[3;1H\x1b[L'))
+        self.assertEqual(self.rows(screen), ['a', 'b', '', 'c', 'e'])
+        screen.feed(AnsiParser().feed(b'\x1b[2;1H\x1b[2M'))
+        self.assertEqual(self.rows(screen), ['a', 'c', '', '', 'e'])
+        # 光标在滚动区域外时不起作用
+        screen.feed(AnsiParser().feed(b'\x1b[5;1H\x1b[L'))
+        self.assertEqual(self.rows(screen), ['a', 'c', '', '', 'e'])
+
+    def test_scroll_up_and_down(self):
+        screen = self.filled()
+        screen.feed(AnsiParser().feed(b'\x1b[S'))
+        self.assertEqual(self.rows(screen), ['a', 'c', 'd', '', 'e'])
+        screen.feed(AnsiParser().feed(b'\x1b[2T'))
+        self.assertEqual(self.rows(screen), ['a', '', '', 'c', 'e'])
+        self.assertEqual(len(screen.history), 0)
+
+    def test_full_screen_scroll_feeds_history(self):
+        screen = _screen(b'a\r\nb\x1b[2S')
+        self.assertEqual(_row(screen, 0), '')
+        self.assertEqual([line.text() for line in screen.history], ['a', 'b'])
+        self.assertEqual(screen.take_scrolled(), 2)
+
+
+class EraseTest(unittest.TestCase):
+    def test_erase_in_display(self):
+        data = b'aaaa\r\nbbbb\r\ncccc\x1b[2;3H'
+        screen = _screen(data + b'\x1b[J', rows=3)
+        self.assertEqual([_row(screen, y) for y in range(3)], ['aaaa', 'bb', ''])
+        screen = _screen(data + b'\x1b[1J', rows=3)
+        self.assertEqual([_row(screen, y) for y in range(3)], ['', '   b', 'cccc'])
+        screen = _screen(data + b'\x1b[2J', rows=3)
+        self.assertEqual([_row(screen, y) for y in range(3)], ['', '', ''])
+        self.assertEqual((screen.cursor.x, screen.cursor.y), (2, 1))
+
+    def test_erase_in_line_and_characters(self):
+        self.assertEqual(_row(_screen(b'abcdef\x1b[1;3H\x1b[K'), 0), 'ab')
+        self.assertEqual(_row(_screen(b'abcdef\x1b[1;3H\x1b[1K'), 0), '   def')
+        self.assertEqual(_row(_screen(b'abcdef\x1b[1;3H\x1b[2K'), 0), '')
+        self.assertEqual(_row(_screen(b'abcdef\x1b[1;3H\x1b[2X'), 0), 'ab  ef')
+        self.assertEqual(_row(_screen(b'abcdef\x1b[1;5H\x1b[9X'), 0), 'abcd')
+
+    def test_erase_uses_current_background(self):
+        screen = _screen(b'abc\x1b[41m\x1b[1;2H\x1b[K')
+        line = screen.lines[0]
+        self.assertEqual(line.attrs[0], screen.lines[1].attrs[0])
+        self.assertNotEqual(line.attrs[1], line.attrs[0])
+        self.assertEqual(line.attrs[1], line.attrs[19])
+
+
+class DirtyRowsTest(unittest.TestCase):
+    def test_only_touched_rows_are_dirty(self):
+        screen = Screen(20, 5)
+        self.assertEqual(screen.take_dirty(), set(range(5)))
+        self.assertFalse(screen.all_dirty)
+        self.assertEqual(screen.take_dirty(), set())
+        screen.feed(AnsiParser().feed(b'\x1b[3;1Hx\x1b[5;1H\x1b[K'))
+        self.assertEqual(screen.take_dirty(), {2, 4})
+
+    def test_scrolling_and_switching_mark_rows(self):
+        screen = Screen(20, 5)
+        screen.take_dirty()
+        screen.feed(AnsiParser().feed(b'\x1b[2;4r\x1b[4;1H\n'))
+        self.assertEqual(screen.take_dirty(), {1, 2, 3})
+        screen.feed(AnsiParser().feed(b'\x1b[?1049h'))
+        self.assertTrue(screen.all_dirty)
+        self.assertEqual(screen.take_dirty(), set(range(5)))
+
+
+class WideCharacterTest(unittest.TestCase):
+    def test_wide_character_wraps_at_line_end(self):
+        screen = _screen('abc中'.encode(), cols=4)
+        self.assertEqual(_row(screen, 0), 'abc')
+        self.assertTrue(screen.lines[0].wrapped)
+        self.assertEqual(screen.lines[1].text(), '中')
+
+    def test_single_column_drops_wide_characters(self):
+        for data in ('中文', 'a中b', '\x1b[?7l中文'):
+            screen = _screen(data.encode(), cols=1, rows=3)
+            for line in screen.lines:
+                self.assertEqual((len(line.chars), len(line.attrs)), (1, 1))
+
+
+class ResizeTest(unittest.TestCase):
+    def test_saved_cursor_is_clamped(self):
+        screen = _screen(b'\x1b[5;20H\x1b7')
+        screen.resize(10, 3)
+        screen.feed(AnsiParser().feed(b'\x1b8x'))
+        self.assertEqual(screen.cursor.y, 2)
+        self.assertLessEqual(screen.cursor.x, 9)
+        self.assertEqual(_row(screen, 2)[-1:], 'x')
+
+    def test_saved_primary_cursor_follows_shrink(self):
+        # 主屏保存的光标在第3行，缩小时顶部两行进入历史，恢复后仍指向同一行
+        screen = _screen(b'a\r\nb\r\nc\r\nd\r\ne\x1b[3;15H\x1b[?1049h')
+        screen.resize(10, 3)
+        self.assertEqual((screen.saved_primary_cursor.x, screen.saved_primary_cursor.y), (9, 0))
+        screen.feed(AnsiParser().feed(b'\x1b[?1049l'))
+        self.assertEqual(_row(screen, 0), 'c')
+        self.assertEqual((screen.cursor.x, screen.cursor.y), (9, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import time
+import unittest
+from unittest import mock
+
+from transport_pool import DEFAULT_LINGER, TransportPool, auth_fingerprint
+
+
+def _client() -> mock.Mock:
+    client = mock.Mock()
+    client.get_transport.return_value.is_active.return_value = True
+    return client
+
+
+class AuthFingerprintTest(unittest.TestCase):
+    def test_credentials_change_the_fingerprint(self):
+        password = auth_fingerprint('password', 'secret')
+        self.assertEqual(password, auth_fingerprint('password', 'secret', '/ignored'))
+        self.assertNotEqual(password, auth_fingerprint('password', 'other'))
+        self.assertNotIn('secret', password)
+
+        key = auth_fingerprint('key', '', '~/.ssh/id_rsa')
+        self.assertEqual(key, auth_fingerprint('key', 'ignored', '~/.ssh/id_rsa'))
+        self.assertNotEqual(key, auth_fingerprint('key', '', '~/.ssh/other'))
+        self.assertNotEqual(key, password)
+
+
+class TransportPoolTest(unittest.TestCase):
+    def test_lease_is_shared_only_with_the_same_credentials(self):
+        pool = TransportPool()
+        auth = auth_fingerprint('password', 'secret')
+        lease = pool.add('web', 22, 'root', auth, _client())
+        self.assertIs(pool.acquire('web', 22, 'root', auth), lease)
+        self.assertEqual(lease.refs, 2)
+        self.assertIsNone(pool.acquire('web', 22, 'root', auth_fingerprint('password', 'wrong')))
+        self.assertIsNone(pool.acquire('web', 22, 'root', auth_fingerprint('key', '', '/tmp/id')))
+        self.assertIsNone(pool.acquire('web', 22, 'admin', auth))
+
+    def test_inactive_connection_is_not_reused(self):
+        pool = TransportPool()
+        client = _client()
+        pool.add('web', 22, 'root', 'auth', client)
+        client.get_transport.return_value.is_active.return_value = False
+        self.assertIsNone(pool.acquire('web', 22, 'root', 'auth'))
+
+    def test_default_linger_keeps_released_connection(self):
+        self.assertGreater(DEFAULT_LINGER, 0)
+        pool = TransportPool()
+        client = _client()
+        lease = pool.add('web', 22, 'root', 'auth', client)
+        pool.release(lease)
+        client.close.assert_not_called()
+        self.assertIs(pool.acquire('web', 22, 'root', 'auth'), lease)
+        self.assertIsNone(lease.timer)
+        pool.close_all()
+        client.close.assert_called_once_with()
+
+    def test_connection_closes_after_linger(self):
+        pool = TransportPool(linger=0.05)
+        client = _client()
+        pool.release(pool.add('web', 22, 'root', 'auth', client))
+        time.sleep(0.3)
+        client.close.assert_called_once_with()
+        self.assertIsNone(pool.acquire('web', 22, 'root', 'auth'))
+
+    def test_zero_linger_closes_immediately(self):
+        pool = TransportPool(linger=0)
+        client = _client()
+        pool.release(pool.add('web', 22, 'root', 'auth', client))
+        client.close.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import threading
+from typing import Optional, Tuple
+
+
+# 最后一个通道关闭后连接保持的秒数，0 表示立即关闭；
+# 关闭标签页后很快重开、连续执行批量命令时可以直接复用连接
+DEFAULT_LINGER = 30.0
+
+# (主机, 端口, 用户名, 认证指纹)
+PoolKey = Tuple[str, int, str, str]
+
+# 计算认证指纹的进程内随机密钥，指纹不能离线用来猜测密码
+_FINGERPRINT_SECRET = os.urandom(16)
+
+
+def auth_fingerprint(auth_type: str, password: str = "", private_key_path: str = "") -> str:
+    """认证方式和凭据的指纹
+
+    连接池按它区分同一用户以不同凭据建立的连接：凭据不同（如改了密码、换了私钥）时
+    不复用别人认证过的连接，而是用自己的凭据重新认证。
+    """
+    if auth_type == "key" and private_key_path:
+        secret = "key\0" + os.path.realpath(os.path.expanduser(private_key_path))
+    else:
+        secret = "password\0" + (password or "")
+    return hashlib.blake2b(secret.encode('utf-8'), key=_FINGERPRINT_SECRET, digest_size=16).hexdigest()
+
+
+class TransportLease:
+    """对池中一条已认证连接的引用计数项"""
+
+    __slots__ = ('key', 'client', 'refs', 'timer')
+
+    def __init__(self, key: PoolKey, client):
+        self.key = key
+        self.client = client
+        self.refs = 1
+        self.timer = None
+
+    @property
+    def transport(self):
+        return self.client.get_transport()
+
+    def is_active(self) -> bool:
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+
+class TransportPool:
+    """已认证SSH连接池
+
+    按 (主机, 端口, 用户名, 认证指纹) 复用 paramiko 连接，新的终端、SFTP或命令执行只需在现有连接上
+    打开一个通道。每个使用者持有一次引用，最后一个引用释放后连接在 linger 秒后关闭，
+    期间再次获取会取消关闭。
+    """
+
+    def __init__(self, linger: float = DEFAULT_LINGER):
+        self.linger = linger
+        self._lock = threading.Lock()
+        self._leases = {}
+
+    def acquire(self, host: str, port: int, username: str, auth: str) -> Optional[TransportLease]:
+        """获取一条仍然活动、以相同凭据（auth 为 auth_fingerprint）认证的连接并增加引用，没有时返回None"""
+        key = (host, port, username, auth)
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is None:
+                return None
+            if not lease.is_active():
+                del self._leases[key]
+                self._cancel_timer(lease)
+                return None
+            lease.refs += 1
+            self._cancel_timer(lease)
+            return lease
+
+    def add(self, host: str, port: int, username: str, auth: str, client) -> TransportLease:
+        """登记新建立的连接，返回持有一次引用的租约
+
+        同一主机已有以相同凭据认证的活动连接时（并发首次连接），新连接不进入池，引用归零后直接关闭。
+        """
+        key = (host, port, username, auth)
+        lease = TransportLease(key, client)
+        with self._lock:
+            current = self._leases.get(key)
+            if current is None or not current.is_active():
+                self._leases[key] = lease
+        return lease
+
+    def release(self, lease: TransportLease):
+        """释放一次引用，引用归零后按 linger 关闭连接"""
+        with self._lock:
+            lease.refs -= 1
+            if lease.refs > 0:
+                return
+            pooled = self._leases.get(lease.key) is lease
+            if pooled and self.linger > 0 and lease.is_active():
+                lease.timer = threading.Timer(self.linger, self._expire, (lease,))
+                lease.timer.daemon = True
+                lease.timer.start()
+                return
+            if pooled:
+                del self._leases[lease.key]
+        lease.client.close()
+
+    def close_all(self):
+        """关闭池中所有连接"""
+        with self._lock:
+            leases = list(self._leases.values())
+            self._leases.clear()
+        for lease in leases:
+            self._cancel_timer(lease)
+            lease.client.close()
+
+    def _expire(self, lease: TransportLease):
+        """空闲期满，仍无人使用则关闭"""
+        with self._lock:
+            if lease.refs > 0 or self._leases.get(lease.key) is not lease:
+                return
+            del self._leases[lease.key]
+            lease.timer = None
+        lease.client.close()
+
+    @staticmethod
+    def _cancel_timer(lease: TransportLease):
+        if lease.timer is not None:
+            lease.timer.cancel()
+            lease.timer = None
+
+
+_pool: Optional[TransportPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_transport_pool() -> TransportPool:
+    """获取全局共享的连接池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TransportPool()
+        return _pool